@@ -0,0 +1,381 @@
+"""
+Vectorized scenario sweeps over the GenAI modeling hypotheses of main.py.
+
+Rebuilding the whole System takes a few seconds, so exploring thousands of combinations of hypotheses with a rebuild
+loop takes hours. In this modeling, every footprint is a multilinear function of the hourly number of visits of each
+usage pattern and of the number of output tokens of its GenAI job: servers are on premise with a fixed number of
+instances, GPU request durations are proportional to the number of output tokens and devices and network usage are
+proportional to the number of visits. The coefficients of this function are fitted once per object from a handful of
+full builds, after which all sweep points are evaluated in a single NumPy matrix product. Devices fabrication
+footprints are the exception, because e-footprint rounds their hourly values to 0.01 kg: they are recomputed from the
+hourly profile of each usage pattern, with the same rounding.
+
+The fixed number of instances of the on premise servers only holds while their hourly resources need fits in it, and
+e-footprint refuses to build the System otherwise. The hourly number of instances each server needs, based on CPU and
+on RAM, is multilinear in the same features: it is fitted for the distinct hours of the design builds, so that every
+sweep point is flagged as feasible or not.
+
+Usage, from the repository root:
+    sweep = ScenarioSweep()
+    results = sweep.evaluate(base_daily_nb_of_visits=np.arange(500, 5000, 500), word_per_chat=[300, 500], grid=True)
+    python -m ai_use_case.scenario_sweep
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from efootprint.constants.units import u
+
+from modeling_tools.footprints import footprints_by_object, hourly_magnitudes
+from modeling_tools.modelings import get_modeling
+from modeling_tools.run_modeling import load_builder
+
+VISIT_DRIVEN_USAGE_PATTERNS = {
+    "chat_with_simple_bot": "simple_chat", "chat_with_advanced_bot": "advanced_chat", "use_rag": "use_rag"}
+
+FEATURE_NAMES = [
+    "constant", "simple_chat_hourly_visits", "simple_chat_hourly_tokens", "advanced_chat_hourly_visits",
+    "advanced_chat_hourly_tokens", "use_rag_hourly_visits", "use_rag_hourly_tokens", "tokens_to_fill_rag"]
+
+# Each point only moves one or two features away from the base scenario, which keeps the design well conditioned.
+DEFAULT_DESIGN = [
+    {},
+    {"base_daily_nb_of_visits": 2000},
+    {"base_daily_nb_of_visits": 500},
+    {"word_per_chat": 1000},
+    {"word_per_document": 4000},
+    {"nb_docs_ingested": 2000},
+    {"share_simple_chat": 0.8},
+    {"share_advanced_chat": 0.5},
+    {"share_use_rag": 0.4},
+    {"token_per_word": 4, "base_daily_nb_of_visits": 1500},
+    {"share_simple_chat": 0.8, "word_per_chat": 300},
+    {"share_advanced_chat": 0.5, "word_per_document": 3000},
+]
+
+
+def base_inputs(main):
+    """
+    Return the base value of every sweep input, from the module of main.py.
+    """
+    return {
+        "base_daily_nb_of_visits": main.base_daily_nb_of_visits,
+        "share_simple_chat": main.usage_split[0],
+        "share_advanced_chat": main.usage_split[1],
+        "share_use_rag": main.usage_split[2],
+        "token_per_word": 3,
+        "nb_docs_ingested": 1000,
+        "word_per_chat": 500,
+        "word_per_document": 2000,
+    }
+
+
+def compute_hourly_visits(inputs, nb_of_active_hours):
+    daily_visits = np.asarray(inputs["base_daily_nb_of_visits"], dtype=float)
+    # Same rounding as main.py, then integer truncation of the volume per active hour, as done by
+    # create_hourly_usage_from_daily_volume_and_list_of_hours which fills an integer array.
+    return {
+        name: np.trunc(np.round(daily_visits * np.asarray(inputs[f"share_{name}"], dtype=float)) / nb_of_active_hours)
+        for name in VISIT_DRIVEN_USAGE_PATTERNS.values()}
+
+
+def compute_features(inputs, nb_of_active_hours):
+    """
+    Turn a dict of input arrays into the (nb_of_points, nb_of_features) matrix of the multilinear footprint model.
+    """
+    daily_visits = np.asarray(inputs["base_daily_nb_of_visits"], dtype=float)
+    hourly_visits = compute_hourly_visits(inputs, nb_of_active_hours)
+    token_per_word = np.asarray(inputs["token_per_word"], dtype=float)
+    word_per_chat = np.asarray(inputs["word_per_chat"], dtype=float)
+    word_per_document = np.asarray(inputs["word_per_document"], dtype=float)
+    tokens = {
+        "simple_chat": word_per_chat * token_per_word,
+        "advanced_chat": word_per_document * token_per_word,
+        "use_rag": (word_per_chat + word_per_document) * token_per_word,
+    }
+    tokens_to_fill_rag = word_per_document * np.asarray(inputs["nb_docs_ingested"], dtype=float) * token_per_word
+
+    columns = [np.ones_like(daily_visits)]
+    for name in ("simple_chat", "advanced_chat", "use_rag"):
+        columns += [hourly_visits[name], hourly_visits[name] * tokens[name]]
+    columns.append(tokens_to_fill_rag)
+
+    return np.column_stack(np.broadcast_arrays(*columns))
+
+
+def footprints_by_key(system):
+    """
+    Return a dict {(category, object name, type): footprint in kg summed over the modeling period}.
+    """
+    return {(footprint["category"], footprint["object"], footprint["type"]): footprint["value"]
+            for footprint in footprints_by_object(system)}
+
+
+def fixed_nb_of_instances_by_server(system):
+    """
+    Return a dict {server name: fixed number of instances} of the servers of system whose number of instances is fixed.
+    """
+    from efootprint.abstract_modeling_classes.explainable_objects import EmptyExplainableObject
+
+    return {server.name: float(server.fixed_nb_of_instances.value.to(u.dimensionless).magnitude)
+            for server in system.servers if not isinstance(server.fixed_nb_of_instances, EmptyExplainableObject)}
+
+
+def hourly_raw_nb_of_instances(server):
+    """
+    Return the hourly number of instances of server needed based on CPU alone and on RAM alone, as computed by
+    ServerBase.update_raw_nb_of_instances before their maximum.
+
+    Returns:
+        pd.Series indexed by (resource, hour).
+    """
+    from efootprint.abstract_modeling_classes.explainable_objects import EmptyExplainableObject
+
+    compute_unit = server.available_compute_per_instance.value.units
+    needs_and_capacities = {
+        "compute": (server.hour_by_hour_compute_need, compute_unit, server.available_compute_per_instance),
+        "ram": (server.hour_by_hour_ram_need, u.GB, server.available_ram_per_instance),
+    }
+    raw_nb_of_instances = []
+    for resource, (need, unit, available_per_instance) in needs_and_capacities.items():
+        if isinstance(need, EmptyExplainableObject):
+            continue
+        raw_nb_of_instances.append(pd.Series(
+            hourly_magnitudes(need, unit) / available_per_instance.value.to(unit).magnitude,
+            index=pd.MultiIndex.from_product([[resource], need.value.index])))
+
+    return pd.concat(raw_nb_of_instances)
+
+
+def devices_fabrication_profile(usage_pattern, hourly_visits):
+    """
+    Return the distinct unrounded hourly devices fabrication footprints in kg for one hourly visit, and their number
+    of occurrences over the modeling period.
+    """
+    # Same computation as UsagePattern.update_devices_fabrication_footprint, before its rounding to 0.01 kg
+    fabrication_over_one_hour = sum(
+        (device.carbon_footprint_fabrication.value * (1 * u.hour)
+         / (device.lifespan.value * device.fraction_of_usage_time.value)).to(u.kg).magnitude
+        for device in usage_pattern.devices)
+    nb_usage_journeys_in_parallel = usage_pattern.nb_usage_journeys_in_parallel.value["value"].pint.magnitude.to_numpy(
+        dtype=float)
+
+    return np.unique(nb_usage_journeys_in_parallel * fabrication_over_one_hour / hourly_visits, return_counts=True)
+
+
+class ScenarioSweep:
+    def __init__(self, design=None):
+        # main.py imports e-footprint modules that call the Boavizta API when they are imported
+        ai_use_case = get_modeling("ai_use_case")
+        self.build_system = load_builder(ai_use_case, ai_use_case.path)
+        main = sys.modules[self.build_system.__module__]
+        self.base_inputs = base_inputs(main)
+        self.nb_of_active_hours = len(main.active_hours)
+
+        self.design = [{**self.base_inputs, **overrides} for overrides in (design or DEFAULT_DESIGN)]
+        design_inputs = {key: np.array([point[key] for point in self.design], dtype=float) for key in self.base_inputs}
+        design_features = compute_features(design_inputs, self.nb_of_active_hours)
+        if np.linalg.matrix_rank(design_features) < len(FEATURE_NAMES):
+            raise ValueError(
+                f"Sweep design of {len(self.design)} points doesn’t identify the {len(FEATURE_NAMES)} model features "
+                f"{FEATURE_NAMES}, please add points that move them independently")
+
+        footprints = []
+        raw_nb_of_instances = []
+        self.devices_fabrication_profiles = {}
+        for point in self.design:
+            system = self.build_system_from_sweep_inputs(point)
+            footprints.append(footprints_by_key(system))
+            if not self.devices_fabrication_profiles:
+                self.system_name = system.name
+                self.fixed_nb_of_instances = fixed_nb_of_instances_by_server(system)
+                hourly_visits = compute_hourly_visits(point, self.nb_of_active_hours)
+                for usage_pattern in system.usage_patterns:
+                    if usage_pattern.name in VISIT_DRIVEN_USAGE_PATTERNS:
+                        self.devices_fabrication_profiles[("Devices", usage_pattern.name, "Fabrication")] = (
+                            devices_fabrication_profile(
+                                usage_pattern, hourly_visits[VISIT_DRIVEN_USAGE_PATTERNS[usage_pattern.name]]))
+            raw_nb_of_instances.append({server.name: hourly_raw_nb_of_instances(server) for server in system.servers
+                                        if server.name in self.fixed_nb_of_instances})
+
+        self.output_keys = list(footprints[0].keys())
+        design_outputs = np.array([[footprint[key] for key in self.output_keys] for footprint in footprints])
+        self.coefficients, _, _, _ = np.linalg.lstsq(design_features, design_outputs, rcond=None)
+        self.fit_max_abs_error = float(np.abs(self.evaluate_array(design_inputs) - design_outputs).max())
+
+        # Most hours share their need with many others, so only the distinct hours of the design builds are fitted
+        self.raw_nb_of_instances_coefficients = {}
+        for server_name in self.fixed_nb_of_instances:
+            # Hours without need in a build are missing from its hourly needs
+            server_raw_nb_of_instances = pd.concat(
+                [point_raw_nb_of_instances[server_name] for point_raw_nb_of_instances in raw_nb_of_instances],
+                axis=1).fillna(0)
+            distinct_hours = np.unique(server_raw_nb_of_instances.to_numpy().T, axis=1)
+            self.raw_nb_of_instances_coefficients[server_name], _, _, _ = np.linalg.lstsq(
+                design_features, distinct_hours, rcond=None)
+
+    def build_system_from_sweep_inputs(self, inputs):
+        return self.build_system(
+            base_daily_nb_of_visits=inputs["base_daily_nb_of_visits"],
+            usage_split=(inputs["share_simple_chat"], inputs["share_advanced_chat"], inputs["share_use_rag"]),
+            token_per_word=inputs["token_per_word"], nb_docs_ingested=inputs["nb_docs_ingested"],
+            word_per_chat=inputs["word_per_chat"], word_per_document=inputs["word_per_document"])
+
+    def resolve_inputs(self, grid=False, **input_arrays):
+        unknown_inputs = set(input_arrays) - set(self.base_inputs)
+        if unknown_inputs:
+            raise ValueError(
+                f"Unknown sweep inputs {sorted(unknown_inputs)}, should be among {list(self.base_inputs)}")
+        arrays = {key: np.atleast_1d(np.asarray(value, dtype=float)) for key, value in input_arrays.items()}
+        if grid:
+            meshes = np.meshgrid(*arrays.values(), indexing="ij")
+            arrays = {key: mesh.ravel() for key, mesh in zip(arrays.keys(), meshes)}
+        nb_of_points = np.broadcast_shapes(*[array.shape for array in arrays.values()], (1,))[0]
+        resolved = {}
+        for key, base_value in self.base_inputs.items():
+            resolved[key] = np.broadcast_to(arrays.get(key, np.asarray([base_value], dtype=float)), (nb_of_points,))
+
+        return resolved
+
+    def evaluate_array(self, inputs):
+        """
+        Return the (nb_of_points, nb_of_outputs) array of footprints in kg, columns ordered as self.output_keys.
+        """
+        footprints = compute_features(inputs, self.nb_of_active_hours) @ self.coefficients
+        hourly_visits = compute_hourly_visits(inputs, self.nb_of_active_hours)
+        for key, (profile_values, profile_counts) in self.devices_fabrication_profiles.items():
+            usage_pattern_hourly_visits = hourly_visits[VISIT_DRIVEN_USAGE_PATTERNS[key[1]]]
+            footprints[:, self.output_keys.index(key)] = (
+                np.round(usage_pattern_hourly_visits[:, np.newaxis] * profile_values, 2) @ profile_counts)
+
+        return footprints
+
+    def nb_of_instances_needed(self, inputs):
+        """
+        Return a dict {server name: array of the number of instances needed at each point} for the servers with a fixed
+        number of instances, computed as ServerBase.on_premise_update_nb_of_instances does.
+        """
+        features = compute_features(inputs, self.nb_of_active_hours)
+        # Same rounding to 6 decimals as the conversion of the raw numbers of instances to dimensionless
+        return {server_name: np.ceil(np.round(features @ coefficients, 6).max(axis=1))
+                for server_name, coefficients in self.raw_nb_of_instances_coefficients.items()}
+
+    def feasible(self, inputs):
+        """
+        Return the boolean array of the points whose servers needs fit in their fixed number of instances, the others
+        making e-footprint raise a ValueError when building the System.
+        """
+        feasible = np.ones(len(compute_features(inputs, self.nb_of_active_hours)), dtype=bool)
+        for server_name, nb_of_instances_needed in self.nb_of_instances_needed(inputs).items():
+            feasible &= nb_of_instances_needed <= self.fixed_nb_of_instances[server_name]
+
+        return feasible
+
+    def evaluate(self, grid=False, **input_arrays):
+        """
+        Evaluate the footprints of all sweep points and return them as a tidy DataFrame.
+
+        Args:
+            grid (bool): if True, sweep the cartesian product of the input arrays, otherwise broadcast them together.
+            **input_arrays: arrays of values for any key of base_inputs. Missing inputs take their base value.
+        Returns:
+            pd.DataFrame: one row per point and footprint, with the point inputs, "Feasible", "Category", "Object",
+                "Type" and "kg CO2 emissions" columns. "Total" rows hold the system total footprint. Points needing more
+                server instances than the fixed number of instances of main.py aren’t feasible, their footprints are
+                extrapolations of the fitted model that e-footprint wouldn’t compute.
+        """
+        inputs = self.resolve_inputs(grid=grid, **input_arrays)
+        footprints = self.evaluate_array(inputs)
+        feasible = self.feasible(inputs)
+        nb_of_points = footprints.shape[0]
+        categories, objects, types = map(list, zip(*self.output_keys))
+        values = np.column_stack([footprints, footprints.sum(axis=1)])
+
+        df = pd.DataFrame({key: np.repeat(value, values.shape[1]) for key, value in inputs.items()})
+        df.insert(0, "point", np.repeat(np.arange(nb_of_points), values.shape[1]))
+        df["Feasible"] = np.repeat(feasible, values.shape[1])
+        df["Category"] = np.tile(categories + ["Total"], nb_of_points)
+        df["Object"] = np.tile(objects + [self.system_name], nb_of_points)
+        df["Type"] = np.tile(types + ["Total"], nb_of_points)
+        df["kg CO2 emissions"] = values.ravel()
+
+        return df
+
+    def check_against_rebuild(self, nb_of_points=3, seed=0):
+        """
+        Compare the sweep with full rebuilds on random feasible points drawn within the design range and return the
+        maximum relative error on the total footprint.
+        """
+        rng = np.random.default_rng(seed)
+        max_relative_error = 0
+        nb_of_checked_points = 0
+        while nb_of_checked_points < nb_of_points:
+            point = {key: rng.uniform(min(p[key] for p in self.design), max(p[key] for p in self.design))
+                     for key in self.base_inputs}
+            for key in ("base_daily_nb_of_visits", "token_per_word", "nb_docs_ingested", "word_per_chat",
+                        "word_per_document"):
+                point[key] = round(point[key])
+            inputs = self.resolve_inputs(**point)
+            if not self.feasible(inputs)[0]:
+                continue
+            rebuilt_total = sum(footprints_by_key(self.build_system_from_sweep_inputs(point)).values())
+            swept_total = self.evaluate_array(inputs).sum()
+            max_relative_error = max(max_relative_error, abs(swept_total - rebuilt_total) / rebuilt_total)
+            nb_of_checked_points += 1
+
+        return max_relative_error
+
+    def check_feasibility_against_rebuild(self, points):
+        """
+        Build the System of each point, a dict of inputs completed with base_inputs, and return the points whose
+        feasibility flag doesn’t match whether e-footprint builds their System.
+        """
+        mismatches = []
+        for point in points:
+            point = {**self.base_inputs, **point}
+            try:
+                self.build_system_from_sweep_inputs(point)
+                built = True
+            except ValueError:
+                built = False
+            if built != self.feasible(self.resolve_inputs(**point))[0]:
+                mismatches.append(point)
+
+        return mismatches
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    scenario_sweep = ScenarioSweep()
+    fit_duration = time.perf_counter() - start
+    print(f"Fitted {len(scenario_sweep.output_keys)} footprints from {len(scenario_sweep.design)} builds "
+          f"in {fit_duration:.1f} s (max fit error {scenario_sweep.fit_max_abs_error:.2e} kg)")
+
+    sweep_values = {
+        "base_daily_nb_of_visits": np.linspace(500, 20000, 25),
+        "word_per_chat": np.linspace(200, 1000, 20),
+        "word_per_document": np.linspace(1000, 4000, 20),
+    }
+    start = time.perf_counter()
+    sweep_results = scenario_sweep.evaluate(grid=True, **sweep_values)
+    sweep_duration = time.perf_counter() - start
+    nb_of_points = int(np.prod([len(values) for values in sweep_values.values()]))
+
+    start = time.perf_counter()
+    scenario_sweep.build_system_from_sweep_inputs(scenario_sweep.base_inputs)
+    rebuild_duration = time.perf_counter() - start
+
+    print(f"Evaluated {nb_of_points} points in {sweep_duration:.2f} s, a rebuild loop would take about "
+          f"{rebuild_duration * nb_of_points:.0f} s ({rebuild_duration * nb_of_points / sweep_duration:.0f}x slower)")
+    print(f"Max relative error against full rebuilds: {scenario_sweep.check_against_rebuild():.2e}")
+    totals = sweep_results[sweep_results["Category"] == "Total"]
+    print(f"{(~totals['Feasible']).sum()} points need more instances than the fixed number of instances of "
+          f"{', '.join(scenario_sweep.fixed_nb_of_instances)}")
+    feasibility_mismatches = scenario_sweep.check_feasibility_against_rebuild(
+        [{"base_daily_nb_of_visits": nb_of_visits, "word_per_chat": 1000, "word_per_document": 4000}
+         for nb_of_visits in (2000, 5000, 8000, 11000)])
+    print(f"Feasibility flags contradicted by full rebuilds: {len(feasibility_mismatches)}")
+    totals = totals[totals["Feasible"]]
+    print(totals.sort_values("kg CO2 emissions").iloc[[0, -1]][list(sweep_values) + ["kg CO2 emissions"]].to_string())
@@ -0,0 +1,314 @@
+"""
+Amortized footprint per inference request of the Bloom modeling, over a grid of request volumes, model lifetimes and
+numbers of inference GPUs.
+
+bloom_efootprint.py models the training, 119 days of gpu_hours, and the inference, request_per_hour requests, as two
+usage patterns of one System, and gives one yearly total. Evaluating another request volume, lifetime or
+GPU_INFERENCE_NB meant rebuilding the System. AmortizationCurves builds it once and splits its yearly footprints into:
+    - the footprint of one training: the training server, the laptop of the Bloom developers, and the training share of
+      the storage and network, split in proportion of the data stored and transferred by each usage pattern,
+    - the footprint of one inference request, split into the inference server fabrication and electricity, the devices
+      of the users, and the storage and network share, each divided by the yearly number of requests.
+The grid is then evaluated with NumPy broadcasting, the training being amortized over all the requests served during
+the model lifetime:
+    amortized footprint per request = training footprint / (requests per hour * hours per year * lifetime)
+                                      + inference footprint per request(nb of GPUs)
+
+The inference footprint per request depends on the number of GPUs as in bloom_efootprint.py: the measured cluster power
+is shared by more GPUs, so that the request duration, which is also the time users spend, is divided by the number of
+GPUs while the power and idle power of the server are multiplied by it, and the fabrication footprint of the server is
+the one of the server without GPU plus one per GPU. The inference resources of a request don’t depend on the request
+volume: autoscaling servers add instances with the load, so the inference footprint is proportional to the number of
+requests, where bloom_efootprint.py keeps the load at the measured cluster power.
+
+The training stops dominating the amortized footprint at the break-even points, where the training footprint equals the
+inference footprint of all the requests of the model lifetime.
+
+check_against_system compares the training and yearly inference footprints at the reference point of the modeling with
+the total footprint of its System, so that no footprint is left out of the split.
+
+Usage:
+    python -m modeling_tools.amortization_curves --requests-per-hour 100 558 5000 --lifetimes 0.5 1 3 --gpus 8 16 32
+        --check
+"""
+import argparse
+import sys
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+TRAINING = "training"
+INFERENCE = "inference"
+SERVER_FABRICATION = "server fabrication"
+SERVER_ELECTRICITY = "server electricity"
+DEVICES = "devices"
+DATA = "storage and network"
+
+
+@dataclass
+class AmortizationCurvesResult:
+    """
+    Amortized footprints of the Bloom modeling, in kg, over a grid of request volumes, model lifetimes and numbers of
+    GPUs.
+
+    Attributes:
+        requests_per_hour: evaluated request volumes.
+        lifetimes_in_years: evaluated model lifetimes, over which the training is amortized.
+        nb_of_inference_gpus: evaluated numbers of GPUs of the inference server.
+        training_footprint: footprint of one training.
+        inference_footprint_per_request: footprint of one request, one per number of GPUs.
+        amortized_footprint_per_request: array of shape (request volumes, lifetimes, numbers of GPUs).
+        training_share: share of the training in the footprint of the model lifetime, same shape.
+        break_even_requests_per_hour: request volumes above which the training stops dominating, of shape (lifetimes,
+            numbers of GPUs).
+        break_even_lifetimes_in_years: lifetimes above which the training stops dominating, of shape (request
+            volumes, numbers of GPUs).
+        duration_in_s: duration of the evaluation.
+    """
+    requests_per_hour: np.ndarray
+    lifetimes_in_years: np.ndarray
+    nb_of_inference_gpus: np.ndarray
+    training_footprint: float
+    inference_footprint_per_request: np.ndarray
+    amortized_footprint_per_request: np.ndarray
+    training_share: np.ndarray
+    break_even_requests_per_hour: np.ndarray
+    break_even_lifetimes_in_years: np.ndarray
+    duration_in_s: float
+
+
+def yearly_footprints_in_kg(system):
+    """
+    Return {(category, object name, footprint type): yearly footprint in kg} of a System built with any e-footprint
+    version, legacy modelings built with e-footprint 9 being modeled over LEGACY_TIMESPAN_IN_YEARS.
+    """
+    from efootprint.constants.units import u
+
+    from modeling_tools.footprints import footprints_by_object
+    from modeling_tools.legacy_adapter import LEGACY_TIMESPAN_IN_YEARS
+
+    yearly_footprints = {}
+    for footprint in footprints_by_object(system):
+        value = footprint["value"] * u(footprint["unit"])
+        if value.check("[mass]"):
+            value = value / (LEGACY_TIMESPAN_IN_YEARS * u.year)
+        yearly_footprints[(footprint["category"], footprint["object"], footprint["type"])] = float(
+            value.to(u.kg / u.year).magnitude)
+
+    return yearly_footprints
+
+
+def yearly_nb_of_user_journeys(usage_pattern):
+    from efootprint.constants.units import u
+
+    return float((usage_pattern.device_population.nb_devices.value * usage_pattern.user_journey_freq_per_user.value
+                  * u.year).to(u.uj).magnitude)
+
+
+def yearly_data(usage_pattern, data_attributes):
+    """
+    Return the data of the jobs of a usage pattern over one year in TB, summing data_attributes of every job.
+    """
+    from efootprint.constants.units import u
+
+    data_per_user_journey = sum(
+        getattr(job, data_attribute).value.to(u.TB / u.uj).magnitude
+        for step in usage_pattern.user_journey.uj_steps for job in step.jobs for data_attribute in data_attributes)
+
+    return data_per_user_journey * yearly_nb_of_user_journeys(usage_pattern)
+
+
+class AmortizationCurves:
+    """
+    Training and inference components of the Bloom modeling, computed once from its built System.
+
+    Args:
+        script_globals: globals of bloom_efootprint.py once run, see run_modeling.run_modeling_script.
+    Attributes:
+        yearly_footprints: {(category, object name, footprint type): yearly footprint in kg} of the System.
+        training_footprint: footprint of one training in kg.
+        nb_of_trainings_per_year: number of trainings in the yearly footprints of the System.
+        reference_requests_per_hour: request volume of the modeling.
+        reference_nb_of_gpus: GPU_INFERENCE_NB of the modeling.
+        inference_terms: {SERVER_FABRICATION, SERVER_ELECTRICITY, DEVICES or DATA: footprint of one request in kg with
+            reference_nb_of_gpus}.
+    """
+    def __init__(self, script_globals):
+        from efootprint.constants.units import u
+
+        system = script_globals["system"]
+        training_up, inference_up = script_globals["training_up"], script_globals["inference_up"]
+        training_server, inference_server = script_globals["server"], script_globals["server_inference"]
+        storage = script_globals["storage"]
+        self.hours_per_year = float((1 * u.year).to(u.hour).magnitude)
+        self.reference_requests_per_hour = float(script_globals["request_per_hour"].value.to(1 / u.hour).magnitude)
+        self.reference_nb_of_gpus = float(script_globals["GPU_INFERENCE_NB"].value.magnitude)
+        self.server_fabrication_without_gpu = float(
+            script_globals["carbon_footprint_fabrication_server_without_gpu"].value.to(u.kg).magnitude)
+        self.fabrication_per_gpu = float(
+            script_globals["carbon_footprint_fabrication_one_gpu"].value.to(u.kg).magnitude)
+
+        # e-footprint 9 names devices after their usage pattern and splits the storage shared by both servers
+        object_names = {
+            TRAINING: {training_server.name, training_up.name, training_up.device_population.name,
+                       f"{storage.name} of {training_server.name}"},
+            INFERENCE: {inference_server.name, inference_up.name, inference_up.device_population.name,
+                        f"{storage.name} of {inference_server.name}"},
+        }
+        training_shares_by_category = {}
+        for category, data_attributes in [("Storage", ["data_upload"]), ("Network", ["data_upload", "data_download"])]:
+            training_data = yearly_data(training_up, data_attributes)
+            training_shares_by_category[category] = training_data / (
+                training_data + yearly_data(inference_up, data_attributes))
+
+        self.yearly_footprints = yearly_footprints_in_kg(system)
+        yearly_training_footprint = 0
+        yearly_inference_terms = {SERVER_FABRICATION: 0, SERVER_ELECTRICITY: 0, DEVICES: 0, DATA: 0}
+        for (category, obj_name, footprint_type), yearly_footprint in self.yearly_footprints.items():
+            if obj_name in object_names[TRAINING]:
+                yearly_training_footprint += yearly_footprint
+                continue
+            if obj_name in object_names[INFERENCE]:
+                if category == "Servers":
+                    term = SERVER_FABRICATION if footprint_type == "Fabrication" else SERVER_ELECTRICITY
+                else:
+                    term = DEVICES if category == "Devices" else DATA
+                yearly_inference_terms[term] += yearly_footprint
+                continue
+            if category not in training_shares_by_category:
+                raise ValueError(f"{category} footprint of {obj_name} belongs neither to the training nor to the "
+                                 f"inference of {system.name}")
+            training_share = training_shares_by_category[category]
+            yearly_training_footprint += yearly_footprint * training_share
+            yearly_inference_terms[DATA] += yearly_footprint * (1 - training_share)
+
+        # The training usage pattern runs the whole total_training_time once a year
+        training_time_per_user_journey = sum(
+            step.user_time_spent.value.to(u.day / u.uj).magnitude for step in training_up.user_journey.uj_steps)
+        self.nb_of_trainings_per_year = (
+            yearly_nb_of_user_journeys(training_up) * training_time_per_user_journey
+            / script_globals["total_training_time"].value.to(u.day).magnitude)
+        self.training_footprint = yearly_training_footprint / self.nb_of_trainings_per_year
+        yearly_nb_of_requests = yearly_nb_of_user_journeys(inference_up)
+        self.inference_terms = {term: yearly_footprint / yearly_nb_of_requests
+                                for term, yearly_footprint in yearly_inference_terms.items()}
+
+    def server_fabrication(self, nb_of_gpus):
+        return self.server_fabrication_without_gpu + nb_of_gpus * self.fabrication_per_gpu
+
+    def inference_footprint_per_request(self, nb_of_gpus):
+        """
+        Returns:
+            array of the footprints of one request in kg, one per number of GPUs of the inference server.
+        """
+        nb_of_gpus = np.asarray(nb_of_gpus, dtype=float)
+        request_duration_ratio = self.reference_nb_of_gpus / nb_of_gpus
+        power_ratio = nb_of_gpus / self.reference_nb_of_gpus
+        fabrication_ratio = self.server_fabrication(nb_of_gpus) / self.server_fabrication(self.reference_nb_of_gpus)
+
+        return (self.inference_terms[SERVER_FABRICATION] * fabrication_ratio * request_duration_ratio
+                + self.inference_terms[SERVER_ELECTRICITY] * power_ratio * request_duration_ratio
+                + self.inference_terms[DEVICES] * request_duration_ratio
+                + self.inference_terms[DATA])
+
+    def evaluate(self, requests_per_hour, lifetimes_in_years, nb_of_inference_gpus):
+        """
+        Args:
+            requests_per_hour: request volumes.
+            lifetimes_in_years: model lifetimes over which the training is amortized.
+            nb_of_inference_gpus: numbers of GPUs of the inference server.
+        Returns:
+            an AmortizationCurvesResult.
+        """
+        start = time.perf_counter()
+        requests_per_hour = np.asarray(requests_per_hour, dtype=float)
+        lifetimes_in_years = np.asarray(lifetimes_in_years, dtype=float)
+        nb_of_inference_gpus = np.asarray(nb_of_inference_gpus, dtype=float)
+        inference_per_request = self.inference_footprint_per_request(nb_of_inference_gpus)
+
+        nb_of_requests = requests_per_hour[:, None, None] * self.hours_per_year * lifetimes_in_years[None, :, None]
+        inference_footprint = nb_of_requests * inference_per_request[None, None, :]
+        yearly_inference_per_request_per_hour = self.hours_per_year * inference_per_request
+
+        return AmortizationCurvesResult(
+            requests_per_hour=requests_per_hour, lifetimes_in_years=lifetimes_in_years,
+            nb_of_inference_gpus=nb_of_inference_gpus, training_footprint=self.training_footprint,
+            inference_footprint_per_request=inference_per_request,
+            amortized_footprint_per_request=self.training_footprint / nb_of_requests + inference_per_request,
+            training_share=self.training_footprint / (self.training_footprint + inference_footprint),
+            break_even_requests_per_hour=self.training_footprint / (
+                lifetimes_in_years[:, None] * yearly_inference_per_request_per_hour[None, :]),
+            break_even_lifetimes_in_years=self.training_footprint / (
+                requests_per_hour[:, None] * yearly_inference_per_request_per_hour[None, :]),
+            duration_in_s=time.perf_counter() - start)
+
+
+def check_against_system(curves, rtol=1e-9):
+    """
+    Compare the yearly footprint of the components at the reference point of the modeling with the total footprint of
+    its System.
+
+    Returns:
+        (yearly footprint of the components, yearly total footprint of the System, whether they match within rtol).
+    """
+    yearly_nb_of_requests = curves.reference_requests_per_hour * curves.hours_per_year
+    components_footprint = (
+        curves.training_footprint * curves.nb_of_trainings_per_year
+        + yearly_nb_of_requests * float(curves.inference_footprint_per_request(curves.reference_nb_of_gpus)))
+    system_footprint = sum(curves.yearly_footprints.values())
+
+    return components_footprint, system_footprint, bool(np.isclose(components_footprint, system_footprint, rtol=rtol))
+
+
+def print_result(curves, result: AmortizationCurvesResult):
+    print(f"Training: {result.training_footprint:.1f} kg per training")
+    for term, footprint in curves.inference_terms.items():
+        print(f"Inference {term} with {curves.reference_nb_of_gpus:g} GPUs: {footprint * 1000:.3f} g per request")
+    print("\nAmortized footprint per request, in g, by request volume per hour")
+    print(f"{'lifetime':>9} {'GPUs':>5} " + " ".join(f"{volume:>10g}" for volume in result.requests_per_hour))
+    for lifetime_index, lifetime in enumerate(result.lifetimes_in_years):
+        for gpu_index, nb_of_gpus in enumerate(result.nb_of_inference_gpus):
+            amortized_footprints = result.amortized_footprint_per_request[:, lifetime_index, gpu_index] * 1000
+            print(f"{lifetime:>7g} y {nb_of_gpus:>5g} " + " ".join(f"{value:>10.3f}" for value in amortized_footprints))
+    print("\nBreak-even request volume per hour, above which the training stops dominating")
+    print(f"{'lifetime':>9} " + " ".join(f"{nb_of_gpus:>8g} GPUs" for nb_of_gpus in result.nb_of_inference_gpus))
+    for lifetime, break_even_volumes in zip(result.lifetimes_in_years, result.break_even_requests_per_hour):
+        print(f"{lifetime:>7g} y " + " ".join(f"{volume:>13.0f}" for volume in break_even_volumes))
+    print("\nBreak-even model lifetime in years, above which the training stops dominating")
+    print(f"{'requests/h':>10} " + " ".join(f"{nb_of_gpus:>8g} GPUs" for nb_of_gpus in result.nb_of_inference_gpus))
+    for volume, break_even_lifetimes in zip(result.requests_per_hour, result.break_even_lifetimes_in_years):
+        print(f"{volume:>10g} " + " ".join(f"{lifetime:>13.2f}" for lifetime in break_even_lifetimes))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests-per-hour", nargs="+", type=float, default=[10, 100, 558, 1000, 10000])
+    parser.add_argument("--lifetimes", nargs="+", type=float, default=[0.5, 1, 2, 5],
+                        help="Model lifetimes in years, over which the training is amortized.")
+    parser.add_argument("--gpus", nargs="+", type=float, default=[8, 16, 32],
+                        help="Numbers of GPUs of the inference server.")
+    parser.add_argument("--check", action="store_true",
+                        help="Compare the components at the reference point with the System total footprint.")
+    args = parser.parse_args()
+
+    from modeling_tools.lookup_cache import import_boavizta_modules
+    from modeling_tools.modelings import get_modeling
+    from modeling_tools.run_modeling import run_for_analysis, run_modeling_script
+
+    bloom = get_modeling("bloom")
+    import_boavizta_modules()
+    build_start = time.perf_counter()
+    bloom_globals = run_for_analysis(run_modeling_script, bloom, bloom.path)
+    print(f"Bloom built in {time.perf_counter() - build_start:.2f} s")
+    amortization_curves = AmortizationCurves(bloom_globals)
+    curves_result = amortization_curves.evaluate(args.requests_per_hour, args.lifetimes, args.gpus)
+    print(f"{curves_result.amortized_footprint_per_request.size} grid points evaluated in "
+          f"{curves_result.duration_in_s * 1000:.2f} ms\n")
+    print_result(amortization_curves, curves_result)
+
+    if args.check:
+        components_total, system_total, totals_match = check_against_system(amortization_curves)
+        print(f"\nReference point: components {components_total:.1f} kg / year, System {system_total:.1f} kg / year")
+        if not totals_match:
+            sys.exit(1)
@@ -0,0 +1,181 @@
+"""
+Run several modelings and parameter variants in parallel and merge their results into one report.
+
+Every run gets its own copy of the modeling directory and its own Python process, so that the files written by a
+modeling can’t collide with those of another run and so that each modeling can use the interpreter where its own
+e-footprint version is installed.
+
+Usage:
+    python -m modeling_tools.batch_runner ai_use_case bloom --python bloom=/path/to/efootprint2/venv/bin/python
+    python -m modeling_tools.batch_runner --variants variants.json --max-workers 8 --headless
+
+variants.json holds a list of runs: [{"modeling": "ai_use_case", "name": "5k visits",
+"params": {"base_daily_nb_of_visits": 5000}}, ...]
+"""
+import argparse
+import csv
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from modeling_tools.modelings import get_modeling, ROOT
+from modeling_tools.render_cache import HEADLESS_ENV
+
+DEFAULT_OUTPUT_DIR = os.path.join(ROOT, "batch_runs")
+
+
+def prepare_run_dir(run_dir, modeling):
+    modeling_dir = os.path.join(run_dir, os.path.basename(modeling.directory))
+    shutil.copytree(modeling.path, modeling_dir, ignore=shutil.ignore_patterns("__pycache__", "*.pyc"))
+
+    return modeling_dir
+
+
+def subprocess_env():
+    """
+    Return the environment of worker processes, which import modeling_tools from the repository root and plot without
+    a display.
+    """
+    python_path = [ROOT] + [path for path in os.environ.get("PYTHONPATH", "").split(os.pathsep) if path]
+
+    return dict(os.environ, PYTHONPATH=os.pathsep.join(python_path), MPLBACKEND="Agg")
+
+
+def execute_run(run, run_dir, python_executable, timeout=None):
+    """
+    Run one variant in a separate Python process and return its result dict, with its status and log file.
+    """
+    modeling = get_modeling(run["modeling"])
+    modeling_dir = prepare_run_dir(run_dir, modeling)
+    result_path = os.path.join(run_dir, "result.json")
+    log_path = os.path.join(run_dir, "log.txt")
+    command = [
+        python_executable, "-m", "modeling_tools.run_modeling", run["modeling"], "--modeling-dir", modeling_dir,
+        "--output", result_path, "--params", json.dumps(run.get("params", {}))]
+
+    start = time.perf_counter()
+    with open(log_path, "w") as log_file:
+        try:
+            completed_process = subprocess.run(
+                command, cwd=modeling_dir, env=subprocess_env(), stdout=log_file, stderr=subprocess.STDOUT,
+                timeout=timeout)
+            return_code = completed_process.returncode
+        except subprocess.TimeoutExpired:
+            return_code = None
+    wall_time = round(time.perf_counter() - start, 3)
+
+    base_result = {"name": run["name"], "modeling": run["modeling"], "params": run.get("params", {}),
+                   "run_dir": run_dir, "log": log_path, "wall_time_in_s": wall_time}
+    if return_code == 0 and os.path.isfile(result_path):
+        with open(result_path) as file:
+            return {**base_result, **json.load(file), "status": "success"}
+
+    return {**base_result, "status": "timeout" if return_code is None else "failed", "return_code": return_code}
+
+
+def normalize_runs(runs):
+    normalized_runs = []
+    names = set()
+    for run in runs:
+        get_modeling(run["modeling"])
+        name = run.get("name") or run["modeling"]
+        if name in names:
+            raise ValueError(f"Run name {name} is used twice, please give a unique name to each variant")
+        names.add(name)
+        normalized_runs.append({**run, "name": name})
+
+    return normalized_runs
+
+
+def run_batch(runs, output_dir=DEFAULT_OUTPUT_DIR, max_workers=None, python_executables=None, timeout=None):
+    """
+    Execute runs in parallel and write the merged report to output_dir.
+
+    Args:
+        runs: list of dicts with "modeling", and optionally "name" and "params" keys.
+        output_dir: directory where a timestamped batch directory is created.
+        max_workers: maximum number of runs executed at the same time, defaults to the number of CPU cores.
+        python_executables: dict {modeling name: python executable}, defaults to the current interpreter.
+        timeout: maximum duration of one run in seconds.
+    Returns:
+        the path of the batch directory and the list of run results.
+    """
+    runs = normalize_runs(runs)
+    python_executables = python_executables or {}
+    batch_dir = os.path.join(output_dir, datetime.now().strftime("%Y-%m-%d_%H-%M-%S"))
+    os.makedirs(batch_dir)
+
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+        futures = [
+            executor.submit(
+                execute_run, run, os.path.join(batch_dir, f"{index}_{run['modeling']}"),
+                python_executables.get(run["modeling"], sys.executable), timeout)
+            for index, run in enumerate(runs)]
+        results = [future.result() for future in futures]
+
+    write_report(batch_dir, results)
+
+    return batch_dir, results
+
+
+def write_report(batch_dir, results):
+    with open(os.path.join(batch_dir, "report.json"), "w") as file:
+        file.write(json.dumps(results, indent=4))
+
+    with open(os.path.join(batch_dir, "footprints.csv"), "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["run", "modeling", "category", "object", "type", "value", "unit"])
+        for result in results:
+            for footprint in result.get("footprints", []):
+                writer.writerow([result["name"], result["modeling"], footprint["category"], footprint["object"],
+                                 footprint["type"], footprint["value"], footprint["unit"]])
+
+
+def parse_python_executables(python_args):
+    python_executables = {}
+    for python_arg in python_args:
+        modeling_name, python_executable = python_arg.split("=", 1)
+        get_modeling(modeling_name)
+        python_executables[modeling_name] = python_executable
+
+    return python_executables
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("modelings", nargs="*", help="Modelings to run with their default parameters.")
+    parser.add_argument("--variants", help="JSON file listing the runs to execute.")
+    parser.add_argument("--max-workers", type=int, default=None)
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--timeout", type=float, default=None, help="Maximum duration of one run in seconds.")
+    parser.add_argument("--python", action="append", default=[], metavar="MODELING=PYTHON_EXECUTABLE",
+                        help="Interpreter to use for a modeling, for example one with its own e-footprint version.")
+    parser.add_argument("--headless", action="store_true", help="Don’t render the plots and graphs of the modelings.")
+    args = parser.parse_args()
+
+    if args.headless:
+        os.environ[HEADLESS_ENV] = "1"
+
+    batch_runs = [{"modeling": modeling_name} for modeling_name in args.modelings]
+    if args.variants:
+        with open(args.variants) as variants_file:
+            batch_runs += json.load(variants_file)
+    if not batch_runs:
+        parser.error("Please give modelings to run or a variants file")
+
+    output_batch_dir, batch_results = run_batch(
+        batch_runs, args.output_dir, args.max_workers, parse_python_executables(args.python), args.timeout)
+
+    for batch_result in batch_results:
+        total = (f"{batch_result['total_footprint']:.0f} {batch_result['footprint_unit']}"
+                 if batch_result["status"] == "success" else f"see {batch_result['log']}")
+        print(f"{batch_result['name']}: {batch_result['status']} in {batch_result['wall_time_in_s']} s, {total}")
+    print(f"Report written to {output_batch_dir}")
+
+    if any(batch_result["status"] != "success" for batch_result in batch_results):
+        sys.exit(1)
@@ -0,0 +1,366 @@
+"""
+Batched inference serving model of the GenAI jobs of GPU servers, with its throughput-latency trade-off.
+
+e-footprint costs every GenAIJob request as if it ran alone: it occupies the GPUs holding its model during
+output_token_count times the single-sequence latency per token of EcoLogits, alpha x active parameters + beta. GPU
+servers batch the requests of a model instead, generating one token for every sequence of the batch at each decoding
+step, so that the model weights streamed from GPU memory at each step are shared by the batch. This module models
+continuous batching on top of a System built with e-footprint 9:
+    - each instance of a GPU server holds one replica of each of its GenAI models, and the requests of all the jobs of
+      a model, like the RAG and RAG fill jobs of Mixtral, are batched together, requests of different models can’t
+      share a batch,
+    - the token demand of a model each hour is the average number of its requests e-footprint runs concurrently,
+      divided by their single-sequence latency per token, and is spread over the instances,
+    - the decoding step of a batch of b sequences lasts max(alpha x streamed parameters, 2 x active parameters x b /
+      GPU FLOP/s) + beta: memory bound for small batches, compute bound for large ones. Dense models stream all their
+      parameters whatever b, while mixture of experts models like Mixtral stream more experts as b grows, total x
+      (1 - (1 - active / total) ** b) parameters,
+    - by Little’s law, the average batch size b of a replica with a token demand r solves b = r x step(b), at least 1
+      and at most the max batch size, the replica being overloaded when r exceeds b / step(b) at the max batch size,
+    - the GPUs of a replica are busy r x step(b) / b of the time, which gives the hourly compute need of the server,
+      then its raw number of instances, energy and footprint with the formulas of e-footprint.
+With batches of one sequence, the model gives back the compute need and footprint of e-footprint.
+
+For each max batch size, the smallest number of instances serving all hours without overload, within the RAM and
+compute of the instances and, optionally, within a maximum latency per token, is the fixed_nb_of_instances needed.
+
+Usage:
+    python -m modeling_tools.batched_inference ai_use_case --batch-sizes 1 4 16 64 --max-token-latency-ms 50
+"""
+import argparse
+from dataclasses import dataclass
+from typing import Dict, List
+
+import numpy as np
+
+from modeling_tools.fleet_sizing import RAW_NB_OF_INSTANCES_ROUNDING, magnitude, total_footprint_in_kg
+from modeling_tools.footprints import hourly_magnitudes
+
+# Dense BF16 peak of an NVIDIA A100, the GPU of the e-footprint GPUServer defaults
+DEFAULT_GPU_FLOPS = 312e12
+DEFAULT_MODEL_FLOPS_UTILIZATION = 0.5
+DEFAULT_BATCH_SIZES = [1, 2, 4, 8, 16, 32, 64, 128]
+FIXED_POINT_ITERATIONS = 200
+FIXED_POINT_TOLERANCE = 1e-9
+
+
+def aligned_magnitudes(hourly_quantities, unit, first_hour, nb_of_hours):
+    """
+    Return the values of e-footprint 9 ExplainableHourlyQuantities in unit over nb_of_hours hours from first_hour,
+    with zeros outside of their own hours.
+    """
+    aligned_values = np.zeros(nb_of_hours)
+    values = hourly_magnitudes(hourly_quantities, unit)
+    if len(values) > 0:
+        offset = (hourly_quantities.value.index[0] - first_hour).n
+        aligned_values[offset:offset + len(values)] = values[:nb_of_hours - offset]
+
+    return aligned_values
+
+
+@dataclass
+class ServedModel:
+    """
+    GenAI model served by a GPU server, with the hourly token demand of all its jobs.
+
+    Attributes:
+        name: name of the GenAIModel.
+        model_name: name of the model in EcoLogits, like mistralai/Mixtral-8x7B-Instruct-v0.1.
+        active_params: parameters used per token.
+        total_params: parameters of the model, more than active_params for mixture of experts models.
+        gpus: GPUs holding one replica of the model, the compute_needed of its jobs.
+        gpu_latency_alpha: latency per active parameter and output token in s.
+        gpu_latency_beta: base latency per output token in s.
+        job_names: names of the GenAIJobs of the model.
+        output_token_counts: output tokens per request of each job.
+        token_demand: hourly output tokens per second over all instances.
+    """
+    name: str
+    model_name: str
+    active_params: float
+    total_params: float
+    gpus: float
+    gpu_latency_alpha: float
+    gpu_latency_beta: float
+    job_names: List[str]
+    output_token_counts: List[float]
+    token_demand: np.ndarray
+
+    def streamed_params(self, batch_size):
+        return self.total_params * (1 - (1 - self.active_params / self.total_params) ** batch_size)
+
+    def token_latency(self, batch_size, gpu_flops):
+        """
+        Return the duration in s of a decoding step of batch_size sequences, the latency per token of each of them.
+        """
+        memory_bound_latency = self.gpu_latency_alpha * self.streamed_params(batch_size)
+        compute_bound_latency = 2 * self.active_params * batch_size / (gpu_flops * self.gpus)
+
+        return np.maximum(memory_bound_latency, compute_bound_latency) + self.gpu_latency_beta
+
+    def throughput(self, batch_size, gpu_flops):
+        """
+        Return the output tokens per second of one replica decoding batch_size sequences.
+        """
+        return batch_size / self.token_latency(batch_size, gpu_flops)
+
+    def batch_sizes(self, replica_token_demand, max_batch_size, gpu_flops):
+        """
+        Return the average batch size of replicas with replica_token_demand output tokens per second, the smallest
+        solution of b = demand x step(b) between 1 and max_batch_size, which converges from 1 as step increases
+        with b, and where replicas are overloaded.
+        """
+        batch_size = np.ones_like(replica_token_demand)
+        for _ in range(FIXED_POINT_ITERATIONS):
+            next_batch_size = np.clip(
+                replica_token_demand * self.token_latency(batch_size, gpu_flops), 1, max_batch_size)
+            converged = np.max(np.abs(next_batch_size - batch_size), initial=0) < FIXED_POINT_TOLERANCE
+            batch_size = next_batch_size
+            if converged:
+                break
+        overloaded = replica_token_demand > self.throughput(max_batch_size, gpu_flops) * (1 + FIXED_POINT_TOLERANCE)
+
+        return batch_size, overloaded
+
+
+@dataclass
+class ServingConfiguration:
+    """
+    Batched serving of the GenAI models of a GPU server with a max batch size and a number of instances.
+
+    Attributes:
+        max_batch_size: max number of sequences per batch.
+        nb_of_instances: number of GPU server instances, each holding one replica of each model.
+        batch_sizes: {model name: hourly average batch size}.
+        token_latencies: {model name: hourly latency per output token in s}.
+        nb_of_overloaded_hours: number of hours when a replica can’t keep up with the token demand.
+        raw_nb_of_instances: hourly raw number of instances.
+        energy_in_kwh: energy of the GPU server over the modeling period.
+        footprint: fabrication and energy footprint of the GPU server over the modeling period in kg.
+    """
+    max_batch_size: float
+    nb_of_instances: float
+    batch_sizes: Dict[str, np.ndarray]
+    token_latencies: Dict[str, np.ndarray]
+    nb_of_overloaded_hours: int
+    raw_nb_of_instances: np.ndarray
+    energy_in_kwh: float
+    footprint: float
+
+    @property
+    def nb_of_instances_needed(self):
+        return float(np.ceil(self.raw_nb_of_instances.max(initial=0)))
+
+    def max_token_latency(self):
+        return max(float(latencies.max(initial=0)) for latencies in self.token_latencies.values())
+
+    def is_feasible(self, max_token_latency=None):
+        return (self.nb_of_overloaded_hours == 0 and self.nb_of_instances_needed <= self.nb_of_instances
+                and (max_token_latency is None or self.max_token_latency() <= max_token_latency))
+
+
+class BatchedServingModel:
+    """
+    Batched serving model of the GenAI jobs of a GPU server of a System built with e-footprint 9.
+
+    Args:
+        system: built System.
+        server_name: name of the GPU server, defaults to the only GPU server of the System.
+        gpu_flops: peak FLOP/s of one GPU.
+        model_flops_utilization: share of the peak FLOP/s reached by compute bound decoding steps.
+    """
+    def __init__(self, system, server_name=None, gpu_flops=DEFAULT_GPU_FLOPS,
+                 model_flops_utilization=DEFAULT_MODEL_FLOPS_UTILIZATION):
+        from efootprint.constants.units import u
+
+        gpu_servers = {server.name: server for server in system.servers if server.class_as_simple_str == "GPUServer"}
+        if server_name is None and len(gpu_servers) != 1:
+            raise ValueError(f"{system.name} has {len(gpu_servers)} GPU servers, give the name of one of them: "
+                             f"{sorted(gpu_servers.keys())}")
+        if server_name is not None and server_name not in gpu_servers:
+            raise ValueError(f"No GPU server named {server_name} in {system.name}, available ones are "
+                             f"{sorted(gpu_servers.keys())}")
+        self.server = gpu_servers[server_name] if server_name is not None else list(gpu_servers.values())[0]
+        self.effective_gpu_flops = gpu_flops * model_flops_utilization
+
+        compute_need = self.server.hour_by_hour_compute_need
+        self.first_hour = compute_need.value.index[0]
+        self.nb_of_hours = len(compute_need.value)
+        self.compute_need = hourly_magnitudes(compute_need, u.gpu)
+        self.ram_need = aligned_magnitudes(self.server.hour_by_hour_ram_need, u.GB, self.first_hour, self.nb_of_hours)
+        self.unbatched_compute_need = np.zeros(self.nb_of_hours)
+        self.served_models = self.read_served_models()
+        # Compute need of the jobs that aren’t GenAIJobs, which batching doesn’t change
+        self.other_compute_need = np.clip(self.compute_need - self.unbatched_compute_need, 0, None)
+
+    def read_served_models(self):
+        from efootprint.constants.units import u
+
+        jobs_by_model = {}
+        for job in self.server.jobs:
+            if job.class_as_simple_str == "GenAIJob":
+                jobs_by_model.setdefault(job.service.name, []).append(job)
+        if not jobs_by_model:
+            raise ValueError(f"{self.server.name} runs no GenAIJob")
+
+        served_models = []
+        for model_name, jobs in sorted(jobs_by_model.items()):
+            service = jobs[0].service
+            served_model = ServedModel(
+                name=model_name, model_name=str(service.model_name.value),
+                active_params=magnitude(service.active_params, u.dimensionless),
+                total_params=magnitude(service.total_params, u.dimensionless),
+                gpus=magnitude(jobs[0].compute_needed, u.gpu),
+                gpu_latency_alpha=magnitude(service.gpu_latency_alpha, u.s),
+                gpu_latency_beta=magnitude(service.gpu_latency_beta, u.s),
+                job_names=[job.name for job in jobs],
+                output_token_counts=[magnitude(job.output_token_count, u.dimensionless) for job in jobs],
+                token_demand=np.zeros(self.nb_of_hours))
+            # The latency of e-footprint is the one of a batch of one sequence
+            single_sequence_latency = magnitude(service.gpu_latency_alpha, u.s) * served_model.active_params \
+                + served_model.gpu_latency_beta
+            for job in jobs:
+                concurrent_requests = aligned_magnitudes(
+                    job.hourly_avg_occurrences_across_usage_patterns, u.dimensionless, self.first_hour,
+                    self.nb_of_hours)
+                served_model.token_demand += concurrent_requests / single_sequence_latency
+                self.unbatched_compute_need += concurrent_requests * magnitude(job.compute_needed, u.gpu)
+            served_models.append(served_model)
+
+        return served_models
+
+    def serve(self, max_batch_size, nb_of_instances):
+        """
+        Returns:
+            the ServingConfiguration of max_batch_size and nb_of_instances.
+        """
+        from efootprint.constants.units import u
+
+        server = self.server
+        compute_need = self.other_compute_need.copy()
+        batch_sizes, token_latencies = {}, {}
+        overloaded = np.zeros(self.nb_of_hours, dtype=bool)
+        for served_model in self.served_models:
+            replica_token_demand = served_model.token_demand / nb_of_instances
+            batch_size, model_overloaded = served_model.batch_sizes(
+                replica_token_demand, max_batch_size, self.effective_gpu_flops)
+            token_latency = served_model.token_latency(batch_size, self.effective_gpu_flops)
+            compute_need += served_model.token_demand * token_latency / batch_size * served_model.gpus
+            batch_sizes[served_model.name] = batch_size
+            token_latencies[served_model.name] = token_latency
+            overloaded |= model_overloaded
+
+        available_compute = magnitude(server.available_compute_per_instance, u.gpu)
+        available_ram = magnitude(server.available_ram_per_instance, u.GB)
+        raw_nb_of_instances = np.round(np.maximum(
+            self.ram_need / available_ram, compute_need / available_compute), RAW_NB_OF_INSTANCES_ROUNDING)
+        power_usage_effectiveness = magnitude(server.power_usage_effectiveness, u.dimensionless)
+        energy_in_kwh = power_usage_effectiveness * (
+            magnitude(server.idle_power, u.W) * nb_of_instances * self.nb_of_hours
+            + (magnitude(server.power, u.W) - magnitude(server.idle_power, u.W)) * raw_nb_of_instances.sum()) / 1000
+        fabrication_footprint = magnitude(server.carbon_footprint_fabrication, u.kg) * nb_of_instances \
+            * self.nb_of_hours / magnitude(server.lifespan, u.hour)
+
+        return ServingConfiguration(
+            max_batch_size=max_batch_size, nb_of_instances=nb_of_instances, batch_sizes=batch_sizes,
+            token_latencies=token_latencies, nb_of_overloaded_hours=int(overloaded.sum()),
+            raw_nb_of_instances=raw_nb_of_instances, energy_in_kwh=float(energy_in_kwh),
+            footprint=float(energy_in_kwh * magnitude(server.average_carbon_intensity, u.kg / u.kWh)
+                            + fabrication_footprint))
+
+    def smallest_feasible_configuration(self, max_batch_size, max_nb_of_instances, max_token_latency=None):
+        """
+        Return the ServingConfiguration of max_batch_size with the smallest number of instances up to
+        max_nb_of_instances that is feasible, see ServingConfiguration.is_feasible, or None if there is none.
+        """
+        for nb_of_instances in range(1, max_nb_of_instances + 1):
+            configuration = self.serve(max_batch_size, nb_of_instances)
+            if configuration.is_feasible(max_token_latency):
+                return configuration
+
+        return None
+
+    def current_nb_of_instances(self):
+        from efootprint.abstract_modeling_classes.explainable_objects import EmptyExplainableObject
+        from efootprint.constants.units import u
+
+        if isinstance(self.server.fixed_nb_of_instances, EmptyExplainableObject):
+            return float(np.ceil(hourly_magnitudes(self.server.raw_nb_of_instances, u.dimensionless).max()))
+
+        return magnitude(self.server.fixed_nb_of_instances, u.dimensionless)
+
+    def current_footprint(self):
+        return total_footprint_in_kg([self.server.instances_fabrication_footprint, self.server.energy_footprint])
+
+
+def token_weighted_mean(values_by_model, served_models):
+    total_demand = sum(served_model.token_demand.sum() for served_model in served_models)
+
+    return sum((values_by_model[served_model.name] * served_model.token_demand).sum()
+               for served_model in served_models) / total_demand
+
+
+def print_trade_off(serving_model: BatchedServingModel, batch_sizes):
+    from efootprint.constants.units import u
+
+    server = serving_model.server
+    active_power_per_gpu = (magnitude(server.power, u.W) - magnitude(server.idle_power, u.W)) * magnitude(
+        server.power_usage_effectiveness, u.dimensionless) / magnitude(server.compute, u.gpu)
+    for served_model in serving_model.served_models:
+        print(f"\n{served_model.name} ({served_model.model_name}, {served_model.active_params / 1e9:.1f}B active / "
+              f"{served_model.total_params / 1e9:.1f}B parameters, {served_model.gpus:.3f} GPU per replica), jobs "
+              f"{', '.join(served_model.job_names)}")
+        print(f"    {'batch':>6} {'ms / token':>11} {'tokens / s':>11} {'J / token':>10}")
+        for batch_size in batch_sizes:
+            token_latency = served_model.token_latency(batch_size, serving_model.effective_gpu_flops)
+            print(f"    {batch_size:>6g} {token_latency * 1000:>11.1f} {batch_size / token_latency:>11.1f} "
+                  f"{active_power_per_gpu * served_model.gpus * token_latency / batch_size:>10.2f}")
+
+
+def print_configurations(serving_model: BatchedServingModel, batch_sizes, max_nb_of_instances, max_token_latency):
+    current_nb_of_instances = serving_model.current_nb_of_instances()
+    unbatched = serving_model.serve(1, current_nb_of_instances)
+    print(f"\n{serving_model.server.name}: {serving_model.current_footprint():.1f} kg in e-footprint, "
+          f"{unbatched.footprint:.1f} kg with batches of one sequence on {current_nb_of_instances:g} instances")
+    print(f"    {'max batch':>9} {'instances':>10} {'mean batch':>11} {'max ms / token':>15} {'energy (kWh)':>13} "
+          f"{'footprint (kg)':>15} {f'on {current_nb_of_instances:g} instances (kg)':>22}")
+    for max_batch_size in batch_sizes:
+        configuration = serving_model.smallest_feasible_configuration(
+            max_batch_size, max_nb_of_instances, max_token_latency)
+        at_current_nb_of_instances = serving_model.serve(max_batch_size, current_nb_of_instances)
+        if configuration is None:
+            print(f"    {max_batch_size:>9g} {f'> {max_nb_of_instances}':>10} {'':>11} {'':>15} {'':>13} {'':>15} "
+                  f"{at_current_nb_of_instances.footprint:>22.1f}")
+            continue
+        mean_batch_size = token_weighted_mean(configuration.batch_sizes, serving_model.served_models)
+        print(f"    {max_batch_size:>9g} {configuration.nb_of_instances:>10g} {mean_batch_size:>11.2f} "
+              f"{configuration.max_token_latency() * 1000:>15.1f} {configuration.energy_in_kwh:>13.1f} "
+              f"{configuration.footprint:>15.1f} {at_current_nb_of_instances.footprint:>22.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("modeling", nargs="?", default="ai_use_case")
+    parser.add_argument("--server", default=None, help="Name of the GPU server, needed when there are several.")
+    parser.add_argument("--batch-sizes", type=float, nargs="+", default=DEFAULT_BATCH_SIZES,
+                        help="Max batch sizes to compare.")
+    parser.add_argument("--max-instances", type=int, default=64, help="Largest number of instances searched.")
+    parser.add_argument("--max-token-latency-ms", type=float, default=None,
+                        help="Maximum latency per output token of every hour, in ms.")
+    parser.add_argument("--gpu-tflops", type=float, default=DEFAULT_GPU_FLOPS / 1e12,
+                        help="Peak TFLOP/s of one GPU.")
+    parser.add_argument("--model-flops-utilization", type=float, default=DEFAULT_MODEL_FLOPS_UTILIZATION,
+                        help="Share of the peak FLOP/s reached by compute bound decoding steps.")
+    args = parser.parse_args()
+
+    from modeling_tools.modelings import get_modeling
+    from modeling_tools.run_modeling import build_for_analysis
+
+    modeling = get_modeling(args.modeling)
+    modeling_system = build_for_analysis(modeling)
+    batched_serving_model = BatchedServingModel(
+        modeling_system, args.server, args.gpu_tflops * 1e12, args.model_flops_utilization)
+    print_trade_off(batched_serving_model, args.batch_sizes)
+    print_configurations(
+        batched_serving_model, args.batch_sizes, args.max_instances,
+        None if args.max_token_latency_ms is None else args.max_token_latency_ms / 1000)
@@ -0,0 +1,478 @@
+"""
+Benchmark the build time and peak memory of the modelings and of synthetic Systems of growing size.
+
+Every measurement runs in a fresh Python process, so that import times and peak resident set sizes aren’t hidden by
+modules and memory left over from a previous case. A case is split into phases:
+    - import: import of the modules the modeling script imports, and of the Boavizta-dependent e-footprint modules,
+    - construction: execution of the modeling script up to the System creation, outside of the System computations,
+      through legacy_adapter.py for legacy modelings when e-footprint 9 is installed, as in run_modeling.py,
+    - calculation: computation of the calculated attributes, which e-footprint launches when a System is created,
+    - after_system: the rest of the modeling script, like result exports and plots,
+    - to_json: system_to_json of the System with its calculated attributes.
+
+The synthetic cases build e-footprint 9 Systems like ai_use_case, growing one dimension at a time: the number of
+usage patterns, the modeling timespan or the number of steps per usage journey.
+
+Results are written as JSON and CSV, and compared to a baseline to flag the metrics that got worse by more than a
+relative threshold.
+
+Usage:
+    python -m modeling_tools.benchmark run ai_use_case bloom paylib --python bloom=/path/to/efootprint2/bin/python
+        --python paylib=/path/to/efootprint1/bin/python --repeat 3 --output benchmarks/baseline.json
+    python -m modeling_tools.benchmark run --sweeps usage_patterns timespan --baseline benchmarks/baseline.json
+    python -m modeling_tools.benchmark compare benchmarks/baseline.json benchmarks/current.json --threshold 0.2
+"""
+import argparse
+import ast
+import csv
+import importlib
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import nullcontext
+from datetime import datetime
+
+from modeling_tools.batch_runner import parse_python_executables, prepare_run_dir, subprocess_env
+from modeling_tools.modelings import get_modeling, MODELINGS, ROOT
+
+DEFAULT_OUTPUT_DIR = os.path.join(ROOT, "benchmarks")
+PHASES = ["import", "construction", "calculation", "after_system", "to_json"]
+TIME_METRICS = [f"{phase}_in_s" for phase in PHASES] + ["total_in_s"]
+MEMORY_METRICS = ["peak_rss_in_mb"]
+# Absolute differences under which a metric isn’t flagged, whatever the relative threshold, to ignore timing noise
+MIN_DELTAS = {**{metric: 0.05 for metric in TIME_METRICS}, "peak_rss_in_mb": 10}
+DEFAULT_THRESHOLD = 0.2
+
+SYNTHETIC_BASE_PARAMS = {"nb_usage_patterns": 4, "timespan_in_years": 1, "nb_steps_per_journey": 2}
+SWEEPS = {
+    "usage_patterns": ("nb_usage_patterns", [1, 2, 4, 8, 16]),
+    "timespan": ("timespan_in_years", [1, 2, 5, 10]),
+    "steps": ("nb_steps_per_journey", [1, 2, 4, 8, 16]),
+}
+# Modeling whose interpreter runs the synthetic cases, which use the same e-footprint 9 classes
+SYNTHETIC_MODELING = "ai_use_case"
+SYNTHETIC_IMPORTS = [
+    "efootprint.abstract_modeling_classes.source_objects", "efootprint.api_utils.system_to_json",
+    "efootprint.builders.time_builders", "efootprint.constants.countries", "efootprint.core.hardware.hardware",
+    "efootprint.core.hardware.network", "efootprint.core.hardware.server", "efootprint.core.hardware.storage",
+    "efootprint.core.system", "efootprint.core.usage.job", "efootprint.core.usage.usage_journey",
+    "efootprint.core.usage.usage_journey_step", "efootprint.core.usage.usage_pattern"]
+
+
+def peak_rss_in_mb():
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return max_rss / 1024 ** 2 if sys.platform == "darwin" else max_rss / 1024
+
+
+def script_imports(script_path):
+    """
+    Return the names of the modules imported at the top level of a script.
+    """
+    with open(script_path) as file:
+        tree = ast.parse(file.read())
+    module_names = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            module_names += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            module_names.append(node.module)
+
+    return module_names
+
+
+class CalculationTimer:
+    """
+    Wrap System.after_init, where e-footprint launches the computation of all calculated attributes, to measure the
+    time spent in it and to keep the last System created and the time its computation ended.
+    """
+    def __init__(self, system_class):
+        self.system_class = system_class
+        self.original_after_init = system_class.after_init
+        self.duration = 0
+        self.system = None
+        self.system_end = None
+
+    def __enter__(self):
+        original_after_init = self.original_after_init
+
+        def timed_after_init(system):
+            start = time.perf_counter()
+            original_after_init(system)
+            self.system_end = time.perf_counter()
+            self.duration += self.system_end - start
+            self.system = system
+
+        self.system_class.after_init = timed_after_init
+
+        return self
+
+    def __exit__(self, *exc_info):
+        self.system_class.after_init = self.original_after_init
+
+
+def build_synthetic_system(nb_usage_patterns, timespan_in_years, nb_steps_per_journey):
+    """
+    Build an e-footprint 9 System of nb_usage_patterns usage patterns over timespan_in_years years, each with its own
+    usage journey of nb_steps_per_journey steps running one job on a shared server.
+    """
+    import datetime as dt
+    import pint
+
+    from efootprint.abstract_modeling_classes.source_objects import SourceValue
+    from efootprint.builders.time_builders import create_hourly_usage_from_daily_volume_and_list_of_hours
+    from efootprint.constants.countries import Countries
+    from efootprint.constants.sources import Sources
+    from efootprint.constants.units import u
+    from efootprint.core.hardware.hardware import Hardware
+    from efootprint.core.hardware.network import Network
+    from efootprint.core.hardware.server import Server, ServerTypes
+    from efootprint.core.hardware.storage import Storage
+    from efootprint.core.system import System
+    from efootprint.core.usage.job import Job
+    from efootprint.core.usage.usage_journey import UsageJourney
+    from efootprint.core.usage.usage_journey_step import UsageJourneyStep
+    from efootprint.core.usage.usage_pattern import UsagePattern
+
+    server = Server(
+        "Synthetic server",
+        server_type=ServerTypes.on_premise(),
+        carbon_footprint_fabrication=SourceValue(600 * u.kg, Sources.BASE_ADEME_V19),
+        power=SourceValue(300 * u.W, Sources.HYPOTHESIS),
+        lifespan=SourceValue(6 * u.year, Sources.HYPOTHESIS),
+        idle_power=SourceValue(50 * u.W, Sources.HYPOTHESIS),
+        ram=SourceValue(128 * u.GB, Sources.HYPOTHESIS),
+        compute=SourceValue(4 * u.cpu_core, Sources.HYPOTHESIS),
+        power_usage_effectiveness=SourceValue(1.2 * u.dimensionless, Sources.HYPOTHESIS),
+        average_carbon_intensity=SourceValue(100 * u.g / u.kWh, Sources.HYPOTHESIS),
+        server_utilization_rate=SourceValue(1 * u.dimensionless, Sources.HYPOTHESIS),
+        base_ram_consumption=SourceValue(300 * u.MB, Sources.HYPOTHESIS),
+        base_compute_consumption=SourceValue(2 * u.cpu_core, Sources.HYPOTHESIS),
+        fixed_nb_of_instances=SourceValue(4 * u.dimensionless, Sources.USER_DATA),
+        storage=Storage.ssd(
+            data_storage_duration=SourceValue(5 * u.year, Sources.HYPOTHESIS),
+            data_replication_factor=SourceValue(2 * u.dimensionless, Sources.HYPOTHESIS),
+            base_storage_need=SourceValue(200 * u.GB))
+    )
+    network = Network("Synthetic network", bandwidth_energy_intensity=SourceValue(0.05 * u("kWh/GB")))
+    laptop = Hardware.laptop()
+    start_date = dt.datetime(2025, 1, 1)
+
+    usage_patterns = []
+    for usage_pattern_index in range(nb_usage_patterns):
+        uj_steps = []
+        for step_index in range(nb_steps_per_journey):
+            job = Job(
+                f"Job {usage_pattern_index}.{step_index}",
+                server=server,
+                data_transferred=SourceValue(2 * u.MB, Sources.HYPOTHESIS),
+                data_stored=SourceValue(10 * u.kB, Sources.HYPOTHESIS),
+                request_duration=SourceValue(1 * u.second, Sources.HYPOTHESIS),
+                compute_needed=SourceValue(0.1 * u.cpu_core, Sources.HYPOTHESIS),
+                ram_needed=SourceValue(0.1 * u.GB, Sources.HYPOTHESIS))
+            uj_steps.append(UsageJourneyStep(
+                f"Step {usage_pattern_index}.{step_index}", jobs=[job],
+                user_time_spent=SourceValue(1 * u.minute, Sources.HYPOTHESIS)))
+        usage_journey = UsageJourney(f"Usage journey {usage_pattern_index}", uj_steps=uj_steps)
+        usage_patterns.append(UsagePattern(
+            f"Usage pattern {usage_pattern_index}", usage_journey, [laptop], network, Countries.FRANCE(),
+            create_hourly_usage_from_daily_volume_and_list_of_hours(
+                timespan_in_years * u.year, 1000 + 100 * usage_pattern_index, [9, 10, 11, 14, 15, 16, 17],
+                start_date, pint.Unit(u.dimensionless))))
+
+    return System("Synthetic system", usage_patterns=usage_patterns)
+
+
+def measure_case(case, work_dir):
+    """
+    Measure the phases of one case in the current process, which must not have imported e-footprint yet.
+
+    Returns:
+        dict of the case metrics.
+    """
+    from modeling_tools.footprints import efootprint_version
+    from modeling_tools.legacy_adapter import legacy_modules
+    from modeling_tools.lookup_cache import cached_boaviztapi_calls, import_boavizta_modules
+    from modeling_tools.run_modeling import add_import_paths, build_modeling_system, modeling_api
+
+    if "modeling" in case:
+        modeling = get_modeling(case["modeling"])
+        add_import_paths(modeling, work_dir)
+        module_names = script_imports(os.path.join(work_dir, modeling.script))
+        legacy_api_version = modeling.legacy_api if int(efootprint_version().split(".")[0]) >= 9 else None
+        api_context = modeling_api(modeling, work_dir)
+    else:
+        module_names = SYNTHETIC_IMPORTS
+        legacy_api_version = None
+        api_context = nullcontext()
+
+    metrics = {}
+    with cached_boaviztapi_calls():
+        start = time.perf_counter()
+        import_boavizta_modules()
+        with api_context:
+            if legacy_api_version is not None:
+                # The modules of legacy e-footprint APIs only exist through legacy_adapter.py
+                module_names = [module_name for module_name in module_names
+                                if module_name not in legacy_modules(legacy_api_version)]
+            for module_name in module_names:
+                importlib.import_module(module_name)
+        metrics["import_in_s"] = time.perf_counter() - start
+        metrics["peak_rss_after_import_in_mb"] = peak_rss_in_mb()
+
+        from efootprint.api_utils.system_to_json import system_to_json
+        from efootprint.core.system import System
+
+        start = time.perf_counter()
+        with CalculationTimer(System) as calculation_timer:
+            if "modeling" in case:
+                build_modeling_system(modeling, work_dir, None)
+            else:
+                build_synthetic_system(**case["params"])
+        end = time.perf_counter()
+    if calculation_timer.system is None:
+        raise ValueError(f"Case {case['name']} didn’t create any System")
+    metrics["construction_in_s"] = calculation_timer.system_end - start - calculation_timer.duration
+    metrics["calculation_in_s"] = calculation_timer.duration
+    metrics["after_system_in_s"] = end - calculation_timer.system_end
+    metrics["peak_rss_after_calculation_in_mb"] = peak_rss_in_mb()
+
+    json_path = os.path.join(work_dir, "benchmark_system.json")
+    start = time.perf_counter()
+    system_to_json(calculation_timer.system, True, json_path)
+    metrics["to_json_in_s"] = time.perf_counter() - start
+    metrics["json_size_in_mb"] = os.path.getsize(json_path) / 1024 ** 2
+    metrics["peak_rss_in_mb"] = peak_rss_in_mb()
+    metrics["total_in_s"] = sum(metrics[f"{phase}_in_s"] for phase in PHASES)
+
+    return metrics
+
+
+def benchmark_cases(modeling_names, sweep_names, sweep_values=None):
+    """
+    Return the cases to benchmark: one per modeling, and one per value of each sweep.
+
+    Args:
+        modeling_names: names of the modelings to benchmark.
+        sweep_names: keys of SWEEPS.
+        sweep_values: dict {sweep name: list of values} overriding the default values of SWEEPS.
+    """
+    cases = []
+    for modeling_name in modeling_names:
+        get_modeling(modeling_name)
+        cases.append({"name": modeling_name, "modeling": modeling_name})
+    for sweep_name in sweep_names:
+        if sweep_name not in SWEEPS:
+            raise ValueError(f"Unknown sweep {sweep_name}, should be one of {list(SWEEPS.keys())}")
+        param_name, default_values = SWEEPS[sweep_name]
+        for value in (sweep_values or {}).get(sweep_name, default_values):
+            cases.append({"name": f"{sweep_name}={value}", "sweep": sweep_name,
+                          "params": {**SYNTHETIC_BASE_PARAMS, param_name: value}})
+
+    return cases
+
+
+def run_case(case, python_executable, timeout=None):
+    """
+    Measure a case in a new Python process and return its metrics, or raise a RuntimeError with the process output.
+    """
+    with tempfile.TemporaryDirectory() as run_dir:
+        work_dir = prepare_run_dir(run_dir, get_modeling(case["modeling"])) if "modeling" in case else run_dir
+        result_path = os.path.join(run_dir, "metrics.json")
+        command = [python_executable, "-m", "modeling_tools.benchmark", "worker", json.dumps(case),
+                   "--work-dir", work_dir, "--output", result_path]
+        completed_process = subprocess.run(
+            command, cwd=work_dir, env=subprocess_env(), capture_output=True, text=True, timeout=timeout)
+        if completed_process.returncode != 0 or not os.path.isfile(result_path):
+            raise RuntimeError(f"Benchmark of {case['name']} failed:\n{completed_process.stdout}"
+                               f"{completed_process.stderr}")
+        with open(result_path) as file:
+            return json.load(file)
+
+
+def summarize(runs):
+    """
+    Return the median of every metric over the runs of a case.
+    """
+    return {metric: round(statistics.median(run[metric] for run in runs), 4) for metric in runs[0]
+            if isinstance(runs[0][metric], (int, float))}
+
+
+def run_benchmarks(cases, python_executables=None, repeat=1, timeout=None):
+    """
+    Measure every case repeat times, each in a new process.
+
+    Args:
+        cases: list of case dicts, as returned by benchmark_cases.
+        python_executables: dict {modeling name: python executable}, defaults to the current interpreter. Synthetic
+            cases use the interpreter of ai_use_case.
+        repeat: number of measurements per case, summarized by their median.
+        timeout: maximum duration of one measurement in seconds.
+    Returns:
+        the benchmark report as a dict.
+    """
+    python_executables = python_executables or {}
+    results = []
+    for case in cases:
+        python_executable = python_executables.get(case.get("modeling", SYNTHETIC_MODELING), sys.executable)
+        runs = [run_case(case, python_executable, timeout) for _ in range(repeat)]
+        efootprint_version = runs[0].pop("efootprint_version")
+        for run in runs[1:]:
+            run.pop("efootprint_version")
+        results.append({**case, "python": python_executable, "efootprint_version": efootprint_version,
+                        "metrics": summarize(runs), "runs": runs})
+
+    return {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "machine": {"platform": platform.platform(), "processor": platform.processor(), "cpu_count": os.cpu_count()},
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def write_report(report, output_path):
+    """
+    Write a benchmark report to output_path and its median metrics to a CSV file next to it.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, "w") as file:
+        file.write(json.dumps(report, indent=4))
+
+    with open(os.path.splitext(output_path)[0] + ".csv", "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["case", "efootprint_version", "metric", "value"])
+        for result in report["results"]:
+            for metric, value in result["metrics"].items():
+                writer.writerow([result["name"], result["efootprint_version"], metric, value])
+
+
+def load_report(report_path):
+    with open(report_path) as file:
+        return json.load(file)
+
+
+def compare_reports(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare the median metrics of the cases present in both reports.
+
+    A metric is a regression when it is more than threshold times higher than in the baseline, and higher by more than
+    its MIN_DELTAS value.
+
+    Returns:
+        list of dicts with "case", "metric", "baseline", "current", "ratio" and "regression" keys.
+    """
+    baseline_metrics = {result["name"]: result["metrics"] for result in baseline["results"]}
+    comparisons = []
+    for result in current["results"]:
+        if result["name"] not in baseline_metrics:
+            continue
+        for metric in TIME_METRICS + MEMORY_METRICS:
+            baseline_value = baseline_metrics[result["name"]].get(metric)
+            current_value = result["metrics"].get(metric)
+            if baseline_value is None or current_value is None:
+                continue
+            if baseline_value > 0:
+                ratio = current_value / baseline_value
+            else:
+                ratio = 1 if current_value == 0 else float("inf")
+            regression = current_value > baseline_value * (1 + threshold) and \
+                current_value - baseline_value > MIN_DELTAS[metric]
+            comparisons.append({"case": result["name"], "metric": metric, "baseline": baseline_value,
+                                "current": current_value, "ratio": round(ratio, 3), "regression": regression})
+
+    return comparisons
+
+
+def print_comparison(comparisons, baseline, current):
+    missing_cases = sorted({result["name"] for result in baseline["results"]}
+                           - {result["name"] for result in current["results"]})
+    if missing_cases:
+        print(f"Cases of the baseline that weren’t run: {missing_cases}")
+    for comparison in comparisons:
+        flag = "REGRESSION" if comparison["regression"] else ""
+        print(f"{comparison['case']:<24} {comparison['metric']:<20} {comparison['baseline']:>10.3f} -> "
+              f"{comparison['current']:>10.3f} (x{comparison['ratio']:.2f}) {flag}")
+    nb_of_regressions = sum(comparison["regression"] for comparison in comparisons)
+    print(f"{nb_of_regressions} regression(s) out of {len(comparisons)} compared metrics")
+
+    return nb_of_regressions
+
+
+def print_report(report):
+    print(f"{'case':<24} {'version':<8} " + " ".join(f"{metric:>16}" for metric in TIME_METRICS + MEMORY_METRICS))
+    for result in report["results"]:
+        print(f"{result['name']:<24} {result['efootprint_version']:<8} "
+              + " ".join(f"{result['metrics'][metric]:>16.3f}" for metric in TIME_METRICS + MEMORY_METRICS))
+
+
+def parse_sweep_values(sweep_value_args):
+    sweep_values = {}
+    for sweep_value_arg in sweep_value_args:
+        sweep_name, values = sweep_value_arg.split("=", 1)
+        if sweep_name not in SWEEPS:
+            raise ValueError(f"Unknown sweep {sweep_name}, should be one of {list(SWEEPS.keys())}")
+        sweep_values[sweep_name] = [int(value) for value in values.split(",")]
+
+    return sweep_values
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser(
+        "run", help="Benchmark modelings and synthetic sweeps, all of them when none is given.")
+    run_parser.add_argument("modelings", nargs="*")
+    run_parser.add_argument("--sweeps", nargs="*", default=[], choices=list(SWEEPS.keys()))
+    run_parser.add_argument("--sweep-values", action="append", default=[], metavar="SWEEP=V1,V2,...",
+                            help="Values of a sweep, for example timespan=1,10.")
+    run_parser.add_argument("--python", action="append", default=[], metavar="MODELING=PYTHON_EXECUTABLE",
+                            help="Interpreter to use for a modeling, for example one with its own e-footprint version.")
+    run_parser.add_argument("--repeat", type=int, default=1)
+    run_parser.add_argument("--timeout", type=float, default=None, help="Maximum duration of one run in seconds.")
+    run_parser.add_argument("--output", default=None, help="JSON file to write the report to.")
+    run_parser.add_argument("--baseline", default=None, help="Report to compare the results to.")
+    run_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    compare_parser = subparsers.add_parser("compare", help="Flag the regressions of a report against a baseline.")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    worker_parser = subparsers.add_parser("worker", help="Measure one case in this process, used by run.")
+    worker_parser.add_argument("case", help="JSON dict of the case.")
+    worker_parser.add_argument("--work-dir", required=True)
+    worker_parser.add_argument("--output", required=True)
+    args = parser.parse_args()
+
+    if args.command == "worker":
+        from modeling_tools.footprints import efootprint_version
+
+        worker_metrics = measure_case(json.loads(args.case), args.work_dir)
+        with open(args.output, "w") as output_file:
+            output_file.write(json.dumps({**worker_metrics, "efootprint_version": efootprint_version()}, indent=4))
+    elif args.command == "run":
+        benchmark_modelings, benchmark_sweeps = args.modelings, args.sweeps
+        if not benchmark_modelings and not benchmark_sweeps:
+            benchmark_modelings, benchmark_sweeps = list(MODELINGS.keys()), list(SWEEPS.keys())
+        benchmark_report = run_benchmarks(
+            benchmark_cases(benchmark_modelings, benchmark_sweeps, parse_sweep_values(args.sweep_values)),
+            parse_python_executables(args.python), args.repeat, args.timeout)
+        output_path = args.output or os.path.join(
+            DEFAULT_OUTPUT_DIR, f"{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json")
+        write_report(benchmark_report, output_path)
+        print_report(benchmark_report)
+        print(f"Report written to {output_path}")
+        if args.baseline:
+            baseline_report = load_report(args.baseline)
+            if print_comparison(compare_reports(baseline_report, benchmark_report, args.threshold),
+                                baseline_report, benchmark_report):
+                sys.exit(1)
+    elif args.command == "compare":
+        baseline_report, current_report = load_report(args.baseline), load_report(args.current)
+        if print_comparison(compare_reports(baseline_report, current_report, args.threshold),
+                            baseline_report, current_report):
+            sys.exit(1)
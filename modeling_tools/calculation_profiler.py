@@ -0,0 +1,293 @@
+"""
+Opt-in profiling of the calculated attribute computations of e-footprint modeling objects.
+
+e-footprint computes every calculated attribute of a modeling object with its update_<attribute name> method, when a
+System is created and again when an input changes. Inside a CalculationProfiler context, these methods are wrapped to
+record, for each (modeling object, calculated attribute), its number of computations, its wall time, its self time
+excluding the nested update methods it calls, and optionally the memory it leaves allocated, measured with
+tracemalloc, which slows computations down.
+
+The profile is exported as a hotspot table, as CSV, and as folded stacks (section;Class object.attribute;... self
+time in microseconds), which flamegraph.pl, speedscope or inferno turn into a flame graph.
+
+Usage:
+    with CalculationProfiler() as profiler:
+        system = build_system()
+        with profiler.section("recompute"):
+            WhatIfSession(system).set("number of words generated per chat", 300)
+    profiler.print_hotspots(limit=20)
+    profiler.write_folded_stacks("calculations.folded")
+
+    python -m modeling_tools.calculation_profiler ai_use_case --set "number of words generated per chat=300" --memory
+"""
+import argparse
+import csv
+import functools
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+UPDATE_METHOD_PREFIX = "update_"
+DEFAULT_SECTION = "build"
+SORT_KEYS = ["self_time_in_s", "total_time_in_s", "calls", "allocated_bytes"]
+
+
+@dataclass
+class AttributeStats:
+    """
+    Computations of one calculated attribute of one modeling object.
+
+    Attributes:
+        class_name: class of the modeling object.
+        object_id: id of the modeling object.
+        object_name: name of the modeling object, which several objects can share.
+        attribute: name of the calculated attribute.
+        calls: number of computations.
+        total_time_in_s: wall time of the computations, nested update methods included.
+        self_time_in_s: wall time of the computations, nested update methods excluded.
+        allocated_bytes: memory still allocated by Python when the computations return, when memory is traced.
+    """
+    class_name: str
+    object_id: str
+    object_name: str
+    attribute: str
+    calls: int = 0
+    total_time_in_s: float = 0
+    self_time_in_s: float = 0
+    allocated_bytes: int = 0
+
+
+def modeling_object_classes():
+    """
+    Return ModelingObject and all its subclasses currently defined.
+    """
+    from efootprint.abstract_modeling_classes.modeling_object import ModelingObject
+
+    classes = [ModelingObject]
+    for cls in classes:
+        classes += [subclass for subclass in cls.__subclasses__() if subclass not in classes]
+
+    return classes
+
+
+class CalculationProfiler:
+    """
+    Context manager wrapping the update methods of all modeling object classes, including those defined inside the
+    context, and recording statistics for each (modeling object, calculated attribute).
+
+    Args:
+        trace_memory: whether to measure the memory allocated by computations with tracemalloc.
+    """
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.stats = {}
+        self.folded_stacks = {}
+        self.sections = [DEFAULT_SECTION]
+        # Frames of the update methods being executed: [stats key, start time, nested update methods time]
+        self.frames = []
+        self.wrapped_methods = []
+        self.original_init_subclass = None
+        self.started_tracemalloc = False
+
+    def stats_key(self, mod_obj, attribute):
+        key = (mod_obj.id, attribute)
+        if key not in self.stats:
+            self.stats[key] = AttributeStats(type(mod_obj).__name__, mod_obj.id, mod_obj.name, attribute)
+
+        return key
+
+    def wrap_update_method(self, update_method, attribute):
+        profiler = self
+
+        @functools.wraps(update_method)
+        def profiled_update_method(mod_obj, *args, **kwargs):
+            key = profiler.stats_key(mod_obj, attribute)
+            # Overridden update methods calling the one of their parent class are recorded once
+            if profiler.frames and profiler.frames[-1][0] == key:
+                return update_method(mod_obj, *args, **kwargs)
+            memory_before = tracemalloc.get_traced_memory()[0] if profiler.trace_memory else 0
+            frame = [key, time.perf_counter(), 0]
+            profiler.frames.append(frame)
+            try:
+                return update_method(mod_obj, *args, **kwargs)
+            finally:
+                profiler.frames.pop()
+                duration = time.perf_counter() - frame[1]
+                self_duration = duration - frame[2]
+                if profiler.frames:
+                    profiler.frames[-1][2] += duration
+                stats = profiler.stats[key]
+                stats.calls += 1
+                stats.total_time_in_s += duration
+                stats.self_time_in_s += self_duration
+                if profiler.trace_memory:
+                    stats.allocated_bytes += tracemalloc.get_traced_memory()[0] - memory_before
+                stack = ";".join(
+                    [profiler.sections[-1]] + [profiler.frame_name(profiler.stats[frame_key])
+                                               for frame_key, _, _ in profiler.frames] + [profiler.frame_name(stats)])
+                profiler.folded_stacks[stack] = profiler.folded_stacks.get(stack, 0) + self_duration
+
+        profiled_update_method.profiled_attribute = attribute
+
+        return profiled_update_method
+
+    @staticmethod
+    def frame_name(stats):
+        # Semicolons separate frames in folded stacks
+        return f"{stats.class_name} {stats.object_name}.{stats.attribute}".replace(";", ",")
+
+    def wrap_class(self, cls):
+        for method_name, method in list(cls.__dict__.items()):
+            if method_name.startswith(UPDATE_METHOD_PREFIX) and callable(method) \
+                    and not hasattr(method, "profiled_attribute"):
+                setattr(cls, method_name, self.wrap_update_method(method, method_name[len(UPDATE_METHOD_PREFIX):]))
+                self.wrapped_methods.append((cls, method_name, method))
+
+    def __enter__(self):
+        from efootprint.abstract_modeling_classes.modeling_object import ModelingObject
+
+        for cls in modeling_object_classes():
+            self.wrap_class(cls)
+
+        self.original_init_subclass = ModelingObject.__dict__.get("__init_subclass__")
+        profiler = self
+
+        def profiled_init_subclass(cls, **kwargs):
+            super(ModelingObject, cls).__init_subclass__(**kwargs)
+            profiler.wrap_class(cls)
+
+        ModelingObject.__init_subclass__ = classmethod(profiled_init_subclass)
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracemalloc = True
+
+        return self
+
+    def __exit__(self, *exc_info):
+        from efootprint.abstract_modeling_classes.modeling_object import ModelingObject
+
+        for cls, method_name, method in reversed(self.wrapped_methods):
+            setattr(cls, method_name, method)
+        self.wrapped_methods = []
+        if self.original_init_subclass is None:
+            del ModelingObject.__init_subclass__
+        else:
+            ModelingObject.__init_subclass__ = self.original_init_subclass
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+            self.started_tracemalloc = False
+
+    @contextmanager
+    def section(self, name):
+        """
+        Record the computations made inside the context under the name section of the folded stacks, like
+        "recompute" for the updates following an input change.
+        """
+        self.sections.append(name.replace(";", ","))
+        try:
+            yield
+        finally:
+            self.sections.pop()
+
+    def hotspots(self, sort_by="self_time_in_s", limit=None):
+        """
+        Returns:
+            list of AttributeStats, sorted by decreasing sort_by.
+        """
+        if sort_by not in SORT_KEYS:
+            raise ValueError(f"Unknown sort key {sort_by}, should be one of {SORT_KEYS}")
+        hotspots = sorted(self.stats.values(), key=lambda stats: getattr(stats, sort_by), reverse=True)
+
+        return hotspots[:limit] if limit is not None else hotspots
+
+    def hotspots_by_class(self, sort_by="self_time_in_s"):
+        """
+        Returns:
+            list of AttributeStats summed over the objects of each (class, attribute), with "*" as object id and
+            name.
+        """
+        stats_by_class = {}
+        for stats in self.stats.values():
+            class_stats = stats_by_class.setdefault(
+                (stats.class_name, stats.attribute), AttributeStats(stats.class_name, "*", "*", stats.attribute))
+            class_stats.calls += stats.calls
+            class_stats.total_time_in_s += stats.total_time_in_s
+            class_stats.self_time_in_s += stats.self_time_in_s
+            class_stats.allocated_bytes += stats.allocated_bytes
+
+        return sorted(stats_by_class.values(), key=lambda stats: getattr(stats, sort_by), reverse=True)
+
+    def print_hotspots(self, sort_by="self_time_in_s", limit=20, by_class=False):
+        hotspots = self.hotspots_by_class(sort_by)[:limit] if by_class else self.hotspots(sort_by, limit)
+        total_self_time = sum(stats.self_time_in_s for stats in self.stats.values())
+        print(f"{'self (ms)':>10} {'%':>6} {'total (ms)':>11} {'calls':>6} "
+              f"{'alloc (kB)' if self.trace_memory else '':>11}  object.attribute")
+        for stats in hotspots:
+            share = 100 * stats.self_time_in_s / total_self_time if total_self_time > 0 else 0
+            allocated = f"{stats.allocated_bytes / 1024:.0f}" if self.trace_memory else ""
+            print(f"{stats.self_time_in_s * 1000:>10.1f} {share:>6.1f} {stats.total_time_in_s * 1000:>11.1f} "
+                  f"{stats.calls:>6} {allocated:>11}  {stats.class_name} {stats.object_name}.{stats.attribute}")
+        print(f"{len(self.stats)} calculated attributes computed in {total_self_time:.3f} s")
+
+    def write_csv(self, output_path, sort_by="self_time_in_s"):
+        with open(output_path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["class", "object_id", "object", "attribute", "calls", "total_time_in_s", "self_time_in_s",
+                             "allocated_bytes"])
+            for stats in self.hotspots(sort_by):
+                writer.writerow([stats.class_name, stats.object_id, stats.object_name, stats.attribute, stats.calls,
+                                 stats.total_time_in_s, stats.self_time_in_s, stats.allocated_bytes])
+
+    def write_folded_stacks(self, output_path):
+        """
+        Write the self time of every stack of update methods in microseconds, one "frame;frame;... count" line per
+        stack, the input format of flamegraph.pl.
+        """
+        with open(output_path, "w") as file:
+            for stack, duration in sorted(self.folded_stacks.items()):
+                file.write(f"{stack} {max(round(duration * 1e6), 1)}\n")
+
+
+def parse_new_values(set_args):
+    new_values = {}
+    for set_arg in set_args:
+        hypothesis_label, new_value = set_arg.rsplit("=", 1)
+        new_values[hypothesis_label] = float(new_value)
+
+    return new_values
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("modeling")
+    parser.add_argument("--set", action="append", default=[], metavar="HYPOTHESIS=VALUE",
+                        help="Hypothesis to change after the build, in its unit, to profile the recomputation. "
+                             "e-footprint 9 modelings only.")
+    parser.add_argument("--memory", action="store_true", help="Measure allocated memory, slower.")
+    parser.add_argument("--sort-by", default="self_time_in_s", choices=SORT_KEYS)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--by-class", action="store_true", help="Sum the statistics of the objects of each class.")
+    parser.add_argument("--output-dir", default=".", help="Directory to write hotspots.csv and calculations.folded to.")
+    args = parser.parse_args()
+
+    from modeling_tools.lookup_cache import cached_boaviztapi_calls, import_boavizta_modules
+    from modeling_tools.modelings import get_modeling
+    from modeling_tools.run_modeling import build_modeling_system
+
+    modeling = get_modeling(args.modeling)
+    import_boavizta_modules()
+    with cached_boaviztapi_calls(), CalculationProfiler(args.memory) as calculation_profiler:
+        modeling_system = build_modeling_system(modeling, modeling.path, None)
+        if args.set:
+            from modeling_tools.what_if import WhatIfSession
+
+            with calculation_profiler.section("recompute"):
+                WhatIfSession(modeling_system).update(parse_new_values(args.set))
+
+    calculation_profiler.print_hotspots(args.sort_by, args.top, args.by_class)
+    os.makedirs(args.output_dir, exist_ok=True)
+    calculation_profiler.write_csv(os.path.join(args.output_dir, "hotspots.csv"), args.sort_by)
+    calculation_profiler.write_folded_stacks(os.path.join(args.output_dir, "calculations.folded"))
+    print(f"Hotspots and folded stacks written to {args.output_dir}")
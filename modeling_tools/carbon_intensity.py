@@ -0,0 +1,241 @@
+"""
+Electricity footprints of servers and storages from an hourly carbon intensity profile instead of a scalar average.
+
+Servers and storages multiply their hourly energy by one average_carbon_intensity, like 57 g/kWh for the GPU server of
+ai_use_case, and e-footprint 9 only accepts a scalar quantity for it. But electricity is more carbon intensive at some
+hours than at others, and the GenAI jobs of ai_use_case run during the office active_hours, which coincide with the
+daily peaks of intensity. This module reads an hourly intensity profile from a CSV or Parquet file, like the exports of
+Electricity Maps or RTE eco2mix, aligns it to the hours of the hourly energy series of a System built with e-footprint 9
+and multiplies them elementwise with NumPy.
+
+Profile timestamps without timezone are read as UTC, like the hourly series of e-footprint 9, and profiles finer than
+one hour are averaged per hour. When the profile covers the whole modeling period, gaps are interpolated in time.
+Otherwise, like with a profile of a past year, each hour of the modeling period takes the mean intensity of the same
+hour of the day in the same month of the profile.
+
+Usage:
+    python -m modeling_tools.carbon_intensity ai_use_case FR_2024_hourly.csv --timestamp-column "Datetime (UTC)"
+        --intensity-column "Carbon Intensity gCO₂eq/kWh (LCA)" --output hourly_footprints.csv
+"""
+import argparse
+import os
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from modeling_tools.footprints import footprint_attributes_by_object, footprints_by_object, hourly_magnitudes
+
+DEFAULT_TIMESTAMP_COLUMN = "datetime"
+DEFAULT_INTENSITY_COLUMN = "carbon_intensity"
+
+
+def read_intensity_profile(profile_path, timestamp_column=DEFAULT_TIMESTAMP_COLUMN,
+                           intensity_column=DEFAULT_INTENSITY_COLUMN, timezone=None):
+    """
+    Read an hourly carbon intensity profile from a CSV file, possibly compressed, or a Parquet file.
+
+    Args:
+        profile_path: path of the file.
+        timestamp_column: name of the column holding the timestamps.
+        intensity_column: name of the column holding the carbon intensities.
+        timezone: timezone of the timestamps without timezone, which default to UTC.
+    Returns:
+        pd.Series of carbon intensities indexed by UTC hours, without timezone.
+    """
+    if ".parquet" in profile_path.lower():
+        # Parquet files need pyarrow or fastparquet, which pandas asks for when they are missing
+        profile_df = pd.read_parquet(profile_path)
+    else:
+        profile_df = pd.read_csv(profile_path)
+    missing_columns = {timestamp_column, intensity_column} - set(profile_df.columns)
+    if missing_columns:
+        raise ValueError(f"{profile_path} has no {sorted(missing_columns)} columns, its columns are "
+                         f"{list(profile_df.columns)}")
+
+    timestamps = pd.DatetimeIndex(pd.to_datetime(profile_df[timestamp_column], utc=timezone is None))
+    if timezone is not None:
+        timestamps = timestamps.tz_localize(timezone, ambiguous="NaT", nonexistent="NaT") if timestamps.tz is None \
+            else timestamps
+    timestamps = timestamps.tz_convert("UTC").tz_localize(None)
+    profile = pd.Series(pd.to_numeric(profile_df[intensity_column], errors="coerce").to_numpy(), index=timestamps)
+    profile = profile[profile.index.notna()].dropna().sort_index()
+    if profile.empty:
+        raise ValueError(f"No timestamped {intensity_column} value in {profile_path}")
+
+    return profile.resample("h").mean().dropna()
+
+
+def align_intensity_profile(profile, hourly_index):
+    """
+    Return the carbon intensity of each hour of hourly_index, a PeriodIndex or DatetimeIndex of UTC hours, as an array.
+    """
+    hours = hourly_index.to_timestamp() if isinstance(hourly_index, pd.PeriodIndex) else pd.DatetimeIndex(hourly_index)
+    if len(hours) == 0:
+        return np.zeros(0)
+    if profile.index[0] <= hours.min() and hours.max() <= profile.index[-1]:
+        interpolated_profile = profile.reindex(profile.index.union(hours)).interpolate(method="time")
+
+        return interpolated_profile.reindex(hours).to_numpy(dtype=float)
+
+    typical_profile = profile.groupby([profile.index.month, profile.index.hour]).mean()
+    intensities = typical_profile.reindex(pd.MultiIndex.from_arrays([hours.month, hours.hour])).to_numpy(dtype=float)
+    if np.isnan(intensities).any():
+        missing_months = sorted(set(hours.month[np.isnan(intensities)]))
+        raise ValueError(
+            f"The profile from {profile.index[0]} to {profile.index[-1]} doesn’t cover the modeling period from "
+            f"{hours.min()} to {hours.max()}, nor all hours of months {missing_months} to build a typical profile")
+
+    return intensities
+
+
+@dataclass
+class HourlyIntensityFootprint:
+    """
+    Electricity footprint of a server or storage with an hourly carbon intensity profile.
+
+    Attributes:
+        category: footprint category, "Servers" or "Storage".
+        object_name: name of the object, made unique as in footprints_by_object.
+        average_carbon_intensity: scalar average_carbon_intensity of the object in g/kWh.
+        hourly_energy: pd.Series of the energy of the object in kWh, indexed by UTC hours.
+        hourly_carbon_intensity: pd.Series of the aligned carbon intensity in g/kWh, same index.
+    """
+    category: str
+    object_name: str
+    average_carbon_intensity: float
+    hourly_energy: pd.Series
+    hourly_carbon_intensity: pd.Series
+
+    @property
+    def hourly_footprint(self):
+        """
+        pd.Series of the electricity footprint in kg, same index as hourly_energy.
+        """
+        return self.hourly_energy * self.hourly_carbon_intensity / 1000
+
+    @property
+    def energy(self):
+        return float(self.hourly_energy.sum())
+
+    @property
+    def footprint(self):
+        return float(self.hourly_footprint.sum())
+
+    @property
+    def average_intensity_footprint(self):
+        return self.energy * self.average_carbon_intensity / 1000
+
+    @property
+    def effective_carbon_intensity(self):
+        """
+        Carbon intensity of the electricity of the object weighted by its hourly energy, in g/kWh.
+        """
+        return self.footprint * 1000 / self.energy if self.energy else float("nan")
+
+
+def hourly_intensity_footprints(system, profile, server_names=None) -> List[HourlyIntensityFootprint]:
+    """
+    Compute the electricity footprints of the servers of a System built with e-footprint 9, and of their storages, with
+    an hourly carbon intensity profile.
+
+    Args:
+        system: built System.
+        profile: pd.Series of carbon intensities in g/kWh indexed by UTC hours, see read_intensity_profile.
+        server_names: names of the servers whose electricity has this profile, with their storages, defaults to all.
+    """
+    from efootprint.abstract_modeling_classes.explainable_objects import EmptyExplainableObject
+    from efootprint.constants.units import u
+
+    server_names_in_system = sorted(server.name for server in system.servers)
+    if server_names is None:
+        server_names = server_names_in_system
+    unknown_names = set(server_names) - set(server_names_in_system)
+    if unknown_names:
+        raise ValueError(f"No server named {sorted(unknown_names)} in {system.name}, available ones are "
+                         f"{server_names_in_system}")
+
+    footprints = []
+    for (category, obj_name, footprint_type), (obj, _) in footprint_attributes_by_object(system).items():
+        if footprint_type != "Electricity" or category not in ("Servers", "Storage"):
+            continue
+        server = obj if category == "Servers" else obj.server
+        if server.name not in server_names or isinstance(obj.instances_energy, EmptyExplainableObject):
+            continue
+        hourly_index = obj.instances_energy.value.index
+        footprints.append(HourlyIntensityFootprint(
+            category=category, object_name=obj_name,
+            average_carbon_intensity=float(obj.average_carbon_intensity.value.to(u.g / u.kWh).magnitude),
+            hourly_energy=pd.Series(hourly_magnitudes(obj.instances_energy, u.kWh), index=hourly_index),
+            hourly_carbon_intensity=pd.Series(align_intensity_profile(profile, hourly_index), index=hourly_index)))
+
+    return footprints
+
+
+def footprints_with_hourly_intensity(system, intensity_footprints: List[HourlyIntensityFootprint]):
+    """
+    Return footprints_by_object(system) with the electricity footprints of intensity_footprints.
+    """
+    footprint_by_key = {(intensity_footprint.category, intensity_footprint.object_name): intensity_footprint.footprint
+                        for intensity_footprint in intensity_footprints}
+    output = footprints_by_object(system)
+    for footprint in output:
+        if footprint["type"] == "Electricity" and (footprint["category"], footprint["object"]) in footprint_by_key:
+            footprint["value"] = footprint_by_key[(footprint["category"], footprint["object"])]
+
+    return output
+
+
+def hourly_footprints_frame(intensity_footprints: List[HourlyIntensityFootprint]):
+    """
+    Return a DataFrame of the hourly electricity footprints in kg, one column per object, indexed by UTC hours.
+    """
+    hourly_footprints = {f"{intensity_footprint.category} {intensity_footprint.object_name}":
+                         intensity_footprint.hourly_footprint for intensity_footprint in intensity_footprints}
+
+    return pd.DataFrame(hourly_footprints).fillna(0)
+
+
+def print_comparison(system, intensity_footprints: List[HourlyIntensityFootprint]):
+    print(f"{'':<36} {'energy (kWh)':>14} {'average (g/kWh)':>16} {'hourly (g/kWh)':>15} {'average (kg)':>13} "
+          f"{'hourly (kg)':>12}")
+    for intensity_footprint in intensity_footprints:
+        print(f"{intensity_footprint.category + ' ' + intensity_footprint.object_name:<36.36} "
+              f"{intensity_footprint.energy:>14.1f} {intensity_footprint.average_carbon_intensity:>16.1f} "
+              f"{intensity_footprint.effective_carbon_intensity:>15.1f} "
+              f"{intensity_footprint.average_intensity_footprint:>13.1f} {intensity_footprint.footprint:>12.1f}")
+    average_total = sum(footprint["value"] for footprint in footprints_by_object(system))
+    hourly_total = sum(footprint["value"] for footprint in footprints_with_hourly_intensity(
+        system, intensity_footprints))
+    print(f"Total footprint of {system.name}: {average_total:.1f} kg with average carbon intensities, "
+          f"{hourly_total:.1f} kg with the hourly profile ({(hourly_total / average_total - 1) * 100:+.1f} %)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("modeling")
+    parser.add_argument("profile", help="CSV or Parquet file of hourly carbon intensities in g/kWh.")
+    parser.add_argument("--timestamp-column", default=DEFAULT_TIMESTAMP_COLUMN)
+    parser.add_argument("--intensity-column", default=DEFAULT_INTENSITY_COLUMN)
+    parser.add_argument("--timezone", default=None, help="Timezone of the profile timestamps, defaults to UTC.")
+    parser.add_argument("--server", action="append", default=None,
+                        help="Name of a server whose electricity has the profile, defaults to all servers.")
+    parser.add_argument("--output", default=None, help="CSV file to write the hourly electricity footprints to.")
+    args = parser.parse_args()
+
+    from modeling_tools.modelings import get_modeling
+    from modeling_tools.run_modeling import build_for_analysis
+
+    modeling = get_modeling(args.modeling)
+    modeling_system = build_for_analysis(modeling)
+    if not hasattr(modeling_system, "fabrication_footprint_sum_over_period"):
+        parser.error(f"{args.modeling} isn’t built with e-footprint 9, whose energies are hourly")
+    intensity_profile = read_intensity_profile(
+        args.profile, args.timestamp_column, args.intensity_column, args.timezone)
+    print(f"{len(intensity_profile)} hourly intensities read from {os.path.basename(args.profile)}, from "
+          f"{intensity_profile.index[0]} to {intensity_profile.index[-1]} UTC")
+    system_intensity_footprints = hourly_intensity_footprints(modeling_system, intensity_profile, args.server)
+    print_comparison(modeling_system, system_intensity_footprints)
+    if args.output:
+        hourly_footprints_frame(system_intensity_footprints).to_csv(args.output, index_label="hour")
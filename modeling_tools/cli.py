@@ -0,0 +1,178 @@
+"""
+Command line entry point running a named modeling with parameter overrides, serving unchanged runs from a result cache.
+
+Running a modeling builds and computes its System, which takes seconds to minutes, while CI and report runs mostly
+repeat runs whose inputs didn’t change. The cache key of a run hashes everything its results are computed from:
+    - the modeling name and its parameter overrides, parsed as JSON values when possible,
+    - the content of the Python sources of the modeling, which hold all its hypotheses and default parameters,
+    - the content of all modeling_tools modules, which compute the results and, like legacy_adapter.py or
+      templates.py, can take part in the build,
+    - the versions of e-footprint and Python.
+Inputs are hashed from the sources rather than from the built System, as building it is what a cache hit saves. The
+values a run looked up in the Boavizta lookup cache aren’t in the sources: a run records the lookup cache entries it
+used, and a hit is only served when they still hold the same values, so that a refreshed or evicted entry triggers a
+new run. Hits only read the installed e-footprint version, the sources and these entries, and return in milliseconds.
+
+Environment variables:
+    EFOOTPRINT_MODELINGS_RESULT_CACHE_DIR: cache directory, defaults to ~/.cache/e-footprint-modelings/results.
+    EFOOTPRINT_MODELINGS_RESULT_CACHE_MAX_SIZE_MB: maximum cache size, defaults to 50 MB.
+
+Usage:
+    python -m modeling_tools.cli ai_use_case --set base_daily_nb_of_visits=5000 --set token_per_word=4
+    python -m modeling_tools.cli paylib --output paylib_results.json --no-cache
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from importlib.metadata import PackageNotFoundError, version
+
+from modeling_tools.lookup_cache import LookupCache, recorded_lookups
+from modeling_tools.modelings import get_modeling, ROOT
+
+RESULT_CACHE_DIR_ENV = "EFOOTPRINT_MODELINGS_RESULT_CACHE_DIR"
+RESULT_CACHE_MAX_SIZE_ENV = "EFOOTPRINT_MODELINGS_RESULT_CACHE_MAX_SIZE_MB"
+DEFAULT_RESULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "e-footprint-modelings", "results")
+DEFAULT_RESULT_CACHE_MAX_SIZE_IN_MB = 50
+
+
+def result_cache():
+    max_size_in_mb = float(os.environ.get(RESULT_CACHE_MAX_SIZE_ENV, DEFAULT_RESULT_CACHE_MAX_SIZE_IN_MB))
+
+    return LookupCache(os.environ.get(RESULT_CACHE_DIR_ENV) or DEFAULT_RESULT_CACHE_DIR, max_size_in_mb * 1024 ** 2,
+                       offline=False)
+
+
+def parse_override(override):
+    """
+    Parse a "name=value" override into (name, value), value being parsed as JSON when possible and kept as a string
+    otherwise, so that --set usage_split='{"chat": 0.5}' gives a dict and --set name=Paris a string.
+    """
+    name, separator, raw_value = override.partition("=")
+    if not separator or not name:
+        raise ValueError(f"Override {override} should be of the form name=value")
+    try:
+        value = json.loads(raw_value)
+    except json.JSONDecodeError:
+        value = raw_value
+
+    return name.strip(), value
+
+
+def installed_efootprint_version():
+    """
+    Return the version of the installed e-footprint without importing it, which takes seconds.
+    """
+    try:
+        return version("efootprint")
+    except PackageNotFoundError:
+        raise ValueError("e-footprint isn’t installed in this Python environment")
+
+
+def file_hashes(paths):
+    """
+    Return {path: sha256 of the file content} for paths, sorted, paths being relative to the repository root.
+    """
+    hashes = {}
+    for path in sorted(paths):
+        with open(path, "rb") as file:
+            hashes[os.path.relpath(path, ROOT)] = hashlib.sha256(file.read()).hexdigest()
+
+    return hashes
+
+
+def modeling_source_paths(modeling):
+    source_paths = []
+    for dir_path, dir_names, file_names in os.walk(modeling.path):
+        dir_names[:] = [dir_name for dir_name in dir_names if dir_name != "__pycache__"]
+        source_paths += [os.path.join(dir_path, file_name) for file_name in file_names if file_name.endswith(".py")]
+
+    return source_paths
+
+
+def modeling_tools_source_paths():
+    modeling_tools_dir = os.path.dirname(os.path.abspath(__file__))
+
+    return [os.path.join(modeling_tools_dir, file_name) for file_name in os.listdir(modeling_tools_dir)
+            if file_name.endswith(".py")]
+
+
+def run_inputs(modeling_name, params):
+    """
+    Return the JSON serializable inputs of a run, whose hash is its result cache key.
+    """
+    modeling = get_modeling(modeling_name)
+
+    return {
+        "modeling": modeling_name,
+        "params": params,
+        "modeling_sources": file_hashes(modeling_source_paths(modeling)),
+        "modeling_tools_sources": file_hashes(modeling_tools_source_paths()),
+        "efootprint_version": installed_efootprint_version(),
+        "python_version": ".".join(str(number) for number in sys.version_info[:3]),
+    }
+
+
+def run_with_cache(modeling_name, params=None, cache=None, use_cache=True):
+    """
+    Return the result of run_modeling for a modeling and parameter overrides, from the cache when a run with the same
+    inputs was already computed and the lookup cache entries it used are unchanged.
+
+    Returns:
+        (result dict, whether it was read from the cache).
+    """
+    from modeling_tools.run_modeling import run_modeling
+
+    params = params or {}
+    modeling = get_modeling(modeling_name)
+    if params and modeling.builder is None:
+        raise ValueError(f"Modeling {modeling_name} has no builder function, so its parameters can’t be overridden")
+    if not use_cache:
+        return run_modeling(modeling_name, modeling.path, params), False
+    cache = cache or result_cache()
+    inputs = run_inputs(modeling_name, params)
+    computed_results = []
+
+    def compute():
+        with recorded_lookups() as lookups:
+            computed_results.append(run_modeling(modeling_name, modeling.path, params))
+        computed_results[0]["lookups"] = lookups
+        return computed_results[0]
+
+    result = cache.get("modeling_result", inputs, compute)
+    if not computed_results and not LookupCache().has_values(result.get("lookups", {})):
+        result = compute()
+        cache.put(cache.entry_path(cache.key("modeling_result", inputs)),
+                  {"lookup": "modeling_result", "arguments": inputs, "value": result})
+
+    return result, not computed_results
+
+
+def print_result(result, from_cache):
+    origin = "read from cache" if from_cache else f"computed in {result['duration_in_s']:.1f} s"
+    print(f"{result['system']} ({result['modeling']}, e-footprint {result['efootprint_version']}), {origin}")
+    for footprint in result["footprints"]:
+        print(f"    {footprint['category']:<20} {footprint['object']:<40} {footprint['type']:<12} "
+              f"{footprint['value']:>14.1f}")
+    print(f"Total footprint: {result['total_footprint']:.1f} {result['footprint_unit']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("modeling")
+    parser.add_argument("--set", dest="overrides", action="append", default=[], metavar="NAME=VALUE",
+                        help="Override a parameter of the modeling builder function, can be repeated.")
+    parser.add_argument("--output", default=None, help="JSON file to write the results to.")
+    parser.add_argument("--no-cache", action="store_true", help="Compute the modeling even if its result is cached.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    run_result, is_cache_hit = run_with_cache(
+        args.modeling, dict(parse_override(override) for override in args.overrides), use_cache=not args.no_cache)
+    print_result(run_result, is_cache_hit)
+    print(f"Done in {time.perf_counter() - start:.2f} s")
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            file.write(json.dumps(run_result, indent=4))
@@ -0,0 +1,234 @@
+"""
+Binary columnar export of the calculated attributes of a System, and memory-mapped reload.
+
+system_to_json(system, save_calculated_attributes=True) writes every hourly value of every calculated attribute as a
+JSON number, which makes the file huge and slow to write and to parse, so the modelings export without them. This
+module writes the same JSON without calculated attributes, plus:
+    - one .npy file per hourly calculated attribute, holding its float64 values,
+    - calculated_attributes.json, indexing these files by modeling object and attribute with their unit, label and
+      start date, and holding the other calculated attributes, like yearly quantities, inline,
+    - the daily, weekly, monthly and yearly footprint rollups of rollups.py, per object and per category.
+
+Loading an export only parses the index: the .npy files are memory-mapped when an attribute is asked for, so a
+dashboard showing one object’s energy footprint reads that series from disk and nothing else.
+
+The export works with the e-footprint versions of all modelings: e-footprint 9 hourly quantities over the modeling
+period, and 24-value hourly usages of older versions.
+
+Usage:
+    python -m modeling_tools.columnar_export export ai_use_case exports/ai_use_case
+    python -m modeling_tools.columnar_export show exports/ai_use_case "GPU server" energy_footprint
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from modeling_tools.rollups import footprint_rollups, read_rollup, write_rollups
+
+SYSTEM_FILENAME = "system.json"
+INDEX_FILENAME = "calculated_attributes.json"
+COLUMNS_DIRNAME = "columns"
+
+
+def linked_modeling_objects(mod_obj, output_list=None):
+    """
+    Return mod_obj and all the modeling objects reachable from its attributes, in the order of system_to_json.
+    """
+    from efootprint.abstract_modeling_classes.modeling_object import ModelingObject
+
+    if output_list is None:
+        output_list = []
+    if any(mod_obj is listed_mod_obj for listed_mod_obj in output_list):
+        return output_list
+    output_list.append(mod_obj)
+    for value in mod_obj.__dict__.values():
+        if isinstance(value, ModelingObject):
+            linked_modeling_objects(value, output_list)
+        elif isinstance(value, list) and len(value) > 0 and isinstance(value[0], ModelingObject):
+            for mod_obj_elt in value:
+                linked_modeling_objects(mod_obj_elt, output_list)
+
+    return output_list
+
+
+def hourly_values(explainable_object):
+    """
+    Return the values of an hourly explainable object as a float64 array and its unit and start date, or None if it
+    isn’t hourly.
+    """
+    value = getattr(explainable_object, "value", None)
+    if isinstance(value, pd.DataFrame):
+        return (value["value"].pint.magnitude.to_numpy(dtype=np.float64), str(value.dtypes.iloc[0].units),
+                value.index[0].strftime("%Y-%m-%d %H:%M:%S"))
+    # Before e-footprint 9, hourly usages are lists of 24 quantities
+    if isinstance(value, list) and len(value) > 0 and hasattr(value[0], "magnitude"):
+        return np.array([elt.magnitude for elt in value], dtype=np.float64), str(value[0].units), None
+
+    return None
+
+
+class ColumnarWriter:
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.nb_of_columns = 0
+        os.makedirs(os.path.join(output_dir, COLUMNS_DIRNAME), exist_ok=True)
+
+    def entry(self, explainable_object):
+        hourly = hourly_values(explainable_object)
+        if hourly is None:
+            return explainable_object.to_json()
+        values, unit, start_date = hourly
+        # Columns are numbered rather than named after object ids, which hold any character of the object names
+        column_path = os.path.join(COLUMNS_DIRNAME, f"{self.nb_of_columns:06d}.npy")
+        np.save(os.path.join(self.output_dir, column_path), values)
+        self.nb_of_columns += 1
+
+        return {"label": explainable_object.label, "unit": unit, "start_date": start_date, "length": len(values),
+                "file": column_path}
+
+
+def export_system(system, output_dir):
+    """
+    Write a System and its calculated attributes to output_dir.
+
+    Returns:
+        the calculated attributes index, as written to calculated_attributes.json.
+    """
+    from efootprint.api_utils.system_to_json import system_to_json
+
+    writer = ColumnarWriter(output_dir)
+    system_to_json(system, False, os.path.join(output_dir, SYSTEM_FILENAME))
+
+    index = {}
+    for mod_obj in linked_modeling_objects(system):
+        attributes = {}
+        for attr_name in mod_obj.calculated_attributes:
+            attr_value = getattr(mod_obj, attr_name)
+            if isinstance(attr_value, dict):
+                attributes[attr_name] = {
+                    getattr(key, "id", key): writer.entry(value) for key, value in attr_value.items()}
+            else:
+                attributes[attr_name] = writer.entry(attr_value)
+        index[mod_obj.id] = {"name": mod_obj.name, "class": type(mod_obj).__name__, "attributes": attributes}
+
+    with open(os.path.join(output_dir, INDEX_FILENAME), "w") as file:
+        file.write(json.dumps(index, indent=4))
+    write_rollups(footprint_rollups(system), output_dir)
+
+    return index
+
+
+class ColumnarResults:
+    """
+    Read access to an export of export_system, loading hourly values lazily as memory-mapped arrays.
+    """
+    def __init__(self, export_dir):
+        self.export_dir = export_dir
+        with open(os.path.join(export_dir, INDEX_FILENAME)) as file:
+            self.index = json.load(file)
+
+    def objects(self):
+        """
+        Returns:
+            list of (id, class, name) of the exported modeling objects.
+        """
+        return [(mod_obj_id, entry["class"], entry["name"]) for mod_obj_id, entry in self.index.items()]
+
+    def object_id(self, mod_obj_name_or_id):
+        if mod_obj_name_or_id in self.index:
+            return mod_obj_name_or_id
+        mod_obj_ids = [mod_obj_id for mod_obj_id, entry in self.index.items() if entry["name"] == mod_obj_name_or_id]
+        if len(mod_obj_ids) == 0:
+            raise ValueError(f"No modeling object named {mod_obj_name_or_id} in {self.export_dir}")
+        if len(mod_obj_ids) > 1:
+            raise ValueError(f"Several modeling objects are named {mod_obj_name_or_id} in {self.export_dir}, use one "
+                             f"of their ids instead: {mod_obj_ids}")
+
+        return mod_obj_ids[0]
+
+    def entry(self, mod_obj_name_or_id, attr_name, key=None):
+        """
+        Return the index entry of a calculated attribute. key is the id of the dict key, like a usage pattern id, for
+        calculated attributes that are dicts.
+        """
+        mod_obj_id = self.object_id(mod_obj_name_or_id)
+        attributes = self.index[mod_obj_id]["attributes"]
+        if attr_name not in attributes:
+            raise ValueError(f"{self.index[mod_obj_id]['name']} has no calculated attribute {attr_name}, available "
+                             f"ones are {list(attributes.keys())}")
+        entry = attributes[attr_name]
+        if key is not None:
+            if key not in entry:
+                raise ValueError(f"{attr_name} of {self.index[mod_obj_id]['name']} has no key {key}, available ones "
+                                 f"are {list(entry.keys())}")
+            entry = entry[key]
+
+        return entry
+
+    def values(self, mod_obj_name_or_id, attr_name, key=None):
+        """
+        Return the hourly values of a calculated attribute as a read-only memory-mapped array, in the unit of its
+        index entry.
+        """
+        entry = self.entry(mod_obj_name_or_id, attr_name, key)
+        if "file" not in entry:
+            raise ValueError(f"{attr_name} of {mod_obj_name_or_id} isn’t an hourly calculated attribute: {entry}")
+
+        return np.load(os.path.join(self.export_dir, entry["file"]), mmap_mode="r")
+
+    def series(self, mod_obj_name_or_id, attr_name, key=None):
+        """
+        Return the hourly values of a calculated attribute as a pandas Series indexed by hour when it has a start
+        date, and by hour of the day otherwise.
+        """
+        entry = self.entry(mod_obj_name_or_id, attr_name, key)
+        values = self.values(mod_obj_name_or_id, attr_name, key)
+        if entry["start_date"] is None:
+            index = pd.RangeIndex(len(values), name="hour of the day")
+        else:
+            index = pd.period_range(start=entry["start_date"], periods=len(values), freq="h")
+
+        return pd.Series(values, index=index, name=f"{entry['label']} ({entry['unit']})", copy=False)
+
+    def rollup(self, tier, level="object", **filters):
+        """
+        Return a footprint rollup tier of the export, see rollups.read_rollup, without reading any hourly value.
+        """
+        return read_rollup(self.export_dir, tier, level, **filters)
+
+    def system_json(self):
+        with open(os.path.join(self.export_dir, SYSTEM_FILENAME)) as file:
+            return json.load(file)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("export", help="Build a modeling and export it.")
+    export_parser.add_argument("modeling")
+    export_parser.add_argument("output_dir")
+    show_parser = subparsers.add_parser("show", help="Print a calculated attribute of an export.")
+    show_parser.add_argument("export_dir")
+    show_parser.add_argument("modeling_object", help="Name or id of the modeling object.")
+    show_parser.add_argument("attribute")
+    show_parser.add_argument("--key", default=None, help="Id of the dict key, for dict calculated attributes.")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        from modeling_tools.modelings import get_modeling
+        from modeling_tools.run_modeling import build_for_analysis
+
+        modeling = get_modeling(args.modeling)
+        modeling_system = build_for_analysis(modeling)
+        export_index = export_system(modeling_system, args.output_dir)
+        print(f"Exported {len(export_index)} modeling objects to {args.output_dir}")
+    elif args.command == "show":
+        results = ColumnarResults(args.export_dir)
+        attribute_entry = results.entry(args.modeling_object, args.attribute, args.key)
+        if "file" in attribute_entry:
+            print(results.series(args.modeling_object, args.attribute, args.key).describe())
+        else:
+            print(json.dumps(attribute_entry, indent=4))
@@ -0,0 +1,401 @@
+"""
+Run-length encoded hourly usage for multi-year, high-volume e-footprint 9 usage patterns.
+
+create_hourly_usage_from_daily_volume_and_list_of_hours and create_hourly_usage_from_frequency fill one pint-pandas row
+per hour of the modeling period, while most of these hours are zeros: a pattern active 7 hours a day changes value twice
+a day, and the monthly RAG fill of the AI use case changes value twice a month. A CompactHourlyUsage only stores the
+hours where the value changes and the value from that hour on, in two typed NumPy arrays, so its size grows with the
+number of changes instead of the number of hours.
+
+The devices and network footprints of a usage pattern only depend on its hourly usage journey starts through shifts,
+sums, products by constants and roundings, which all apply run by run. usage_pattern_footprints computes them from a
+CompactHourlyUsage with the same steps and roundings as e-footprint’s UsagePattern and Network, without expanding it
+to one value per hour. Server and storage footprints depend on all usage patterns at once and are left to e-footprint,
+which consumes dense series: to_source_hourly_values converts a CompactHourlyUsage when it has to go into a System.
+
+Usage:
+    hourly_starts = CompactHourlyUsage.from_daily_volume_and_list_of_hours(10 * u.year, 2000, list(range(9, 16)))
+    footprints = usage_pattern_footprints(usage_pattern, hourly_starts)
+"""
+import math
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_START_DATE = datetime.strptime("2025-01-01", "%Y-%m-%d")
+FREQUENCIES = ["daily", "weekly", "monthly", "yearly"]
+
+
+class CompactHourlyUsage:
+    """
+    Hourly series stored as runs of equal values.
+
+    Attributes:
+        run_starts: uint32 array of the hour offsets, from start_date, where each run starts. The first one is 0.
+        run_values: value of each run, integer for series built like e-footprint’s time builders and float otherwise.
+        nb_of_hours: length of the series in hours.
+        start_date: date of the first hour.
+        pint_unit: unit of the values, dimensionless by default.
+    """
+    def __init__(self, run_starts, run_values, nb_of_hours, start_date=DEFAULT_START_DATE, pint_unit=None):
+        run_starts = np.asarray(run_starts, dtype=np.int64)
+        run_values = np.asarray(run_values)
+        if len(run_starts) != len(run_values):
+            raise ValueError(f"run_starts and run_values must have the same length, got {len(run_starts)} and "
+                             f"{len(run_values)}.")
+        if nb_of_hours > 0 and (len(run_starts) == 0 or run_starts[0] != 0 or np.any(np.diff(run_starts) <= 0)
+                                or run_starts[-1] >= nb_of_hours):
+            raise ValueError(f"run_starts must be strictly increasing hour offsets starting at 0 and lower than "
+                             f"nb_of_hours ({nb_of_hours}).")
+        # Merge consecutive runs with the same value
+        if len(run_values) > 1:
+            is_run_start = np.concatenate(([True], run_values[1:] != run_values[:-1]))
+            run_starts, run_values = run_starts[is_run_start], run_values[is_run_start]
+        self.run_starts = run_starts.astype(np.uint32)
+        self.run_values = run_values
+        self.nb_of_hours = int(nb_of_hours)
+        self.start_date = start_date
+        self.pint_unit = pint_unit
+
+    @classmethod
+    def from_active_hours(cls, active_hour_offsets, active_hour_values, nb_of_hours, start_date=DEFAULT_START_DATE,
+                          pint_unit=None):
+        """
+        Build a series that is 0 everywhere except at the given hour offsets.
+
+        Args:
+            active_hour_offsets: sorted and unique hour offsets from start_date.
+            active_hour_values: value at each of these offsets, or a single value for all of them.
+        """
+        active_hour_offsets = np.asarray(active_hour_offsets, dtype=np.int64)
+        active_hour_values = np.broadcast_to(np.asarray(active_hour_values), active_hour_offsets.shape)
+        run_starts = np.unique(np.concatenate(([0], active_hour_offsets, active_hour_offsets + 1)))
+        run_starts = run_starts[run_starts < nb_of_hours]
+        run_values = np.zeros(len(run_starts), dtype=active_hour_values.dtype)
+        is_active = np.isin(run_starts, active_hour_offsets)
+        run_values[is_active] = active_hour_values[np.searchsorted(active_hour_offsets, run_starts[is_active])]
+
+        return cls(run_starts, run_values, nb_of_hours, start_date, pint_unit)
+
+    @classmethod
+    def from_frequency(cls, timespan, input_volume, frequency, active_days=None, hours=None,
+                       start_date=DEFAULT_START_DATE, pint_unit=None):
+        """
+        Same series as e-footprint’s create_hourly_usage_from_frequency, computed day by day instead of hour by hour.
+        """
+        from efootprint.constants.units import u
+
+        if frequency not in FREQUENCIES:
+            raise ValueError(f"frequency must be one of 'daily', 'weekly', 'monthly', or 'yearly', got {frequency}.")
+        if frequency == "daily" and active_days is not None:
+            raise ValueError(f"active_days must be None for daily frequency, got {active_days}.")
+        if active_days is None:
+            active_days = [0] if frequency == "weekly" else [1]
+        if hours is None:
+            hours = [0]
+
+        end_date = start_date + timedelta(days=timespan.to(u.day).magnitude)
+        # Like pd.period_range(start=start_date, end=end_date, freq="h") in e-footprint, the end hour is included
+        nb_of_hours = len(pd.period_range(start=start_date, end=end_date, freq="h"))
+        days = pd.date_range(start=pd.Timestamp(start_date).floor("D"), end=end_date, freq="D")
+        day_numbers = {"weekly": days.dayofweek, "monthly": days.day, "yearly": days.dayofyear}.get(frequency)
+        if day_numbers is not None:
+            days = days[np.isin(day_numbers, active_days)]
+        day_offsets = ((days - pd.Timestamp(start_date)) // pd.Timedelta(hours=1)).to_numpy(dtype=np.int64)
+        active_hour_offsets = np.unique(
+            (day_offsets[:, np.newaxis] + np.unique(np.asarray(hours, dtype=np.int64))[np.newaxis, :]).ravel())
+        active_hour_offsets = active_hour_offsets[(active_hour_offsets >= 0) & (active_hour_offsets < nb_of_hours)]
+        # e-footprint writes the volume into an integer array, which truncates it
+        volume = np.trunc(input_volume).astype(np.int64)
+
+        return cls.from_active_hours(active_hour_offsets, volume, nb_of_hours, start_date, pint_unit)
+
+    @classmethod
+    def from_daily_volume_and_list_of_hours(cls, timespan, daily_volume, hours, start_date=DEFAULT_START_DATE,
+                                            pint_unit=None):
+        """
+        Same series as e-footprint’s create_hourly_usage_from_daily_volume_and_list_of_hours.
+        """
+        return cls.from_frequency(
+            timespan, daily_volume / len(hours), "daily", hours=hours, start_date=start_date, pint_unit=pint_unit)
+
+    @classmethod
+    def from_dense(cls, values, start_date=DEFAULT_START_DATE, pint_unit=None):
+        values = np.asarray(values)
+        run_starts = np.concatenate(([0], np.flatnonzero(values[1:] != values[:-1]) + 1)) if len(values) else []
+
+        return cls(run_starts, values[run_starts], len(values), start_date, pint_unit)
+
+    @classmethod
+    def from_hourly_quantities(cls, hourly_quantities):
+        """
+        Encode the values of an e-footprint ExplainableHourlyQuantities, like the hourly usage journey starts of a usage
+        pattern.
+        """
+        return cls.from_dense(
+            hourly_quantities.value["value"].pint.magnitude.to_numpy(), hourly_quantities.value.index[0].to_timestamp(),
+            hourly_quantities.unit)
+
+    @property
+    def run_lengths(self):
+        return np.diff(np.append(self.run_starts.astype(np.int64), self.nb_of_hours))
+
+    @property
+    def nbytes(self):
+        return self.run_starts.nbytes + self.run_values.nbytes
+
+    def __len__(self):
+        return self.nb_of_hours
+
+    def __repr__(self):
+        return (f"CompactHourlyUsage({len(self.run_starts)} runs over {self.nb_of_hours} hours from {self.start_date}, "
+                f"{self.nbytes} bytes)")
+
+    def values_at(self, hour_offsets):
+        """
+        Return the values at the given hour offsets from start_date, 0 outside of the series.
+        """
+        hour_offsets = np.asarray(hour_offsets, dtype=np.int64)
+        run_index = np.maximum(np.searchsorted(self.run_starts, hour_offsets, side="right") - 1, 0)
+        is_inside = (hour_offsets >= 0) & (hour_offsets < self.nb_of_hours)
+
+        return np.where(is_inside, self.run_values[run_index], np.zeros(1, dtype=self.run_values.dtype))
+
+    def shift(self, nb_of_hours):
+        return CompactHourlyUsage(
+            self.run_starts, self.run_values, self.nb_of_hours, self.start_date + timedelta(hours=int(nb_of_hours)),
+            self.pint_unit)
+
+    def __add__(self, other):
+        if not isinstance(other, CompactHourlyUsage):
+            return NotImplemented
+        # Like pandas additions with fill_value=0, the sum covers both series and is 0 where only one of them is defined
+        start_date = min(self.start_date, other.start_date)
+        self_offset = int((self.start_date - start_date) / timedelta(hours=1))
+        other_offset = int((other.start_date - start_date) / timedelta(hours=1))
+        nb_of_hours = max(self_offset + self.nb_of_hours, other_offset + other.nb_of_hours)
+        run_starts = np.unique(np.concatenate((
+            [0], self.run_starts.astype(np.int64) + self_offset, [self_offset + self.nb_of_hours],
+            other.run_starts.astype(np.int64) + other_offset, [other_offset + other.nb_of_hours])))
+        run_starts = run_starts[run_starts < nb_of_hours]
+        run_values = self.values_at(run_starts - self_offset) + other.values_at(run_starts - other_offset)
+
+        return CompactHourlyUsage(run_starts, run_values, nb_of_hours, start_date, self.pint_unit)
+
+    def __mul__(self, factor):
+        return CompactHourlyUsage(self.run_starts, self.run_values * factor, self.nb_of_hours, self.start_date,
+                                  self.pint_unit)
+
+    def __rmul__(self, factor):
+        return self * factor
+
+    def round(self, decimals):
+        return CompactHourlyUsage(self.run_starts, np.round(self.run_values, decimals), self.nb_of_hours,
+                                  self.start_date, self.pint_unit)
+
+    def sum(self):
+        return float(np.dot(self.run_values.astype(float), self.run_lengths))
+
+    def max(self):
+        return self.run_values.max()
+
+    def nb_avg_hourly_occurrences(self, event_duration_in_hours):
+        """
+        Same computation as e-footprint’s compute_nb_avg_hourly_occurrences: sum of the series shifted by every full
+        hour of the event duration, plus the series shifted by the number of full hours times the remaining fraction.
+        """
+        nb_of_full_hours = math.floor(event_duration_in_hours)
+        occurrences = None
+        for hour_shift in range(nb_of_full_hours):
+            occurrences = self.shift(hour_shift) if occurrences is None else occurrences + self.shift(hour_shift)
+        nonfull_duration_rest = event_duration_in_hours - nb_of_full_hours
+        if nonfull_duration_rest > 0:
+            rest_occurrences = self.shift(nb_of_full_hours) * nonfull_duration_rest
+            occurrences = rest_occurrences if occurrences is None else occurrences + rest_occurrences
+
+        return occurrences
+
+    def to_dense(self):
+        return np.repeat(self.run_values, self.run_lengths)
+
+    def to_source_hourly_values(self):
+        from efootprint.builders.time_builders import create_source_hourly_values_from_list
+        from efootprint.constants.units import u
+
+        return create_source_hourly_values_from_list(
+            self.to_dense(), self.start_date, self.pint_unit if self.pint_unit is not None else u.dimensionless)
+
+
+def utc_offset_in_hours(timezone, date):
+    """
+    Shift converting hourly values in a country timezone to UTC, with the offset of the timezone at date, like the start
+    date of the modeling period. ExplainableHourlyQuantities.convert_to_utc applies the same shift to all hours, but
+    with the offset at the current date, which makes hourly series depend on the day they are computed, while the
+    footprints summed over the modeling period don’t depend on the shift.
+    """
+    return -int(timezone.value.utcoffset(date).total_seconds() / 3600)
+
+
+def magnitude_in(quantity, unit):
+    from copy import copy
+
+    # Use copy not to convert the quantity of an e-footprint object in place
+    return copy(quantity).to(unit).magnitude
+
+
+def usage_pattern_footprints(usage_pattern, hourly_usage_journey_starts=None):
+    """
+    Compute the devices and network footprints of an e-footprint 9 usage pattern from compact hourly usage journey
+    starts, with the steps and roundings of UsagePattern and Network.
+
+    Args:
+        usage_pattern: UsagePattern whose devices, usage journey, network and country are used.
+        hourly_usage_journey_starts: CompactHourlyUsage in the usage pattern timezone, defaults to the encoding of the
+            usage pattern hourly_usage_journey_starts.
+
+    Returns:
+        dict {footprint name: footprint in kg summed over the modeling period} with "Devices fabrication",
+        "Devices energy" and "Network energy" keys, and the CompactHourlyUsage of the hourly number of usage journeys in
+        parallel under "nb_usage_journeys_in_parallel".
+    """
+    from efootprint.constants.units import u
+
+    if hourly_usage_journey_starts is None:
+        hourly_usage_journey_starts = CompactHourlyUsage.from_hourly_quantities(
+            usage_pattern.hourly_usage_journey_starts)
+    utc_starts = hourly_usage_journey_starts.shift(
+        utc_offset_in_hours(usage_pattern.country.timezone, hourly_usage_journey_starts.start_date))
+    carbon_intensity = magnitude_in(usage_pattern.country.average_carbon_intensity.value, u.kg / u.kWh)
+
+    nb_usage_journeys_in_parallel = utc_starts.nb_avg_hourly_occurrences(
+        magnitude_in(usage_pattern.usage_journey.duration.value, u.hour))
+    devices_energy_over_one_hour = magnitude_in(
+        sum(device.power.value for device in usage_pattern.devices) * (1 * u.hour), u.kWh)
+    devices_energy = (nb_usage_journeys_in_parallel * devices_energy_over_one_hour).round(6)
+    devices_energy_footprint = (devices_energy * carbon_intensity).round(6)
+    devices_fabrication_over_one_hour = sum(
+        magnitude_in(device.carbon_footprint_fabrication.value * (1 * u.hour)
+                     / (device.lifespan.value * device.fraction_of_usage_time.value), u.g)
+        for device in usage_pattern.devices)
+    devices_fabrication_footprint = (
+        nb_usage_journeys_in_parallel * devices_fabrication_over_one_hour * magnitude_in(1 * u.g, u.kg)).round(2)
+
+    # Network rounds the energy of the data transferred by all the jobs of the usage pattern, summed hour by hour
+    network_energy = None
+    bandwidth_energy_intensity = usage_pattern.network.bandwidth_energy_intensity.value
+    delay_in_hours = 0
+    for uj_step in usage_pattern.usage_journey.uj_steps:
+        for job in uj_step.jobs:
+            job_occurrences = utc_starts.shift(math.floor(delay_in_hours))
+            duration_in_full_hours = math.ceil(magnitude_in(job.request_duration.value, u.hour))
+            energy_per_occurrence_and_hour = magnitude_in(
+                bandwidth_energy_intensity * job.data_transferred.value / duration_in_full_hours, u.kWh)
+            for hour_shift in range(duration_in_full_hours):
+                job_network_energy = job_occurrences.shift(hour_shift) * energy_per_occurrence_and_hour
+                network_energy = job_network_energy if network_energy is None else network_energy + job_network_energy
+        delay_in_hours += magnitude_in(uj_step.user_time_spent.value, u.hour)
+    network_energy_footprint = 0 if network_energy is None else (
+        network_energy.round(6) * carbon_intensity).round(6).sum()
+
+    return {
+        "Devices fabrication": devices_fabrication_footprint.sum(),
+        "Devices energy": devices_energy_footprint.sum(),
+        "Network energy": network_energy_footprint,
+        "nb_usage_journeys_in_parallel": nb_usage_journeys_in_parallel,
+    }
+
+
+def dense_devices_footprints(usage_pattern, hourly_usage_journey_starts):
+    """
+    Devices footprints computed by e-footprint’s own operations on dense hourly quantities, as reference for the
+    benchmark.
+    """
+    from efootprint.abstract_modeling_classes.explainable_objects import ExplainableQuantity
+    from efootprint.constants.units import u
+    from efootprint.core.usage.compute_nb_occurrences_in_parallel import compute_nb_avg_hourly_occurrences
+
+    utc_starts = hourly_usage_journey_starts.convert_to_utc(local_timezone=usage_pattern.country.timezone)
+    nb_usage_journeys_in_parallel = compute_nb_avg_hourly_occurrences(utc_starts, usage_pattern.usage_journey.duration)
+    devices_energy = (nb_usage_journeys_in_parallel * sum([device.power for device in usage_pattern.devices])
+                      * ExplainableQuantity(1 * u.hour, "one full hour")).to(u.kWh)
+    devices_energy_footprint = (devices_energy * usage_pattern.country.average_carbon_intensity).to(u.kg)
+    devices_fabrication_over_one_hour = sum([
+        (device.carbon_footprint_fabrication * ExplainableQuantity(1 * u.hour, "one hour")
+         / (device.lifespan * device.fraction_of_usage_time)).to(u.g) for device in usage_pattern.devices])
+    devices_fabrication_footprint = (nb_usage_journeys_in_parallel * devices_fabrication_over_one_hour).to(
+        u.kg, rounding=2)
+
+    return {"Devices fabrication": devices_fabrication_footprint.sum().value.to(u.kg).magnitude,
+            "Devices energy": devices_energy_footprint.sum().value.to(u.kg).magnitude}
+
+
+def measure(function):
+    """
+    Return the result of function, its duration in s and its peak memory allocation in bytes.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function()
+    duration = time.perf_counter() - start
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return result, duration, peak_memory
+
+
+if __name__ == "__main__":
+    from efootprint.builders.time_builders import create_hourly_usage_from_daily_volume_and_list_of_hours, \
+        create_hourly_usage_from_frequency
+    from efootprint.constants.units import u
+
+    from modeling_tools.modelings import get_modeling
+    from modeling_tools.run_modeling import load_builder
+
+    ai_use_case = get_modeling("ai_use_case")
+    system = load_builder(ai_use_case, ai_use_case.path)()
+
+    print("Compact footprints of the AI use case usage patterns, compared with e-footprint:")
+    network_energy_footprint = 0
+    for usage_pattern in sorted(system.usage_patterns, key=lambda usage_pattern: usage_pattern.name):
+        compact_footprints = usage_pattern_footprints(usage_pattern)
+        network_energy_footprint += compact_footprints["Network energy"]
+        for footprint_name, attribute_name in [("Devices fabrication", "devices_fabrication_footprint"),
+                                               ("Devices energy", "devices_energy_footprint")]:
+            efootprint_value = getattr(usage_pattern, attribute_name).sum().value.to(u.kg).magnitude
+            print(f"    {usage_pattern.name} {footprint_name}: {compact_footprints[footprint_name]:.6f} kg, "
+                  f"e-footprint: {efootprint_value:.6f} kg")
+    efootprint_network_energy_footprint = sum(
+        network.energy_footprint.sum().value.to(u.kg).magnitude for network in system.networks)
+    print(f"    Network energy: {network_energy_footprint:.6f} kg, e-footprint: "
+          f"{efootprint_network_energy_footprint:.6f} kg")
+
+    timespan = 10 * u.year
+    usage_pattern = next(usage_pattern for usage_pattern in system.usage_patterns if usage_pattern.name == "use_rag")
+    print(f"\nHourly usage over {timespan}, dense pint-pandas series against compact series:")
+    for description, dense_builder, compact_builder in [
+            ("2000 daily visits over 7 hours",
+             lambda: create_hourly_usage_from_daily_volume_and_list_of_hours(timespan, 2000, list(range(9, 16))),
+             lambda: CompactHourlyUsage.from_daily_volume_and_list_of_hours(timespan, 2000, list(range(9, 16)))),
+            ("1 monthly start",
+             lambda: create_hourly_usage_from_frequency(timespan, 1, "monthly", active_days=[1]),
+             lambda: CompactHourlyUsage.from_frequency(timespan, 1, "monthly", active_days=[1]))]:
+        dense_starts, dense_build_duration, _ = measure(dense_builder)
+        compact_starts, compact_build_duration, _ = measure(compact_builder)
+        dense_size = int(dense_starts.value.memory_usage(deep=True).sum())
+        dense_footprints, dense_duration, dense_peak_memory = measure(
+            lambda: dense_devices_footprints(usage_pattern, dense_starts))
+        compact_footprints, compact_duration, compact_peak_memory = measure(
+            lambda: usage_pattern_footprints(usage_pattern, compact_starts))
+        if not np.array_equal(compact_starts.to_dense(), dense_starts.value["value"].pint.magnitude.to_numpy()):
+            raise ValueError(f"Compact and dense hourly usage differ for {description}.")
+        print(f"{description}: {len(compact_starts)} hours, {len(compact_starts.run_starts)} runs")
+        print(f"    size: dense {dense_size / 1024:.0f} kB, compact {compact_starts.nbytes / 1024:.1f} kB")
+        print(f"    build: dense {dense_build_duration * 1000:.0f} ms, compact {compact_build_duration * 1000:.1f} ms")
+        print(f"    devices footprints: dense {dense_duration * 1000:.0f} ms and {dense_peak_memory / 1024:.0f} kB "
+              f"peak, compact {compact_duration * 1000:.1f} ms and {compact_peak_memory / 1024:.0f} kB peak")
+        for footprint_name, dense_value in dense_footprints.items():
+            print(f"    {footprint_name}: dense {dense_value:.4f} kg, "
+                  f"compact {compact_footprints[footprint_name]:.4f} kg")
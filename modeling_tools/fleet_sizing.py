@@ -0,0 +1,372 @@
+"""
+Search the number of instances and GPUs per server of the on-premise servers of a System for the lowest footprint.
+
+In the ai_use_case modeling, the GPU server shared by the three GenAI models is fixed at 6 instances of 4 GPUs and the
+web server at 1 instance, by hand. FleetSizer reads the hourly compute and RAM needs of each on-premise server from the
+System built with e-footprint 9, which don’t depend on its sizing, and evaluates a whole grid of candidate sizings at
+once with NumPy, using the formulas of e-footprint:
+    - the available compute and RAM per instance are the server resources times its utilization rate minus what its
+      base consumption and installed services, like loaded GenAI models, occupy,
+    - the raw number of instances needed each hour is the max of the RAM and compute needs over these available
+      resources, and a candidate is feasible when it never exceeds the number of instances,
+    - fabrication footprints are proportional to the number of instances, and energy footprints to the number of
+      instances drawing idle power plus the raw number of instances drawing the extra power of full activity.
+The power, RAM and fabrication footprint of GPU servers are proportional to their number of GPUs, so both dimensions
+are searched for them. Other servers only have their number of instances searched, as changing their compute
+wouldn’t change their power nor their fabrication footprint in e-footprint.
+
+Servers are independent from each other, so the lowest total footprint is reached with the lowest footprint of each
+server, the footprints of the rest of the System being unchanged. --check applies the best sizing to the System with
+a ModelingUpdate and compares its total footprint with the predicted one.
+
+Usage:
+    python -m modeling_tools.fleet_sizing ai_use_case --max-instances 64 --gpus-per-server 1 2 4 8 --check
+"""
+import argparse
+import sys
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from modeling_tools.footprints import footprints_by_object, hourly_magnitudes
+
+# e-footprint rounds the hourly raw numbers of instances when converting them to dimensionless
+RAW_NB_OF_INSTANCES_ROUNDING = 6
+
+
+def magnitude(explainable_quantity, unit):
+    return float(explainable_quantity.value.to(unit).magnitude)
+
+
+def total_footprint_in_kg(hourly_footprints):
+    from efootprint.abstract_modeling_classes.explainable_objects import EmptyExplainableObject
+    from efootprint.constants.units import u
+
+    return sum(float(footprint.sum().value.to(u.kg).magnitude) for footprint in hourly_footprints
+               if not isinstance(footprint, EmptyExplainableObject))
+
+
+@dataclass
+class ServerSizing:
+    """
+    Footprints of the candidate sizings of one server over the modeling period.
+
+    Attributes:
+        server_name: name of the server.
+        compute_unit: unit of the compute options, gpu for GPU servers.
+        compute_options: compute per instance of the candidates, the rows of the arrays below.
+        nb_of_instances_options: numbers of instances of the candidates, the columns of the arrays below.
+        nb_of_instances_needed: number of instances needed for each compute option, inf when an instance can’t even
+            hold the base consumption of the server and its services.
+        footprints: footprints of the candidates in kg, fabrication plus energy.
+        current_compute: compute per instance of the server in the System.
+        current_nb_of_instances: fixed number of instances of the server in the System, None when it isn’t fixed.
+        current_footprint: footprint of the server in the System in kg.
+    """
+    server_name: str
+    compute_unit: str
+    compute_options: np.ndarray
+    nb_of_instances_options: np.ndarray
+    nb_of_instances_needed: np.ndarray
+    footprints: np.ndarray
+    current_compute: float
+    current_nb_of_instances: float
+    current_footprint: float
+
+    @property
+    def feasible(self):
+        return self.nb_of_instances_needed[:, np.newaxis] <= self.nb_of_instances_options[np.newaxis, :]
+
+    @property
+    def nb_of_candidates(self):
+        return self.footprints.size
+
+    def best(self):
+        """
+        Returns:
+            (compute, nb of instances, footprint) of the feasible candidate with the lowest footprint, the smallest
+            one on ties.
+        """
+        feasible_footprints = np.where(self.feasible, self.footprints, np.inf)
+        if not np.isfinite(feasible_footprints).any():
+            raise ValueError(
+                f"No candidate sizing of {self.server_name} covers its needs, the largest one needs "
+                f"{self.nb_of_instances_needed[-1]} instances of {self.compute_options[-1]} {self.compute_unit}")
+        compute_index, nb_of_instances_index = np.unravel_index(
+            np.argmin(feasible_footprints), feasible_footprints.shape)
+
+        return (float(self.compute_options[compute_index]),
+                float(self.nb_of_instances_options[nb_of_instances_index]),
+                float(self.footprints[compute_index, nb_of_instances_index]))
+
+    def ranked(self):
+        """
+        Returns:
+            list of (compute, nb of instances, footprint) of the feasible candidates, by increasing footprint.
+        """
+        compute_indexes, nb_of_instances_indexes = np.nonzero(self.feasible)
+        footprints = self.footprints[compute_indexes, nb_of_instances_indexes]
+        order = np.lexsort((nb_of_instances_indexes, compute_indexes, footprints))
+
+        return [(float(self.compute_options[compute_indexes[index]]),
+                 float(self.nb_of_instances_options[nb_of_instances_indexes[index]]), float(footprints[index]))
+                for index in order]
+
+    def footprint_of(self, compute, nb_of_instances):
+        compute_index = np.flatnonzero(self.compute_options == compute)
+        nb_of_instances_index = np.flatnonzero(self.nb_of_instances_options == nb_of_instances)
+        if not len(compute_index) or not len(nb_of_instances_index):
+            raise ValueError(f"{nb_of_instances} instances of {compute} {self.compute_unit} of {self.server_name} "
+                             f"aren’t among the candidates")
+
+        return float(self.footprints[compute_index[0], nb_of_instances_index[0]])
+
+
+@dataclass
+class FleetSizingResult:
+    """
+    Candidate sizings of the on-premise servers of a System.
+
+    Attributes:
+        server_sizings: ServerSizing of each sized server.
+        other_footprint: footprint of the rest of the System in kg, which doesn’t depend on the sizings.
+        duration_in_s: duration of the evaluation of all candidates.
+    """
+    server_sizings: List[ServerSizing]
+    other_footprint: float
+    duration_in_s: float
+
+    @property
+    def nb_of_candidates(self):
+        return sum(server_sizing.nb_of_candidates for server_sizing in self.server_sizings)
+
+    def best_configuration(self) -> Dict[str, Tuple[float, float]]:
+        """
+        Returns:
+            dict {server name: (compute, nb of instances)} of the sizing with the lowest total footprint.
+        """
+        return {server_sizing.server_name: server_sizing.best()[:2] for server_sizing in self.server_sizings}
+
+    def total_footprint(self, configuration=None):
+        """
+        Total footprint of the System in kg with configuration, a {server name: (compute, nb of instances)} dict that
+        defaults to the best configuration.
+        """
+        configuration = configuration or self.best_configuration()
+
+        return self.other_footprint + sum(
+            server_sizing.footprint_of(*configuration[server_sizing.server_name])
+            for server_sizing in self.server_sizings)
+
+    def current_total_footprint(self):
+        return self.other_footprint + sum(server_sizing.current_footprint for server_sizing in self.server_sizings)
+
+
+class FleetSizer:
+    """
+    Evaluator of the footprint of a System built with e-footprint 9 for other sizings of its on-premise servers.
+
+    Args:
+        system: built System.
+        server_names: names of the servers to size, defaults to all on-premise servers.
+    """
+    def __init__(self, system, server_names=None):
+        from efootprint.core.hardware.server_base import ServerTypes
+
+        self.system = system
+        on_premise_servers = {server.name: server for server in system.servers
+                              if server.server_type == ServerTypes.on_premise()}
+        if server_names is None:
+            server_names = sorted(on_premise_servers.keys())
+        unknown_names = set(server_names) - set(on_premise_servers.keys())
+        if unknown_names:
+            raise ValueError(f"No on-premise server named {sorted(unknown_names)} in {system.name}, available ones "
+                             f"are {sorted(on_premise_servers.keys())}")
+        self.servers = [on_premise_servers[name] for name in server_names]
+
+    @staticmethod
+    def is_gpu_server(server):
+        # Servers linked to other objects are wrapped in ContextualModelingObjectAttributes, which e-footprint
+        # considers as instances of all ModelingObject classes
+        return server.class_as_simple_str == "GPUServer"
+
+    def hardware_per_instance(self, server, compute_options):
+        """
+        Returns:
+            arrays of power and idle power in W, RAM in GB and fabrication footprint in kg per instance, one value per
+            compute option.
+        """
+        from efootprint.constants.units import u
+
+        if self.is_gpu_server(server):
+            return (compute_options * magnitude(server.gpu_power, u.W / u.gpu),
+                    compute_options * magnitude(server.gpu_idle_power, u.W / u.gpu),
+                    compute_options * magnitude(server.ram_per_gpu, u.GB / u.gpu),
+                    magnitude(server.carbon_footprint_fabrication_without_gpu, u.kg)
+                    + compute_options * magnitude(server.carbon_footprint_fabrication_per_gpu, u.kg / u.gpu))
+
+        return tuple(np.full(len(compute_options), value) for value in (
+            magnitude(server.power, u.W), magnitude(server.idle_power, u.W), magnitude(server.ram, u.GB),
+            magnitude(server.carbon_footprint_fabrication, u.kg)))
+
+    def size_server(self, server, nb_of_instances_options, compute_options=None):
+        """
+        Evaluate all combinations of nb_of_instances_options and compute_options for server.
+
+        Args:
+            server: on-premise server of the System.
+            nb_of_instances_options: candidate numbers of instances.
+            compute_options: candidate compute per instance, in the compute unit of the server, only for GPU servers.
+                Defaults to the current compute of the server.
+        Returns:
+            a ServerSizing.
+        """
+        from efootprint.abstract_modeling_classes.explainable_objects import EmptyExplainableObject
+        from efootprint.constants.units import u
+
+        compute_unit = server.compute.value.units
+        current_compute = magnitude(server.compute, compute_unit)
+        if compute_options is None:
+            compute_options = [current_compute]
+        elif not self.is_gpu_server(server) and list(compute_options) != [current_compute]:
+            raise ValueError(f"Only the compute of GPU servers can be searched, {server.name} is a "
+                             f"{server.class_as_simple_str}")
+        compute_options = np.asarray(compute_options, dtype=float)
+        nb_of_instances_options = np.asarray(nb_of_instances_options, dtype=float)
+
+        compute_need = hourly_magnitudes(server.hour_by_hour_compute_need, compute_unit)
+        ram_need = hourly_magnitudes(server.hour_by_hour_ram_need, u.GB)
+        power, idle_power, ram, carbon_footprint_fabrication = self.hardware_per_instance(server, compute_options)
+        utilization_rate = magnitude(server.server_utilization_rate, u.dimensionless)
+        available_compute = compute_options * utilization_rate - magnitude(
+            server.occupied_compute_per_instance, compute_unit)
+        available_ram = ram * utilization_rate - magnitude(server.occupied_ram_per_instance, u.GB)
+
+        # Raw number of instances for every compute option and hour, infinite when an instance has no room left
+        with np.errstate(divide="ignore", invalid="ignore"):
+            raw_nb_of_instances = np.maximum(
+                np.where(ram_need > 0, ram_need[np.newaxis, :] / available_ram[:, np.newaxis], 0),
+                np.where(compute_need > 0, compute_need[np.newaxis, :] / available_compute[:, np.newaxis], 0))
+        no_room = (available_ram < 0) | (available_compute < 0)
+        raw_nb_of_instances[no_room | ~np.isfinite(raw_nb_of_instances).all(axis=1)] = np.inf
+        raw_nb_of_instances = np.round(raw_nb_of_instances, RAW_NB_OF_INSTANCES_ROUNDING)
+        nb_of_instances_needed = np.ceil(raw_nb_of_instances.max(axis=1, initial=0))
+        raw_instance_hours = raw_nb_of_instances.sum(axis=1)
+
+        nb_of_hours = len(compute_need)
+        power_usage_effectiveness = magnitude(server.power_usage_effectiveness, u.dimensionless)
+        carbon_intensity = magnitude(server.average_carbon_intensity, u.kg / u.kWh)
+        lifespan_in_hours = magnitude(server.lifespan, u.hour)
+        instance_hours = nb_of_instances_options[np.newaxis, :] * nb_of_hours
+        with np.errstate(invalid="ignore"):
+            energy_in_kwh = power_usage_effectiveness * (
+                idle_power[:, np.newaxis] * instance_hours
+                + ((power - idle_power) * raw_instance_hours)[:, np.newaxis]) / 1000
+        fabrication_footprint = carbon_footprint_fabrication[:, np.newaxis] * instance_hours / lifespan_in_hours
+        footprints = energy_in_kwh * carbon_intensity + fabrication_footprint
+
+        current_nb_of_instances = None if isinstance(server.fixed_nb_of_instances, EmptyExplainableObject) \
+            else magnitude(server.fixed_nb_of_instances, u.dimensionless)
+
+        return ServerSizing(
+            server_name=server.name, compute_unit=str(compute_unit), compute_options=compute_options,
+            nb_of_instances_options=nb_of_instances_options, nb_of_instances_needed=nb_of_instances_needed,
+            footprints=footprints, current_compute=current_compute, current_nb_of_instances=current_nb_of_instances,
+            current_footprint=total_footprint_in_kg(
+                [server.instances_fabrication_footprint, server.energy_footprint]))
+
+    def size(self, nb_of_instances_options, gpus_per_server_options=None):
+        """
+        Args:
+            nb_of_instances_options: candidate numbers of instances, for all servers.
+            gpus_per_server_options: candidate numbers of GPUs per instance for the GPU servers, defaults to their
+                current one.
+        Returns:
+            a FleetSizingResult.
+        """
+        start = time.perf_counter()
+        server_sizings = [
+            self.size_server(server, nb_of_instances_options,
+                             gpus_per_server_options if self.is_gpu_server(server) else None)
+            for server in self.servers]
+        system_footprint = sum(footprint["value"] for footprint in footprints_by_object(self.system))
+
+        return FleetSizingResult(
+            server_sizings=server_sizings,
+            other_footprint=system_footprint - sum(server_sizing.current_footprint for server_sizing in server_sizings),
+            duration_in_s=time.perf_counter() - start)
+
+
+def apply_configuration(system, configuration):
+    """
+    Give the compute per instance and fixed number of instances of configuration, a {server name: (compute, nb of
+    instances)} dict, to the servers of a built System in one ModelingUpdate.
+    """
+    from efootprint.abstract_modeling_classes.modeling_update import ModelingUpdate
+    from efootprint.abstract_modeling_classes.source_objects import SourceValue
+    from efootprint.constants.sources import Sources
+    from efootprint.constants.units import u
+    from modeling_tools.lookup_cache import import_boavizta_modules
+
+    import_boavizta_modules()
+    servers = {server.name: server for server in system.servers}
+    changes_list = []
+    for server_name, (compute, nb_of_instances) in configuration.items():
+        server = servers[server_name]
+        if compute != magnitude(server.compute, server.compute.value.units):
+            changes_list.append([server.compute, SourceValue(compute * server.compute.value.units, Sources.USER_DATA)])
+        changes_list.append(
+            [server.fixed_nb_of_instances, SourceValue(nb_of_instances * u.dimensionless, Sources.USER_DATA)])
+    ModelingUpdate(changes_list)
+
+
+def print_result(result: FleetSizingResult, top=5):
+    print(f"{result.nb_of_candidates} candidate sizings evaluated in {result.duration_in_s * 1000:.0f} ms "
+          f"({result.nb_of_candidates / result.duration_in_s:.0f} candidates / s)")
+    for server_sizing in result.server_sizings:
+        print(f"\n{server_sizing.server_name}: currently {server_sizing.current_nb_of_instances} instances of "
+              f"{server_sizing.current_compute:g} {server_sizing.compute_unit}, "
+              f"{server_sizing.current_footprint:.1f} kg")
+        print(f"    {server_sizing.compute_unit:>10} {'instances':>10} {'footprint (kg)':>16}")
+        for compute, nb_of_instances, footprint in server_sizing.ranked()[:top]:
+            print(f"    {compute:>10g} {nb_of_instances:>10g} {footprint:>16.1f}")
+    print(f"\nTotal footprint: {result.current_total_footprint():.1f} kg currently, {result.total_footprint():.1f} kg "
+          f"with the best sizing")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("modeling", nargs="?", default="ai_use_case")
+    parser.add_argument("--server", action="append", default=None,
+                        help="Name of an on-premise server to size, defaults to all of them.")
+    parser.add_argument("--max-instances", type=int, default=64,
+                        help="Largest candidate number of instances, candidates go from 1 to it.")
+    parser.add_argument("--gpus-per-server", type=float, nargs="+", default=list(range(1, 17)),
+                        help="Candidate numbers of GPUs per instance of GPU servers.")
+    parser.add_argument("--top", type=int, default=5, help="Number of best candidates printed per server.")
+    parser.add_argument("--check", action="store_true",
+                        help="Apply the best sizing to the System and compare its total footprint with the predicted "
+                             "one.")
+    args = parser.parse_args()
+
+    from modeling_tools.modelings import get_modeling
+    from modeling_tools.run_modeling import build_for_analysis
+
+    modeling = get_modeling(args.modeling)
+    modeling_system = build_for_analysis(modeling)
+    fleet_sizer = FleetSizer(modeling_system, args.server)
+    sizing_result = fleet_sizer.size(np.arange(1, args.max_instances + 1), args.gpus_per_server)
+    print_result(sizing_result, args.top)
+
+    if args.check:
+        best_configuration = sizing_result.best_configuration()
+        predicted_footprint = sizing_result.total_footprint(best_configuration)
+        apply_configuration(modeling_system, best_configuration)
+        applied_footprint = sum(footprint["value"] for footprint in footprints_by_object(modeling_system))
+        print(f"Best sizing applied to {modeling_system.name}: {applied_footprint:.1f} kg, predicted "
+              f"{predicted_footprint:.1f} kg")
+        # e-footprint rounds hourly energies to 6 decimals, which the prediction doesn’t
+        if not np.isclose(applied_footprint, predicted_footprint, rtol=1e-5, atol=0):
+            sys.exit(1)
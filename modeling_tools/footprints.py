@@ -0,0 +1,135 @@
+from importlib.metadata import version
+
+import numpy as np
+
+
+def efootprint_version():
+    return version("efootprint")
+
+
+def unique_object_names(objs):
+    """
+    Return the names of objs, made unique by adding the names of their containers to the duplicated ones, for example
+    for the default storages of two servers, and by numbering the ones that share their containers too, like two usage
+    patterns of a System.
+    """
+    names = [obj.name for obj in objs]
+    container_qualified_names = []
+    for obj, name in zip(objs, names):
+        if names.count(name) > 1:
+            container_names = sorted(container.name for container in obj.modeling_obj_containers)
+            name = f"{name} ({', '.join(container_names)})"
+        container_qualified_names.append(name)
+
+    unique_names = []
+    for index, name in enumerate(container_qualified_names):
+        if container_qualified_names.count(name) > 1:
+            name = f"{name} {container_qualified_names[:index].count(name) + 1}"
+        unique_names.append(name)
+
+    return unique_names
+
+
+def footprint_attributes_by_object(system):
+    """
+    Return the object and attribute holding every footprint of an e-footprint 9 System.
+
+    Returns:
+        dict {(category, object name, footprint type): (object, attribute name)}.
+    """
+    footprint_attributes_by_category = {
+        "Servers": (system.servers, "instances_fabrication_footprint", "energy_footprint"),
+        "Storage": (system.storages, "instances_fabrication_footprint", "energy_footprint"),
+        "Network": (system.networks, None, "energy_footprint"),
+        "Devices": (system.usage_patterns, "devices_fabrication_footprint", "devices_energy_footprint"),
+    }
+    footprint_attributes = {}
+    for category, (objs, fabrication_attribute, energy_attribute) in footprint_attributes_by_category.items():
+        objs = sorted(objs, key=lambda obj: obj.name)
+        for obj, obj_name in zip(objs, unique_object_names(objs)):
+            if fabrication_attribute is not None:
+                footprint_attributes[(category, obj_name, "Fabrication")] = (obj, fabrication_attribute)
+            footprint_attributes[(category, obj_name, "Electricity")] = (obj, energy_attribute)
+
+    return footprint_attributes
+
+
+def hourly_footprints_by_object(system):
+    """
+    Return the hourly footprints of every object of an e-footprint 9 System.
+
+    The footprint dicts of the System are keyed by object name, so objects sharing a name, like default storages,
+    override each other in them. Footprints are read from the objects themselves instead.
+
+    Returns:
+        dict {(category, object name, footprint type): ExplainableHourlyQuantities}.
+    """
+    return {key: getattr(obj, attribute) for key, (obj, attribute) in footprint_attributes_by_object(system).items()}
+
+
+def hourly_magnitudes(hourly_quantities, unit):
+    """
+    Return the values of e-footprint 9 ExplainableHourlyQuantities in unit as a NumPy array, without converting them in
+    place as their to method does.
+    """
+    from efootprint.abstract_modeling_classes.explainable_objects import EmptyExplainableObject
+
+    if isinstance(hourly_quantities, EmptyExplainableObject):
+        return np.zeros(0)
+
+    return hourly_quantities.value["value"].pint.to(unit).pint.magnitude.to_numpy(dtype=float)
+
+
+def footprint_in_kg(footprint):
+    """
+    Return an hourly footprint of an e-footprint 9 System summed over the modeling period, in kg.
+    """
+    from efootprint.abstract_modeling_classes.explainable_objects import EmptyExplainableObject
+    from efootprint.constants.units import u
+
+    if isinstance(footprint, EmptyExplainableObject):
+        return 0
+
+    return float(footprint.sum().value.to(u.kg).magnitude)
+
+
+def footprint_unit(system):
+    """
+    Return the unit of the footprints of footprints_by_object: kg for e-footprint 9 Systems, kg / year before.
+    """
+    from efootprint.constants.units import u
+
+    if hasattr(system, "fabrication_footprint_sum_over_period"):
+        return str(u.kg)
+
+    return str(u.kg / u.year)
+
+
+def footprints_by_object(system):
+    """
+    Return the footprint of every object of a System, whatever the e-footprint version that built it.
+
+    e-footprint 9 computes hourly footprints, summed here over the modeling period in kg. Older versions compute yearly
+    footprints, returned in kg / year.
+
+    Returns:
+        list of dicts with "category", "object", "type", "value" and "unit" keys.
+    """
+    output = []
+    unit = footprint_unit(system)
+    if hasattr(system, "fabrication_footprint_sum_over_period"):
+        for (category, obj_name, footprint_type), footprint in hourly_footprints_by_object(system).items():
+            output.append({"category": category, "object": obj_name, "type": footprint_type,
+                           "value": footprint_in_kg(footprint), "unit": unit})
+
+        return output
+
+    footprints_by_type = {"Fabrication": system.fabrication_footprints, "Electricity": system.energy_footprints}
+    for footprint_type, footprints in footprints_by_type.items():
+        for category, category_footprints in footprints.items():
+            for obj_name, footprint in category_footprints.items():
+                output.append({
+                    "category": category, "object": obj_name, "type": footprint_type,
+                    "value": float(footprint.value.to(unit).magnitude), "unit": unit})
+
+    return output
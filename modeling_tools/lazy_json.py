@@ -0,0 +1,336 @@
+"""
+Lazy loader of the JSON files written by system_to_json, reading only the modeling objects and attributes asked for.
+
+Saved with their calculated attributes, the JSON files of large systems weigh hundreds of MB, and json.load parses all
+of them to read one series. LazySystemJson scans the memory-mapped file once, skipping over the content of attribute
+values at C speed, and writes a sidecar offset index next to it, holding the byte span of every modeling object, of
+every attribute and of the keys of attribute values, like the label and values of an explainable object or the usage
+pattern ids of a dict of explainable objects. Reopening the file reads the sidecar index, as long as the size and
+modification time of the file are unchanged, and a query parses the bytes of the requested span only, so it takes the
+same time whatever the size of the file.
+
+Usage:
+    system_json = LazySystemJson("system_with_calculated_attributes.json")
+    energy_footprint = system_json.series("GPU server", "energy_footprint")
+    explainable_energy_footprint = system_json.explainable_object("GPU server", "energy_footprint")
+
+    python -m modeling_tools.lazy_json save ai_use_case ai_use_case_with_calculated_attributes.json
+    python -m modeling_tools.lazy_json show ai_use_case_with_calculated_attributes.json "GPU server" energy_footprint
+"""
+import argparse
+import json
+import mmap
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+INDEX_SUFFIX = ".index.json"
+INDEX_FORMAT_VERSION = 1
+STRING_PATTERN = rb'"[^"\\]*(?:\\.[^"\\]*)*"'
+# Tokens of the indexed levels, and of the skipped content of deeper containers, where commas don’t matter
+SHALLOW_TOKENS = re.compile(STRING_PATTERN + rb"|[{}\[\],]")
+DEEP_TOKENS = re.compile(STRING_PATTERN + rb"|[{}\[\]]")
+KEY_SEPARATOR = re.compile(rb"\s*:")
+# Containers nested deeper are skipped: root, classes, modeling objects, attribute values
+MAX_INDEXED_DEPTH = 4
+
+
+def sidecar_index_path(json_path):
+    return json_path + INDEX_SUFFIX
+
+
+def file_signature(json_path):
+    stat = os.stat(json_path)
+
+    return {"file_size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def skip_flat_array(buffer, position):
+    """
+    Return the position after the end of the array whose opening bracket ends at position if it only holds numbers,
+    like hourly values, and None otherwise. Searching bytes is much faster than matching tokens with a regex.
+    """
+    end = buffer.find(b"]", position)
+    if end == -1 or any(buffer.find(character, position, end) != -1 for character in (b"[", b"{", b'"')):
+        return None
+
+    return end + 1
+
+
+def skip_container(buffer, position):
+    """
+    Return the position after the end of the container whose opening bracket ends at position.
+    """
+    depth = 1
+    while depth > 0:
+        match = DEEP_TOKENS.search(buffer, position)
+        if match is None:
+            raise ValueError(f"Unterminated JSON container before byte {position}")
+        token = match.group()
+        flat_array_end = skip_flat_array(buffer, match.end()) if token == b"[" else None
+        if flat_array_end is not None:
+            position = flat_array_end
+            continue
+        if token in (b"{", b"["):
+            depth += 1
+        elif token in (b"}", b"]"):
+            depth -= 1
+        position = match.end()
+
+    return position
+
+
+def scan_spans(buffer):
+    """
+    Yield (key path, start, end) for the values of the first MAX_INDEXED_DEPTH levels of the JSON object in buffer,
+    end excluding the comma or bracket closing the value. Key paths are tuples of decoded keys.
+    """
+    # One [key, value start] per open object, the key being None outside of a value
+    stack = []
+    position = 0
+    while True:
+        match = SHALLOW_TOKENS.search(buffer, position)
+        if match is None:
+            break
+        token = match.group()
+        position = match.end()
+        if token[:1] == b'"':
+            separator = KEY_SEPARATOR.match(buffer, position)
+            if separator is not None and stack and stack[-1][0] is None:
+                stack[-1][0] = json.loads(token)
+                stack[-1][1] = separator.end()
+                position = separator.end()
+        elif token in (b"{", b"["):
+            if len(stack) >= MAX_INDEXED_DEPTH:
+                position = (token == b"[" and skip_flat_array(buffer, position)) or skip_container(buffer, position)
+            else:
+                # Arrays of the indexed levels are never keyed, so their key stays set to skip their strings
+                stack.append([None if token == b"{" else b"[", None])
+        else:
+            if stack and stack[-1][0] not in (None, b"["):
+                key_path = tuple(entry[0] for entry in stack)
+                yield key_path, stack[-1][1], match.start()
+                stack[-1][0] = None
+            if token in (b"}", b"]"):
+                stack.pop()
+                if not stack:
+                    break
+
+
+def build_index(json_path):
+    """
+    Scan json_path and return its offset index: {"efootprint_version", "objects": {id: {"class", "name", "span",
+    "attributes": {attribute name: {"span", "keys": {key: span}}}}}}, spans being [start, end] byte offsets.
+    """
+    objects = {}
+    efootprint_version = None
+    with open(json_path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        for key_path, start, end in scan_spans(buffer):
+            if len(key_path) == 1:
+                if key_path[0] == "efootprint_version":
+                    efootprint_version = json.loads(buffer[start:end])
+            elif len(key_path) == 2:
+                objects.setdefault(key_path[1], {"class": key_path[0], "name": None, "attributes": {}})["span"] = [
+                    start, end]
+            else:
+                mod_obj = objects.setdefault(key_path[1], {"class": key_path[0], "name": None, "attributes": {}})
+                attribute = mod_obj["attributes"].setdefault(key_path[2], {"keys": {}})
+                if len(key_path) == 3:
+                    attribute["span"] = [start, end]
+                    if key_path[2] == "name":
+                        mod_obj["name"] = json.loads(buffer[start:end])
+                else:
+                    attribute["keys"][key_path[3]] = [start, end]
+
+    return {"format_version": INDEX_FORMAT_VERSION, "efootprint_version": efootprint_version, "objects": objects}
+
+
+def load_or_build_index(json_path, write_sidecar=True):
+    """
+    Return the offset index of json_path, read from its sidecar file when it matches the size and modification time of
+    json_path, and built and written to the sidecar file otherwise.
+    """
+    signature = file_signature(json_path)
+    index_path = sidecar_index_path(json_path)
+    if os.path.exists(index_path):
+        with open(index_path) as file:
+            index = json.load(file)
+        if index.get("format_version") == INDEX_FORMAT_VERSION and index.get("signature") == signature:
+            return index
+    index = build_index(json_path)
+    index["signature"] = signature
+    if write_sidecar:
+        try:
+            with open(index_path, "w") as file:
+                file.write(json.dumps(index))
+        except OSError:
+            # Read-only directories still get the in-memory index
+            pass
+
+    return index
+
+
+def json_to_explainable(attribute_json):
+    """
+    Return the e-footprint explainable object of an attribute value, with the function of the installed e-footprint.
+    """
+    from modeling_tools.lookup_cache import import_boavizta_modules
+
+    # json_to_system imports the e-footprint modules calling the Boavizta API
+    import_boavizta_modules()
+    from efootprint.api_utils import json_to_system
+
+    converter = getattr(json_to_system, "json_to_explainable_object", None) or getattr(
+        json_to_system, "json_to_explainable_quantity")
+
+    return converter(attribute_json)
+
+
+class LazySystemJson:
+    """
+    Read access to a system_to_json file, parsing only the requested modeling objects and attributes.
+
+    Args:
+        json_path: path of the JSON file.
+        write_sidecar: whether to write the offset index next to the file when it has to be built.
+
+    Attributes:
+        index: offset index of the file, see build_index.
+    """
+    def __init__(self, json_path, write_sidecar=True):
+        self.json_path = json_path
+        self.index = load_or_build_index(json_path, write_sidecar)
+        self.file = open(json_path, "rb")
+
+    @property
+    def efootprint_version(self):
+        return self.index["efootprint_version"]
+
+    def objects(self):
+        """
+        Returns:
+            list of (id, class, name) of the modeling objects of the file.
+        """
+        return [(mod_obj_id, entry["class"], entry["name"]) for mod_obj_id, entry in self.index["objects"].items()]
+
+    def object_id(self, mod_obj_name_or_id):
+        objects = self.index["objects"]
+        if mod_obj_name_or_id in objects:
+            return mod_obj_name_or_id
+        mod_obj_ids = [mod_obj_id for mod_obj_id, entry in objects.items() if entry["name"] == mod_obj_name_or_id]
+        if len(mod_obj_ids) == 0:
+            raise ValueError(f"No modeling object named {mod_obj_name_or_id} in {self.json_path}")
+        if len(mod_obj_ids) > 1:
+            raise ValueError(f"Several modeling objects are named {mod_obj_name_or_id} in {self.json_path}, use one "
+                             f"of their ids instead: {mod_obj_ids}")
+
+        return mod_obj_ids[0]
+
+    def attributes(self, mod_obj_name_or_id):
+        return list(self.index["objects"][self.object_id(mod_obj_name_or_id)]["attributes"].keys())
+
+    def read_span(self, span):
+        self.file.seek(span[0])
+
+        return json.loads(self.file.read(span[1] - span[0]))
+
+    def object_json(self, mod_obj_name_or_id):
+        """
+        Return the JSON dict of a modeling object, with all its attributes.
+        """
+        return self.read_span(self.index["objects"][self.object_id(mod_obj_name_or_id)]["span"])
+
+    def attribute_json(self, mod_obj_name_or_id, attr_name, key=None):
+        """
+        Return the JSON value of an attribute of a modeling object. key is a key of the attribute value, like the id of
+        a usage pattern for dicts of explainable objects, or "values" for the hourly values of an explainable object.
+        """
+        mod_obj_id = self.object_id(mod_obj_name_or_id)
+        mod_obj = self.index["objects"][mod_obj_id]
+        if attr_name not in mod_obj["attributes"]:
+            raise ValueError(f"{mod_obj['name']} has no attribute {attr_name} in {self.json_path}, available ones are "
+                             f"{list(mod_obj['attributes'].keys())}")
+        attribute = mod_obj["attributes"][attr_name]
+        if key is None:
+            return self.read_span(attribute["span"])
+        if key not in attribute["keys"]:
+            raise ValueError(f"{attr_name} of {mod_obj['name']} has no key {key}, available ones are "
+                             f"{list(attribute['keys'].keys())}")
+
+        return self.read_span(attribute["keys"][key])
+
+    def explainable_object(self, mod_obj_name_or_id, attr_name, key=None):
+        """
+        Return an attribute of a modeling object as an e-footprint explainable object, without parents.
+        """
+        return json_to_explainable(self.attribute_json(mod_obj_name_or_id, attr_name, key))
+
+    def series(self, mod_obj_name_or_id, attr_name, key=None):
+        """
+        Return the hourly values of an attribute as a pandas Series indexed by hour when it has a start date, and by
+        hour of the day otherwise.
+        """
+        attribute_json = self.attribute_json(mod_obj_name_or_id, attr_name, key)
+        if not isinstance(attribute_json, dict) or "values" not in attribute_json:
+            raise ValueError(f"{attr_name} of {mod_obj_name_or_id} has no hourly values in {self.json_path}")
+        values = np.array(attribute_json["values"], dtype=np.float64)
+        if attribute_json.get("start_date") is None:
+            index = pd.RangeIndex(len(values), name="hour of the day")
+        else:
+            index = pd.period_range(start=attribute_json["start_date"], periods=len(values), freq="h")
+
+        return pd.Series(values, index=index, name=f"{attribute_json['label']} ({attribute_json['unit']})")
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    save_parser = subparsers.add_parser("save", help="Build a modeling and save it with its calculated attributes.")
+    save_parser.add_argument("modeling")
+    save_parser.add_argument("output")
+    index_parser = subparsers.add_parser("index", help="Build the sidecar offset index of a file.")
+    index_parser.add_argument("json_path")
+    show_parser = subparsers.add_parser("show", help="Print an attribute of a modeling object of a file.")
+    show_parser.add_argument("json_path")
+    show_parser.add_argument("modeling_object", help="Name or id of the modeling object.")
+    show_parser.add_argument("attribute")
+    show_parser.add_argument("--key", default=None, help="Key of the attribute value, like a usage pattern id.")
+    args = parser.parse_args()
+
+    if args.command == "save":
+        from modeling_tools.lookup_cache import cached_boaviztapi_calls, import_boavizta_modules
+        from modeling_tools.modelings import get_modeling
+        from modeling_tools.run_modeling import build_modeling_system
+
+        modeling = get_modeling(args.modeling)
+        import_boavizta_modules()
+        with cached_boaviztapi_calls():
+            modeling_system = build_modeling_system(modeling, modeling.path, None)
+        from efootprint.api_utils.system_to_json import system_to_json
+
+        system_to_json(modeling_system, True, args.output)
+        print(f"Saved {modeling.directory} to {args.output} ({os.path.getsize(args.output) / 1024 ** 2:.1f} MB)")
+    elif args.command == "index":
+        if os.path.exists(sidecar_index_path(args.json_path)):
+            os.remove(sidecar_index_path(args.json_path))
+        with LazySystemJson(args.json_path) as lazy_system_json:
+            print(f"Indexed {len(lazy_system_json.objects())} modeling objects of {args.json_path} to "
+                  f"{sidecar_index_path(args.json_path)}")
+    elif args.command == "show":
+        with LazySystemJson(args.json_path) as lazy_system_json:
+            shown_json = lazy_system_json.attribute_json(args.modeling_object, args.attribute, args.key)
+            if isinstance(shown_json, dict) and "values" in shown_json:
+                print(lazy_system_json.series(args.modeling_object, args.attribute, args.key).describe())
+            else:
+                print(json.dumps(shown_json, indent=4))
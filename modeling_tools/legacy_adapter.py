@@ -0,0 +1,786 @@
+"""
+Build the e-footprint 1.x and 2.x modelings of this repository with e-footprint 9, and check their footprints against
+the ones of their legacy e-footprint version.
+
+Paylib is written for e-footprint 1.3.2 and Bloom for e-footprint 2.1.6, whose classes don’t exist anymore in
+e-footprint 9, so each modeling needed its own Python environment. Inside legacy_api(api_version, directory), the
+e-footprint modules the Python files of the modeling directory import, like efootprint.core.service or
+efootprint.core.usage.job, are served as modules of definition classes with the legacy signatures, and the legacy units
+uj, user and core are added to the e-footprint 9 unit registry. Only the imports made by the files of the directory are
+redirected: sys.modules keeps the e-footprint 9 modules, so that e-footprint 9 code importing its classes inside its
+functions, while the System is computed, still gets them. The scripts run unchanged: their objects only record their
+arguments, and System translates them into e-footprint 9 objects:
+    - services disappear: their base RAM and CPU consumptions are summed on their server, which gets their storage,
+    - a storage shared by several servers is split into one storage per server, as e-footprint 9 storages belong to
+      one server and take their PUE and carbon intensity from it,
+    - each 1.x user journey step becomes a step with one job, and per user journey quantities are multiplied by one
+      user journey,
+    - the yearly user journey frequency of a usage pattern is spread evenly over the active hours of its time intervals
+      during one year starting on LEGACY_START_DATE, so that yearly volumes are unchanged.
+Calculated attributes of the legacy objects, like the energy_footprint of a server, are read on their e-footprint 9
+translation once the System is built.
+
+e-footprint 9 computes footprints hour by hour where legacy versions compute yearly averages, and some of its models
+changed, like the energy of servers and the accumulation of stored data, so the parity check compares the footprint
+of each legacy object with its e-footprint 9 translation over one year within a relative tolerance, and lists the
+ones that differ, with the LEGACY_MODEL_CHANGES explanation of those whose model changed. Legacy footprints are read
+from the legacy_footprints.json file of each modeling directory, written by run_modeling with the legacy e-footprint
+version.
+
+Usage:
+    python -m modeling_tools.legacy_adapter ai_use_case bloom paylib
+    python -m modeling_tools.legacy_adapter paylib --rtol 0.1
+    /path/to/efootprint-2.1.6/bin/python -m modeling_tools.run_modeling bloom --modeling-dir llm_modelings
+        --output llm_modelings/legacy_footprints.json
+"""
+import argparse
+import builtins
+import json
+import operator
+import os
+import sys
+import types
+from contextlib import contextmanager
+from datetime import datetime
+from functools import reduce
+
+import numpy as np
+
+from modeling_tools.templates import fresh_explainable_object
+
+LEGACY_API_VERSIONS = (1, 2)
+LEGACY_UNIT_DEFINITIONS = {"user_journey": "user_journey = [user_journey] = uj", "user": "user = [user]",
+                           "core": "core = cpu_core"}
+LEGACY_START_DATE = datetime.strptime("2025-01-01", "%Y-%m-%d")
+LEGACY_TIMESPAN_IN_YEARS = 1
+LEGACY_FOOTPRINTS_FILENAME = "legacy_footprints.json"
+DEFAULT_RTOL = 0.05
+DEFAULT_ATOL_IN_KG = 1
+# Footprints whose e-footprint 9 model differs from the legacy one, by (category, type), with the change
+LEGACY_MODEL_CHANGES = {
+    ("Servers", "Fabrication"): "hourly rounded up numbers of instances",
+    ("Servers", "Electricity"): "idle power of instances plus extra power of their raw number",
+    ("Storage", "Fabrication"): "hourly accumulation of stored data",
+    ("Devices", "Fabrication"): "hourly footprints rounded to 10 g",
+}
+
+# Names of the legacy objects holding the footprints of e-footprint 9 objects, by System id and object id
+LEGACY_OBJECT_NAMES = {}
+
+
+class LegacyDefinition:
+    """
+    Object of a legacy modeling, recording its arguments until System translates it into an e-footprint 9 object.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.efootprint_object = None
+
+    def __getattr__(self, attr_name):
+        # Calculated attributes, like energy_footprint, are read on the e-footprint 9 translation
+        efootprint_object = self.__dict__.get("efootprint_object")
+        if efootprint_object is None:
+            raise AttributeError(
+                f"{type(self).__name__} {self.__dict__.get('name')} has no attribute {attr_name}, calculated "
+                f"attributes are only available once it belongs to a System")
+
+        return getattr(efootprint_object, attr_name)
+
+
+class LegacyService(LegacyDefinition):
+    def __init__(self, name, server, storage, base_ram_consumption, base_cpu_consumption=None):
+        from efootprint.abstract_modeling_classes.source_objects import SourceValue
+        from efootprint.constants.units import u
+
+        super().__init__(name)
+        self.server = server
+        self.storage = storage
+        self.base_ram_consumption = base_ram_consumption
+        self.base_cpu_consumption = base_cpu_consumption or SourceValue(1 * u.core)
+
+
+class LegacyJob(LegacyDefinition):
+    def __init__(self, name, service, data_upload, data_download, request_duration, cpu_needed, ram_needed,
+                 job_type=None, description=""):
+        super().__init__(name)
+        self.service = service
+        self.data_upload = data_upload
+        self.data_download = data_download
+        self.request_duration = request_duration
+        self.cpu_needed = cpu_needed
+        self.ram_needed = ram_needed
+        self.job_type = job_type
+        self.description = description
+
+
+class LegacyUserJourneyStep(LegacyDefinition):
+    """
+    e-footprint 2.x user journey step, whose jobs hold the requests to services.
+    """
+    def __init__(self, name, user_time_spent, jobs):
+        super().__init__(name)
+        self.user_time_spent = user_time_spent
+        self.jobs = jobs
+
+
+class LegacyRequestUserJourneyStep(LegacyUserJourneyStep):
+    """
+    e-footprint 1.x user journey step, holding its request to a service itself. It is translated into a step with one
+    job named after it, or without job when it has no service.
+    """
+    def __init__(self, name, service, data_upload, data_download, user_time_spent, request_duration=None,
+                 cpu_needed=None, ram_needed=None):
+        from efootprint.abstract_modeling_classes.source_objects import SourceValue
+        from efootprint.constants.units import u
+
+        jobs = []
+        if service is not None:
+            jobs = [LegacyJob(
+                name, service, data_upload, data_download, request_duration or SourceValue(1 * u.s),
+                cpu_needed or SourceValue(1 * u.core / u.uj), ram_needed or SourceValue(100 * u.MB / u.uj))]
+        super().__init__(name, user_time_spent, jobs)
+        self.service = service
+
+
+class LegacyUserJourney(LegacyDefinition):
+    def __init__(self, name, uj_steps):
+        super().__init__(name)
+        self.uj_steps = uj_steps
+
+
+class LegacyDevicePopulation(LegacyDefinition):
+    def __init__(self, name, nb_devices, country, devices):
+        super().__init__(name)
+        self.nb_devices = nb_devices
+        self.country = country
+        self.devices = devices
+
+
+class LegacyUsagePattern(LegacyDefinition):
+    def __init__(self, name, user_journey, device_population, network, user_journey_freq_per_user, time_intervals):
+        super().__init__(name)
+        self.user_journey = user_journey
+        self.device_population = device_population
+        self.network = network
+        self.user_journey_freq_per_user = user_journey_freq_per_user
+        self.time_intervals = time_intervals
+
+
+class LegacyServer(LegacyDefinition):
+    """
+    Attributes:
+        server_type: name of the ServerTypes method giving the e-footprint 9 server type.
+    """
+    server_type = None
+
+    def __init__(self, name, carbon_footprint_fabrication, power, lifespan, idle_power, ram, cpu_cores,
+                 power_usage_effectiveness, average_carbon_intensity, server_utilization_rate,
+                 fixed_nb_of_instances=None):
+        super().__init__(name)
+        self.carbon_footprint_fabrication = carbon_footprint_fabrication
+        self.power = power
+        self.lifespan = lifespan
+        self.idle_power = idle_power
+        self.ram = ram
+        self.cpu_cores = cpu_cores
+        self.power_usage_effectiveness = power_usage_effectiveness
+        self.average_carbon_intensity = average_carbon_intensity
+        self.server_utilization_rate = server_utilization_rate
+        self.fixed_nb_of_instances = fixed_nb_of_instances
+
+
+class LegacyAutoscaling(LegacyServer):
+    server_type = "autoscaling"
+
+
+class LegacyOnPremise(LegacyServer):
+    server_type = "on_premise"
+
+
+class LegacyServerless(LegacyServer):
+    server_type = "serverless"
+
+
+class LegacyStorage(LegacyDefinition):
+    def __init__(self, name, carbon_footprint_fabrication, power, lifespan, idle_power, storage_capacity,
+                 power_usage_effectiveness, average_carbon_intensity, data_replication_factor,
+                 storage_need_from_previous_year=None):
+        super().__init__(name)
+        self.carbon_footprint_fabrication = carbon_footprint_fabrication
+        self.power = power
+        self.lifespan = lifespan
+        self.idle_power = idle_power
+        self.storage_capacity = storage_capacity
+        self.power_usage_effectiveness = power_usage_effectiveness
+        self.average_carbon_intensity = average_carbon_intensity
+        self.data_replication_factor = data_replication_factor
+        self.storage_need_from_previous_year = storage_need_from_previous_year
+
+
+def unique_by_id(objs):
+    unique_objs = []
+    for obj in objs:
+        if not any(obj is unique_obj for unique_obj in unique_objs):
+            unique_objs.append(obj)
+
+    return unique_objs
+
+
+def legacy_sum(explainable_quantities, label):
+    """
+    Sum explainable_quantities into an explainable quantity labelled label, as e-footprint 9 requires a label on every
+    attribute of a modeling object.
+    """
+    if len(explainable_quantities) == 1:
+        return fresh_explainable_object(explainable_quantities[0]).set_label(label)
+
+    return reduce(operator.add, explainable_quantities).set_label(label)
+
+
+def legacy_hourly_usage_journey_starts(usage_pattern):
+    """
+    Spread the yearly user journey frequency of a legacy usage pattern evenly over the active hours of its time
+    intervals, in local time, during LEGACY_TIMESPAN_IN_YEARS years starting on LEGACY_START_DATE.
+    """
+    from efootprint.abstract_modeling_classes.explainable_objects import ExplainableHourlyQuantities
+    from efootprint.builders.time_builders import create_hourly_usage_df_from_list
+    from efootprint.constants.units import u
+
+    yearly_nb_of_usage_journeys = usage_pattern.device_population.nb_devices * usage_pattern.user_journey_freq_per_user
+    timespan = LEGACY_TIMESPAN_IN_YEARS * u.year
+    nb_of_usage_journeys = (yearly_nb_of_usage_journeys.value * timespan).to(u.uj).magnitude
+
+    is_active_hour_of_day = np.zeros(24, dtype=bool)
+    # Legacy time intervals exclude their end hour
+    for start_hour, end_hour in usage_pattern.time_intervals.value:
+        is_active_hour_of_day[start_hour:end_hour] = True
+    nb_of_hours = int(timespan.to(u.hour).magnitude)
+    is_active_hour = is_active_hour_of_day[(LEGACY_START_DATE.hour + np.arange(nb_of_hours)) % 24]
+    hourly_starts = np.where(is_active_hour, nb_of_usage_journeys / is_active_hour.sum(), 0)
+
+    return ExplainableHourlyQuantities(
+        create_hourly_usage_df_from_list(hourly_starts, LEGACY_START_DATE), left_parent=yearly_nb_of_usage_journeys,
+        right_parent=usage_pattern.time_intervals, operator="spread evenly over one year of active hours of",
+        label=f"Hourly usage journey starts of {usage_pattern.name}")
+
+
+class LegacyTranslator:
+    """
+    Translate the definitions of a legacy System into e-footprint 9 objects, each definition once.
+
+    e-footprint 9 classes are imported from efootprint.core.all_classes_in_order, which legacy_api doesn’t replace.
+
+    Attributes:
+        legacy_names: {e-footprint 9 object id: name of the legacy object holding its footprint}, for usage patterns,
+            whose devices footprints were held by device populations, and for storages split between servers.
+    """
+    def __init__(self):
+        from efootprint.abstract_modeling_classes.source_objects import SourceValue
+        from efootprint.constants.units import u
+
+        self.translations = {}
+        self.legacy_names = {}
+        self.one_user_journey = SourceValue(1 * u.uj, label="One user journey")
+
+    def translation(self, definition, translate):
+        if id(definition) not in self.translations:
+            self.translations[id(definition)] = translate(definition)
+            definition.efootprint_object = self.translations[id(definition)]
+
+        return self.translations[id(definition)]
+
+    def per_user_journey(self, explainable_quantity, label=None):
+        return (explainable_quantity * self.one_user_journey).set_label(
+            f"{label or explainable_quantity.label} per user journey")
+
+    def system(self, name, usage_patterns):
+        from efootprint.core.all_classes_in_order import System
+
+        services = unique_by_id([
+            job.service for usage_pattern in usage_patterns for step in usage_pattern.user_journey.uj_steps
+            for job in step.jobs])
+        servers = unique_by_id([service.server for service in services])
+        services_by_server = {id(server): [service for service in services if service.server is server]
+                              for server in servers}
+        storage_by_server = {}
+        for server in servers:
+            storages = unique_by_id([service.storage for service in services_by_server[id(server)]])
+            if len(storages) > 1:
+                raise ValueError(
+                    f"The services of {server.name} use several storages, {[storage.name for storage in storages]}, "
+                    f"but an e-footprint 9 server has only one storage")
+            storage_by_server[id(server)] = storages[0]
+
+        storages = unique_by_id(list(storage_by_server.values()))
+        translated_storages = {}
+        for storage in storages:
+            storage_servers = [server for server in servers if storage_by_server[id(server)] is storage]
+            for index, server in enumerate(storage_servers):
+                translated_storage = self.storage(storage, server if len(storage_servers) > 1 else None, index == 0)
+                translated_storages[id(server)] = translated_storage
+                self.legacy_names[translated_storage.id] = storage.name
+            if len(storage_servers) == 1:
+                storage.efootprint_object = translated_storages[id(storage_servers[0])]
+
+        for server in servers:
+            self.translation(
+                server, lambda definition: self.server(
+                    definition, services_by_server[id(definition)], translated_storages[id(definition)]))
+
+        system = System(name, [self.translation(usage_pattern, self.usage_pattern) for usage_pattern in usage_patterns])
+        LEGACY_OBJECT_NAMES[system.id] = self.legacy_names
+
+        return system
+
+    def storage(self, storage, server=None, holds_storage_need_from_previous_year=True):
+        """
+        Translate a legacy storage for one of its servers, named after it when the storage is split between servers.
+        The storage need from the previous year is only given to the first part of a split storage.
+        """
+        from efootprint.abstract_modeling_classes.source_objects import SourceValue
+        from efootprint.constants.units import u
+        from efootprint.core.all_classes_in_order import Storage
+
+        base_storage_need = SourceValue(0 * u.TB)
+        if storage.storage_need_from_previous_year is not None and holds_storage_need_from_previous_year:
+            base_storage_need = fresh_explainable_object(storage.storage_need_from_previous_year)
+
+        return Storage(
+            storage.name if server is None else f"{storage.name} of {server.name}",
+            carbon_footprint_fabrication_per_storage_capacity=(
+                storage.carbon_footprint_fabrication / storage.storage_capacity).set_label(
+                f"Carbon footprint fabrication per storage capacity of {storage.name}"),
+            power_per_storage_capacity=(storage.power / storage.storage_capacity).set_label(
+                f"Power per storage capacity of {storage.name}"),
+            lifespan=fresh_explainable_object(storage.lifespan),
+            idle_power=fresh_explainable_object(storage.idle_power),
+            storage_capacity=fresh_explainable_object(storage.storage_capacity),
+            data_replication_factor=fresh_explainable_object(storage.data_replication_factor),
+            data_storage_duration=SourceValue(
+                LEGACY_TIMESPAN_IN_YEARS * u.year, label="Legacy data kept over the whole modeling"),
+            base_storage_need=base_storage_need)
+
+    def server(self, server, services, storage):
+        from efootprint.constants.units import u
+        from efootprint.core.all_classes_in_order import Server
+        from efootprint.core.hardware.server_base import ServerTypes
+
+        fixed_nb_of_instances = None
+        if server.fixed_nb_of_instances is not None:
+            fixed_nb_of_instances = fresh_explainable_object(server.fixed_nb_of_instances)
+
+        return Server(
+            server.name,
+            server_type=getattr(ServerTypes, server.server_type)(),
+            carbon_footprint_fabrication=fresh_explainable_object(server.carbon_footprint_fabrication),
+            power=fresh_explainable_object(server.power),
+            lifespan=fresh_explainable_object(server.lifespan),
+            idle_power=fresh_explainable_object(server.idle_power),
+            ram=fresh_explainable_object(server.ram),
+            compute=fresh_explainable_object(server.cpu_cores).to(u.cpu_core),
+            power_usage_effectiveness=fresh_explainable_object(server.power_usage_effectiveness),
+            average_carbon_intensity=fresh_explainable_object(server.average_carbon_intensity),
+            server_utilization_rate=fresh_explainable_object(server.server_utilization_rate),
+            base_ram_consumption=legacy_sum(
+                [service.base_ram_consumption for service in services], f"Base RAM consumption of {server.name}"),
+            base_compute_consumption=legacy_sum(
+                [service.base_cpu_consumption for service in services],
+                f"Base compute consumption of {server.name}").to(u.cpu_core),
+            storage=storage,
+            fixed_nb_of_instances=fixed_nb_of_instances)
+
+    def job(self, job):
+        from efootprint.constants.units import u
+        from efootprint.core.all_classes_in_order import Job
+
+        return Job(
+            job.name, job.service.server.efootprint_object,
+            data_transferred=self.per_user_journey(
+                job.data_upload + job.data_download, f"Data transferred by {job.name}"),
+            data_stored=self.per_user_journey(job.data_upload, f"Data stored by {job.name}"),
+            request_duration=fresh_explainable_object(job.request_duration),
+            compute_needed=self.per_user_journey(job.cpu_needed, f"Compute needed by {job.name}").to(u.cpu_core),
+            ram_needed=self.per_user_journey(job.ram_needed, f"RAM needed by {job.name}"))
+
+    def step(self, step):
+        from efootprint.core.all_classes_in_order import UsageJourneyStep
+
+        return UsageJourneyStep(
+            step.name, user_time_spent=self.per_user_journey(step.user_time_spent, f"Time spent on {step.name}"),
+            jobs=[self.translation(job, self.job) for job in step.jobs])
+
+    def user_journey(self, user_journey):
+        from efootprint.core.all_classes_in_order import UsageJourney
+
+        return UsageJourney(
+            user_journey.name, uj_steps=[self.translation(step, self.step) for step in user_journey.uj_steps])
+
+    def usage_pattern(self, usage_pattern):
+        from efootprint.core.all_classes_in_order import UsagePattern
+
+        device_population = usage_pattern.device_population
+        translated_usage_pattern = UsagePattern(
+            usage_pattern.name, self.translation(usage_pattern.user_journey, self.user_journey),
+            devices=device_population.devices, network=usage_pattern.network, country=device_population.country,
+            hourly_usage_journey_starts=legacy_hourly_usage_journey_starts(usage_pattern))
+        self.legacy_names[translated_usage_pattern.id] = device_population.name
+
+        return translated_usage_pattern
+
+
+def legacy_system(name, usage_patterns):
+    """
+    Drop-in replacement of the legacy System class, returning the e-footprint 9 translation of the System.
+    """
+    return LegacyTranslator().system(name, usage_patterns)
+
+
+def legacy_object_name(system, mod_obj):
+    """
+    Return the name of the legacy object holding the footprint of an object of a System built by legacy_system.
+    """
+    return LEGACY_OBJECT_NAMES.get(system.id, {}).get(mod_obj.id, mod_obj.name)
+
+
+def on_premise_server_from_config(
+        name, nb_of_cpu_units, nb_of_cores_per_cpu_unit, nb_of_ram_units, ram_quantity_per_unit_in_gb,
+        average_carbon_intensity, lifespan=None, idle_power=None, power_usage_effectiveness=None,
+        server_utilization_rate=None, fixed_nb_of_instances=None):
+    """
+    Legacy on_premise_server_from_config, making the same Boavizta API call so that it hits the same lookup cache
+    entries.
+    """
+    import requests
+    from efootprint.abstract_modeling_classes.explainable_object_base_class import Source
+    from efootprint.abstract_modeling_classes.source_objects import SourceValue
+    from efootprint.constants.sources import Sources
+    from efootprint.constants.units import u
+
+    impact_url = "https://api.boavizta.org/v1/server/"
+    params = {"verbose": "true", "archetype": "platform_compute_medium", "criteria": ["gwp"]}
+    data = {"model": {"type": "rack"},
+            "configuration": {"cpu": {"units": nb_of_cpu_units, "core_units": nb_of_cores_per_cpu_unit},
+                              "ram": [{"units": nb_of_ram_units, "capacity": ram_quantity_per_unit_in_gb}]}}
+    response = requests.post(
+        impact_url, headers={"accept": "application/json", "Content-Type": "application/json"}, params=params,
+        json=data)
+    if response.status_code != 200:
+        raise ValueError(f"POST request to {impact_url} with params {params} failed with status code "
+                         f"{response.status_code}")
+    impact_data = response.json()
+    impact_source = Source(
+        "Boavizta API servers", f"{impact_url}?{'&'.join([key + '=' + str(params[key]) for key in params.keys()])}")
+    cpu_spec = impact_data["verbose"]["CPU-1"]
+    ram_spec = impact_data["verbose"]["RAM-1"]
+
+    return LegacyOnPremise(
+        name,
+        carbon_footprint_fabrication=SourceValue(
+            impact_data["impacts"]["gwp"]["embedded"]["value"] * u.kg, impact_source),
+        power=SourceValue(impact_data["verbose"]["avg_power"]["value"] * u.W, impact_source),
+        lifespan=lifespan or SourceValue(6 * u.year, Sources.HYPOTHESIS),
+        idle_power=idle_power or SourceValue(0 * u.W, Sources.HYPOTHESIS),
+        ram=SourceValue(ram_spec["units"]["value"] * ram_spec["capacity"]["value"] * u.GB, impact_source),
+        cpu_cores=SourceValue(cpu_spec["units"]["value"] * cpu_spec["core_units"]["value"] * u.core, impact_source),
+        power_usage_effectiveness=power_usage_effectiveness or SourceValue(1.4 * u.dimensionless, Sources.HYPOTHESIS),
+        average_carbon_intensity=average_carbon_intensity,
+        server_utilization_rate=server_utilization_rate or SourceValue(0.7 * u.dimensionless, Sources.HYPOTHESIS),
+        fixed_nb_of_instances=fixed_nb_of_instances)
+
+
+def default_server(server_class, name, **kwargs):
+    from efootprint.abstract_modeling_classes.source_objects import SourceValue
+    from efootprint.constants.sources import Sources
+    from efootprint.constants.units import u
+
+    output_args = {
+        "carbon_footprint_fabrication": SourceValue(600 * u.kg, Sources.BASE_ADEME_V19),
+        "power": SourceValue(300 * u.W, Sources.HYPOTHESIS),
+        "lifespan": SourceValue(6 * u.year, Sources.HYPOTHESIS),
+        "idle_power": SourceValue(50 * u.W, Sources.HYPOTHESIS),
+        "ram": SourceValue(128 * u.GB, Sources.HYPOTHESIS),
+        "cpu_cores": SourceValue(24 * u.core, Sources.HYPOTHESIS),
+        "power_usage_effectiveness": SourceValue(1.2 * u.dimensionless, Sources.HYPOTHESIS),
+        "average_carbon_intensity": SourceValue(100 * u.g / u.kWh, Sources.HYPOTHESIS),
+        "server_utilization_rate": SourceValue(0.9 * u.dimensionless, Sources.HYPOTHESIS)
+    }
+    output_args.update(kwargs)
+
+    return server_class(name, **output_args)
+
+
+def default_storage(name, carbon_footprint_fabrication, power, lifespan, **kwargs):
+    from efootprint.abstract_modeling_classes.source_objects import SourceValue
+    from efootprint.constants.sources import Sources
+    from efootprint.constants.units import u
+
+    output_args = {
+        "carbon_footprint_fabrication": SourceValue(
+            carbon_footprint_fabrication, Sources.STORAGE_EMBODIED_CARBON_STUDY),
+        "power": SourceValue(power, Sources.STORAGE_EMBODIED_CARBON_STUDY),
+        "lifespan": SourceValue(lifespan, Sources.HYPOTHESIS),
+        "idle_power": SourceValue(0 * u.W, Sources.HYPOTHESIS),
+        "storage_capacity": SourceValue(1 * u.TB, Sources.STORAGE_EMBODIED_CARBON_STUDY),
+        "power_usage_effectiveness": SourceValue(1.2 * u.dimensionless, Sources.HYPOTHESIS),
+        "average_carbon_intensity": SourceValue(100 * u.g / u.kWh, Sources.HYPOTHESIS),
+        "data_replication_factor": SourceValue(3 * u.dimensionless, Sources.HYPOTHESIS)
+    }
+    output_args.update(kwargs)
+
+    return LegacyStorage(name, **output_args)
+
+
+def legacy_builders_modules():
+    """
+    Return the attributes of the legacy e-footprint builder modules, with the default values of e-footprint 1.x and 2.x.
+    """
+    from efootprint.abstract_modeling_classes.source_objects import SourceValue
+    from efootprint.constants.sources import Sources
+    from efootprint.constants.units import u
+    from efootprint.core.hardware.hardware import Hardware
+    from efootprint.core.hardware.network import Network
+
+    def network_builder(default_name, bandwidth_energy_intensity):
+        def build_network(name=default_name, **kwargs):
+            output_args = {
+                "bandwidth_energy_intensity": SourceValue(bandwidth_energy_intensity, Sources.TRAFICOM_STUDY)}
+            output_args.update(kwargs)
+            return Network(name, **output_args)
+
+        return build_network
+
+    return {
+        "efootprint.builders.hardware.devices_defaults": {
+            "default_smartphone": Hardware.smartphone, "default_laptop": Hardware.laptop,
+            "default_box": Hardware.box, "default_screen": Hardware.screen},
+        "efootprint.builders.hardware.network_defaults": {
+            "default_wifi_network": network_builder("Default wifi network", 0.05 * u("kWh/GB")),
+            "default_mobile_network": network_builder("Default mobile network", 0.12 * u("kWh/GB"))},
+        "efootprint.builders.hardware.servers_defaults": {
+            "default_serverless": lambda name="Default serverless", **kwargs: default_server(
+                LegacyServerless, name, **kwargs),
+            "default_autoscaling": lambda name="Default autoscaling", **kwargs: default_server(
+                LegacyAutoscaling, name, **kwargs),
+            "default_onpremise": lambda name="Default on premise", **kwargs: default_server(
+                LegacyOnPremise, name, **kwargs)},
+        "efootprint.builders.hardware.storage_defaults": {
+            "default_ssd": lambda name="Default SSD storage", **kwargs: default_storage(
+                name, 160 * u.kg, 1.3 * u.W, 6 * u.years, **kwargs),
+            "default_hdd": lambda name="Default HDD storage", **kwargs: default_storage(
+                name, 20 * u.kg, 4.2 * u.W, 4 * u.years, **kwargs)},
+        "efootprint.builders.hardware.servers_boaviztapi": {
+            "on_premise_server_from_config": on_premise_server_from_config},
+    }
+
+
+def legacy_modules(api_version):
+    """
+    Return {module name: module attributes} of the legacy e-footprint modules imported by the modelings.
+    """
+    from efootprint.core.hardware.hardware import Hardware
+
+    modules = {
+        "efootprint.core.service": {"Service": LegacyService},
+        "efootprint.core.usage.usage_pattern": {"UsagePattern": LegacyUsagePattern},
+        "efootprint.core.hardware.device_population": {"DevicePopulation": LegacyDevicePopulation},
+        "efootprint.core.hardware.hardware_base_classes": {"Hardware": Hardware},
+        "efootprint.core.hardware.servers": {},
+        "efootprint.core.hardware.servers.autoscaling": {"Autoscaling": LegacyAutoscaling},
+        "efootprint.core.hardware.servers.on_premise": {"OnPremise": LegacyOnPremise},
+        "efootprint.core.hardware.servers.serverless": {"Serverless": LegacyServerless},
+        "efootprint.core.hardware.storage": {"Storage": LegacyStorage},
+        "efootprint.core.system": {"System": legacy_system},
+        **legacy_builders_modules(),
+    }
+    if api_version == 1:
+        modules["efootprint.core.usage.user_journey"] = {
+            "UserJourney": LegacyUserJourney, "UserJourneyStep": LegacyRequestUserJourneyStep}
+    else:
+        modules["efootprint.core.usage.user_journey"] = {
+            "UserJourney": LegacyUserJourney, "UserJourneyStep": LegacyUserJourneyStep}
+        modules["efootprint.core.usage.user_journey_step"] = {"UserJourneyStep": LegacyUserJourneyStep}
+        modules["efootprint.core.usage.job"] = {"Job": LegacyJob}
+
+    return modules
+
+
+class LegacyModule(types.ModuleType):
+    """
+    Module of legacy definitions, falling back to the e-footprint 9 module of the same name when there is one, for the
+    names the legacy API shares with it, like SourceValue.
+    """
+    def __init__(self, name, attributes, current_module=None):
+        super().__init__(name)
+        self.__dict__.update(attributes)
+        self.__path__ = []
+        self._current_module = current_module
+
+    def __getattr__(self, attr_name):
+        if self._current_module is None:
+            raise AttributeError(f"Legacy module {self.__name__} has no attribute {attr_name}")
+
+        return getattr(self._current_module, attr_name)
+
+
+def add_legacy_units():
+    from efootprint.constants.units import u
+
+    for unit_name, unit_definition in LEGACY_UNIT_DEFINITIONS.items():
+        if unit_name not in u:
+            u.define(unit_definition)
+
+
+def is_in_directory(module_globals, directory):
+    module_file = (module_globals or {}).get("__file__") or ""
+
+    return os.path.abspath(module_file).startswith(directory)
+
+
+@contextmanager
+def legacy_api(api_version, directory):
+    """
+    Make the e-footprint modules imported by the Python files of directory while the context is active expose the
+    classes of an e-footprint 1.x or 2.x API, whose System is built with the installed e-footprint 9.
+
+    Imports are redirected by the import statement itself, from the globals of the importing module, so sys.modules and
+    the imports of every other module are left untouched.
+    """
+    if api_version not in LEGACY_API_VERSIONS:
+        raise ValueError(f"Unsupported legacy e-footprint API version {api_version}, should be one of "
+                         f"{LEGACY_API_VERSIONS}")
+    # Import the e-footprint 9 classes the legacy modules fall back on
+    import efootprint.core.all_classes_in_order  # noqa: F401
+
+    add_legacy_units()
+    modules = {module_name: LegacyModule(module_name, attributes, sys.modules.get(module_name))
+               for module_name, attributes in legacy_modules(api_version).items()}
+    directory = os.path.abspath(directory) + os.sep
+    current_import = builtins.__import__
+
+    def legacy_import(name, module_globals=None, module_locals=None, fromlist=(), level=0):
+        # Legacy scripts only use absolute "from ... import ..." statements for e-footprint modules
+        if level == 0 and fromlist and name in modules and is_in_directory(module_globals, directory):
+            return modules[name]
+
+        return current_import(name, module_globals, module_locals, fromlist, level)
+
+    builtins.__import__ = legacy_import
+    try:
+        yield
+    finally:
+        builtins.__import__ = current_import
+
+
+def read_legacy_footprints(modeling):
+    legacy_footprints_path = os.path.join(modeling.path, LEGACY_FOOTPRINTS_FILENAME)
+    if not os.path.isfile(legacy_footprints_path):
+        raise ValueError(
+            f"No legacy footprints for {modeling.directory}, write {legacy_footprints_path} by running "
+            f"modeling_tools.run_modeling with e-footprint {modeling.legacy_api}")
+    with open(legacy_footprints_path) as file:
+        return json.load(file)
+
+
+def compare_with_legacy(system, legacy_result, rtol=DEFAULT_RTOL, atol=DEFAULT_ATOL_IN_KG):
+    """
+    Compare the footprints of a System built with legacy_api with the legacy run_modeling result of the same modeling.
+
+    Legacy footprints are yearly, so they are compared with the e-footprint 9 footprints summed over the
+    LEGACY_TIMESPAN_IN_YEARS modeling years, grouped by the legacy object holding them.
+
+    Returns:
+        list of dicts with "category", "object", "type", "legacy", "current" (both in kg), "relative_difference",
+        "match" and "model_change" keys, the last one being the total footprint. model_change is the
+        LEGACY_MODEL_CHANGES explanation of a footprint whose e-footprint 9 model changed, and for the total, of its
+        first mismatching footprint, or None.
+    """
+    from efootprint.abstract_modeling_classes.explainable_objects import EmptyExplainableObject
+    from efootprint.constants.units import u
+
+    from modeling_tools.footprints import footprint_attributes_by_object
+
+    current_footprints = {}
+    for (category, _, footprint_type), (mod_obj, attr_name) in footprint_attributes_by_object(system).items():
+        key = (category, legacy_object_name(system, mod_obj), footprint_type)
+        footprint = getattr(mod_obj, attr_name)
+        value = 0 if isinstance(footprint, EmptyExplainableObject) else float(footprint.sum().value.to(u.kg).magnitude)
+        current_footprints[key] = current_footprints.get(key, 0) + value
+    legacy_footprints = {}
+    for footprint in legacy_result["footprints"]:
+        key = (footprint["category"], footprint["object"], footprint["type"])
+        yearly_value = footprint["value"] * u(footprint["unit"])
+        legacy_footprints[key] = float((yearly_value * LEGACY_TIMESPAN_IN_YEARS * u.year).to(u.kg).magnitude)
+
+    keys = list(legacy_footprints.keys()) + [key for key in current_footprints if key not in legacy_footprints]
+    comparisons = [
+        {"category": category, "object": obj_name, "type": footprint_type,
+         "legacy": legacy_footprints.get((category, obj_name, footprint_type), 0),
+         "current": current_footprints.get((category, obj_name, footprint_type), 0)}
+        for category, obj_name, footprint_type in keys]
+    comparisons.append({"category": "Total", "object": system.name, "type": "Total",
+                        "legacy": sum(legacy_footprints.values()), "current": sum(current_footprints.values())})
+    for comparison in comparisons:
+        difference = comparison["current"] - comparison["legacy"]
+        comparison["relative_difference"] = difference / comparison["legacy"] if comparison["legacy"] else None
+        comparison["match"] = bool(abs(difference) <= atol + rtol * abs(comparison["legacy"]))
+        comparison["model_change"] = LEGACY_MODEL_CHANGES.get((comparison["category"], comparison["type"]))
+    comparisons[-1]["model_change"] = next(
+        (comparison["model_change"] for comparison in comparisons[:-1]
+         if not comparison["match"] and comparison["model_change"] is not None), None)
+
+    return comparisons
+
+
+def print_comparisons(modeling_name, legacy_version, comparisons):
+    print(f"\n{modeling_name}: e-footprint {legacy_version} vs e-footprint 9 footprints over "
+          f"{LEGACY_TIMESPAN_IN_YEARS} year(s), in kg")
+    for comparison in comparisons:
+        relative_difference = comparison["relative_difference"]
+        relative_difference_str = "" if relative_difference is None else f"{relative_difference:+.1%}"
+        model_change_str = "" if comparison["match"] else comparison["model_change"] or ""
+        print(f"  {'ok ' if comparison['match'] else 'DIFF'} {comparison['category']:<9} {comparison['type']:<11} "
+              f"{comparison['object'][:45]:<45} {comparison['legacy']:>12.1f} {comparison['current']:>12.1f} "
+              f"{relative_difference_str:>8} {model_change_str}".rstrip())
+
+
+if __name__ == "__main__":
+    from modeling_tools.footprints import footprints_by_object
+    # run_modeling imports this module as modeling_tools.legacy_adapter, whose LEGACY_OBJECT_NAMES holds the legacy
+    # names of the objects of the Systems it builds, not the one of __main__
+    from modeling_tools.legacy_adapter import compare_with_legacy, print_comparisons, read_legacy_footprints
+    from modeling_tools.lookup_cache import cached_boaviztapi_calls, import_boavizta_modules
+    from modeling_tools.modelings import get_modeling
+    from modeling_tools.render_cache import rendering
+    from modeling_tools.run_modeling import build_modeling_system
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("modelings", nargs="+", help="Modelings to build in this Python process.")
+    parser.add_argument("--rtol", type=float, default=DEFAULT_RTOL,
+                        help="Relative tolerance of the footprints of each legacy object.")
+    parser.add_argument("--atol", type=float, default=DEFAULT_ATOL_IN_KG,
+                        help="Absolute tolerance of the footprints of each legacy object, in kg.")
+    args = parser.parse_args()
+
+    import_boavizta_modules()
+    nb_of_mismatches = 0
+    nb_of_unexplained_mismatches = 0
+    for modeling_name in args.modelings:
+        modeling = get_modeling(modeling_name)
+        with cached_boaviztapi_calls(), rendering():
+            modeling_system = build_modeling_system(modeling, modeling.path, None)
+        if modeling.legacy_api is None:
+            total_footprint = sum(footprint["value"] for footprint in footprints_by_object(modeling_system))
+            print(f"\n{modeling_name}: built natively, total footprint of {total_footprint:.1f} kg")
+            continue
+        legacy_footprints = read_legacy_footprints(modeling)
+        modeling_comparisons = compare_with_legacy(modeling_system, legacy_footprints, args.rtol, args.atol)
+        print_comparisons(modeling_name, legacy_footprints["efootprint_version"], modeling_comparisons)
+        nb_of_mismatches += sum(not comparison["match"] for comparison in modeling_comparisons)
+        nb_of_unexplained_mismatches += sum(
+            not comparison["match"] and comparison["model_change"] is None for comparison in modeling_comparisons)
+
+    if nb_of_mismatches > 0:
+        print(f"\n{nb_of_mismatches} footprints differ from their legacy value by more than {args.rtol:.0%} and "
+              f"{args.atol} kg, {nb_of_unexplained_mismatches} of them without an e-footprint 9 model change")
+    if nb_of_unexplained_mismatches > 0:
+        sys.exit(1)
@@ -0,0 +1,375 @@
+"""
+Hourly peak load and capacity headroom of the on-premise servers of a System.
+
+The on-premise servers of the modelings, like server_web and the GPU server of ai_use_case or Prod compute and Preprod
+compute of Paylib, have a fixed number of instances and a server utilization rate, while their jobs declare the
+compute or CPU, RAM and request duration they need. e-footprint only checks that the peak need fits the fixed number
+of instances, and the build fails when it doesn’t. LoadAnalyzer shows how much of the capacity is used hour by hour:
+    - the compute and RAM demand of every job in every usage pattern is computed for all hours at once, as a jobs x
+      usage patterns by hours matrix, with the formulas of e-footprint, and summed into the demand of the server,
+    - the capacity of each hour is the number of instances times the compute and RAM available per instance, that is
+      the server resources times its utilization rate minus what its base consumption and installed services occupy,
+    - utilization is demand over capacity, and hours above 100% are saturated,
+    - idle capacity is the number of instances minus the raw number of instances the demand needs, each idle
+      instance hour wasting the idle energy and the fabrication footprint share of one instance.
+
+e-footprint 9 computes demand over the whole modeling period. Older versions, like the one of Paylib, compute it
+over the 24 hours of a typical day in UTC, whose idle capacity waste is also given per year. --check compares the
+summed demand with the hourly needs computed by e-footprint for each server.
+
+Usage:
+    python -m modeling_tools.load_headroom ai_use_case --check
+    python -m modeling_tools.load_headroom paylib --server "Prod compute" --percentiles 50 90 99
+"""
+import argparse
+import sys
+from dataclasses import dataclass
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from modeling_tools.fleet_sizing import magnitude
+from modeling_tools.footprints import hourly_magnitudes
+
+DEFAULT_PERCENTILES = (50, 95, 99)
+# e-footprint 9 rounds the hourly needs of servers to 6 decimals when converting them to their unit
+NEED_ROUNDING_ATOL = 1e-6
+
+
+@dataclass
+class ServerLoad:
+    """
+    Hourly demand and capacity of one server.
+
+    Attributes:
+        server_name: name of the server.
+        compute_unit: unit of compute demand and capacity, RAM ones being in GB.
+        hours: index of the analyzed hours, hourly periods for e-footprint 9 and hours of a typical UTC day before.
+        contributors: (job name, usage pattern name) of the rows of the demand arrays.
+        compute_demand: compute demand of each contributor and hour.
+        ram_demand: RAM demand of each contributor and hour in GB.
+        nb_of_instances: number of instances of the server each hour.
+        available_compute_per_instance: compute an instance leaves to jobs.
+        available_ram_per_instance: RAM in GB an instance leaves to jobs.
+        idle_instance_hour_footprint: footprint of one unused instance during one hour in kg, idle energy plus
+            fabrication.
+        efootprint_compute_need: hourly compute need of the server computed by e-footprint, on hours.
+        efootprint_ram_need: hourly RAM need of the server computed by e-footprint in GB, on hours.
+    """
+    server_name: str
+    compute_unit: str
+    hours: pd.Index
+    contributors: List[Tuple[str, str]]
+    compute_demand: np.ndarray
+    ram_demand: np.ndarray
+    nb_of_instances: np.ndarray
+    available_compute_per_instance: float
+    available_ram_per_instance: float
+    idle_instance_hour_footprint: float
+    efootprint_compute_need: np.ndarray
+    efootprint_ram_need: np.ndarray
+
+    @property
+    def typical_day(self):
+        return not isinstance(self.hours, pd.PeriodIndex)
+
+    @property
+    def total_compute_demand(self):
+        return self.compute_demand.sum(axis=0)
+
+    @property
+    def total_ram_demand(self):
+        return self.ram_demand.sum(axis=0)
+
+    @staticmethod
+    def ratio(demand, capacity):
+        # Hours without demand are idle even without capacity, demand without capacity saturates
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(demand > 0, demand / capacity, 0)
+
+    @property
+    def compute_utilization(self):
+        return self.ratio(self.total_compute_demand, self.nb_of_instances * self.available_compute_per_instance)
+
+    @property
+    def ram_utilization(self):
+        return self.ratio(self.total_ram_demand, self.nb_of_instances * self.available_ram_per_instance)
+
+    @property
+    def utilization(self):
+        return np.maximum(self.compute_utilization, self.ram_utilization)
+
+    @property
+    def raw_nb_of_instances(self):
+        return np.maximum(self.ratio(self.total_compute_demand, self.available_compute_per_instance),
+                          self.ratio(self.total_ram_demand, self.available_ram_per_instance))
+
+    @property
+    def saturated_hours(self):
+        return self.hours[self.utilization > 1 + NEED_ROUNDING_ATOL]
+
+    @property
+    def idle_instance_hours(self):
+        return float(np.clip(self.nb_of_instances - self.raw_nb_of_instances, 0, None).sum())
+
+    @property
+    def idle_capacity_footprint(self):
+        """
+        Footprint in kg of the idle capacity over the analyzed hours.
+        """
+        return self.idle_instance_hours * self.idle_instance_hour_footprint
+
+    def utilization_percentiles(self, percentiles=DEFAULT_PERCENTILES):
+        """
+        Returns:
+            DataFrame of the given percentiles and the peak of compute, RAM and overall utilization over the hours.
+        """
+        utilizations = {"compute": self.compute_utilization, "ram": self.ram_utilization,
+                        "overall": self.utilization}
+        rows = [f"p{percentile:g}" for percentile in percentiles] + ["peak"]
+
+        return pd.DataFrame(
+            {name: np.append(np.percentile(values, percentiles), values.max(initial=0))
+             for name, values in utilizations.items()}, index=rows)
+
+    def peak_contributors(self, top=5):
+        """
+        Returns:
+            (peak hour, list of (job name, usage pattern name, share of the demand of the resource binding at the
+            peak hour)) of the contributors with the largest shares, by decreasing share.
+        """
+        peak_index = int(np.argmax(self.utilization))
+        if self.compute_utilization[peak_index] >= self.ram_utilization[peak_index]:
+            demand = self.compute_demand[:, peak_index]
+        else:
+            demand = self.ram_demand[:, peak_index]
+        shares = demand / demand.sum() if demand.sum() > 0 else np.zeros_like(demand)
+        order = np.argsort(-shares, kind="stable")[:top]
+
+        return self.hours[peak_index], [
+            (*self.contributors[index], float(shares[index])) for index in order if shares[index] > 0]
+
+    def check(self, rtol=1e-9, atol=NEED_ROUNDING_ATOL):
+        """
+        Returns:
+            dict {resource: largest absolute difference} of the resources, compute or ram, whose summed demand
+            doesn’t match the hourly need computed by e-footprint within rtol and atol, empty when all match.
+        """
+        differences = {}
+        for resource, demand, need in (("compute", self.total_compute_demand, self.efootprint_compute_need),
+                                       ("ram", self.total_ram_demand, self.efootprint_ram_need)):
+            if not np.allclose(demand, need, rtol=rtol, atol=atol):
+                differences[resource] = float(np.abs(demand - need).max())
+
+        return differences
+
+
+def on_grid(values, start, first_hour, nb_of_hours):
+    """
+    Place hourly values starting at start on a grid of nb_of_hours hours starting at first_hour, zeros elsewhere.
+    """
+    grid = np.zeros(nb_of_hours)
+    if start is not None:
+        offset = (start - first_hour).n
+        grid[offset:offset + len(values)] = values
+
+    return grid
+
+
+def start_hour(hourly_quantities):
+    from efootprint.abstract_modeling_classes.explainable_objects import EmptyExplainableObject
+
+    if isinstance(hourly_quantities, EmptyExplainableObject) or len(hourly_quantities.value) == 0:
+        return None
+
+    return hourly_quantities.value.index[0]
+
+
+class LoadAnalyzer:
+    """
+    Analyzer of the hourly load of the on-premise servers of a System built with any e-footprint version.
+
+    Args:
+        system: built System.
+        server_names: names of the servers to analyze, defaults to all on-premise servers.
+    """
+    def __init__(self, system, server_names=None):
+        self.system = system
+        self.hourly_engine = hasattr(system, "fabrication_footprint_sum_over_period")
+        on_premise_servers = {server.name: server for server in system.servers if self.is_on_premise(server)}
+        if server_names is None:
+            server_names = sorted(on_premise_servers.keys())
+        unknown_names = set(server_names) - set(on_premise_servers.keys())
+        if unknown_names:
+            raise ValueError(f"No on-premise server named {sorted(unknown_names)} in {system.name}, available ones "
+                             f"are {sorted(on_premise_servers.keys())}")
+        self.servers = [on_premise_servers[name] for name in server_names]
+        if not self.servers:
+            raise ValueError(f"{system.name} has no on-premise server to analyze")
+
+    def is_on_premise(self, server):
+        if self.hourly_engine:
+            from efootprint.core.hardware.server_base import ServerTypes
+
+            return server.server_type == ServerTypes.on_premise()
+
+        return type(server).__name__ == "OnPremise"
+
+    @staticmethod
+    def idle_instance_hour_footprint(server):
+        from efootprint.constants.units import u
+
+        idle_energy_in_kwh = magnitude(server.idle_power, u.W) * magnitude(
+            server.power_usage_effectiveness, u.dimensionless) / 1000
+
+        return (idle_energy_in_kwh * magnitude(server.average_carbon_intensity, u.kg / u.kWh)
+                + magnitude(server.carbon_footprint_fabrication, u.kg) / magnitude(server.lifespan, u.hour))
+
+    def analyze_hourly_server(self, server):
+        """
+        ServerLoad of a server of an e-footprint 9 System, over the hours of the modeling period.
+        """
+        from efootprint.constants.units import u
+
+        compute_unit = server.available_compute_per_instance.value.units
+        contributors, occurrences, starts, compute_needed, ram_needed = [], [], [], [], []
+        for job in server.jobs:
+            for usage_pattern, hourly_avg_occurrences in job.hourly_avg_occurrences_per_usage_pattern.items():
+                contributors.append((job.name, usage_pattern.name))
+                occurrences.append(hourly_magnitudes(hourly_avg_occurrences, u.dimensionless))
+                starts.append(start_hour(hourly_avg_occurrences))
+                compute_needed.append(magnitude(job.compute_needed, compute_unit))
+                ram_needed.append(magnitude(job.ram_needed, u.GB))
+        hourly_attributes = [server.nb_of_instances, server.hour_by_hour_compute_need, server.hour_by_hour_ram_need]
+        hourly_values = [hourly_magnitudes(attribute, unit) for attribute, unit in zip(
+            hourly_attributes, [u.dimensionless, compute_unit, u.GB])]
+        spans = [(start, len(values)) for start, values in zip(
+            starts + [start_hour(attribute) for attribute in hourly_attributes], occurrences + hourly_values)
+                 if start is not None]
+        if not spans:
+            raise ValueError(f"{server.name} has no hourly need nor number of instances to analyze")
+        first_hour = min(start for start, _ in spans)
+        nb_of_hours = max((start - first_hour).n + length for start, length in spans)
+
+        occurrence_matrix = np.array([on_grid(values, start, first_hour, nb_of_hours)
+                                      for values, start in zip(occurrences, starts)]).reshape(-1, nb_of_hours)
+        nb_of_instances, compute_need, ram_need = (
+            on_grid(values, start_hour(attribute), first_hour, nb_of_hours)
+            for values, attribute in zip(hourly_values, hourly_attributes))
+
+        return ServerLoad(
+            server_name=server.name, compute_unit=str(compute_unit),
+            hours=pd.period_range(start=first_hour, periods=nb_of_hours, freq="h"), contributors=contributors,
+            compute_demand=occurrence_matrix * np.array(compute_needed)[:, np.newaxis],
+            ram_demand=occurrence_matrix * np.array(ram_needed)[:, np.newaxis], nb_of_instances=nb_of_instances,
+            available_compute_per_instance=magnitude(server.available_compute_per_instance, compute_unit),
+            available_ram_per_instance=magnitude(server.available_ram_per_instance, u.GB),
+            idle_instance_hour_footprint=self.idle_instance_hour_footprint(server),
+            efootprint_compute_need=compute_need, efootprint_ram_need=ram_need)
+
+    def analyze_typical_day_server(self, server):
+        """
+        ServerLoad of a server of a System built with e-footprint before 9, over the 24 hours of a typical UTC day.
+        """
+        from efootprint.constants.units import u
+
+        compute_unit = server.available_cpu_per_instance.value.units
+        contributors, time_intervals, compute_per_user_journey, ram_per_user_journey = [], [], [], []
+        for service in server.services:
+            # Services run jobs from e-footprint 2 and user journey steps before
+            jobs = service.jobs if hasattr(service, "jobs") else service.uj_steps
+            for job in jobs:
+                for usage_pattern in job.usage_patterns:
+                    contributors.append((job.name, usage_pattern.name))
+                    time_intervals.append([magnitude_elt.magnitude for magnitude_elt in (
+                        usage_pattern.utc_time_intervals.value)])
+                    # Average need of a user journey over its duration, times the user journeys in parallel
+                    user_journeys_in_parallel = (
+                        usage_pattern.nb_user_journeys_in_parallel_during_usage.value
+                        * job.request_duration.value / (usage_pattern.user_journey.duration.value * u.user_journey))
+                    compute_per_user_journey.append(
+                        (job.cpu_needed.value * user_journeys_in_parallel).to(compute_unit).magnitude)
+                    ram_per_user_journey.append((job.ram_needed.value * user_journeys_in_parallel).to(u.GB).magnitude)
+        time_interval_matrix = np.array(time_intervals, dtype=float).reshape(-1, 24)
+        nb_of_instances = magnitude(server.nb_of_instances, u.dimensionless)
+
+        return ServerLoad(
+            server_name=server.name, compute_unit=str(compute_unit), hours=pd.RangeIndex(24, name="hour of the day"),
+            contributors=contributors,
+            compute_demand=time_interval_matrix * np.array(compute_per_user_journey)[:, np.newaxis],
+            ram_demand=time_interval_matrix * np.array(ram_per_user_journey)[:, np.newaxis],
+            nb_of_instances=np.full(24, nb_of_instances),
+            available_compute_per_instance=magnitude(server.available_cpu_per_instance, compute_unit),
+            available_ram_per_instance=magnitude(server.available_ram_per_instance, u.GB),
+            idle_instance_hour_footprint=self.idle_instance_hour_footprint(server),
+            efootprint_compute_need=np.array(
+                [elt.to(compute_unit).magnitude for elt in server.all_services_cpu_needs.value]),
+            efootprint_ram_need=np.array([elt.to(u.GB).magnitude for elt in server.all_services_ram_needs.value]))
+
+    def analyze(self) -> List[ServerLoad]:
+        if self.hourly_engine:
+            return [self.analyze_hourly_server(server) for server in self.servers]
+
+        return [self.analyze_typical_day_server(server) for server in self.servers]
+
+
+def print_server_load(server_load: ServerLoad, percentiles=DEFAULT_PERCENTILES, top=5, max_saturated_hours=10):
+    from efootprint.constants.units import u
+
+    nb_of_instances = np.unique(server_load.nb_of_instances)
+    span = "typical UTC day" if server_load.typical_day \
+        else f"{server_load.hours[0]} to {server_load.hours[-1]}, {len(server_load.hours)} hours"
+    print(f"\n{server_load.server_name} ({span}): {', '.join(f'{elt:g}' for elt in nb_of_instances)} instances of "
+          f"{server_load.available_compute_per_instance:g} {server_load.compute_unit} and "
+          f"{server_load.available_ram_per_instance:g} GB available")
+    print((server_load.utilization_percentiles(percentiles) * 100).round(1).to_string(
+        float_format=lambda value: f"{value:g}%"))
+
+    saturated_hours = server_load.saturated_hours
+    print(f"Saturated hours: {len(saturated_hours)}"
+          + (f", first ones {[str(hour) for hour in saturated_hours[:max_saturated_hours]]}" if len(saturated_hours)
+             else ""))
+    peak_hour, peak_contributors = server_load.peak_contributors(top)
+    print(f"Peak at {peak_hour}, from " + ", ".join(
+        f"{job_name} in {usage_pattern_name} ({share * 100:.1f}%)"
+        for job_name, usage_pattern_name, share in peak_contributors))
+
+    idle_capacity = (f"Idle capacity: {server_load.idle_instance_hours:.1f} instance hours, "
+                     f"{server_load.idle_capacity_footprint:.2f} kg")
+    if server_load.typical_day:
+        days_per_year = (1 * u.year).to(u.day).magnitude
+        idle_capacity += f" per day, {server_load.idle_capacity_footprint * days_per_year:.1f} kg per year"
+    print(idle_capacity)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("modeling", nargs="?", default="ai_use_case")
+    parser.add_argument("--server", action="append", default=None,
+                        help="Name of an on-premise server to analyze, defaults to all of them.")
+    parser.add_argument("--percentiles", type=float, nargs="+", default=list(DEFAULT_PERCENTILES),
+                        help="Utilization percentiles over the hours to print.")
+    parser.add_argument("--top", type=int, default=5, help="Number of jobs printed at the peak hour of each server.")
+    parser.add_argument("--check", action="store_true",
+                        help="Compare the summed demand of each server with its hourly needs computed by e-footprint.")
+    args = parser.parse_args()
+
+    from modeling_tools.modelings import get_modeling
+    from modeling_tools.run_modeling import build_for_analysis
+
+    modeling = get_modeling(args.modeling)
+    modeling_system = build_for_analysis(modeling)
+    server_loads = LoadAnalyzer(modeling_system, args.server).analyze()
+    mismatches = {}
+    for analyzed_server_load in server_loads:
+        print_server_load(analyzed_server_load, args.percentiles, args.top)
+        if args.check:
+            mismatches[analyzed_server_load.server_name] = analyzed_server_load.check()
+
+    if args.check:
+        for server_name, differences in mismatches.items():
+            print(f"{server_name}: demand " + (f"differs from e-footprint needs by up to {differences}" if differences
+                                               else "matches e-footprint needs"))
+        if any(mismatches.values()):
+            sys.exit(1)
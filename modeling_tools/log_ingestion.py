@@ -0,0 +1,393 @@
+"""
+Streaming ingestion of timestamped request logs into hourly usage journey counts for usage patterns.
+
+The usage patterns of the modelings are driven by constants, like the 558 requests per hour of the Bloom inference, or
+by synthetic daily volumes, like the GenAI usage patterns of ai_use_case. ingest_log reads a CSV or JSON lines log,
+optionally compressed, in chunks of lines, and bins every line into the hour of its timestamp and the journey type of
+one of its columns. Only the current chunk and one counter per hour and journey type are held in memory, so peak memory
+doesn’t grow with the size of the log, only with the time span it covers.
+
+The hourly counts of a journey type give:
+    - the hourly_usage_journey_starts of an e-footprint 9 UsagePattern, as SourceHourlyValues or CompactHourlyUsage,
+    - the user_journey_freq_per_user and time_intervals of the UsagePatterns of older e-footprint versions, like
+      Bloom’s, as the average frequency over the log period and the hours of the day when journeys happen.
+
+Timestamps without timezone are read as UTC. e-footprint usage patterns are in the local time of their country, so
+timestamps are converted to the timezone given to ingest_log before binning.
+
+Usage:
+    python -m modeling_tools.log_ingestion ingest gateway.jsonl.gz --journey-column route --timezone Europe/Paris
+        --output hourly_counts.csv
+    python -m modeling_tools.log_ingestion generate synthetic.csv --nb-of-lines 10000000
+"""
+import argparse
+import csv
+import gzip
+import json
+import os
+import resource
+import sys
+import time
+import zipfile
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_CHUNK_SIZE = 200_000
+DEFAULT_TIMESTAMP_COLUMN = "timestamp"
+# Journey type of the lines of logs without journey column
+ALL_JOURNEYS = "all"
+COMPRESSION_EXTENSIONS = [".gz", ".bz2", ".xz", ".zst", ".zip"]
+FORMATS_BY_EXTENSION = {".csv": "csv", ".tsv": "tsv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".json": "jsonl"}
+
+
+def log_format(log_path):
+    """
+    Return "csv", "tsv" or "jsonl" from the extension of a log, ignoring its compression extension.
+    """
+    root, extension = os.path.splitext(log_path.lower())
+    if extension in COMPRESSION_EXTENSIONS:
+        root, extension = os.path.splitext(root)
+    if extension not in FORMATS_BY_EXTENSION:
+        raise ValueError(
+            f"Can’t infer the format of {log_path} from its extension, please give it as csv, tsv or jsonl")
+
+    return FORMATS_BY_EXTENSION[extension]
+
+
+class HourlyCounts:
+    """
+    Number of log lines per hour and journey type, over the hours between the first and the last line seen.
+
+    Attributes:
+        first_hour: first hour, as a number of hours since the Unix epoch, None until lines are added.
+        nb_of_hours: number of hours from first_hour to the last hour seen.
+        counts: {journey type: int64 array of counts, one per hour from first_hour}.
+    """
+    def __init__(self):
+        self.first_hour = None
+        self.nb_of_hours = 0
+        self.counts = {}
+
+    @property
+    def journey_types(self):
+        return sorted(self.counts.keys())
+
+    @property
+    def start_date(self):
+        return None if self.first_hour is None else pd.Timestamp(self.first_hour, unit="h").to_pydatetime()
+
+    def extend(self, min_hour, max_hour):
+        """
+        Pad the counts with zeros so that they cover the hours from min_hour to max_hour.
+        """
+        if self.first_hour is None:
+            self.first_hour = min_hour
+        nb_of_hours_before = max(self.first_hour - min_hour, 0)
+        nb_of_hours_after = max(max_hour - (self.first_hour + self.nb_of_hours - 1), 0)
+        if nb_of_hours_before or nb_of_hours_after:
+            self.counts = {journey_type: np.pad(counts, (nb_of_hours_before, nb_of_hours_after))
+                           for journey_type, counts in self.counts.items()}
+            self.first_hour -= nb_of_hours_before
+            self.nb_of_hours += nb_of_hours_before + nb_of_hours_after
+
+    def add(self, journey_type, hours):
+        """
+        Count lines of a journey type, given the hours of their timestamps as numbers of hours since the Unix epoch.
+        """
+        if len(hours) == 0:
+            return
+        self.extend(int(hours.min()), int(hours.max()))
+        counts = self.counts.setdefault(journey_type, np.zeros(self.nb_of_hours, dtype=np.int64))
+        counts += np.bincount(hours - self.first_hour, minlength=self.nb_of_hours)
+
+    def hourly_counts(self, journey_type):
+        if journey_type not in self.counts:
+            raise ValueError(f"No journey type {journey_type} in the log, available ones are {self.journey_types}")
+
+        return self.counts[journey_type]
+
+    def to_frame(self):
+        """
+        Returns:
+            DataFrame of the counts, with one column per journey type and one row per hour.
+        """
+        return pd.DataFrame(
+            {journey_type: self.counts[journey_type] for journey_type in self.journey_types},
+            index=pd.date_range(self.start_date, periods=self.nb_of_hours, freq="h", name="hour"))
+
+    def daily_profile(self, journey_type):
+        """
+        Returns:
+            array of the average number of lines at each hour of the day, from 0 to 23.
+        """
+        hours_of_day = (self.first_hour + np.arange(self.nb_of_hours)) % 24
+
+        return np.bincount(hours_of_day, weights=self.hourly_counts(journey_type), minlength=24) / np.maximum(
+            np.bincount(hours_of_day, minlength=24), 1)
+
+    def to_compact(self, journey_type, scale=1):
+        """
+        Return the counts of a journey type, multiplied by scale, as a CompactHourlyUsage.
+        """
+        from modeling_tools.compact_hourly_usage import CompactHourlyUsage
+
+        return CompactHourlyUsage.from_dense(self.hourly_counts(journey_type) * scale, self.start_date)
+
+    def to_source_hourly_values(self, journey_type, scale=1, source_name="Request log"):
+        """
+        Return the counts of a journey type, multiplied by scale, as the hourly_usage_journey_starts of an e-footprint
+        9 UsagePattern.
+        """
+        from efootprint.abstract_modeling_classes.explainable_object_base_class import Source
+        from efootprint.abstract_modeling_classes.source_objects import SourceHourlyValues
+        from efootprint.builders.time_builders import create_hourly_usage_df_from_list
+        from efootprint.constants.units import u
+
+        return SourceHourlyValues(
+            create_hourly_usage_df_from_list(self.hourly_counts(journey_type) * scale, self.start_date,
+                                             u.dimensionless),
+            source=Source(source_name, None), label=f"Hourly {journey_type} journeys from {source_name}")
+
+    def usage_pattern_inputs_before_9(self, journey_type, nb_of_users=1, min_share_of_peak=0,
+                                      source_name="Request log"):
+        """
+        Return the user_journey_freq_per_user and time_intervals of a UsagePattern of e-footprint 1.x or 2.x.
+
+        Args:
+            journey_type: journey type whose counts drive the usage pattern.
+            nb_of_users: number of devices of the device population of the usage pattern.
+            min_share_of_peak: hours of the day whose average count is at or below this share of the busiest hour’s
+                are left out of the time intervals.
+            source_name: name of the source of the returned objects.
+        Returns:
+            user_journey_freq_per_user as a SourceValue, the average frequency over the log period, and
+            time_intervals as a SourceObject, the [start hour, end hour[ intervals of the active hours of the day.
+        """
+        from efootprint.abstract_modeling_classes.explainable_object_base_class import Source
+        from efootprint.abstract_modeling_classes.source_objects import SourceValue, SourceObject
+        from efootprint.constants.units import u
+
+        source = Source(source_name, None)
+        counts = self.hourly_counts(journey_type)
+        user_journey_freq_per_user = SourceValue(
+            (counts.sum() / (nb_of_users * self.nb_of_hours) * u.user_journey / (u.user * u.hour)).to(
+                u.user_journey / (u.user * u.year)), source, f"Frequency of {journey_type} journeys per user")
+
+        daily_profile = self.daily_profile(journey_type)
+        is_active = daily_profile > min_share_of_peak * daily_profile.max()
+        time_intervals = []
+        for hour in range(24):
+            if is_active[hour]:
+                if time_intervals and time_intervals[-1][1] == hour:
+                    time_intervals[-1][1] = hour + 1
+                else:
+                    time_intervals.append([hour, hour + 1])
+
+        return user_journey_freq_per_user, SourceObject(time_intervals, source)
+
+
+@dataclass
+class LogIngestionResult:
+    """
+    Outcome of ingest_log.
+
+    Attributes:
+        hourly_counts: HourlyCounts of the ingested lines.
+        nb_of_lines: number of lines read.
+        nb_of_skipped_lines: number of lines without valid timestamp, or with a journey type left out of the mapping.
+        duration_in_s: duration of the ingestion.
+    """
+    hourly_counts: HourlyCounts
+    nb_of_lines: int
+    nb_of_skipped_lines: int
+    duration_in_s: float
+
+    @property
+    def lines_per_second(self):
+        return self.nb_of_lines / self.duration_in_s if self.duration_in_s > 0 else float("inf")
+
+
+def read_log_chunks(log_path, columns, log_file_format=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield DataFrames of at most chunk_size lines of a log, with the given columns read as raw values.
+
+    The logs of a ZIP archive are read one after the other, in the archive order, the format of each being inferred
+    from its own name unless log_file_format is given.
+    """
+    if log_path.lower().endswith(".zip"):
+        with zipfile.ZipFile(log_path) as archive:
+            for member in archive.infolist():
+                if member.is_dir():
+                    continue
+                with archive.open(member) as log_file:
+                    yield from read_log_file_chunks(
+                        log_file, f"{log_path}/{member.filename}", columns,
+                        log_file_format or log_format(member.filename), chunk_size)
+    else:
+        yield from read_log_file_chunks(
+            log_path, log_path, columns, log_file_format or log_format(log_path), chunk_size)
+
+
+def read_log_file_chunks(log_file, log_name, columns, log_file_format, chunk_size):
+    if log_file_format in ("csv", "tsv"):
+        reader = pd.read_csv(log_file, sep="," if log_file_format == "csv" else "\t", usecols=columns, dtype=str,
+                             chunksize=chunk_size, compression="infer")
+    elif log_file_format == "jsonl":
+        reader = pd.read_json(log_file, lines=True, chunksize=chunk_size, dtype=False, convert_dates=False,
+                              compression="infer")
+    else:
+        raise ValueError(f"Unknown log format {log_file_format}, should be csv, tsv or jsonl")
+    with reader:
+        for chunk in reader:
+            missing_columns = [column for column in columns if column not in chunk.columns]
+            if missing_columns:
+                raise ValueError(f"Columns {missing_columns} not found in {log_name}, available ones are "
+                                 f"{list(chunk.columns)}")
+            yield chunk[columns]
+
+
+def timestamps_to_hours(timestamps, timezone=None, timestamp_format=None, epoch_unit=None):
+    """
+    Return the local hours of timestamps, as int64 numbers of hours since the Unix epoch, and the mask of the valid
+    timestamps.
+    """
+    if epoch_unit is not None:
+        datetimes = pd.to_datetime(pd.to_numeric(timestamps, errors="coerce"), unit=epoch_unit, utc=True)
+    else:
+        datetimes = pd.to_datetime(timestamps, utc=True, errors="coerce", format=timestamp_format or "ISO8601")
+    if timezone is not None:
+        datetimes = datetimes.dt.tz_convert(timezone)
+    is_valid = datetimes.notna().to_numpy()
+    hours = datetimes[is_valid].dt.tz_localize(None).to_numpy().astype("datetime64[h]").astype(np.int64)
+
+    return hours, is_valid
+
+
+def ingest_log(log_path, timestamp_column=DEFAULT_TIMESTAMP_COLUMN, journey_column=None, journey_mapping=None,
+               timezone=None, timestamp_format=None, epoch_unit=None, log_file_format=None,
+               chunk_size=DEFAULT_CHUNK_SIZE, hourly_counts=None):
+    """
+    Stream a log and count its lines per local hour and journey type.
+
+    Args:
+        log_path: CSV, TSV or JSON lines file, possibly compressed.
+        timestamp_column: column of the timestamps, ISO 8601 strings unless timestamp_format or epoch_unit is given.
+        journey_column: column of the journey types, like the request route. All lines are counted under
+            ALL_JOURNEYS without it.
+        journey_mapping: {value of journey_column: journey type}, lines with other values are skipped.
+        timezone: timezone of the usage patterns, like "Europe/Paris", UTC by default.
+        timestamp_format: strftime format of the timestamps.
+        epoch_unit: unit of numeric timestamps since the Unix epoch, like "s" or "ms".
+        log_file_format: "csv", "tsv" or "jsonl", inferred from the file extension by default.
+        chunk_size: number of lines held in memory at once.
+        hourly_counts: HourlyCounts to add the lines to, to ingest several log files.
+    Returns:
+        a LogIngestionResult.
+    """
+    start = time.perf_counter()
+    hourly_counts = hourly_counts if hourly_counts is not None else HourlyCounts()
+    columns = [timestamp_column] + ([journey_column] if journey_column is not None else [])
+    nb_of_lines = 0
+    nb_of_skipped_lines = 0
+    for chunk in read_log_chunks(log_path, columns, log_file_format, chunk_size):
+        nb_of_lines += len(chunk)
+        hours, is_valid = timestamps_to_hours(chunk[timestamp_column], timezone, timestamp_format, epoch_unit)
+        nb_of_skipped_lines += int((~is_valid).sum())
+        if journey_column is None:
+            hourly_counts.add(ALL_JOURNEYS, hours)
+            continue
+        journey_values = chunk[journey_column].to_numpy()[is_valid]
+        if journey_mapping is not None:
+            journey_values = pd.Series(journey_values).map(journey_mapping).to_numpy()
+            is_mapped = pd.notna(journey_values)
+            nb_of_skipped_lines += int((~is_mapped).sum())
+            hours, journey_values = hours[is_mapped], journey_values[is_mapped]
+        journey_codes, journey_types = pd.factorize(journey_values, use_na_sentinel=True)
+        nb_of_skipped_lines += int((journey_codes < 0).sum())
+        for journey_code, journey_type in enumerate(journey_types):
+            hourly_counts.add(str(journey_type), hours[journey_codes == journey_code])
+
+    return LogIngestionResult(hourly_counts, nb_of_lines, nb_of_skipped_lines, time.perf_counter() - start)
+
+
+def generate_log(log_path, nb_of_lines, journey_types=("chat", "document", "rag"), start_date="2025-01-01",
+                 nb_of_days=365, seed=0, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Write a synthetic CSV or JSON lines log of nb_of_lines requests spread over nb_of_days days, mostly during office
+    hours, to test and benchmark ingestion.
+    """
+    rng = np.random.default_rng(seed)
+    # Relative request rate at each hour of the day, in UTC
+    daily_profile = np.array([1, 1, 1, 1, 1, 2, 4, 10, 20, 25, 25, 20, 15, 20, 25, 25, 20, 10, 6, 4, 3, 2, 1, 1], float)
+    start_second = int(pd.Timestamp(start_date, tz="UTC").timestamp())
+    log_file_format = log_format(log_path)
+    open_log = gzip.open if log_path.endswith(".gz") else open
+    with open_log(log_path, "wt", newline="") as file:
+        if log_file_format in ("csv", "tsv"):
+            writer = csv.writer(file, delimiter="," if log_file_format == "csv" else "\t")
+            writer.writerow(["timestamp", "route", "status"])
+        for chunk_start in range(0, nb_of_lines, chunk_size):
+            nb_of_chunk_lines = min(chunk_size, nb_of_lines - chunk_start)
+            seconds = (start_second + rng.integers(0, nb_of_days, nb_of_chunk_lines) * 86400
+                       + rng.choice(24, nb_of_chunk_lines, p=daily_profile / daily_profile.sum()) * 3600
+                       + rng.integers(0, 3600, nb_of_chunk_lines))
+            timestamps = pd.to_datetime(np.sort(seconds), unit="s", utc=True).strftime("%Y-%m-%dT%H:%M:%SZ")
+            routes = rng.choice(journey_types, nb_of_chunk_lines)
+            if log_file_format == "jsonl":
+                file.writelines(f'{{"timestamp": "{timestamp}", "route": "{route}", "status": 200}}\n'
+                                for timestamp, route in zip(timestamps, routes))
+            else:
+                writer.writerows(zip(timestamps, routes, [200] * nb_of_chunk_lines))
+
+
+def peak_rss_in_mb():
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return max_rss / 1024 ** 2 if sys.platform == "darwin" else max_rss / 1024
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    ingest_parser = subparsers.add_parser("ingest", help="Count the lines of a log per hour and journey type.")
+    ingest_parser.add_argument("logs", nargs="+", help="Log files, ingested one after the other.")
+    ingest_parser.add_argument("--timestamp-column", default=DEFAULT_TIMESTAMP_COLUMN)
+    ingest_parser.add_argument("--journey-column", default=None)
+    ingest_parser.add_argument("--journey-mapping", default=None,
+                               help="JSON dict mapping values of the journey column to journey types.")
+    ingest_parser.add_argument("--timezone", default=None, help="Timezone of the usage patterns, UTC by default.")
+    ingest_parser.add_argument("--timestamp-format", default=None, help="strftime format of the timestamps.")
+    ingest_parser.add_argument("--epoch-unit", default=None, help="Unit of numeric timestamps, like s or ms.")
+    ingest_parser.add_argument("--format", default=None, choices=["csv", "tsv", "jsonl"])
+    ingest_parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    ingest_parser.add_argument("--output", default=None, help="CSV file to write the hourly counts to.")
+    generate_parser = subparsers.add_parser("generate", help="Write a synthetic log.")
+    generate_parser.add_argument("log")
+    generate_parser.add_argument("--nb-of-lines", type=int, default=1_000_000)
+    generate_parser.add_argument("--nb-of-days", type=int, default=365)
+    generate_parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        generate_log(args.log, args.nb_of_lines, nb_of_days=args.nb_of_days, seed=args.seed)
+        print(f"{args.nb_of_lines} lines written to {args.log}")
+    elif args.command == "ingest":
+        total_hourly_counts = HourlyCounts()
+        for log in args.logs:
+            ingestion_result = ingest_log(
+                log, args.timestamp_column, args.journey_column,
+                json.loads(args.journey_mapping) if args.journey_mapping else None, args.timezone,
+                args.timestamp_format, args.epoch_unit, args.format, args.chunk_size, total_hourly_counts)
+            print(f"{log}: {ingestion_result.nb_of_lines} lines, {ingestion_result.nb_of_skipped_lines} skipped, in "
+                  f"{ingestion_result.duration_in_s:.2f} s ({ingestion_result.lines_per_second:,.0f} lines/s)")
+        print(f"{total_hourly_counts.nb_of_hours} hours from {total_hourly_counts.start_date}, peak RSS "
+              f"{peak_rss_in_mb():.0f} MB")
+        for ingested_journey_type in total_hourly_counts.journey_types:
+            journey_counts = total_hourly_counts.hourly_counts(ingested_journey_type)
+            print(f"    {ingested_journey_type}: {journey_counts.sum()} journeys, {journey_counts.mean():.1f} per hour "
+                  f"on average, {journey_counts.max()} at peak")
+        if args.output:
+            total_hourly_counts.to_frame().to_csv(args.output)
+            print(f"Hourly counts written to {args.output}")
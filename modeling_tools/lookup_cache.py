@@ -0,0 +1,332 @@
+"""
+Persistent on-disk cache for the Boavizta API calls made when importing e-footprint and building modelings.
+
+Entries are content-addressed: the key is the hash of the lookup name and of the call arguments (url, method, query
+parameters and json body, which hold the server configuration like nb_of_cpu_units or nb_of_cores_per_cpu_unit), so
+two servers with the same configuration share one entry. The cache is shared by all modelings and batch runs, and the
+least recently used entries are evicted when its size goes over the limit.
+
+Environment variables:
+    EFOOTPRINT_MODELINGS_CACHE_DIR: cache directory, defaults to ~/.cache/e-footprint-modelings/lookups.
+    EFOOTPRINT_MODELINGS_CACHE_MAX_SIZE_MB: maximum cache size, defaults to 50 MB.
+    EFOOTPRINT_MODELINGS_OFFLINE: when set to 1, a cache miss raises an OfflineCacheMissError instead of calling the
+        API, which makes builds fail fast on air-gapped machines.
+    EFOOTPRINT_MODELINGS_BOAVIZTA_API_URL: url of a self-hosted Boavizta API, like http://localhost:5000/, called on
+        cache misses instead of https://api.boavizta.org/. Entries are still keyed on the public url, so that they are
+        hits for builds using the public API.
+
+Usage:
+    python -m modeling_tools.lookup_cache prewarm paylib --python paylib=/path/to/efootprint-1.3.2/bin/python
+    python -m modeling_tools.lookup_cache info
+    python -m modeling_tools.lookup_cache clear
+"""
+import argparse
+import hashlib
+import importlib
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+
+CACHE_DIR_ENV = "EFOOTPRINT_MODELINGS_CACHE_DIR"
+MAX_SIZE_ENV = "EFOOTPRINT_MODELINGS_CACHE_MAX_SIZE_MB"
+OFFLINE_ENV = "EFOOTPRINT_MODELINGS_OFFLINE"
+BOAVIZTA_API_URL_ENV = "EFOOTPRINT_MODELINGS_BOAVIZTA_API_URL"
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "e-footprint-modelings", "lookups")
+DEFAULT_MAX_SIZE_IN_MB = 50
+
+BOAVIZTA_API_URL = "https://api.boavizta.org/"
+# e-footprint 9 modules listing Boavizta cloud providers and instances when they are imported
+BOAVIZTA_IMPORT_TIME_MODULES = ["efootprint.builders.hardware.boavizta_cloud_server"]
+# {cache key: hash of the value} dicts of the lookups made inside recorded_lookups contexts
+LOOKUP_RECORDERS = []
+
+
+class OfflineCacheMissError(LookupError):
+    pass
+
+
+def is_offline():
+    return os.environ.get(OFFLINE_ENV, "0").lower() in ("1", "true", "yes")
+
+
+def value_hash(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class LookupCache:
+    """
+    Directory of JSON entries, one file per lookup, named after the hash of the lookup arguments.
+
+    The modification time of an entry is updated on every hit and is used to evict the least recently used entries.
+    """
+    def __init__(self, cache_dir=None, max_size_in_bytes=None, offline=None):
+        self.cache_dir = cache_dir or os.environ.get(CACHE_DIR_ENV) or DEFAULT_CACHE_DIR
+        if max_size_in_bytes is None:
+            max_size_in_bytes = float(os.environ.get(MAX_SIZE_ENV, DEFAULT_MAX_SIZE_IN_MB)) * 1024 ** 2
+        self.max_size_in_bytes = max_size_in_bytes
+        self.offline = is_offline() if offline is None else offline
+
+    @staticmethod
+    def key(lookup_name, arguments):
+        serialized_arguments = json.dumps({"lookup": lookup_name, "arguments": arguments}, sort_keys=True)
+
+        return hashlib.sha256(serialized_arguments.encode("utf-8")).hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def entry_paths(self):
+        for dir_path, _, file_names in os.walk(self.cache_dir):
+            for file_name in file_names:
+                if file_name.endswith(".json"):
+                    yield os.path.join(dir_path, file_name)
+
+    def get(self, lookup_name, arguments, compute):
+        """
+        Return the cached value of a lookup, or compute, store and return it on a cache miss.
+
+        Args:
+            lookup_name: name of the lookup, part of the cache key.
+            arguments: JSON serializable arguments of the lookup, part of the cache key.
+            compute: function without arguments returning the JSON serializable value of the lookup.
+        """
+        key = self.key(lookup_name, arguments)
+        entry_path = self.entry_path(key)
+        value = self.read(key)
+        if value is not None:
+            os.utime(entry_path)
+            self.record(key, value)
+            return value
+
+        if self.offline:
+            raise OfflineCacheMissError(
+                f"No cached value for {lookup_name} with arguments {arguments} in {self.cache_dir} and offline mode is "
+                f"on. Run python -m modeling_tools.lookup_cache prewarm on a machine with network access, or unset "
+                f"{OFFLINE_ENV}.")
+
+        value = compute()
+        if value is not None:
+            self.put(entry_path, {"lookup": lookup_name, "arguments": arguments, "value": value})
+            self.record(key, value)
+
+        return value
+
+    def read(self, key):
+        """
+        Return the cached value of the entry of key, None when there is none.
+        """
+        try:
+            with open(self.entry_path(key)) as file:
+                return json.load(file)["value"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return None
+
+    @staticmethod
+    def record(key, value):
+        for recorder in LOOKUP_RECORDERS:
+            recorder[key] = value_hash(value)
+
+    def has_values(self, value_hashes):
+        """
+        Tell whether the entries of a {cache key: hash of the value} dict, recorded by recorded_lookups, still hold the
+        same values.
+        """
+        for key, recorded_value_hash in value_hashes.items():
+            value = self.read(key)
+            if value is None or value_hash(value) != recorded_value_hash:
+                return False
+
+        return True
+
+    def put(self, entry_path, entry):
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        # Write to a temporary file first so that parallel runs never read a partially written entry
+        file_descriptor, tmp_path = tempfile.mkstemp(dir=os.path.dirname(entry_path), suffix=".tmp")
+        with os.fdopen(file_descriptor, "w") as file:
+            json.dump(entry, file)
+        os.replace(tmp_path, entry_path)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for entry_path in self.entry_paths():
+            try:
+                stat = os.stat(entry_path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry_path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, entry_path in sorted(entries):
+            if total_size <= self.max_size_in_bytes:
+                break
+            try:
+                os.remove(entry_path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+    def info(self):
+        entry_sizes = [os.path.getsize(entry_path) for entry_path in self.entry_paths()]
+
+        return {"cache_dir": self.cache_dir, "nb_of_entries": len(entry_sizes), "size_in_bytes": sum(entry_sizes),
+                "max_size_in_bytes": self.max_size_in_bytes, "offline": self.offline}
+
+    def clear(self):
+        for entry_path in list(self.entry_paths()):
+            os.remove(entry_path)
+
+
+class CachedResponse:
+    """
+    Minimal stand-in for the requests.Response of a successful Boavizta API call, built from a cached JSON body.
+    """
+    status_code = 200
+
+    def __init__(self, value):
+        self.content = json.dumps(value).encode("utf-8")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def cached_request_function(request_function, method, cache=None):
+    """
+    Wrap requests.get or requests.post so that Boavizta API responses are read from and written to the cache.
+
+    Calls to other urls and failed calls go through untouched.
+    """
+    def wrapper(url, *args, **kwargs):
+        if not url.startswith(BOAVIZTA_API_URL):
+            return request_function(url, *args, **kwargs)
+        # Positional arguments are requests.get params and requests.post data and json, named as such in the cache key
+        positional_names = ["params"] if method == "GET" else ["data", "json"]
+        named_args = dict(zip(positional_names, args))
+        # Headers don’t change the response, so they are left out of the cache key
+        arguments = {"url": url, "method": method,
+                     **{key: value for key, value in {**named_args, **kwargs}.items() if key != "headers"}}
+        failed_responses = []
+
+        def call_api():
+            api_url = os.environ.get(BOAVIZTA_API_URL_ENV)
+            called_url = url if not api_url else api_url.rstrip("/") + "/" + url[len(BOAVIZTA_API_URL):]
+            response = request_function(called_url, *args, **kwargs)
+            if response.status_code != 200:
+                failed_responses.append(response)
+                return None
+            return response.json()
+
+        value = (cache or LookupCache()).get("boaviztapi", arguments, call_api)
+        if failed_responses:
+            return failed_responses[0]
+
+        return CachedResponse(value)
+
+    wrapper.__wrapped__ = request_function
+
+    return wrapper
+
+
+@contextmanager
+def recorded_lookups():
+    """
+    Record the lookups made while the context is active, read from the cache or computed.
+
+    Yields:
+        {cache key: hash of the value} dict of the lookups, filled as they are made.
+    """
+    recorder = {}
+    LOOKUP_RECORDERS.append(recorder)
+    try:
+        yield recorder
+    finally:
+        LOOKUP_RECORDERS.remove(recorder)
+
+
+@contextmanager
+def cached_boaviztapi_calls(cache=None):
+    """
+    Route all Boavizta API calls made through requests, by e-footprint builders or at e-footprint module import, through
+    the cache while the context is active.
+    """
+    import requests
+
+    patched_functions = []
+    for method in ("GET", "POST"):
+        function_name = method.lower()
+        request_function = getattr(requests, function_name)
+        if not hasattr(request_function, "__wrapped__"):
+            patched_functions.append((function_name, request_function))
+            setattr(requests, function_name, cached_request_function(request_function, method, cache))
+    try:
+        yield
+    finally:
+        for function_name, request_function in patched_functions:
+            setattr(requests, function_name, request_function)
+
+
+def import_boavizta_modules():
+    """
+    Import, with the cache on, the e-footprint modules that call the Boavizta API when they are imported.
+
+    e-footprint 9 imports them as soon as a modeling object is updated or a System is loaded from json.
+    """
+    with cached_boaviztapi_calls():
+        for module_name in BOAVIZTA_IMPORT_TIME_MODULES:
+            if importlib.util.find_spec(module_name) is not None:
+                importlib.import_module(module_name)
+
+
+def prewarm(modeling_names, python_executables=None, timeout=None):
+    """
+    Build modelings with network access so that all their lookups end up in the cache.
+
+    Returns:
+        the list of run results from the batch runner.
+    """
+    from modeling_tools.batch_runner import run_batch
+
+    os.environ[OFFLINE_ENV] = "0"
+    with tempfile.TemporaryDirectory() as output_dir:
+        _, results = run_batch(
+            [{"modeling": modeling_name} for modeling_name in modeling_names], output_dir,
+            python_executables=python_executables, timeout=timeout)
+        for result in results:
+            if result["status"] != "success":
+                with open(result["log"]) as log_file:
+                    result["log_content"] = log_file.read()
+
+    return results
+
+
+if __name__ == "__main__":
+    from modeling_tools.batch_runner import parse_python_executables
+    from modeling_tools.modelings import MODELINGS
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    prewarm_parser = subparsers.add_parser("prewarm", help="Build modelings to fill the cache with their lookups.")
+    prewarm_parser.add_argument("modelings", nargs="*", help="Modelings to prewarm, defaults to all of them.")
+    prewarm_parser.add_argument("--python", action="append", default=[], metavar="MODELING=PYTHON_EXECUTABLE")
+    prewarm_parser.add_argument("--timeout", type=float, default=None)
+    subparsers.add_parser("info", help="Print the cache location and size.")
+    subparsers.add_parser("clear", help="Remove all cache entries.")
+    args = parser.parse_args()
+
+    if args.command == "prewarm":
+        prewarm_results = prewarm(
+            args.modelings or list(MODELINGS.keys()), parse_python_executables(args.python), args.timeout)
+        for prewarm_result in prewarm_results:
+            print(f"{prewarm_result['name']}: {prewarm_result['status']}")
+            if prewarm_result["status"] != "success":
+                print(prewarm_result["log_content"])
+        print(json.dumps(LookupCache().info(), indent=4))
+        if any(prewarm_result["status"] != "success" for prewarm_result in prewarm_results):
+            sys.exit(1)
+    elif args.command == "info":
+        print(json.dumps(LookupCache().info(), indent=4))
+    elif args.command == "clear":
+        LookupCache().clear()
@@ -0,0 +1,51 @@
+import os
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@dataclass(frozen=True)
+class Modeling:
+    """
+    Description of how to run one of the modelings of this repository.
+
+    Attributes:
+        directory: directory of the modeling, relative to the repository root.
+        script: script building the modeling, relative to directory.
+        system_variable: name of the global variable holding the System once the script has run.
+        import_paths: directories to add to sys.path, relative to directory, for the script imports to work.
+        builder: "module:function" building the System from keyword arguments, needed to run parameter variants.
+        requirements: requirements file of the modeling, relative to directory.
+        legacy_api: major version of the e-footprint API the script is written for, when it is older than e-footprint
+            9, see legacy_adapter.py.
+    """
+    directory: str
+    script: str
+    system_variable: str
+    import_paths: List[str] = field(default_factory=lambda: ["."])
+    builder: Optional[str] = None
+    requirements: str = "requirements.txt"
+    legacy_api: Optional[int] = None
+
+    @property
+    def path(self):
+        return os.path.join(ROOT, self.directory)
+
+
+MODELINGS = {
+    "ai_use_case": Modeling(
+        directory="ai_use_case", script="main.py", system_variable="system_main", builder="main:build_system"),
+    "bloom": Modeling(
+        directory="llm_modelings", script="bloom_efootprint.py", system_variable="system", legacy_api=2),
+    "paylib": Modeling(
+        directory="paylib_efootprint", script="paylib_per_million_users.py", system_variable="paylib",
+        import_paths=["paylib_per_million_users"], legacy_api=1),
+}
+
+
+def get_modeling(modeling_name):
+    if modeling_name not in MODELINGS:
+        raise ValueError(f"Unknown modeling {modeling_name}, should be one of {list(MODELINGS.keys())}")
+
+    return MODELINGS[modeling_name]
@@ -0,0 +1,380 @@
+"""
+Monte Carlo propagation of the uncertainty of hypotheses through a built System.
+
+Modelings report one footprint, computed from inputs of which many are SourceValues with the hypothesis source, like
+the server power usage effectiveness or lifespan. This module draws samples of these hypotheses from distributions and
+propagates all samples at once: the footprints of the System are recomputed by replaying their calculation graph from
+the sampled hypotheses, with one NumPy array holding all samples in place of each value. 10 000 samples of the Paylib
+modeling are propagated in under 2 seconds, about the duration of one of its builds.
+
+The calculation graph of e-footprint 1.x and 2.x records additions, subtractions, products and divisions, but cuts it
+where e-footprint rounds numbers of user journeys in parallel and of server instances up to the next integer: the
+rounding is stored as a constant, computed from the unsampled values. These roundings are recognized by their labels
+and operators and recomputed for every sample. Calculations the replay doesn’t know raise a ValueError when they
+depend on sampled hypotheses.
+
+Hypotheses are identified by their label, as in what_if.py, and all SourceValues sharing a label and a value, like the
+powers of several default smartphones, get the same sample. SourceValues sharing a label but not a value, like unnamed
+ones, have their value added to their label. Hypotheses without distribution get a triangular distribution
+between -20 % and +20 % of their value by default.
+
+Usage:
+    monte_carlo = MonteCarlo(paylib, {"PUE of Prod compute from hypothesis": Uniform(1.2, 1.8)})
+    result = monte_carlo.run(10000)
+    print(result.percentiles())
+"""
+import operator
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Tuple
+
+import numpy as np
+
+REPLAYABLE_OPERATORS = {"+": operator.add, "-": operator.sub, "*": operator.mul, "/": operator.truediv}
+# Constants stored by e-footprint 1.x and 2.x in place of the rounding up of a value to the next integer
+ROUNDING_UP_LABELS = ["Rounding up of user journeys in parallel to next integer"]
+ROUNDING_UP_OPERATORS = ["Rounding up of instances nb"]
+DEFAULT_PERCENTILES = (5, 50, 95)
+
+
+@dataclass
+class Uniform:
+    low: float
+    high: float
+
+    def sample(self, rng, nb_of_samples):
+        return rng.uniform(self.low, self.high, nb_of_samples)
+
+
+@dataclass
+class Triangular:
+    low: float
+    mode: float
+    high: float
+
+    def sample(self, rng, nb_of_samples):
+        if self.low == self.high:
+            return np.full(nb_of_samples, float(self.mode))
+        return rng.triangular(self.low, self.mode, self.high, nb_of_samples)
+
+
+@dataclass
+class Normal:
+    mean: float
+    std: float
+
+    def sample(self, rng, nb_of_samples):
+        return rng.normal(self.mean, self.std, nb_of_samples)
+
+
+@dataclass
+class MonteCarloResult:
+    """
+    Samples of a MonteCarlo run.
+
+    Attributes:
+        hypotheses: {hypothesis label: sampled magnitudes, in the unit of the hypothesis}.
+        footprints: {(category, object name, footprint type): sampled footprints}.
+        total_footprint: sampled total footprints.
+        unit: unit of the footprints.
+        duration_in_s: duration of the sampling and propagation.
+    """
+    hypotheses: Dict[str, np.ndarray]
+    footprints: Dict[Tuple[str, str, str], np.ndarray]
+    total_footprint: np.ndarray
+    unit: str
+    duration_in_s: float = 0
+
+    def percentiles(self, percentiles=DEFAULT_PERCENTILES):
+        """
+        Returns:
+            list of dicts with "category", "object", "type", "unit" and one "p{percentile}" key per percentile, the
+            total footprint first.
+        """
+        output = [{"category": "Total", "object": "System", "type": "Total", "unit": self.unit,
+                   **dict(zip([f"p{percentile}" for percentile in percentiles],
+                              np.percentile(self.total_footprint, percentiles)))}]
+        for (category, obj_name, footprint_type), footprints in self.footprints.items():
+            output.append({"category": category, "object": obj_name, "type": footprint_type, "unit": self.unit,
+                           **dict(zip([f"p{percentile}" for percentile in percentiles],
+                                      np.percentile(footprints, percentiles)))})
+
+        return output
+
+
+def is_hypothesis(explainable_object):
+    from efootprint.constants.sources import Sources
+    from pint import Quantity
+
+    source = getattr(explainable_object, "source", None)
+
+    return source is not None and source.name == Sources.HYPOTHESIS.name and isinstance(
+        explainable_object.value, Quantity)
+
+
+def has_parents(explainable_object):
+    return explainable_object.left_parent is not None or explainable_object.right_parent is not None
+
+
+def group_by_label(explainable_objects):
+    """
+    Returns:
+        {label: list of the explainable objects with this label}. Objects sharing a label but not a value, like unnamed
+        SourceValues, are told apart by their value added to their label.
+    """
+    objects_by_label = {}
+    for explainable_object in explainable_objects:
+        objects_by_label.setdefault(explainable_object.label, {}).setdefault(
+            str(explainable_object.value), []).append(explainable_object)
+
+    grouped_objects = {}
+    for label, objects_by_value in objects_by_label.items():
+        for value, label_objects in objects_by_value.items():
+            grouped_objects[label if len(objects_by_value) == 1 else f"{label} ({value})"] = label_objects
+
+    return grouped_objects
+
+
+def apply_to_hours(function, *values):
+    """
+    Apply function hour by hour when one of the values is an hourly usage, a list of 24 quantities.
+    """
+    if any(isinstance(value, list) for value in values):
+        return [function(*hour_values) for hour_values in zip(
+            *[value if isinstance(value, list) else [value] * 24 for value in values])]
+
+    return function(*values)
+
+
+def convert_like(value, reference):
+    if isinstance(reference, list):
+        return [hour_value.to(reference_hour_value.units) for hour_value, reference_hour_value in zip(value, reference)]
+
+    return value.to(reference.units)
+
+
+def is_used(hour_value):
+    return (np.asarray(hour_value.magnitude) != 0).astype(float)
+
+
+def round_up(value, rounding_unit=None):
+    """
+    Same rounding up as e-footprint, which adds the difference between the magnitude and the next integer, in
+    rounding_unit or in the unit of the value, to the value.
+    """
+    def round_up_hour_value(hour_value):
+        magnitude = hour_value.magnitude
+
+        return hour_value + (np.ceil(magnitude) - magnitude) * (rounding_unit or hour_value.units)
+
+    return apply_to_hours(round_up_hour_value, value)
+
+
+class MonteCarlo:
+    """
+    Sampler of the hypotheses of a System built with e-footprint 1.x or 2.x, whose footprints are yearly quantities.
+
+    Args:
+        system: built System.
+        distributions: {hypothesis label: distribution of its magnitude in the hypothesis unit}. A None distribution
+            keeps the hypothesis at its value.
+        default_relative_spread: relative half-width of the triangular distribution of the other hypotheses, 0 to only
+            sample the hypotheses of distributions.
+        seed: seed of the NumPy random generator.
+    """
+    def __init__(self, system, distributions=None, default_relative_spread=0.2, seed=None):
+        if hasattr(system, "fabrication_footprint_sum_over_period"):
+            raise ValueError(
+                f"{system.name} is an e-footprint 9 System with hourly footprints, which MonteCarlo doesn’t sample")
+        self.system = system
+        self.distributions = distributions or {}
+        self.default_relative_spread = default_relative_spread
+        self.seed = seed
+        unknown_labels = set(self.distributions.keys()) - set(self.hypotheses().keys())
+        if unknown_labels:
+            raise ValueError(f"No hypothesis labelled {sorted(unknown_labels)} in {system.name}, available ones are "
+                             f"{sorted(self.hypotheses().keys())}")
+
+    def footprint_nodes(self):
+        """
+        Returns:
+            {(category, object name, footprint type): ExplainableQuantity} of the footprints of the System.
+        """
+        footprint_nodes = {}
+        for footprint_type, footprints in [("Fabrication", self.system.fabrication_footprints),
+                                           ("Electricity", self.system.energy_footprints)]:
+            for category, category_footprints in footprints.items():
+                for obj_name, footprint in category_footprints.items():
+                    footprint_nodes[(category, obj_name, footprint_type)] = footprint
+
+        return footprint_nodes
+
+    def hypotheses(self, is_input=is_hypothesis):
+        """
+        Returns:
+            {label: list of the hypothesis SourceValues with this label} for the hypotheses the footprints depend on,
+            or for the leaves of their calculation graphs selected by is_input.
+        """
+        leaves = {}
+        visited_node_ids = set()
+        nodes_to_visit = list(self.footprint_nodes().values())
+        while nodes_to_visit:
+            node = nodes_to_visit.pop()
+            if id(node) in visited_node_ids:
+                continue
+            visited_node_ids.add(id(node))
+            if is_input(node) and not has_parents(node):
+                leaves[id(node)] = node
+            nodes_to_visit += [parent for parent in (node.left_parent, node.right_parent) if parent is not None]
+
+        return group_by_label(leaves.values())
+
+    def distribution(self, label, hypothesis):
+        if label in self.distributions:
+            return self.distributions[label]
+        if self.default_relative_spread == 0:
+            return None
+        magnitude = float(hypothesis.value.magnitude)
+        spread = abs(magnitude) * self.default_relative_spread
+
+        return Triangular(magnitude - spread, magnitude, magnitude + spread)
+
+    def sample_hypotheses(self, nb_of_samples):
+        """
+        Returns:
+            {hypothesis label: sampled magnitudes} for the hypotheses with a distribution.
+        """
+        rng = np.random.default_rng(self.seed)
+        samples = {}
+        for label, hypotheses in sorted(self.hypotheses().items()):
+            distribution = self.distribution(label, hypotheses[0])
+            if distribution is not None:
+                samples[label] = distribution.sample(rng, nb_of_samples)
+
+        return samples
+
+    def replay(self, node, sampled_values_by_node_id, replayed_values):
+        """
+        Return the value of node computed from the sampled hypotheses, or None if it doesn’t depend on any of them.
+        """
+        import pytz
+        from efootprint.constants.units import u
+
+        if id(node) in replayed_values:
+            return replayed_values[id(node)]
+        if id(node) in sampled_values_by_node_id:
+            return sampled_values_by_node_id[id(node)]
+        if not has_parents(node):
+            return None
+
+        left_value, right_value = [
+            None if parent is None else self.replay(parent, sampled_values_by_node_id, replayed_values)
+            for parent in (node.left_parent, node.right_parent)]
+        if left_value is None and right_value is None:
+            replayed_values[id(node)] = None
+            return None
+        if left_value is None and node.left_parent is not None:
+            left_value = node.left_parent.value
+        if right_value is None and node.right_parent is not None:
+            right_value = node.right_parent.value
+
+        if node.operator == "+" and getattr(node.right_parent, "label", None) in ROUNDING_UP_LABELS:
+            value = round_up(left_value)
+        elif node.operator in ROUNDING_UP_OPERATORS:
+            value = round_up(left_value, u.dimensionless)
+        elif node.operator in REPLAYABLE_OPERATORS:
+            value = apply_to_hours(REPLAYABLE_OPERATORS[node.operator], left_value, right_value)
+        elif node.operator is None and node.right_parent is None:
+            value = left_value
+        elif node.operator in ("max", "max compared with") and node.right_parent is not None:
+            value = apply_to_hours(np.maximum, left_value, right_value)
+        elif node.operator == "max" and isinstance(left_value, list):
+            value = np.maximum.reduce(left_value)
+        elif node.operator == "sum" and isinstance(left_value, list):
+            value = sum(left_value)
+        elif node.operator == "mean" and isinstance(left_value, list):
+            value = sum(left_value) / len(left_value)
+        elif node.operator == "retrieving usage hours":
+            value = [is_used(hour_value) * u.dimensionless for hour_value in left_value]
+        elif node.operator == "usage time fraction computation":
+            value = sum(is_used(hour_value) for hour_value in left_value) / len(left_value) * u.dimensionless
+        elif node.operator == "converted to UTC from":
+            # Same rotation of the 24 hours as ExplainableHourlyUsage.convert_to_utc
+            time_diff = right_value.utcoffset(datetime.now()) - pytz.timezone("UTC").utcoffset(datetime.now())
+            time_diff_in_hours = int(time_diff.total_seconds() / 3600)
+            value = left_value[time_diff_in_hours:] + left_value[:time_diff_in_hours]
+        else:
+            raise ValueError(f"Can’t propagate samples through operator {node.operator} of {node.label}")
+        value = convert_like(value, node.value)
+        replayed_values[id(node)] = value
+
+        return value
+
+    def propagate(self, values_by_node_id, nb_of_values):
+        """
+        Recompute the footprints of the System with new values for some nodes of their calculation graphs.
+
+        Args:
+            values_by_node_id: {id of a node: pint Quantity holding an array of nb_of_values magnitudes}.
+            nb_of_values: length of the arrays.
+        Returns:
+            {(category, object name, footprint type): array of nb_of_values footprints in kg / year}, and the set of
+            the keys of the footprints depending on the new values.
+        """
+        from efootprint.constants.units import u
+
+        unit = u.kg / u.year
+        replayed_values = {}
+        footprints = {}
+        dependent_keys = set()
+        for key, footprint_node in self.footprint_nodes().items():
+            value = self.replay(footprint_node, values_by_node_id, replayed_values)
+            if value is None:
+                value = footprint_node.value
+            else:
+                dependent_keys.add(key)
+            footprints[key] = np.broadcast_to(np.asarray(value.to(unit).magnitude, dtype=float), (nb_of_values,))
+
+        return footprints, dependent_keys
+
+    def run(self, nb_of_samples=10000):
+        from efootprint.constants.units import u
+
+        start = time.perf_counter()
+        hypotheses = self.hypotheses()
+        samples = self.sample_hypotheses(nb_of_samples)
+        sampled_values_by_node_id = {}
+        for label, magnitudes in samples.items():
+            for hypothesis in hypotheses[label]:
+                sampled_values_by_node_id[id(hypothesis)] = magnitudes * hypothesis.value.units
+        footprints, _ = self.propagate(sampled_values_by_node_id, nb_of_samples)
+
+        return MonteCarloResult(
+            hypotheses=samples, footprints=footprints, total_footprint=sum(footprints.values()),
+            unit=str(u.kg / u.year), duration_in_s=time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from modeling_tools.modelings import get_modeling
+    from modeling_tools.run_modeling import build_for_analysis
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("modeling", nargs="?", default="paylib")
+    parser.add_argument("--samples", type=int, default=10000)
+    parser.add_argument("--spread", type=float, default=0.2, help="Default relative spread of the hypotheses.")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    modeling = get_modeling(args.modeling)
+    modeling_system = build_for_analysis(modeling)
+    monte_carlo_result = MonteCarlo(modeling_system, default_relative_spread=args.spread, seed=args.seed).run(
+        args.samples)
+    print(f"{len(monte_carlo_result.hypotheses)} hypotheses sampled {args.samples} times and propagated in "
+          f"{monte_carlo_result.duration_in_s:.2f} s")
+    for row in monte_carlo_result.percentiles():
+        print(f"{row['category']:<10} {row['object'][:45]:<45} {row['type']:<12} "
+              + " ".join(f"{key} {value:>12.1f}" for key, value in row.items() if key.startswith("p"))
+              + f" {row['unit']}")
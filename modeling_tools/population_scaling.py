@@ -0,0 +1,320 @@
+"""
+Evaluate a modeling for a whole vector of population sizes in one pass.
+
+The Paylib modeling gives its footprints per million users: its website and mobile app device populations hold 1e6
+users. Getting results for 5, 20 or 60 million users used to mean editing these populations and rebuilding the System
+for each size. PopulationScaling instead replays the calculation graphs of the footprints of the built System, as
+monte_carlo.py does, with one NumPy array of population sizes in place of the number of devices of each scaled
+population, and splits the footprints into:
+    - fixed terms, which don’t depend on the population, like the preprod servers and storage,
+    - proportional terms, which are multiplied by the population scale, like the smartphone footprints,
+    - non-proportional terms, which depend on the population but not in proportion, like the electricity of the prod
+      compute, whose fixed_nb_of_instances servers draw idle power whatever the load, or the store servers, whose
+      number of instances is rounded up to an integer.
+Only the population-dependent terms are replayed, and roundings to integer numbers of instances and of user journeys
+in parallel are recomputed for every population size.
+
+e-footprint refuses to build a System where an on-premise server needs more instances than its fixed_nb_of_instances,
+like the Paylib prod compute between 50 and 60 million users. The number of instances needed by these servers is
+recomputed for every population size, and the sizes where it goes over fixed_nb_of_instances are flagged as invalid.
+
+check_against_rebuild builds the modeling again from scratch for some population sizes, with the number of devices of
+the scaled populations multiplied when they are created, and compares the footprints with the replayed ones.
+
+The replay works on Systems built with e-footprint 1.x and 2.x, like Paylib and Bloom.
+
+Usage:
+    python -m modeling_tools.population_scaling paylib 1e6 5e6 20e6 60e6 --check
+"""
+import argparse
+import os
+import runpy
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+FIXED = "fixed"
+PROPORTIONAL = "proportional"
+NON_PROPORTIONAL = "non-proportional"
+
+
+@dataclass
+class PopulationScalingResult:
+    """
+    Footprints of a System for several population sizes.
+
+    Attributes:
+        nb_of_users: evaluated population sizes, in number of users of the largest scaled population.
+        footprints: {(category, object name, footprint type): array of footprints, one per population size}.
+        terms: {(category, object name, footprint type): FIXED, PROPORTIONAL or NON_PROPORTIONAL}.
+        nb_of_instances_needed: {server name: array of numbers of instances needed} for the servers with a
+            fixed_nb_of_instances.
+        fixed_nb_of_instances: {server name: fixed_nb_of_instances} for the same servers.
+        unit: unit of the footprints.
+        duration_in_s: duration of the evaluation.
+    """
+    nb_of_users: np.ndarray
+    footprints: Dict[Tuple[str, str, str], np.ndarray]
+    terms: Dict[Tuple[str, str, str], str]
+    nb_of_instances_needed: Dict[str, np.ndarray]
+    fixed_nb_of_instances: Dict[str, float]
+    unit: str
+    duration_in_s: float
+
+    @property
+    def valid(self):
+        """
+        Boolean array telling for each population size whether e-footprint can build the System.
+        """
+        valid = np.ones(len(self.nb_of_users), dtype=bool)
+        for server_name, nb_of_instances_needed in self.nb_of_instances_needed.items():
+            valid &= nb_of_instances_needed <= self.fixed_nb_of_instances[server_name]
+
+        return valid
+
+    @property
+    def total_footprint(self):
+        return sum(self.footprints.values())
+
+    def total_by_term(self, term):
+        return sum((footprint for key, footprint in self.footprints.items() if self.terms[key] == term),
+                   start=np.zeros(len(self.nb_of_users)))
+
+
+class PopulationScaling:
+    """
+    Evaluator of the footprints of a System built with e-footprint 1.x or 2.x for other population sizes.
+
+    Args:
+        system: built System.
+        population_names: names of the device populations that scale with the number of users, defaults to those with
+            the largest number of devices, like the three 1e6 user populations of Paylib. The other ones, like the
+            laptop of the Paylib preprod, keep their number of devices.
+    """
+    def __init__(self, system, population_names=None):
+        from modeling_tools.monte_carlo import MonteCarlo
+
+        # A MonteCarlo without sampled hypotheses is only used for its replay of calculation graphs
+        self.replayer = MonteCarlo(system, default_relative_spread=0)
+        self.system = system
+        device_populations = {usage_pattern.device_population.name: usage_pattern.device_population
+                              for usage_pattern in system.usage_patterns}
+        if population_names is None:
+            max_nb_of_devices = max(population.nb_devices.value for population in device_populations.values())
+            population_names = [name for name, population in device_populations.items()
+                                if population.nb_devices.value == max_nb_of_devices]
+        unknown_names = set(population_names) - set(device_populations.keys())
+        if unknown_names:
+            raise ValueError(f"No device population named {sorted(unknown_names)} in {system.name}, available ones are "
+                             f"{sorted(device_populations.keys())}")
+        self.populations = [device_populations[name] for name in population_names]
+        self.reference_nb_of_users = max(
+            float(population.nb_devices.value.magnitude) for population in self.populations)
+
+    def scales(self, nb_of_users):
+        return np.asarray(nb_of_users, dtype=float) / self.reference_nb_of_users
+
+    def fixed_instances_servers(self):
+        return sorted([server for server in self.system.servers if getattr(server, "fixed_nb_of_instances", None)],
+                      key=lambda server: server.name)
+
+    def replayed_value(self, node, scaled_values_by_node_id):
+        replayed_value = self.replayer.replay(node, scaled_values_by_node_id, {})
+
+        return node.value if replayed_value is None else replayed_value
+
+    def nb_of_instances_needed(self, server, scaled_values_by_node_id, nb_of_values):
+        """
+        Same number of instances as the one e-footprint computes from the RAM and CPU needs of an on-premise server
+        before comparing it with fixed_nb_of_instances, for every population size.
+        """
+        from efootprint.constants.units import u
+
+        nb_of_instances_needed = np.zeros(nb_of_values)
+        for hourly_need_node, available_per_instance_node in [
+                (server.all_services_ram_needs, server.available_ram_per_instance),
+                (server.all_services_cpu_needs, server.available_cpu_per_instance)]:
+            hourly_need, available_per_instance = [
+                self.replayed_value(node, scaled_values_by_node_id)
+                for node in (hourly_need_node, available_per_instance_node)]
+            for hour_need in hourly_need:
+                nb_of_instances_needed = np.maximum(nb_of_instances_needed, np.broadcast_to(
+                    (hour_need / available_per_instance).to(u.dimensionless).magnitude, (nb_of_values,)))
+
+        return np.ceil(nb_of_instances_needed)
+
+    def evaluate(self, nb_of_users):
+        """
+        Args:
+            nb_of_users: population sizes, in number of users of the largest scaled population. The other scaled
+                populations keep their size relative to it.
+        Returns:
+            a PopulationScalingResult.
+        """
+        from efootprint.constants.units import u
+
+        start = time.perf_counter()
+        scales = self.scales(nb_of_users)
+        scaled_values_by_node_id = {
+            id(population.nb_devices): population.nb_devices.value * scales for population in self.populations}
+        footprints, dependent_keys = self.replayer.propagate(scaled_values_by_node_id, len(scales))
+
+        reference_footprints = {key: float(node.value.to(u.kg / u.year).magnitude)
+                                for key, node in self.replayer.footprint_nodes().items()}
+        terms = {}
+        for key, footprint in footprints.items():
+            if key not in dependent_keys:
+                terms[key] = FIXED
+            elif np.allclose(footprint, reference_footprints[key] * scales, rtol=1e-9, atol=0):
+                terms[key] = PROPORTIONAL
+            else:
+                terms[key] = NON_PROPORTIONAL
+
+        servers = self.fixed_instances_servers()
+
+        return PopulationScalingResult(
+            nb_of_users=np.asarray(nb_of_users, dtype=float), footprints=footprints, terms=terms,
+            nb_of_instances_needed={
+                server.name: self.nb_of_instances_needed(server, scaled_values_by_node_id, len(scales))
+                for server in servers},
+            fixed_nb_of_instances={
+                server.name: float(server.fixed_nb_of_instances.value.magnitude) for server in servers},
+            unit=str(u.kg / u.year), duration_in_s=time.perf_counter() - start)
+
+
+@contextmanager
+def scaled_device_populations(population_names, scale):
+    """
+    Multiply the number of devices of the device populations named population_names created inside the context.
+    """
+    from efootprint.abstract_modeling_classes.source_objects import SourceValue
+    from efootprint.core.hardware.device_population import DevicePopulation
+
+    original_init = DevicePopulation.__init__
+
+    def scaled_init(population, name, nb_devices, *args, **kwargs):
+        if name in population_names:
+            nb_devices = SourceValue(nb_devices.value * scale, nb_devices.source)
+        original_init(population, name, nb_devices, *args, **kwargs)
+
+    DevicePopulation.__init__ = scaled_init
+    try:
+        yield
+    finally:
+        DevicePopulation.__init__ = original_init
+
+
+def rebuild_modeling(modeling, population_names, scale):
+    """
+    Build a modeling from scratch with the number of devices of population_names multiplied by scale.
+
+    The modules of the modeling are imported again, so that the objects memoized by their builder functions aren’t
+    reused from a previous build.
+    """
+    from modeling_tools.lookup_cache import cached_boaviztapi_calls
+    from modeling_tools.run_modeling import add_import_paths
+
+    for module_name, module in list(sys.modules.items()):
+        module_file = getattr(module, "__file__", None) or ""
+        if os.path.abspath(module_file).startswith(modeling.path + os.sep):
+            del sys.modules[module_name]
+    add_import_paths(modeling, modeling.path)
+    with cached_boaviztapi_calls(), scaled_device_populations(population_names, scale):
+        script_globals = runpy.run_path(os.path.join(modeling.path, modeling.script), run_name="__main__")
+
+    return script_globals[modeling.system_variable]
+
+
+def check_against_rebuild(modeling, scaling, result, nb_of_users_to_check, rtol=1e-9):
+    """
+    Compare the footprints of result with those of full rebuilds of the modeling, and check that the rebuild fails for
+    the population sizes that aren’t valid.
+
+    Returns:
+        list of (nb of users, footprint key, replayed footprint, rebuilt footprint) of the mismatching footprints, with
+        None as key and footprints for the sizes whose rebuild succeeded or failed unexpectedly.
+    """
+    from modeling_tools.monte_carlo import MonteCarlo
+    from efootprint.constants.units import u
+
+    population_names = [population.name for population in scaling.populations]
+    mismatches = []
+    for nb_of_users in nb_of_users_to_check:
+        index = int(np.argmin(np.abs(result.nb_of_users - nb_of_users)))
+        if result.nb_of_users[index] != nb_of_users:
+            raise ValueError(f"{nb_of_users} users weren’t evaluated, evaluated sizes are {list(result.nb_of_users)}")
+        try:
+            rebuilt_system = rebuild_modeling(modeling, population_names, scaling.scales(nb_of_users))
+        except ValueError:
+            if result.valid[index]:
+                mismatches.append((nb_of_users, None, None, None))
+            continue
+        if not result.valid[index]:
+            mismatches.append((nb_of_users, None, None, None))
+            continue
+        rebuilt_footprints = {key: float(node.value.to(u.kg / u.year).magnitude) for key, node in
+                              MonteCarlo(rebuilt_system, default_relative_spread=0).footprint_nodes().items()}
+        if set(rebuilt_footprints.keys()) != set(result.footprints.keys()):
+            raise ValueError(f"The rebuilt System for {nb_of_users} users doesn’t have the same footprints")
+        for key, rebuilt_footprint in rebuilt_footprints.items():
+            replayed_footprint = result.footprints[key][index]
+            if not np.isclose(replayed_footprint, rebuilt_footprint, rtol=rtol, atol=0):
+                mismatches.append((nb_of_users, key, replayed_footprint, rebuilt_footprint))
+
+    return mismatches
+
+
+def print_result(result: PopulationScalingResult, keys: List[Tuple[str, str, str]] = None):
+    print(f"{'':<62} " + " ".join(f"{nb_of_users:>12.3g}" for nb_of_users in result.nb_of_users) + " users")
+    for key in keys or sorted(result.footprints.keys(), key=lambda key: (result.terms[key], key)):
+        category, obj_name, footprint_type = key
+        print(f"{result.terms[key]:<16} {category:<10} {obj_name[:22]:<22} {footprint_type:<11} "
+              + " ".join(f"{value:>12.1f}" for value in result.footprints[key]))
+    for term in (FIXED, PROPORTIONAL, NON_PROPORTIONAL):
+        print(f"{'total ' + term:<62} " + " ".join(f"{value:>12.1f}" for value in result.total_by_term(term)))
+    print(f"{'total':<62} " + " ".join(f"{value:>12.1f}" for value in result.total_footprint) + f" {result.unit}")
+    for server_name, nb_of_instances_needed in result.nb_of_instances_needed.items():
+        print(f"{server_name + ' instances needed, fixed to ' + str(result.fixed_nb_of_instances[server_name]):<62} "
+              + " ".join(f"{value:>12.0f}" for value in nb_of_instances_needed))
+    if not result.valid.all():
+        print(f"e-footprint can’t build the System for {list(result.nb_of_users[~result.valid])} users, whose "
+              f"footprints above use the fixed number of instances")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("modeling", nargs="?", default="paylib")
+    parser.add_argument("nb_of_users", nargs="*", type=float, default=[1e6, 5e6, 20e6, 60e6])
+    parser.add_argument("--population", action="append", default=None,
+                        help="Name of a device population scaling with the number of users, defaults to the largest "
+                             "ones.")
+    parser.add_argument("--check", action="store_true", help="Compare the results with full rebuilds.")
+    args = parser.parse_args()
+
+    from modeling_tools.lookup_cache import cached_boaviztapi_calls
+    from modeling_tools.modelings import get_modeling
+    from modeling_tools.run_modeling import build_modeling_system
+
+    modeling = get_modeling(args.modeling)
+    with cached_boaviztapi_calls():
+        modeling_system = build_modeling_system(modeling, modeling.path, None)
+    population_scaling = PopulationScaling(modeling_system, args.population)
+    scaling_result = population_scaling.evaluate(args.nb_of_users)
+    scaled_population_names = [population.name for population in population_scaling.populations]
+    print(f"{len(args.nb_of_users)} population sizes of {scaled_population_names} evaluated in "
+          f"{scaling_result.duration_in_s * 1000:.0f} ms")
+    print_result(scaling_result)
+
+    if args.check:
+        start_time = time.perf_counter()
+        check_mismatches = check_against_rebuild(modeling, population_scaling, scaling_result, args.nb_of_users)
+        print(f"{len(args.nb_of_users)} full rebuilds in {time.perf_counter() - start_time:.2f} s: "
+              f"{len(check_mismatches)} mismatching footprints")
+        for check_nb_of_users, check_key, replayed, rebuilt in check_mismatches:
+            print(f"    {check_nb_of_users:.3g} users, {check_key}: replayed {replayed}, rebuilt {rebuilt}")
+        if check_mismatches:
+            sys.exit(1)
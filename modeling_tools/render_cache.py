@@ -0,0 +1,325 @@
+"""
+Headless mode and on-disk cache for the HTML plots and object relationship graphs rendered by modelings.
+
+Modeling scripts render System.plot_footprints_by_category_and_object and object_relationship_graph_to_file on every
+run, which in batch runs costs more than the footprint computation. Inside a rendering context, these methods:
+    - do nothing in headless mode,
+    - otherwise write the file from the cache when the same object was already rendered with the same arguments,
+      and render it when it wasn’t.
+Renders happen in the calling thread by default, and the methods return what the e-footprint methods return. With
+background=True, renders missing from the cache happen in a single background thread while the modeling goes on. They
+render a snapshot of the object and of all the objects it links to, copied in the calling thread, so that changes made
+to the objects after the call don’t end up in the file, and return None. Renderer.wait waits for them, and the
+rendering context when it exits.
+
+Cache keys are the hash of the rendering method, its arguments, the e-footprint version and the inputs of the rendered
+object and of all objects it links to, serialized with system_to_json without calculated attributes, since they are
+computed from the inputs. The random ids of modeling objects are replaced by their order in the serialization, so that
+two builds of the same modeling share their cache entries.
+
+Environment variables:
+    EFOOTPRINT_MODELINGS_HEADLESS: when set to 1, plots and graphs aren’t rendered.
+    EFOOTPRINT_MODELINGS_RENDER_CACHE_DIR: cache directory, defaults to ~/.cache/e-footprint-modelings/renders.
+    EFOOTPRINT_MODELINGS_RENDER_CACHE_MAX_SIZE_MB: maximum cache size, defaults to 200 MB.
+
+Usage:
+    with rendering() as renderer:
+        system = build_system()
+        system.plot_footprints_by_category_and_object()
+    print(renderer.stats)
+
+    python -m modeling_tools.render_cache info
+    python -m modeling_tools.render_cache clear
+"""
+import argparse
+import copy
+import datetime
+import enum
+import hashlib
+import json
+import os
+import shutil
+import types
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from modeling_tools.footprints import efootprint_version
+from modeling_tools.lookup_cache import LookupCache
+
+HEADLESS_ENV = "EFOOTPRINT_MODELINGS_HEADLESS"
+RENDER_CACHE_DIR_ENV = "EFOOTPRINT_MODELINGS_RENDER_CACHE_DIR"
+RENDER_CACHE_MAX_SIZE_ENV = "EFOOTPRINT_MODELINGS_RENDER_CACHE_MAX_SIZE_MB"
+DEFAULT_RENDER_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "e-footprint-modelings", "renders")
+DEFAULT_RENDER_CACHE_MAX_SIZE_IN_MB = 200
+# pyvis resources that object relationship graphs load from the working directory
+PYVIS_RESOURCES = ["bindings", "tom-select", "vis-9.1.2"]
+
+
+def is_headless():
+    return os.environ.get(HEADLESS_ENV, "0").lower() in ("1", "true", "yes")
+
+
+def render_cache():
+    max_size_in_mb = float(os.environ.get(RENDER_CACHE_MAX_SIZE_ENV, DEFAULT_RENDER_CACHE_MAX_SIZE_IN_MB))
+
+    return LookupCache(os.environ.get(RENDER_CACHE_DIR_ENV) or DEFAULT_RENDER_CACHE_DIR, max_size_in_mb * 1024 ** 2,
+                       offline=False)
+
+
+def replace_ids(json_value, canonical_ids):
+    if isinstance(json_value, dict):
+        return {canonical_ids.get(key, key): replace_ids(value, canonical_ids) for key, value in json_value.items()}
+    if isinstance(json_value, list):
+        return [replace_ids(value, canonical_ids) for value in json_value]
+    if isinstance(json_value, str):
+        return canonical_ids.get(json_value, json_value)
+
+    return json_value
+
+
+def inputs_fingerprint(mod_obj):
+    """
+    Return the hash of the inputs of mod_obj and of all the modeling objects it links to, independent of their ids.
+    """
+    from efootprint.api_utils.system_to_json import system_to_json
+
+    json_dict = system_to_json(mod_obj, False)
+    canonical_ids = {}
+    for class_name, objects_by_id in json_dict.items():
+        for mod_obj_id in objects_by_id:
+            canonical_ids[mod_obj_id] = f"{class_name}-{len(canonical_ids)}"
+    serialized_inputs = json.dumps(replace_ids(json_dict, canonical_ids), sort_keys=True, default=str)
+
+    return hashlib.sha256(serialized_inputs.encode("utf-8")).hexdigest()
+
+
+def instance_dict(obj):
+    # Read through object, as some e-footprint classes forward missing attributes to the object they wrap
+    try:
+        return object.__getattribute__(obj, "__dict__")
+    except AttributeError:
+        return None
+
+
+def snapshot(mod_obj):
+    """
+    Copy mod_obj and all the objects it links to, so that renders of the copy don’t show later changes to them.
+
+    copy.deepcopy fails on modeling objects, whose hashes and attribute lookups need their attributes before deepcopy
+    restores them. Objects are therefore all created empty first, then given copies of their attributes, and dicts,
+    lists and sets are filled last, once the modeling objects they hold can be hashed. NumPy, pandas and pint values are
+    deep copied, and immutable values and objects that can’t be created empty are shared.
+    """
+    import numpy as np
+    import pandas as pd
+    import pint
+
+    shared_types = (str, bytes, int, float, complex, bool, type(None), type, enum.Enum, types.ModuleType,
+                    types.FunctionType, types.BuiltinFunctionType, types.MethodType, datetime.date, datetime.time,
+                    datetime.timedelta, datetime.tzinfo)
+    value_types = (np.ndarray, np.generic, pd.DataFrame, pd.Series, pd.Index, pint.Quantity)
+    container_types = (dict, list, set)
+    copies = {}
+    originals = []
+    objs_to_visit = [mod_obj]
+    while objs_to_visit:
+        obj = objs_to_visit.pop()
+        if isinstance(obj, shared_types + value_types) or id(obj) in copies:
+            continue
+        if isinstance(obj, tuple):
+            objs_to_visit.extend(obj)
+            continue
+        obj_dict = instance_dict(obj)
+        if isinstance(obj, container_types):
+            copies[id(obj)] = type(obj).__new__(type(obj))
+            objs_to_visit.extend(obj)
+            if isinstance(obj, dict):
+                objs_to_visit.extend(obj.values())
+        elif obj_dict is not None and type(obj).__new__ is object.__new__:
+            copies[id(obj)] = object.__new__(type(obj))
+        else:
+            continue
+        originals.append(obj)
+        if obj_dict:
+            objs_to_visit.extend(obj_dict.values())
+
+    def copied(value):
+        if id(value) in copies:
+            return copies[id(value)]
+        if isinstance(value, tuple):
+            return tuple(copied(item) for item in value)
+        if isinstance(value, value_types):
+            return copy.deepcopy(value)
+
+        return value
+
+    for obj in originals:
+        obj_dict = instance_dict(obj)
+        if obj_dict:
+            instance_dict(copies[id(obj)]).update({key: copied(value) for key, value in obj_dict.items()})
+    # Filled through the base classes, as the e-footprint containers link what they hold to the modeling objects
+    for obj in originals:
+        if isinstance(obj, dict):
+            dict.update(copies[id(obj)], {copied(key): copied(value) for key, value in obj.items()})
+        elif isinstance(obj, list):
+            list.extend(copies[id(obj)], [copied(item) for item in obj])
+        elif isinstance(obj, set):
+            set.update(copies[id(obj)], [copied(item) for item in obj])
+
+    return copies[id(mod_obj)]
+
+
+def copy_pyvis_resources():
+    """
+    Copy the pyvis resources to the working directory, as pyvis does when it renders a graph.
+    """
+    import pyvis
+
+    for resource in PYVIS_RESOURCES:
+        resource_path = os.path.join("lib", resource)
+        if not os.path.exists(resource_path):
+            shutil.copytree(os.path.join(os.path.dirname(pyvis.__file__), "templates", "lib", resource), resource_path)
+
+
+class Renderer:
+    """
+    Skips, reads from the cache or renders the plots and graphs of modeling objects.
+
+    Args:
+        headless: whether to skip rendering, defaults to the EFOOTPRINT_MODELINGS_HEADLESS environment variable.
+        cache: LookupCache holding the rendered files, defaults to the render cache of the environment variables.
+        background: whether to render snapshots of the objects missing from the cache in a background thread instead
+            of rendering them in the calling one.
+
+    Attributes:
+        stats: numbers of renders "skipped" in headless mode, read from the cache ("hits") and "rendered".
+    """
+    def __init__(self, headless=None, cache=None, background=False):
+        self.headless = is_headless() if headless is None else headless
+        self.cache = cache or render_cache()
+        self.executor = ThreadPoolExecutor(max_workers=1) if background else None
+        self.futures = []
+        self.stats = {"skipped": 0, "hits": 0, "rendered": 0}
+
+    def render(self, render_method, mod_obj, filename, args, kwargs, uses_pyvis=False, file_result=None):
+        """
+        Render mod_obj to filename with render_method, or write filename from the cache.
+
+        Args:
+            file_result: function of the filename returning what render_method returns, for cache hits.
+        Returns:
+            what render_method returns, None in headless mode and for background renders.
+        """
+        if self.headless:
+            self.stats["skipped"] += 1
+            return None
+        arguments = {"render": render_method.__name__, "efootprint_version": efootprint_version(),
+                     "inputs": inputs_fingerprint(mod_obj), "args": repr(args), "kwargs": repr(sorted(kwargs.items()))}
+        # Cache hits don’t read the objects, so only renders are left to the background thread
+        if self.executor is not None and not os.path.exists(self.cache.entry_path(self.cache.key("render", arguments))):
+            self.futures.append(self.executor.submit(
+                self.render_to_file, render_method, snapshot(mod_obj), os.path.abspath(filename), arguments, args,
+                kwargs, uses_pyvis, file_result))
+            return None
+
+        return self.render_to_file(render_method, mod_obj, filename, arguments, args, kwargs, uses_pyvis, file_result)
+
+    def render_to_file(self, render_method, mod_obj, filename, arguments, args, kwargs, uses_pyvis, file_result):
+        render_results = []
+
+        def render_file():
+            render_results.append(render_method(mod_obj, filename, *args, **kwargs))
+            with open(filename) as file:
+                return file.read()
+
+        content = self.cache.get("render", arguments, render_file)
+        if render_results:
+            self.stats["rendered"] += 1
+            return render_results[0]
+        self.stats["hits"] += 1
+        with open(filename, "w") as file:
+            file.write(content)
+        if uses_pyvis:
+            copy_pyvis_resources()
+
+        return file_result(filename) if file_result is not None else None
+
+    def wait(self):
+        """
+        Wait for the background renders to end, and raise the error of the first failed one.
+        """
+        futures, self.futures = self.futures, []
+        for future in futures:
+            future.result()
+
+    def close(self):
+        try:
+            self.wait()
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown()
+
+
+def html_file(filename):
+    from IPython.display import HTML
+
+    return HTML(filename)
+
+
+def rendering_method(renderer, render_method, default_filename, uses_pyvis=False, file_result=None):
+    def wrapper(mod_obj, filename=None, *args, **kwargs):
+        # Renders for notebooks return their content instead of writing a file
+        if kwargs.get("notebook") or kwargs.get("return_only_html"):
+            return render_method(mod_obj, filename, *args, **kwargs)
+        return renderer.render(render_method, mod_obj, filename or default_filename(mod_obj), args, kwargs, uses_pyvis,
+                               file_result)
+
+    wrapper.__wrapped__ = render_method
+
+    return wrapper
+
+
+@contextmanager
+def rendering(headless=None, cache=None, background=False):
+    """
+    Route the plots and object relationship graphs rendered while the context is active through a Renderer, and wait
+    for its background renders when the context exits.
+    """
+    from efootprint.abstract_modeling_classes.modeling_object import ModelingObject
+    from efootprint.core.system import System
+
+    renderer = Renderer(headless, cache, background)
+    # Plots return the IPython HTML object of their file, graphs only return one in notebooks
+    patched_methods = [
+        (System, "plot_footprints_by_category_and_object", lambda system: f"{system.name} footprints.html", False,
+         html_file),
+        (ModelingObject, "object_relationship_graph_to_file",
+         lambda mod_obj: os.path.join(".", f"{mod_obj.name} object relationship graph.html"), True, None)]
+    original_methods = []
+    for cls, method_name, default_filename, uses_pyvis, file_result in patched_methods:
+        render_method = cls.__dict__[method_name]
+        if hasattr(render_method, "__wrapped__"):
+            continue
+        original_methods.append((cls, method_name, render_method))
+        setattr(cls, method_name, rendering_method(renderer, render_method, default_filename, uses_pyvis, file_result))
+    try:
+        yield renderer
+    finally:
+        for cls, method_name, render_method in original_methods:
+            setattr(cls, method_name, render_method)
+        renderer.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("info", help="Print the cache location and size.")
+    subparsers.add_parser("clear", help="Remove all cache entries.")
+    args = parser.parse_args()
+
+    if args.command == "info":
+        cache_info = render_cache().info()
+        del cache_info["offline"]
+        print(json.dumps(cache_info, indent=4))
+    elif args.command == "clear":
+        render_cache().clear()
@@ -0,0 +1,219 @@
+"""
+Daily, weekly, monthly and yearly rollups of the footprints of a System, per object and per category.
+
+Dashboards showing footprints over time re-aggregate the 8,760 hourly values per year of every server, storage,
+network and device on every view. This module aggregates them once: the hourly footprints of all objects are stacked
+in one hours x objects matrix in kg, summed into days with one np.add.reduceat over the hours, and the daily tier is
+summed into weeks and months, and months into years, the same way, so that no tier but the daily one reads the hourly
+values. Category tiers sum the object columns of each category and footprint type.
+
+e-footprint 9 computes hourly footprints over the modeling period. Older versions, like the one of Paylib, only
+compute yearly footprints, which are spread evenly over the hours of one year starting at start_date, so that their
+tiers have the same layout.
+
+Tiers are written as CSV files in long format, with period, category, object, type and footprint_in_kg columns, next
+to the hourly values of a columnar export, see columnar_export.py, or to any output directory.
+
+Usage:
+    tiers = footprint_rollups(system)
+    monthly_server_footprints = tiers.by_object["monthly"]["Servers"]
+
+    python -m modeling_tools.rollups ai_use_case rollups/ai_use_case
+    python -m modeling_tools.rollups paylib rollups/paylib --start-date 2025-01-01
+"""
+import argparse
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from modeling_tools.footprints import footprints_by_object, hourly_footprints_by_object, hourly_magnitudes
+
+# Tier name: (pandas period frequency, finer tier it is aggregated from), weeks overlapping months and years
+TIERS = {"daily": ("D", None), "weekly": ("W", "daily"), "monthly": ("M", "daily"), "yearly": ("Y", "monthly")}
+ROLLUPS_DIRNAME = "rollups"
+COLUMN_LEVELS = ["category", "object", "type"]
+
+
+def hourly_footprint_matrix(system, start_date=None):
+    """
+    Return the hourly footprints of every object of a System in kg, as an hours x objects array.
+
+    Args:
+        system: System built with any e-footprint version.
+        start_date: first hour of the year over which the yearly footprints of e-footprint versions before 9 are
+            spread, defaults to January 1st of the current year. Ignored for e-footprint 9.
+    Returns:
+        (array, hourly pandas PeriodIndex of its rows, pandas MultiIndex of its (category, object, type) columns).
+    """
+    from efootprint.constants.units import u
+
+    if not hasattr(system, "fabrication_footprint_sum_over_period"):
+        start_date = start_date or datetime(datetime.now().year, 1, 1)
+        nb_of_hours = int((start_date.replace(year=start_date.year + 1) - start_date).total_seconds() // 3600)
+        hourly_index = pd.period_range(start=start_date, periods=nb_of_hours, freq="h")
+        footprints = footprints_by_object(system)
+        yearly_values = np.array([footprint["value"] for footprint in footprints], dtype=np.float64)
+        matrix = np.broadcast_to(yearly_values / len(hourly_index), (len(hourly_index), len(footprints)))
+        columns = pd.MultiIndex.from_tuples(
+            [(footprint["category"], footprint["object"], footprint["type"]) for footprint in footprints],
+            names=COLUMN_LEVELS)
+
+        return matrix, hourly_index, columns
+
+    hourly_footprints = hourly_footprints_by_object(system)
+    columns = pd.MultiIndex.from_tuples(list(hourly_footprints.keys()), names=COLUMN_LEVELS)
+    values_and_starts = []
+    for footprint in hourly_footprints.values():
+        values = hourly_magnitudes(footprint, u.kg)
+        values_and_starts.append((values, footprint.value.index[0] if len(values) > 0 else None))
+    starts = [start for _, start in values_and_starts if start is not None]
+    if not starts:
+        raise ValueError(f"{system.name} has no hourly footprint to roll up")
+    first_hour = min(starts)
+    nb_of_hours = max((start - first_hour).n + len(values) for values, start in values_and_starts if start is not None)
+    # Objects used over part of the modeling period only are placed at their offset, zeros elsewhere
+    matrix = np.zeros((nb_of_hours, len(columns)))
+    for column, (values, start) in enumerate(values_and_starts):
+        if start is not None:
+            offset = (start - first_hour).n
+            matrix[offset:offset + len(values), column] = values
+
+    return matrix, pd.period_range(start=first_hour, periods=nb_of_hours, freq="h"), columns
+
+
+def aggregate_periods(matrix, period_index, freq):
+    """
+    Sum the consecutive rows of matrix falling in the same period of frequency freq, in one vectorized pass.
+
+    Returns:
+        (aggregated array, PeriodIndex of its rows).
+    """
+    coarse_index = period_index.asfreq(freq)
+    ordinals = coarse_index.asi8
+    period_starts = np.concatenate([[0], np.flatnonzero(np.diff(ordinals)) + 1])
+
+    return np.add.reduceat(matrix, period_starts, axis=0), coarse_index[period_starts]
+
+
+@dataclass
+class FootprintRollups:
+    """
+    Footprint tiers of a System, in kg.
+
+    Attributes:
+        by_object: {tier: DataFrame indexed by period with (category, object, type) columns}.
+        by_category: {tier: DataFrame indexed by period with (category, type) columns}.
+    """
+    by_object: Dict[str, pd.DataFrame]
+    by_category: Dict[str, pd.DataFrame]
+
+    def total(self, tier):
+        return self.by_category[tier].sum(axis=1).rename("footprint_in_kg")
+
+
+def rollup_tiers(matrix, hourly_index, columns):
+    """
+    Return the FootprintRollups of an hourly footprint matrix, see hourly_footprint_matrix.
+    """
+    category_columns = columns.droplevel("object")
+    unique_category_columns = category_columns.unique()
+    # Objects x categories 0/1 matrix, to sum the object columns of each category with one product
+    category_membership = (
+        unique_category_columns.get_indexer(category_columns)[:, None] == np.arange(len(unique_category_columns)))
+
+    by_object, by_category = {}, {}
+    for tier, (freq, finer_tier) in TIERS.items():
+        if finer_tier is None:
+            tier_values, tier_index = aggregate_periods(matrix, hourly_index, freq)
+        else:
+            tier_values, tier_index = aggregate_periods(
+                by_object[finer_tier].values, by_object[finer_tier].index, freq)
+        by_object[tier] = pd.DataFrame(tier_values, index=tier_index, columns=columns)
+        by_category[tier] = pd.DataFrame(
+            tier_values @ category_membership, index=tier_index, columns=unique_category_columns)
+
+    return FootprintRollups(by_object, by_category)
+
+
+def footprint_rollups(system, start_date=None):
+    """
+    Return the daily, weekly, monthly and yearly FootprintRollups of a System, see hourly_footprint_matrix.
+    """
+    return rollup_tiers(*hourly_footprint_matrix(system, start_date))
+
+
+def long_format(tier_frame):
+    """
+    Return a tier DataFrame as one row per period and column, with a footprint_in_kg column.
+    """
+    long_frame = tier_frame.stack(list(range(tier_frame.columns.nlevels)), future_stack=True).rename(
+        "footprint_in_kg").reset_index()
+
+    return long_frame.rename(columns={long_frame.columns[0]: "period"})
+
+
+def write_rollups(rollups, output_dir):
+    """
+    Write the tiers of rollups to output_dir/rollups, as {tier}_by_object.csv and {tier}_by_category.csv files.
+
+    Returns:
+        list of the written file paths.
+    """
+    rollups_dir = os.path.join(output_dir, ROLLUPS_DIRNAME)
+    os.makedirs(rollups_dir, exist_ok=True)
+    written_paths = []
+    for level, tiers in (("object", rollups.by_object), ("category", rollups.by_category)):
+        for tier, tier_frame in tiers.items():
+            file_path = os.path.join(rollups_dir, f"{tier}_by_{level}.csv")
+            long_format(tier_frame).to_csv(file_path, index=False)
+            written_paths.append(file_path)
+
+    return written_paths
+
+
+def read_rollup(output_dir, tier, level="object", **filters):
+    """
+    Read a tier written by write_rollups, without reading any hourly value.
+
+    Args:
+        output_dir: directory given to write_rollups.
+        tier: one of TIERS.
+        level: "object" or "category".
+        filters: values of the category, object or type columns to keep, like category="Servers".
+    Returns:
+        DataFrame with period, category, object for the object level, type and footprint_in_kg columns.
+    """
+    if tier not in TIERS:
+        raise ValueError(f"Unknown tier {tier}, should be one of {list(TIERS.keys())}")
+    if level not in ("object", "category"):
+        raise ValueError(f"Unknown level {level}, should be object or category")
+    rollup = pd.read_csv(os.path.join(output_dir, ROLLUPS_DIRNAME, f"{tier}_by_{level}.csv"))
+    for column, value in filters.items():
+        if column not in rollup.columns:
+            raise ValueError(f"Can’t filter {tier} rollups by {column}, columns are {list(rollup.columns)}")
+        rollup = rollup[rollup[column] == value]
+
+    return rollup.reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("modeling")
+    parser.add_argument("output_dir")
+    parser.add_argument("--start-date", type=datetime.fromisoformat, default=None,
+                        help="Start of the year over which yearly footprints of e-footprint versions before 9 are "
+                             "spread, defaults to January 1st of the current year.")
+    args = parser.parse_args()
+
+    from modeling_tools.modelings import get_modeling
+    from modeling_tools.run_modeling import build_for_analysis
+
+    modeling_system = build_for_analysis(get_modeling(args.modeling))
+    system_rollups = footprint_rollups(modeling_system, args.start_date)
+    for rollup_path in write_rollups(system_rollups, args.output_dir):
+        print(f"Wrote {rollup_path}")
+    print(system_rollups.by_category["monthly"].round(1).to_string())
@@ -0,0 +1,139 @@
+"""
+Run one modeling in the current process and write its footprints to a JSON file.
+
+This script is the worker side of batch_runner.py: it is launched in a fresh Python process, with the run directory as
+working directory, so that every file the modeling writes ends up in the run directory.
+
+Usage:
+    python -m modeling_tools.run_modeling ai_use_case --modeling-dir runs/0/ai_use_case --output result.json
+        --params '{"base_daily_nb_of_visits": 5000}'
+"""
+import argparse
+import importlib
+import json
+import os
+import runpy
+import sys
+import tempfile
+import time
+from contextlib import nullcontext
+
+from modeling_tools.footprints import footprint_unit, footprints_by_object, efootprint_version
+from modeling_tools.legacy_adapter import legacy_api
+from modeling_tools.lookup_cache import cached_boaviztapi_calls, import_boavizta_modules
+from modeling_tools.modelings import get_modeling
+from modeling_tools.render_cache import rendering
+
+
+def add_import_paths(modeling, modeling_dir):
+    for import_path in modeling.import_paths:
+        sys.path.insert(0, os.path.abspath(os.path.join(modeling_dir, import_path)))
+
+
+def load_builder(modeling, modeling_dir):
+    """
+    Return the function building the System of a modeling from keyword arguments.
+    """
+    if modeling.builder is None:
+        raise ValueError(f"Modeling {modeling.directory} has no builder function")
+    add_import_paths(modeling, modeling_dir)
+    module_name, function_name = modeling.builder.split(":")
+
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def modeling_api(modeling, modeling_dir):
+    """
+    Return the context in which the scripts of a modeling whose sources are in modeling_dir are run: legacy_adapter.py
+    translates modelings written for e-footprint 1.x or 2.x when e-footprint 9 or later is installed.
+    """
+    if modeling.legacy_api is not None and int(efootprint_version().split(".")[0]) >= 9:
+        return legacy_api(modeling.legacy_api, modeling_dir)
+
+    return nullcontext()
+
+
+def run_modeling_script(modeling, modeling_dir):
+    """
+    Run the script of a modeling whose sources are in modeling_dir as __main__, side effects included, and return its
+    globals.
+    """
+    with modeling_api(modeling, modeling_dir):
+        add_import_paths(modeling, modeling_dir)
+
+        return runpy.run_path(os.path.join(modeling_dir, modeling.script), run_name="__main__")
+
+
+def build_modeling_system(modeling, modeling_dir, params):
+    """
+    Build the System of a modeling whose sources are in modeling_dir.
+
+    Without params the modeling script is run as __main__, side effects included. With params the System is built
+    by the modeling builder function, which must exist. Modelings written for e-footprint 1.x or 2.x are built through
+    legacy_adapter.py when e-footprint 9 or later is installed.
+    """
+    if not params:
+        return run_modeling_script(modeling, modeling_dir)[modeling.system_variable]
+
+    if modeling.builder is None:
+        raise ValueError(
+            f"Modeling {modeling.directory} has no builder function, so it can’t be run with parameters {params}")
+    with modeling_api(modeling, modeling_dir):
+        return load_builder(modeling, modeling_dir)(**params)
+
+
+def run_modeling(modeling_name, modeling_dir, params=None):
+    modeling = get_modeling(modeling_name)
+    start = time.perf_counter()
+    import_boavizta_modules()
+    with cached_boaviztapi_calls(), rendering(background=True):
+        system = build_modeling_system(modeling, modeling_dir, params)
+    footprints = footprints_by_object(system)
+
+    return {
+        "modeling": modeling_name,
+        "params": params or {},
+        "efootprint_version": efootprint_version(),
+        "system": system.name,
+        "duration_in_s": round(time.perf_counter() - start, 3),
+        "total_footprint": sum(footprint["value"] for footprint in footprints),
+        "footprint_unit": footprint_unit(system),
+        "footprints": footprints,
+    }
+
+
+def run_for_analysis(build_function, *args):
+    """
+    Call a build function of run_modeling.py for an analysis tool, with cached Boavizta API calls. The modeling script
+    runs in a temporary working directory without rendering plots and graphs, so that the files it writes, like the
+    system_to_json.json of the AI use case, don’t end up in the current one.
+    """
+    import_boavizta_modules()
+    working_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as build_dir, cached_boaviztapi_calls(), rendering(headless=True):
+        os.chdir(build_dir)
+        try:
+            return build_function(*args)
+        finally:
+            os.chdir(working_dir)
+
+
+def build_for_analysis(modeling, params=None):
+    """
+    Build the System of a modeling from its sources in the repository for an analysis tool, see run_for_analysis.
+    """
+    return run_for_analysis(build_modeling_system, modeling, modeling.path, params)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("modeling")
+    parser.add_argument("--modeling-dir", required=True, help="Directory holding the modeling sources to run.")
+    parser.add_argument("--output", required=True, help="JSON file to write the results to.")
+    parser.add_argument("--params", default="{}", help="JSON dict of keyword arguments for the modeling builder.")
+    args = parser.parse_args()
+
+    result = run_modeling(args.modeling, args.modeling_dir, json.loads(args.params))
+
+    with open(args.output, "w") as file:
+        file.write(json.dumps(result, indent=4))
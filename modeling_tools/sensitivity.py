@@ -0,0 +1,319 @@
+"""
+Ranking of the SourceValues of a built System by the elasticity of its total footprint to each of them.
+
+Every SourceValue a footprint of the System is computed from, like the GPU power or the lifespan of a server, is
+multiplied by 1 + relative_step then by 1 - relative_step, the others staying at their value, and the elasticity
+(footprint(+step) - footprint(-step)) / (2 * relative_step * footprint) is computed: an elasticity of 1 means the
+total footprint is proportional to the input, 0 that it doesn’t depend on it. As in monte_carlo.py, SourceValues
+sharing a label and a value, like the powers of several default laptops, are perturbed together.
+
+Perturbations aren’t evaluated through one rebuild per input:
+    - with e-footprint 1.x and 2.x, all of them are evaluated in one batch by replaying the calculation graph of the
+      footprints with MonteCarlo.propagate, with one array of two values per input in place of each SourceValue,
+    - with e-footprint 9, whose footprints are hourly, the System is built once and each perturbation is a
+      WhatIfSession update, which only recomputes the calculated attributes downstream of the input, split between
+      forked worker processes.
+
+Usage:
+    sensitivity_result = compute_sensitivity(system, relative_step=0.1)
+    print_ranking(sensitivity_result, limit=20)
+
+    python -m modeling_tools.sensitivity bloom --step 0.1 --output bloom_sensitivity.csv
+"""
+import argparse
+import csv
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+
+DEFAULT_RELATIVE_STEP = 0.1
+# System inherited by the worker processes forked by incremental_sensitivity
+forked_system = None
+
+
+@dataclass
+class InputSensitivity:
+    """
+    Sensitivity of the total footprint to one input.
+
+    Attributes:
+        label: label of the input SourceValues.
+        value: value of the input, with its unit.
+        nb_of_source_values: number of SourceValues perturbed together.
+        footprint_up: total footprint with the input multiplied by 1 + relative_step.
+        footprint_down: total footprint with the input multiplied by 1 - relative_step.
+        elasticity: relative change of the total footprint divided by the relative change of the input.
+        error: message of the error raised by the perturbation, if any.
+    """
+    label: str
+    value: str
+    nb_of_source_values: int
+    footprint_up: float = math.nan
+    footprint_down: float = math.nan
+    elasticity: float = math.nan
+    error: str = None
+
+
+@dataclass
+class SensitivityResult:
+    """
+    Sensitivities of the total footprint of a System to all its inputs.
+
+    Attributes:
+        inputs: list of InputSensitivity.
+        base_footprint: total footprint of the System.
+        unit: unit of the footprints.
+        relative_step: relative perturbation of the inputs.
+        duration_in_s: duration of the evaluation of all perturbations.
+    """
+    inputs: List[InputSensitivity]
+    base_footprint: float
+    unit: str
+    relative_step: float
+    duration_in_s: float = 0
+
+    def ranked(self):
+        """
+        Returns:
+            list of InputSensitivity by decreasing absolute elasticity then by label, those in error last.
+        """
+        return sorted(self.inputs, key=lambda input_sensitivity: (
+            input_sensitivity.error is not None, -abs(np.nan_to_num(input_sensitivity.elasticity)),
+            input_sensitivity.label))
+
+    def write_csv(self, output_path):
+        with open(output_path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["rank", "input", "value", "nb_of_source_values", f"footprint_up_in_{self.unit}",
+                             f"footprint_down_in_{self.unit}", "elasticity", "error"])
+            for rank, input_sensitivity in enumerate(self.ranked(), start=1):
+                writer.writerow([rank, input_sensitivity.label, input_sensitivity.value,
+                                 input_sensitivity.nb_of_source_values, input_sensitivity.footprint_up,
+                                 input_sensitivity.footprint_down, input_sensitivity.elasticity,
+                                 input_sensitivity.error or ""])
+
+
+def is_source_value(explainable_object):
+    from efootprint.abstract_modeling_classes.source_objects import SourceValue
+
+    return isinstance(explainable_object, SourceValue)
+
+
+def elasticity(footprint_up, footprint_down, base_footprint, relative_step):
+    if base_footprint == 0:
+        return 0 if footprint_up == footprint_down else math.inf
+
+    return (footprint_up - footprint_down) / (2 * relative_step * base_footprint)
+
+
+def batch_sensitivity(system, relative_step=DEFAULT_RELATIVE_STEP):
+    """
+    Evaluate all perturbations of the inputs of a System built with e-footprint 1.x or 2.x in one replay of its
+    calculation graph. When the replay fails, inputs are evaluated one by one to isolate those it can’t propagate.
+    """
+    from efootprint.constants.units import u
+
+    from modeling_tools.monte_carlo import MonteCarlo
+
+    start = time.perf_counter()
+    monte_carlo = MonteCarlo(system, default_relative_spread=0)
+    inputs = monte_carlo.hypotheses(is_source_value)
+    base_footprint = sum(float(footprint_node.value.to(u.kg / u.year).magnitude)
+                         for footprint_node in monte_carlo.footprint_nodes().values())
+
+    def perturbed_total_footprints(labels):
+        # Values 2 * i and 2 * i + 1 of the arrays are the perturbations up and down of the ith input
+        nb_of_values = 2 * len(labels)
+        values_by_node_id = {}
+        for input_index, label in enumerate(labels):
+            for source_value in inputs[label]:
+                magnitudes = np.full(nb_of_values, float(source_value.value.magnitude))
+                magnitudes[2 * input_index] *= 1 + relative_step
+                magnitudes[2 * input_index + 1] *= 1 - relative_step
+                values_by_node_id[id(source_value)] = magnitudes * source_value.value.units
+        footprints, _ = monte_carlo.propagate(values_by_node_id, nb_of_values)
+
+        return sum(footprints.values())
+
+    input_sensitivities = {label: InputSensitivity(label, str(source_values[0].value), len(source_values))
+                           for label, source_values in inputs.items()}
+    try:
+        labels_batches = [list(inputs.keys())]
+        total_footprints_batches = [perturbed_total_footprints(labels_batches[0])]
+    except ValueError:
+        labels_batches, total_footprints_batches = [], []
+        for label in inputs:
+            try:
+                total_footprints_batches.append(perturbed_total_footprints([label]))
+                labels_batches.append([label])
+            except ValueError as error:
+                input_sensitivities[label].error = str(error)
+    for labels, total_footprints in zip(labels_batches, total_footprints_batches):
+        for input_index, label in enumerate(labels):
+            input_sensitivity = input_sensitivities[label]
+            input_sensitivity.footprint_up = float(total_footprints[2 * input_index])
+            input_sensitivity.footprint_down = float(total_footprints[2 * input_index + 1])
+            input_sensitivity.elasticity = elasticity(
+                input_sensitivity.footprint_up, input_sensitivity.footprint_down, base_footprint, relative_step)
+
+    return SensitivityResult(list(input_sensitivities.values()), base_footprint, str(u.kg / u.year), relative_step,
+                             time.perf_counter() - start)
+
+
+def whatif_inputs(session):
+    """
+    Returns:
+        {label: list of SourceValues} of the inputs of the System of a WhatIfSession, the SourceValues of the System
+        when the session started for the inputs it changed.
+    """
+    from modeling_tools.monte_carlo import group_by_label
+
+    initial_hypotheses = {id(current_hypothesis): initial_hypothesis
+                          for initial_hypothesis, current_hypothesis in session.changes}
+    source_values = {}
+    for hypotheses in session.hypotheses().values():
+        for hypothesis in (hypotheses if isinstance(hypotheses, list) else [hypotheses]):
+            if is_source_value(hypothesis):
+                hypothesis = initial_hypotheses.get(id(hypothesis), hypothesis)
+                source_values[id(hypothesis)] = hypothesis
+
+    return group_by_label(source_values.values())
+
+
+def perturbed_total_footprint(session, source_values, factor):
+    """
+    Return the total footprint of the System of a WhatIfSession with source_values, SourceValues of the System when the
+    session started, multiplied by factor, then set them back to their values.
+    """
+    current_hypotheses = {id(initial_hypothesis): current_hypothesis
+                          for initial_hypothesis, current_hypothesis in session.changes}
+    try:
+        return session.update([(current_hypotheses.get(id(source_value), source_value), source_value.value * factor)
+                               for source_value in source_values]).total_footprint_after
+    finally:
+        session.reset()
+
+
+def perturb_inputs(labels, relative_step, session=None):
+    """
+    Apply the perturbations of some inputs of an e-footprint 9 System one after the other in one WhatIfSession, each
+    starting from the initial state of the System. Worker processes start a session on the System they inherit.
+
+    Returns:
+        list of (label, footprint up, footprint down, error message or None).
+    """
+    from modeling_tools.what_if import WhatIfSession
+
+    session = session if session is not None else WhatIfSession(forked_system)
+    inputs = whatif_inputs(session)
+    perturbations = []
+    for label in labels:
+        try:
+            footprint_up = perturbed_total_footprint(session, inputs[label], 1 + relative_step)
+            footprint_down = perturbed_total_footprint(session, inputs[label], 1 - relative_step)
+            perturbations.append((label, footprint_up, footprint_down, None))
+        except ValueError as error:
+            perturbations.append((label, math.nan, math.nan, str(error)))
+
+    return perturbations
+
+
+def incremental_sensitivity(system, relative_step=DEFAULT_RELATIVE_STEP, nb_of_workers=None):
+    """
+    Evaluate the perturbations of the inputs of an e-footprint 9 System with WhatIfSession updates, in nb_of_workers
+    processes forked from the current one, which inherit the built System. One process is used where fork isn’t
+    available.
+    """
+    global forked_system
+
+    from modeling_tools.what_if import WhatIfSession
+
+    start = time.perf_counter()
+    session = WhatIfSession(system)
+    inputs = whatif_inputs(session)
+    base_footprint = session.total_footprint()
+    labels = list(inputs.keys())
+    nb_of_workers = min(nb_of_workers or os.cpu_count(), len(labels))
+    if nb_of_workers > 1 and "fork" in multiprocessing.get_all_start_methods():
+        forked_system = system
+        try:
+            with ProcessPoolExecutor(nb_of_workers, mp_context=multiprocessing.get_context("fork")) as executor:
+                perturbations = [perturbation for worker_perturbations in executor.map(
+                    perturb_inputs, [labels[worker_index::nb_of_workers] for worker_index in range(nb_of_workers)],
+                    [relative_step] * nb_of_workers) for perturbation in worker_perturbations]
+        finally:
+            forked_system = None
+    else:
+        perturbations = perturb_inputs(labels, relative_step, session)
+
+    input_sensitivities = []
+    for label, footprint_up, footprint_down, error in perturbations:
+        input_sensitivities.append(InputSensitivity(
+            label, str(inputs[label][0].value), len(inputs[label]), footprint_up, footprint_down,
+            elasticity(footprint_up, footprint_down, base_footprint, relative_step), error))
+
+    return SensitivityResult(input_sensitivities, base_footprint, "kg", relative_step, time.perf_counter() - start)
+
+
+def compute_sensitivity(system, relative_step=DEFAULT_RELATIVE_STEP, nb_of_workers=None):
+    """
+    Compute the elasticity of the total footprint of a built System to each of its inputs.
+
+    Args:
+        system: System built with e-footprint 1.x, 2.x or 9.
+        relative_step: relative perturbation of the inputs, up and down.
+        nb_of_workers: number of processes evaluating the perturbations of an e-footprint 9 System, the number of
+            CPUs by default.
+    Returns:
+        a SensitivityResult, whose footprints are in kg / year for e-footprint 1.x and 2.x, and in kg over the
+        modeling period for e-footprint 9.
+    """
+    if not 0 < relative_step < 1:
+        raise ValueError(f"relative_step should be between 0 and 1, got {relative_step}")
+    if hasattr(system, "fabrication_footprint_sum_over_period"):
+        return incremental_sensitivity(system, relative_step, nb_of_workers)
+
+    return batch_sensitivity(system, relative_step)
+
+
+def print_ranking(sensitivity_result, limit=None):
+    ranked_inputs = sensitivity_result.ranked()
+    print(f"Total footprint {sensitivity_result.base_footprint:.1f} {sensitivity_result.unit}, inputs perturbed by "
+          f"±{sensitivity_result.relative_step:.0%}")
+    print(f"{'rank':>4} {'elasticity':>10} {'footprint up':>14} {'footprint down':>14}  input")
+    for rank, input_sensitivity in enumerate(ranked_inputs[:limit], start=1):
+        if input_sensitivity.error is not None:
+            print(f"{rank:>4} {'error':>10} {'':>14} {'':>14}  {input_sensitivity.label}: {input_sensitivity.error}")
+            continue
+        print(f"{rank:>4} {input_sensitivity.elasticity:>10.3f} {input_sensitivity.footprint_up:>14.1f} "
+              f"{input_sensitivity.footprint_down:>14.1f}  {input_sensitivity.label} = {input_sensitivity.value}")
+    print(f"{len(ranked_inputs)} inputs evaluated in {sensitivity_result.duration_in_s:.2f} s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("modeling")
+    parser.add_argument("--step", type=float, default=DEFAULT_RELATIVE_STEP, help="Relative perturbation of inputs.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes, e-footprint 9 modelings only.")
+    parser.add_argument("--top", type=int, default=None)
+    parser.add_argument("--output", default=None, help="CSV file to write the ranking to.")
+    args = parser.parse_args()
+
+    from modeling_tools.lookup_cache import cached_boaviztapi_calls
+    from modeling_tools.modelings import get_modeling
+    from modeling_tools.run_modeling import build_for_analysis
+
+    modeling_system = build_for_analysis(get_modeling(args.modeling))
+    # Updates of Boavizta servers call the Boavizta API again
+    with cached_boaviztapi_calls():
+        result = compute_sensitivity(modeling_system, args.step, args.workers)
+    print_ranking(result, args.top)
+    if args.output:
+        result.write_csv(args.output)
+        print(f"Ranking written to {args.output}")
@@ -0,0 +1,429 @@
+"""
+Parametric templates of modeling objects, to define a journey or usage pattern once and instantiate many variants.
+
+Modeling a product per country and per device family means thousands of usage patterns that differ by a few values,
+like the app download journeys of Paylib, which only differ by their download size. A Template holds the builder of a
+modeling object, a class like UserJourney or a function like default_smartphone, with its arguments, where:
+    - Param("data_download", u.MB / u.uj) is a slot replaced by the value of the data_download parameter,
+    - strings are formatted with the parameters, like "Téléchargement application {device_family}",
+    - nested Templates are instantiated with the same parameters,
+    - ExplainableObjects are copied for each instance, as e-footprint links each of them to one modeling object.
+
+Instances are interned: each Template builds one object per distinct value of the parameters it uses, including through
+its nested Templates, and returns it again for variants with the same values. Sub-objects that don’t depend on a
+parameter, like the store service or the smartphone device, are shared by all variants of a template, and the device
+population of a country and device family by all patterns of that country and family.
+
+Variants are also computed together: group_variants groups the variants that only differ by the parameters naming their
+objects, like the market, and by a parameter their footprints are linear in, like the number of users, so that each
+group is built as one usage pattern with the users of all its variants, and each variant gets the share of the group
+footprint of its users. The number of usage patterns, and with it the memory and build time of the System, then grows
+with the number of distinct values, like the countries and device families, not with the number of variants. Groups
+don’t round their values like their variants would: e-footprint 9 rounds hourly values to a few decimals, once per group
+instead of once per variant, and e-footprint 1.x also rounds up the number of user journeys in parallel of each usage
+pattern, which makes separate variants need a little more server resources.
+
+Usage:
+    download_step = Template(
+        UserJourneyStep, "Téléchargement store {device_family}", Template(smartphone_stores),
+        data_download=Param("data_download", u.MB / u.uj, Sources.USER_DATA), ...)
+    download_journey = Template(UserJourney, "Téléchargement application {device_family}", uj_steps=[download_step])
+    journeys = download_journey.instantiate_many(
+        [{"device_family": "Android", "data_download": 25}, {"device_family": "iPhone", "data_download": 32}])
+    groups = group_variants(parameter_grid(market=markets, device_family=device_families), "nb_of_users", ["market"])
+
+    python -m modeling_tools.templates --nb-of-markets 1 10 100 --device-families Android iPhone
+"""
+import argparse
+import copy
+import itertools
+import os
+import string
+import time
+import tracemalloc
+import types
+from typing import Dict, List
+
+
+def explainable_object_class():
+    from efootprint.abstract_modeling_classes.explainable_object_base_class import ExplainableObject
+
+    return ExplainableObject
+
+
+def fresh_explainable_object(explainable_object):
+    """
+    Return a copy of explainable_object that can be linked to another modeling object. Hypotheses are copied as
+    e-footprint copies them, and calculated values are recreated with the same parents, so that they still appear in
+    calculation graphs.
+    """
+    if explainable_object.left_parent is None and explainable_object.right_parent is None:
+        return copy.deepcopy(explainable_object)
+
+    return type(explainable_object)(
+        explainable_object.value, explainable_object.label, explainable_object.left_parent,
+        explainable_object.right_parent, explainable_object.operator)
+
+
+def format_fields(format_string):
+    return {field_name for _, field_name, _, _ in string.Formatter().parse(format_string) if field_name}
+
+
+def parameter_key(value):
+    """
+    Return a hashable key of a parameter value, equal for values that give the same modeling objects.
+    """
+    from pint import Quantity
+
+    if isinstance(value, Quantity):
+        return "quantity", float(value.magnitude), str(value.units)
+    if isinstance(value, explainable_object_class()):
+        if value.left_parent is None and value.right_parent is None:
+            return "hypothesis", parameter_key(value.value), value.label, getattr(value.source, "name", None)
+        return "calculated", id(value)
+    if isinstance(value, (list, tuple)):
+        return tuple(parameter_key(element) for element in value)
+    try:
+        hash(value)
+    except TypeError:
+        return "object", id(value)
+
+    return value
+
+
+class Param:
+    """
+    Slot of a Template, replaced by the value of a parameter when the Template is instantiated.
+
+    Args:
+        name: name of the parameter.
+        unit: pint unit of the parameter when its values are given as numbers, which then become SourceValues.
+        source: source of the SourceValues made from numbers or pint Quantities, defaults to the SourceValue default.
+        label: label of these SourceValues, formatted with the parameters, defaults to the e-footprint default label.
+    """
+    def __init__(self, name, unit=None, source=None, label=None):
+        self.name = name
+        self.unit = unit
+        self.source = source
+        self.label = label
+
+    @property
+    def parameter_names(self):
+        return {self.name} | (format_fields(self.label) if self.label else set())
+
+    def resolve(self, params):
+        from numbers import Number
+        from pint import Quantity
+        from efootprint.abstract_modeling_classes.source_objects import SourceValue
+
+        value = params[self.name]
+        if isinstance(value, Number) and not isinstance(value, bool) and self.unit is not None:
+            value = value * self.unit
+        if isinstance(value, Quantity):
+            source_value = SourceValue(value) if self.source is None else SourceValue(value, self.source)
+            if self.label:
+                source_value.set_label(self.label.format(**params))
+            return source_value
+
+        return resolve_argument(value, params)
+
+    def __repr__(self):
+        return f"Param({self.name!r})"
+
+
+def argument_parameter_names(argument):
+    if isinstance(argument, (Template, Param)):
+        return argument.parameter_names
+    if isinstance(argument, str):
+        return format_fields(argument)
+    if isinstance(argument, (list, tuple)):
+        return set().union(*[argument_parameter_names(element) for element in argument])
+    if isinstance(argument, dict):
+        return set().union(*[argument_parameter_names(element) for element in argument.values()])
+
+    return set()
+
+
+def resolve_argument(argument, params):
+    if isinstance(argument, Template):
+        return argument.instantiate(**params)
+    if isinstance(argument, Param):
+        return argument.resolve(params)
+    if isinstance(argument, str):
+        return argument.format(**params) if format_fields(argument) else argument
+    if isinstance(argument, (list, tuple)):
+        return type(argument)(resolve_argument(element, params) for element in argument)
+    if isinstance(argument, dict):
+        return {key: resolve_argument(value, params) for key, value in argument.items()}
+    if isinstance(argument, explainable_object_class()):
+        return fresh_explainable_object(argument)
+
+    return argument
+
+
+class Template:
+    """
+    Builder of a modeling object with parameter slots, whose instances are interned by parameter values.
+
+    Args:
+        builder: class or function building the modeling object.
+        args, kwargs: arguments of builder, which can hold Params, Templates and strings formatted with the
+            parameters, also inside lists.
+
+    Attributes:
+        instances: {parameter key: built object} of the distinct instances built so far.
+    """
+    def __init__(self, builder, *args, **kwargs):
+        self.builder = builder
+        self.args = args
+        self.kwargs = kwargs
+        self.parameter_names = argument_parameter_names(list(args) + list(kwargs.values()))
+        self.instances = {}
+
+    def instance_key(self, params):
+        missing_names = self.parameter_names - set(params.keys())
+        if missing_names:
+            raise ValueError(f"Parameters {sorted(missing_names)} of the {self} template aren’t given")
+
+        return tuple((name, parameter_key(params[name])) for name in sorted(self.parameter_names))
+
+    def instantiate(self, **params):
+        """
+        Return the object built with params, the same one as for a previous instantiation with the same values of the
+        parameters this Template uses. Parameters it doesn’t use are ignored.
+        """
+        key = self.instance_key(params)
+        if key not in self.instances:
+            self.instances[key] = self.builder(
+                *[resolve_argument(arg, params) for arg in self.args],
+                **{name: resolve_argument(value, params) for name, value in self.kwargs.items()})
+
+        return self.instances[key]
+
+    __call__ = instantiate
+
+    def instantiate_many(self, params_list: List[Dict]):
+        return [self.instantiate(**params) for params in params_list]
+
+    def clear(self):
+        """
+        Forget the built instances, of this Template and of its nested Templates.
+        """
+        self.instances = {}
+        for argument in list(self.args) + list(self.kwargs.values()):
+            for nested_template in nested_templates(argument):
+                nested_template.clear()
+
+    def __repr__(self):
+        return getattr(self.builder, "__name__", repr(self.builder))
+
+
+def nested_templates(argument):
+    if isinstance(argument, Template):
+        return [argument]
+    if isinstance(argument, (list, tuple)):
+        return sum([nested_templates(element) for element in argument], start=[])
+    if isinstance(argument, dict):
+        return sum([nested_templates(element) for element in argument.values()], start=[])
+
+    return []
+
+
+def parameter_grid(**values_by_parameter):
+    """
+    Return the list of parameter dicts of all combinations of values_by_parameter, a {parameter name: list of values}
+    dict. Values that are dicts give several parameters at once, like {"device_family": "Android", "data_download": 25}.
+    """
+    names = list(values_by_parameter.keys())
+    grid = []
+    for combination in itertools.product(*values_by_parameter.values()):
+        params = {}
+        for name, value in zip(names, combination):
+            if isinstance(value, dict):
+                params.update(value)
+            else:
+                params[name] = value
+        grid.append(params)
+
+    return grid
+
+
+def group_variants(params_list: List[Dict], summed_name, naming_names):
+    """
+    Group the variants of params_list whose parameters are all equal, except summed_name, a parameter the footprints of
+    their objects are linear in, like a number of users, and the naming_names parameters, which only name their objects.
+
+    Returns:
+        list of the groups, as lists of the parameter dicts of their variants, in the order of their first variants.
+    """
+    groups = {}
+    for params in params_list:
+        key = tuple((name, parameter_key(value)) for name, value in sorted(params.items())
+                    if name != summed_name and name not in naming_names)
+        groups.setdefault(key, []).append(params)
+
+    return list(groups.values())
+
+
+def paylib_templates(mobile_apps, system_class):
+    """
+    Templates of the objects of one Paylib device family in one market. The objects that don’t depend on the
+    parameters, like the store service and the mobile network, are those of the Paylib mobile_apps module, and the
+    modeling classes those it imports, which are the legacy_adapter.py ones when e-footprint 9 is installed.
+
+    Parameters: market, a suffix of the object names, empty for the French market of Paylib, country, nb_of_users and
+    the parameters of a device family, see device_families.
+
+    Returns:
+        SimpleNamespace with the phones, uj_app_download, app_download_pattern and app_usage_pattern Templates, the
+        device_families {device family name: parameters} dict, and the Countries and System classes of the modeling.
+    """
+    SourceValue, SourceObject, Sources = mobile_apps.SourceValue, mobile_apps.SourceObject, mobile_apps.Sources
+    u = mobile_apps.u
+    DevicePopulation, UsagePattern = mobile_apps.DevicePopulation, mobile_apps.UsagePattern
+    UserJourney, UserJourneyStep = mobile_apps.UserJourney, mobile_apps.UserJourneyStep
+    default_smartphone = mobile_apps.default_smartphone
+
+    phones = Template(
+        DevicePopulation, "{phones}{market}", nb_devices=Param("nb_of_users", u.user), country=Param("country"),
+        devices=[Template(default_smartphone)])
+    uj_app_download = Template(
+        UserJourney, "Téléchargement application {device_family}",
+        uj_steps=[
+            Template(
+                UserJourneyStep, "Téléchargement store {device_family}", Template(mobile_apps.smartphone_stores),
+                data_upload=SourceValue(100 * u.kB / u.uj, Sources.USER_DATA),
+                data_download=Param("data_download", u.MB / u.uj, Sources.USER_DATA),
+                user_time_spent=SourceValue(30 * u.s / u.uj, Sources.USER_DATA),
+                request_duration=SourceValue(30 * u.s, Sources.HYPOTHESIS),
+                cpu_needed=SourceValue(0.1 * u.core / u.user_journey),
+                ram_needed=SourceValue(30 * u.MB / u.user_journey)
+            )])
+    app_download_pattern = Template(
+        UsagePattern, "Usage {device_family} app download{market}", uj_app_download, phones,
+        Template(mobile_apps.network), Param("download_rate"), SourceObject([[9, 17]]))
+    # Named like the download patterns in the Paylib modeling
+    app_usage_pattern = Template(
+        UsagePattern, "Usage {device_family} app download{market}", Template(mobile_apps.uj_app_usage_iphone_android),
+        phones, Template(mobile_apps.network), SourceValue(2 * u.uj / (u.user * u.year)), SourceObject([[9, 22]]))
+    device_families = {
+        "Android": {"device_family": "Android", "phones": "Android phones", "data_download": 25,
+                    "download_rate": mobile_apps.average_paylib_app_download_rate_android()},
+        "iPhone": {"device_family": "iPhone", "phones": "iPhones", "data_download": 32,
+                   "download_rate": mobile_apps.average_paylib_app_download_rate_iphone()},
+    }
+
+    return types.SimpleNamespace(
+        phones=phones, uj_app_download=uj_app_download, app_download_pattern=app_download_pattern,
+        app_usage_pattern=app_usage_pattern, device_families=device_families, Countries=mobile_apps.Countries,
+        System=system_class)
+
+
+def import_paylib_templates():
+    """
+    Import the Paylib modules afresh, with the e-footprint API they are written for, so that no object built by a
+    previous import is reused, and return the Paylib templates built from them, see paylib_templates.
+    """
+    import importlib
+    import sys
+    from modeling_tools.footprints import efootprint_version
+    from modeling_tools.legacy_adapter import legacy_modules
+    from modeling_tools.modelings import get_modeling
+    from modeling_tools.run_modeling import add_import_paths, modeling_api
+
+    paylib = get_modeling("paylib")
+    for module_name, module in list(sys.modules.items()):
+        module_file = getattr(module, "__file__", None) or ""
+        if os.path.abspath(module_file).startswith(paylib.path + os.sep):
+            del sys.modules[module_name]
+    add_import_paths(paylib, paylib.path)
+    with modeling_api(paylib, paylib.path):
+        mobile_apps = importlib.import_module("mobile_apps")
+    if paylib.legacy_api is not None and int(efootprint_version().split(".")[0]) >= 9:
+        system_class = legacy_modules(paylib.legacy_api)["efootprint.core.system"]["System"]
+    else:
+        from efootprint.core.system import System as system_class
+
+    return paylib_templates(mobile_apps, system_class)
+
+
+def market_countries(templates):
+    """
+    Return Templates of the countries of e-footprint, which the markets of build_paylib_variants cycle through.
+    """
+    return [Template(value) for name, value in vars(templates.Countries).items() if name.isupper() and callable(value)]
+
+
+def build_paylib_variants(templates, nb_of_markets, device_family_names, nb_of_users_per_market, together=True):
+    """
+    Build a System with the Paylib app download and usage patterns of every market and device family, markets cycling
+    through the countries of e-footprint.
+
+    Args:
+        templates: Paylib templates, see import_paylib_templates.
+        nb_of_markets: number of markets.
+        device_family_names: names of the device families of templates.device_families.
+        nb_of_users_per_market: number of users of each device family in each market.
+        together: compute the variants of a country and device family together, see group_variants, instead of
+            building usage patterns for each of them.
+    Returns:
+        (System, variants), variants being SimpleNamespaces with the params of each variant, the usage_patterns
+        computing it and its share of their footprints.
+    """
+    countries = market_countries(templates)
+    markets = [{"market": f" in market {index}", "country": countries[index % len(countries)],
+                "nb_of_users": nb_of_users_per_market} for index in range(nb_of_markets)]
+    variants = parameter_grid(
+        market=markets, device_family=[templates.device_families[name] for name in device_family_names])
+    if together:
+        groups = group_variants(variants, "nb_of_users", ["market"])
+    else:
+        groups = [[params] for params in variants]
+
+    usage_patterns = []
+    variant_shares = []
+    for group in groups:
+        nb_of_users = sum(params["nb_of_users"] for params in group)
+        market = group[0]["market"] + (f" and {len(group) - 1} other markets" if len(group) > 1 else "")
+        group_params = {**group[0], "market": market, "nb_of_users": nb_of_users}
+        group_usage_patterns = [templates.app_download_pattern.instantiate(**group_params),
+                                templates.app_usage_pattern.instantiate(**group_params)]
+        usage_patterns += group_usage_patterns
+        variant_shares += [types.SimpleNamespace(params=params, usage_patterns=group_usage_patterns,
+                                                 share=params["nb_of_users"] / nb_of_users) for params in group]
+
+    return templates.System(f"Paylib in {nb_of_markets} markets", usage_patterns), variant_shares
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--nb-of-markets", type=int, nargs="+", default=[1, 10, 100],
+                        help="Numbers of markets of the Paylib variants to build, each in a fresh template state.")
+    parser.add_argument("--device-families", nargs="+", default=["Android", "iPhone"])
+    parser.add_argument("--nb-of-users-per-market", type=float, default=1e4,
+                        help="Number of users of each device family in each market.")
+    parser.add_argument("--separately", action="store_true",
+                        help="Build usage patterns for each variant instead of computing variants together.")
+    args = parser.parse_args()
+
+    from modeling_tools.lookup_cache import cached_boaviztapi_calls, import_boavizta_modules
+
+    print(f"{'markets':>8} {'variants':>9} {'usage patterns':>15} {'objects':>8} {'build (s)':>10} "
+          f"{'per variant (ms)':>17} {'peak memory (MB)':>17}")
+    import_boavizta_modules()
+    with cached_boaviztapi_calls():
+        for markets_count in args.nb_of_markets:
+            paylib = import_paylib_templates()
+            tracemalloc.start()
+            start = time.perf_counter()
+            variants_system, variant_shares = build_paylib_variants(
+                paylib, markets_count, args.device_families, args.nb_of_users_per_market, not args.separately)
+            duration = time.perf_counter() - start
+            peak_memory = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+            tracemalloc.stop()
+            nb_of_usage_patterns = len({id(usage_pattern) for variant in variant_shares
+                                        for usage_pattern in variant.usage_patterns})
+            nb_of_objects = sum(len(template.instances) for template in (
+                paylib.app_download_pattern, paylib.app_usage_pattern, paylib.phones, paylib.uj_app_download))
+            print(f"{markets_count:>8} {len(variant_shares):>9} {nb_of_usage_patterns:>15} {nb_of_objects:>8} "
+                  f"{duration:>10.2f} {duration / len(variant_shares) * 1000:>17.1f} {peak_memory:>17.1f}")
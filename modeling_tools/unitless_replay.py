@@ -0,0 +1,695 @@
+"""
+Unit-stripped replay of the calculation graphs of the footprints of a System on raw NumPy arrays.
+
+Every value of e-footprint is a pint quantity, and every operation of a build checks and converts units and allocates
+new quantities, hour by hour in e-footprint 1.x and 2.x hourly usages and as pint-pandas DataFrames in e-footprint 9.
+UnitlessReplay walks the calculation graphs of the footprints of a built System once and compiles them into a list of
+NumPy steps:
+    - the dimensional consistency of every operation is checked once, from the units of its operands and result,
+    - every leaf is converted once to the base units of its dimension, so that the steps need no unit conversion,
+    - the hour periods of e-footprint 9 hourly quantities, which pandas aligns at every addition, are aligned once
+      into index arrays,
+    - every step is checked once against the value e-footprint computed for its node.
+Evaluations then run the steps on float64, or float32, arrays and scalars without any pint object, and put units back
+on the footprints only.
+
+Operations the replay doesn’t know, like the EcoLogits data lookups, and steps that don’t reproduce the value of
+their node, are kept as constants, as monte_carlo.py does for roundings. The time shifts of e-footprint 9, by a job
+duration or a timezone, are compiled from the values of their durations and timezones. Overriding a leaf these
+constants or shifts depend on raises a ValueError, as the replay couldn’t recompute them.
+
+e-footprint 9 rounds hourly quantities to 6 decimals of their unit when converting them, and device fabrication
+footprints to 2 decimals of kg. These roundings aren’t recorded in the calculation graph: they are found when a step
+only reproduces the value of its node once rounded, and replayed from then on. A rounding that didn’t change the value
+of its node when the replay was compiled can’t be found, so overrides can then move a footprint by up to the rounding.
+
+check_against_pint compares the replayed footprints with those computed by e-footprint. The Paylib, Bloom and
+ai_use_case footprints match within 1e-9 of their largest value in float64 and 1e-5 in float32, plus, for
+ai_use_case, one millionth of a kg at the hours where e-footprint and the replay round a tie to different sides.
+
+Usage:
+    replay = UnitlessReplay(paylib)
+    footprints = replay.evaluate({"PUE of Prod compute from hypothesis": 1.6})
+
+    python -m modeling_tools.unitless_replay ai_use_case --check
+    python -m modeling_tools.unitless_replay paylib --dtype float32 --check --rtol 1e-5
+"""
+import argparse
+import functools
+import math
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+import numpy as np
+
+from modeling_tools.monte_carlo import ROUNDING_UP_LABELS, ROUNDING_UP_OPERATORS, group_by_label, has_parents
+
+SCALAR = "scalar"
+# Hourly usages of e-footprint 1.x and 2.x, lists of 24 quantities
+HOURS_OF_DAY = "hours of day"
+# Hourly quantities of e-footprint 9, DataFrames indexed by hour periods
+HOURLY = "hourly"
+EMPTY = "empty"
+OTHER = "other"
+
+ELEMENTWISE_OPERATORS = {"+": np.add, "-": np.subtract, "*": np.multiply, "/": np.divide}
+# Values e-footprint 9 fills the hours missing in one of two hourly operands with
+ALIGNMENT_FILL_VALUES = {"+": 0, "-": np.nan, "*": 0, "/": np.nan}
+UNARY_OPERATORS = {"abs": np.abs, "negate": np.negative}
+# Operators whose result is the value of their left parent
+PASS_THROUGH_OPERATORS = [None, "duplicate", "logically dependent on", "depending on being empty"]
+SHIFT_OPERATORS = ["shifted by", "converted to UTC from", "shift by storage duration and negate"]
+COMPARISON_OPERATORS = {"max compared with": np.maximum, "min compared with": np.minimum, "max": np.maximum}
+# Numbers of decimals e-footprint 9 can round hourly quantities to when converting them, 6 by default
+ROUNDING_DECIMALS = range(6, -1, -1)
+
+
+@dataclass
+class Layout:
+    """
+    Shape and unit of the value of a node of a calculation graph.
+
+    Attributes:
+        kind: SCALAR, HOURS_OF_DAY, HOURLY, EMPTY or OTHER.
+        unit: pint unit of the value, None for EMPTY and OTHER values.
+        factor: magnitude of one unit in base units.
+        hour_factors: magnitudes of the units of the 24 quantities of HOURS_OF_DAY values in base units, which can
+            differ, like a dimensionless zero among day / hour quantities.
+        positions: hour period ordinals of HOURLY values.
+    """
+    kind: str
+    unit: object = None
+    factor: float = 1.0
+    hour_factors: np.ndarray = None
+    positions: np.ndarray = None
+
+    @property
+    def is_numeric(self):
+        return self.kind in (SCALAR, HOURS_OF_DAY, HOURLY)
+
+
+@functools.lru_cache(maxsize=None)
+def unit_factor(unit):
+    return float((1 * unit).to_base_units().magnitude)
+
+
+def node_layout(node):
+    import pandas as pd
+
+    value = node.value
+    if type(value).__name__ == "EmptyExplainableObject":
+        return Layout(EMPTY)
+    if isinstance(value, pd.DataFrame):
+        unit = value.dtypes.iloc[0].units
+        return Layout(HOURLY, unit, unit_factor(unit), positions=np.asarray(value.index.asi8))
+    if isinstance(value, list) and len(value) > 0 and all(hasattr(elt, "units") for elt in value):
+        return Layout(HOURS_OF_DAY, value[0].units, unit_factor(value[0].units),
+                      np.array([unit_factor(elt.units) for elt in value]))
+    if hasattr(value, "units") and hasattr(value, "magnitude"):
+        return Layout(SCALAR, value.units, unit_factor(value.units))
+
+    return Layout(OTHER)
+
+
+def base_magnitudes(node, layout):
+    """
+    Return the value of a numeric node in base units, as a float or a float64 array.
+    """
+    if layout.kind == HOURLY:
+        return node.value["value"].pint.magnitude.to_numpy(dtype=np.float64) * layout.factor
+    if layout.kind == HOURS_OF_DAY:
+        return np.array([float(elt.magnitude) for elt in node.value]) * layout.hour_factors
+
+    return float(node.value.magnitude) * layout.factor
+
+
+def aligner(from_positions, to_positions, fill_value):
+    """
+    Return a function placing values at from_positions into an array over to_positions, filled with fill_value where
+    from_positions has no value, as pandas aligns DataFrames, or None if from_positions aren’t in to_positions.
+    """
+    if len(from_positions) == len(to_positions) and np.array_equal(from_positions, to_positions):
+        return lambda values: values
+    indexes = np.searchsorted(to_positions, from_positions)
+    if np.any(indexes >= len(to_positions)) or not np.array_equal(to_positions[indexes], from_positions):
+        return None
+
+    def align(values):
+        aligned_values = np.full(len(to_positions), fill_value, dtype=values.dtype)
+        aligned_values[indexes] = values
+        return aligned_values
+
+    return align
+
+
+def shifter(from_positions, to_positions, shift):
+    """
+    Return a function placing values at from_positions at from_positions + shift in an array over to_positions, with
+    zeros where no value is shifted to, like the storage dumps e-footprint 9 truncates to the storage need hours.
+    """
+    source_positions = to_positions - shift
+    if len(from_positions) == 0:
+        return lambda values: np.zeros(len(to_positions), dtype=values.dtype)
+    indexes = np.minimum(np.searchsorted(from_positions, source_positions), len(from_positions) - 1)
+    is_shifted = from_positions[indexes] == source_positions
+    if is_shifted.all():
+        return lambda values: values[indexes]
+    shifted_indexes = indexes[is_shifted]
+
+    def shift_values(values):
+        shifted_values = np.zeros(len(to_positions), dtype=values.dtype)
+        shifted_values[is_shifted] = values[shifted_indexes]
+        return shifted_values
+
+    return shift_values
+
+
+class NotReplayable(Exception):
+    """
+    Raised when compiling a node the replay keeps as a constant, with the reason as message.
+    """
+
+
+def reproduces(replayed_value, expected_value, rtol=1e-9, atol=0):
+    """
+    Tell whether replayed_value is expected_value, up to rtol times the largest expected value plus atol.
+    """
+    if np.shape(replayed_value) != np.shape(expected_value):
+        return False
+    if not np.array_equal(np.isnan(replayed_value), np.isnan(expected_value)):
+        return False
+    largest_value = np.nanmax(np.abs(expected_value), initial=0)
+
+    return bool(
+        np.nanmax(np.abs(np.asarray(replayed_value) - expected_value), initial=0) <= rtol * largest_value + atol)
+
+
+def rounded(function, decimals, factor):
+    """
+    Return function with its result rounded to decimals in the unit whose magnitude in base units is factor.
+    """
+    return lambda *values: np.round(function(*values) / factor, decimals) * factor
+
+
+def check_dimensions(node, operand_units, expected_unit):
+    if operand_units.dimensionality != expected_unit.dimensionality:
+        raise ValueError(f"Operator {node.operator} of {node.label} gives {expected_unit} but its operands give "
+                         f"{operand_units}, of another dimension")
+
+
+def has_same_dimension(layout, other_layout):
+    return layout.unit.dimensionality == other_layout.unit.dimensionality
+
+
+@dataclass
+class Step:
+    slot: int
+    function: object
+    operand_slots: tuple
+
+
+class UnitlessReplay:
+    """
+    Compiled calculation graphs of the footprints of a System, evaluated without units.
+
+    Args:
+        system: System built with any e-footprint version.
+        dtype: NumPy float type of the evaluations, np.float64 or np.float32.
+    Attributes:
+        footprint_slots: {(category, object name, footprint type): slot of the footprint}.
+        frozen: {slot: reason} of the nodes with parents kept as constants.
+        duration_in_s: duration of the compilation.
+    """
+    def __init__(self, system, dtype=np.float64):
+        start = time.perf_counter()
+        self.system = system
+        self.dtype = np.dtype(dtype)
+        self.nodes = []
+        self.layouts = []
+        self.slots_by_node_id = {}
+        self.steps = []
+        self.constants = {}
+        self.frozen = {}
+        self.structural_slots = set()
+        self.slots_by_leaf_label = None
+        self.footprint_slots = {key: self.compile(node) for key, node in footprint_nodes(system).items()}
+        self.not_overridable_slots = self.ancestors(set(self.frozen) | self.structural_slots)
+        self.typed_constants = {slot: self.typed(value) for slot, value in self.constants.items()}
+        self.duration_in_s = time.perf_counter() - start
+
+    def typed(self, value):
+        if value is None:
+            return None
+        if isinstance(value, np.ndarray):
+            return value.astype(self.dtype)
+
+        return self.dtype.type(value)
+
+    def compile(self, footprint_node):
+        """
+        Add the steps computing footprint_node and its ancestors not compiled yet, parents first.
+
+        Returns:
+            the slot of footprint_node.
+        """
+        nodes_to_visit = [(footprint_node, False)]
+        while nodes_to_visit:
+            node, parents_compiled = nodes_to_visit.pop()
+            if id(node) in self.slots_by_node_id:
+                continue
+            parents = [parent for parent in (node.left_parent, node.right_parent) if parent is not None]
+            if not parents_compiled and any(id(parent) not in self.slots_by_node_id for parent in parents):
+                nodes_to_visit.append((node, True))
+                nodes_to_visit += [(parent, False) for parent in parents]
+                continue
+            slot = len(self.nodes)
+            self.slots_by_node_id[id(node)] = slot
+            self.nodes.append(node)
+            layout = node_layout(node)
+            self.layouts.append(layout)
+            if layout.kind in (EMPTY, OTHER):
+                self.constants[slot] = None
+                if parents:
+                    self.frozen[slot] = f"{layout.kind} value"
+                continue
+            if not parents:
+                self.constants[slot] = base_magnitudes(node, layout)
+                continue
+            self.add_step(node, slot, layout)
+
+        return self.slots_by_node_id[id(footprint_node)]
+
+    def add_step(self, node, slot, layout):
+        expected_value = base_magnitudes(node, layout)
+        try:
+            compiled = self.step_function(node, layout)
+        except NotReplayable as error:
+            compiled = None
+            reason = str(error)
+        if compiled is not None:
+            function, operand_slots = compiled
+            # Checked once against the value of e-footprint, from the values e-footprint computed for the operands
+            operand_values = [base_magnitudes(self.nodes[operand_slot], self.layouts[operand_slot])
+                              for operand_slot in operand_slots]
+            replayed_value = function(*operand_values)
+            if reproduces(replayed_value, expected_value):
+                self.steps.append(Step(slot, function, operand_slots))
+                return
+            if layout.kind == HOURLY:
+                rounded_functions = [rounded(function, decimals, layout.factor) for decimals in ROUNDING_DECIMALS]
+                # Values computed in another order can round to the other side of a tie, but a rounding reproducing
+                # the value exactly comes first, as the tie tolerance of a rounding can hide the next coarser one
+                for tie_tolerance in (0, 1.5):
+                    for decimals, rounded_function in zip(ROUNDING_DECIMALS, rounded_functions):
+                        if reproduces(rounded_function(*operand_values), expected_value,
+                                      atol=tie_tolerance * 10 ** -decimals * layout.factor):
+                            self.steps.append(Step(slot, rounded_function, operand_slots))
+                            return
+            reason = "replayed value differs from the e-footprint one"
+        self.constants[slot] = expected_value
+        self.frozen[slot] = f"{node.operator}: {reason}"
+
+    def operand_layouts(self, node):
+        return [None if parent is None else self.layouts[self.slots_by_node_id[id(parent)]]
+                for parent in (node.left_parent, node.right_parent)]
+
+    def step_function(self, node, layout):
+        """
+        Returns:
+            (function of the base unit values of the operands returning the base unit value of node, operand slots),
+            raising NotReplayable when node can’t be replayed, and a ValueError when its units are inconsistent.
+        """
+        left, right = self.operand_layouts(node)
+        left_slot = self.slots_by_node_id[id(node.left_parent)] if node.left_parent is not None else None
+        right_slot = self.slots_by_node_id[id(node.right_parent)] if node.right_parent is not None else None
+        operator = node.operator
+        if left is None or not left.is_numeric:
+            raise NotReplayable("left parent isn’t a quantity")
+
+        if operator == "+" and getattr(node.right_parent, "label", None) in ROUNDING_UP_LABELS:
+            # Rounding up stored as a constant by e-footprint 1.x and 2.x, recomputed in the unit of the left value
+            check_dimensions(node, left.unit, layout.unit)
+            return self.ceil_in_unit(left), (left_slot,)
+        if operator in ROUNDING_UP_OPERATORS:
+            check_dimensions(node, left.unit, layout.unit)
+            return self.round_up_adding_dimensionless(left), (left_slot,)
+        if operator == "ceil":
+            check_dimensions(node, left.unit, layout.unit)
+            return self.ceil_in_unit(left), (left_slot,)
+        if operator in ELEMENTWISE_OPERATORS and right is not None:
+            if not right.is_numeric:
+                raise NotReplayable("right parent isn’t a quantity")
+            operand_units = {"+": left.unit, "-": left.unit, "*": left.unit * right.unit, "/": left.unit / right.unit}
+            check_dimensions(node, operand_units[operator], layout.unit)
+            if operator in ("+", "-"):
+                check_dimensions(node, right.unit, layout.unit)
+            return self.elementwise(ELEMENTWISE_OPERATORS[operator], left, right, layout,
+                                    ALIGNMENT_FILL_VALUES[operator]), (left_slot, right_slot)
+        if operator in COMPARISON_OPERATORS and right is not None and right.is_numeric:
+            check_dimensions(node, left.unit, layout.unit)
+            check_dimensions(node, right.unit, layout.unit)
+            return self.elementwise(COMPARISON_OPERATORS[operator], left, right, layout, np.nan), (
+                left_slot, right_slot)
+        if operator in ("max compared with", "min compared with") and right is None:
+            # e-footprint 9 compares with zeros when the compared value is empty
+            check_dimensions(node, left.unit, layout.unit)
+            function = COMPARISON_OPERATORS[operator]
+            return (lambda values: function(values, 0)), (left_slot,)
+
+        if operator in PASS_THROUGH_OPERATORS and layout.kind == left.kind:
+            if not has_same_dimension(layout, left):
+                raise NotReplayable("value has another dimension than its left parent")
+            if operator is None and right is not None and right.kind == SCALAR and layout.kind == HOURLY:
+                # Fixed number of instances spread over the hours of the left value
+                nb_of_hours = len(layout.positions)
+                return (lambda values, right_value: np.full(nb_of_hours, right_value, dtype=values.dtype)), (
+                    left_slot, right_slot)
+            if layout.kind == HOURLY:
+                function = aligner(left.positions, layout.positions, 0)
+                if function is None:
+                    raise NotReplayable("hours of the value aren’t those of its left parent")
+                return function, (left_slot,)
+            return (lambda value: value), (left_slot,)
+        if operator in UNARY_OPERATORS and right is None:
+            check_dimensions(node, left.unit, layout.unit)
+            return UNARY_OPERATORS[operator], (left_slot,)
+        if operator in SHIFT_OPERATORS and layout.kind == HOURLY and left.kind == HOURLY:
+            check_dimensions(node, left.unit, layout.unit)
+            self.add_structural(right_slot)
+            if operator == "shift by storage duration and negate":
+                from efootprint.constants.units import u
+
+                shift = shifter(left.positions, layout.positions,
+                                math.ceil(node.right_parent.value.to(u.hour).magnitude))
+                return (lambda values: -shift(values)), (left_slot,)
+            if len(left.positions) == 0 or len(layout.positions) == 0:
+                raise NotReplayable("value or its left parent has no hour")
+            return shifter(left.positions, layout.positions, layout.positions[0] - left.positions[0]), (left_slot,)
+        if operator == "converted to UTC from" and left.kind == HOURS_OF_DAY:
+            # Same rotation of the 24 hours as ExplainableHourlyUsage.convert_to_utc
+            import pytz
+
+            time_diff = node.right_parent.value.utcoffset(datetime.now()) - pytz.timezone("UTC").utcoffset(
+                datetime.now())
+            time_diff_in_hours = int(time_diff.total_seconds() / 3600)
+            self.add_structural(right_slot)
+            return (lambda values: np.roll(values, -time_diff_in_hours)), (left_slot,)
+        if operator == "hourly occurrences average" and layout.kind == HOURLY and right.kind == SCALAR:
+            return self.hourly_occurrences_average(node, left, layout), (left_slot,)
+        if operator == "cumulative sum of storage delta with initial storage need" and right.kind == SCALAR:
+            check_dimensions(node, left.unit, layout.unit)
+            check_dimensions(node, right.unit, layout.unit)
+            align = aligner(left.positions, layout.positions, 0)
+            if align is None:
+                raise NotReplayable("hours of the value aren’t those of its left parent")
+
+            def cumulative_sum(values, initial_value):
+                aligned_values = align(values).copy()
+                aligned_values[0] += initial_value
+                return np.cumsum(aligned_values)
+
+            return cumulative_sum, (left_slot, right_slot)
+
+        if right is None and layout.kind == SCALAR and left.kind in (HOURS_OF_DAY, HOURLY):
+            if operator in ("sum", "mean", "max"):
+                check_dimensions(node, left.unit, layout.unit)
+                nb_of_values = 24 if left.kind == HOURS_OF_DAY else len(left.positions)
+                reducers = {"sum": np.sum, "mean": lambda values: np.sum(values) / nb_of_values, "max": np.max}
+                return reducers[operator], (left_slot,)
+            if operator == "usage time fraction computation":
+                return (lambda values: np.count_nonzero(values) / len(values) * layout.factor), (left_slot,)
+        if operator == "retrieving usage hours" and left.kind == HOURS_OF_DAY:
+            return (lambda values: (values != 0).astype(values.dtype) * layout.factor), (left_slot,)
+
+        raise NotReplayable("operator unknown to the replay")
+
+    @staticmethod
+    def ceil_in_unit(layout):
+        factors = layout.hour_factors if layout.kind == HOURS_OF_DAY else layout.factor
+
+        return lambda values: np.ceil(values / factors) * factors
+
+    @staticmethod
+    def round_up_adding_dimensionless(layout):
+        """
+        Same rounding up as autoscaling servers of e-footprint 2.x, which add the difference between the magnitude and
+        the next integer as a dimensionless quantity, so that a number of instances in day / hour goes up by less than
+        the difference.
+        """
+        factors = layout.hour_factors if layout.kind == HOURS_OF_DAY else layout.factor
+
+        return lambda values: values + (np.ceil(values / factors) - values / factors)
+
+    @staticmethod
+    def elementwise(function, left, right, layout, fill_value):
+        """
+        Return function applied to values aligned on the hours of layout when both operands are e-footprint 9 hourly
+        quantities, the missing hours of an operand being filled with fill_value, as pandas does.
+        """
+        if left.kind != HOURLY or right.kind != HOURLY:
+            return function
+        align_left, align_right = [aligner(operand.positions, layout.positions, fill_value)
+                                   for operand in (left, right)]
+        if align_left is None or align_right is None:
+            raise NotReplayable("hours of the operands aren’t in those of the value")
+
+        return lambda left_values, right_values: function(align_left(left_values), align_right(right_values))
+
+    def hourly_occurrences_average(self, node, left, layout):
+        """
+        Same sum of the hourly occurrence starts shifted by every hour of the event duration as
+        compute_nb_avg_hourly_occurrences of e-footprint 9.
+        """
+        from efootprint.constants.units import u
+
+        check_dimensions(node, left.unit, layout.unit)
+        event_duration_in_nb_of_hours = node.right_parent.value.to(u.hour).magnitude
+        nb_of_full_hours = int(np.floor(event_duration_in_nb_of_hours))
+        shifts_and_weights = [(hour_shift, 1) for hour_shift in range(nb_of_full_hours)]
+        if event_duration_in_nb_of_hours - nb_of_full_hours > 0:
+            shifts_and_weights.append((nb_of_full_hours, event_duration_in_nb_of_hours - nb_of_full_hours))
+        shifted_aligners = [(aligner(left.positions + hour_shift, layout.positions, 0), weight)
+                            for hour_shift, weight in shifts_and_weights]
+        if any(align is None for align, _ in shifted_aligners):
+            raise NotReplayable("hours of the value aren’t the shifted hours of its left parent")
+        self.add_structural(self.slots_by_node_id[id(node.right_parent)])
+
+        def average(values):
+            averaged_values = np.zeros(len(layout.positions), dtype=values.dtype)
+            for align, weight in shifted_aligners:
+                averaged_values += align(values) * weight if weight != 1 else align(values)
+            return averaged_values
+
+        return average
+
+    def add_structural(self, slot):
+        """
+        Mark the node at slot, whose value the compiled steps depend on, like a shift duration, as not overridable.
+        """
+        if slot is not None:
+            self.structural_slots.add(slot)
+
+    def ancestors(self, slots):
+        ancestor_slots = set()
+        slots_to_visit = list(slots)
+        while slots_to_visit:
+            slot = slots_to_visit.pop()
+            if slot in ancestor_slots:
+                continue
+            ancestor_slots.add(slot)
+            node = self.nodes[slot]
+            slots_to_visit += [self.slots_by_node_id[id(parent)] for parent in (node.left_parent, node.right_parent)
+                               if parent is not None]
+
+        return ancestor_slots
+
+    def leaves(self):
+        """
+        Returns:
+            {label: list of the slots of the numeric leaves with this label}, see monte_carlo.group_by_label.
+        """
+        if self.slots_by_leaf_label is None:
+            self.slots_by_leaf_label = self.leaf_slots_by_label()
+
+        return self.slots_by_leaf_label
+
+    def leaf_slots_by_label(self):
+        leaf_nodes = [node for node, layout in zip(self.nodes, self.layouts)
+                      if layout.is_numeric and not has_parents(node)]
+        slots_by_node_id = self.slots_by_node_id
+
+        return {label: [slots_by_node_id[id(node)] for node in nodes]
+                for label, nodes in group_by_label(leaf_nodes).items()}
+
+    def override_values(self, overrides):
+        """
+        Returns:
+            {slot: value in base units} of overrides, {leaf label: magnitude or array of magnitudes in the leaf unit}.
+        """
+        leaves = self.leaves()
+        values = {}
+        for label, magnitude in overrides.items():
+            if label not in leaves:
+                raise ValueError(f"No leaf labelled {label} in the footprint calculations of {self.system.name}")
+            for slot in leaves[label]:
+                if slot in self.not_overridable_slots:
+                    frozen_operators = sorted({str(self.nodes[frozen_slot].operator) for frozen_slot in self.frozen})
+                    raise ValueError(f"{label} changes values the replay keeps constant, like time shifts or the "
+                                     f"results of operators {frozen_operators}, so it can’t be overridden")
+                values[slot] = self.typed(np.asarray(magnitude, dtype=np.float64) * self.layouts[slot].factor
+                                          if np.ndim(magnitude) else float(magnitude) * self.layouts[slot].factor)
+
+        return values
+
+    def evaluate_magnitudes(self, overrides=None):
+        """
+        Returns:
+            list of the values of all slots in base units, the values of overridden leaves being replaced.
+        """
+        values = [None] * len(self.nodes)
+        for slot, value in self.typed_constants.items():
+            values[slot] = value
+        if overrides:
+            for slot, value in self.override_values(overrides).items():
+                values[slot] = value
+        for step in self.steps:
+            values[step.slot] = step.function(*[values[operand_slot] for operand_slot in step.operand_slots])
+
+        return values
+
+    def evaluate(self, overrides=None):
+        """
+        Args:
+            overrides: {leaf label: new magnitude in the leaf unit}, see leaves.
+        Returns:
+            {(category, object name, footprint type): pint Quantity of the footprint, in the unit e-footprint gave it}.
+        """
+        from efootprint.constants.units import u
+
+        values = self.evaluate_magnitudes(overrides)
+        footprints = {}
+        for key, slot in self.footprint_slots.items():
+            layout = self.layouts[slot]
+            # Quantities are built from whole arrays, as multiplying an array by a unit builds one quantity per value
+            if layout.kind == EMPTY:
+                footprints[key] = u.Quantity(np.zeros(0, dtype=self.dtype), u.kg)
+            else:
+                footprints[key] = u.Quantity(values[slot] / layout.factor, layout.unit)
+
+        return footprints
+
+
+def footprint_nodes(system):
+    """
+    Return {(category, object name, footprint type): explainable object} of the footprints of a System built with any
+    e-footprint version.
+    """
+    if hasattr(system, "fabrication_footprint_sum_over_period"):
+        from modeling_tools.footprints import hourly_footprints_by_object
+
+        return hourly_footprints_by_object(system)
+    from modeling_tools.monte_carlo import MonteCarlo
+
+    return MonteCarlo(system, default_relative_spread=0).footprint_nodes()
+
+
+def check_against_pint(replay, footprints, rtol=1e-9, atol=0):
+    """
+    Compare footprints evaluated by replay without overrides with the footprints computed by e-footprint.
+
+    Args:
+        replay: UnitlessReplay.
+        footprints: result of replay.evaluate().
+        rtol: tolerance relative to the largest value of each footprint.
+        atol: absolute tolerance in the unit of each footprint, like the last decimal e-footprint 9 rounds to, as
+            values computed in another order can round to the other side of a tie.
+    Returns:
+        list of (footprint key, largest absolute difference, largest footprint value) of the footprints differing by
+        more than rtol times their largest value plus atol.
+    """
+    mismatches = []
+    for key, node in footprint_nodes(replay.system).items():
+        layout = replay.layouts[replay.footprint_slots[key]]
+        replayed = np.asarray(footprints[key].magnitude, dtype=np.float64)
+        if layout.kind == EMPTY:
+            expected = np.zeros(0)
+        else:
+            expected = base_magnitudes(node, layout) / layout.factor
+        if np.shape(replayed) != np.shape(expected):
+            mismatches.append((key, np.inf, float(np.max(np.abs(expected), initial=0))))
+            continue
+        if not reproduces(replayed, expected, rtol, atol):
+            mismatches.append((key, float(np.nanmax(np.abs(replayed - expected), initial=0)),
+                               float(np.nanmax(np.abs(expected), initial=0))))
+
+    return mismatches
+
+
+def pint_replay_duration(system):
+    """
+    Return the duration of the replay of the footprints of an e-footprint 1.x or 2.x System with pint quantities by
+    monte_carlo.py, from all its quantity leaves, to compare with the unitless replay.
+    """
+    from modeling_tools.monte_carlo import MonteCarlo
+
+    replayer = MonteCarlo(system, default_relative_spread=0)
+    leaves = [leaf for label_leaves in replayer.hypotheses(
+        is_input=lambda node: node_layout(node).kind in (SCALAR, HOURS_OF_DAY)).values() for leaf in label_leaves]
+    start = time.perf_counter()
+    replayer.propagate({id(leaf): leaf.value for leaf in leaves}, 1)
+
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("modeling", nargs="?", default="paylib")
+    parser.add_argument("--dtype", choices=["float64", "float32"], default="float64")
+    parser.add_argument("--repeat", type=int, default=20, help="Number of timed evaluations.")
+    parser.add_argument("--check", action="store_true", help="Compare the footprints with the e-footprint ones.")
+    parser.add_argument("--rtol", type=float, default=None,
+                        help="Tolerance of the check relative to the largest value of each footprint, defaults to 1e-9 "
+                             "in float64 and 1e-5 in float32.")
+    parser.add_argument("--atol", type=float, default=None,
+                        help="Absolute tolerance of the check in the footprint unit, defaults to the last decimal "
+                             "e-footprint 9 rounds hourly quantities to, 0 for older versions.")
+    args = parser.parse_args()
+
+    from modeling_tools.lookup_cache import import_boavizta_modules
+    from modeling_tools.modelings import get_modeling
+    from modeling_tools.run_modeling import build_for_analysis
+
+    modeling = get_modeling(args.modeling)
+    import_boavizta_modules()
+    build_start = time.perf_counter()
+    modeling_system = build_for_analysis(modeling)
+    print(f"Build with e-footprint: {time.perf_counter() - build_start:.2f} s")
+    is_efootprint_9 = hasattr(modeling_system, "fabrication_footprint_sum_over_period")
+    unitless_replay = UnitlessReplay(modeling_system, np.dtype(args.dtype))
+    print(f"{len(unitless_replay.nodes)} nodes compiled into {len(unitless_replay.steps)} {args.dtype} steps in "
+          f"{unitless_replay.duration_in_s:.2f} s, {len(unitless_replay.frozen)} kept as constants")
+    frozen_reasons = [frozen_reason for frozen_reason in unitless_replay.frozen.values()]
+    for frozen_reason in sorted(set(frozen_reasons)):
+        print(f"    {frozen_reasons.count(frozen_reason):>4} {frozen_reason}")
+    evaluation_durations = []
+    for _ in range(args.repeat):
+        evaluation_start = time.perf_counter()
+        replayed_footprints = unitless_replay.evaluate()
+        evaluation_durations.append(time.perf_counter() - evaluation_start)
+    print(f"Unitless evaluation: {np.median(evaluation_durations) * 1000:.2f} ms (median of {args.repeat})")
+    if not is_efootprint_9:
+        print(f"pint replay: {pint_replay_duration(modeling_system) * 1000:.2f} ms")
+
+    if args.check:
+        check_rtol = args.rtol or (1e-9 if args.dtype == "float64" else 1e-5)
+        check_atol = args.atol if args.atol is not None else (
+            10 ** -max(ROUNDING_DECIMALS) if is_efootprint_9 else 0)
+        check_mismatches = check_against_pint(unitless_replay, replayed_footprints, check_rtol, check_atol)
+        print(f"{len(replayed_footprints) - len(check_mismatches)}/{len(replayed_footprints)} footprints match the "
+              f"e-footprint ones within {check_rtol:g} of their largest value plus {check_atol:g}")
+        for check_key, check_difference, check_largest_value in check_mismatches:
+            print(f"    {check_key}: differs by up to {check_difference:.3g}, largest value {check_largest_value:.3g}")
+        if check_mismatches:
+            sys.exit(1)
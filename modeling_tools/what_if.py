@@ -0,0 +1,458 @@
+"""
+Incremental what-if analysis on a built e-footprint 9 System.
+
+Changing one hypothesis and rerunning a modeling script rebuilds and recomputes every object. A WhatIfSession instead
+finds the modeling object inputs computed from the changed hypothesis, replays their calculation with the new value
+and hands them to e-footprint’s ModelingUpdate, which only recomputes the calculated attributes downstream of them.
+The session keeps the footprint of every object summed over the modeling period, and only sums again the footprints
+among the recomputed attributes.
+
+Most of the duration of an update is spent by e-footprint summing copies of hourly job occurrences shifted by each hour
+of the job duration, with one pandas alignment per hour: a monthly RAG ingestion job lasting days takes about a
+hundred of them. During updates, fast_hourly_shifts replaces these sums by one NumPy convolution giving the same
+values.
+
+Hypotheses are the leaves of the calculation graphs of modeling object inputs: SourceValues set directly on a modeling
+object, like a server lifespan, and SourceValues only used to compute an input, like the number of words per chat that
+main.py multiplies by the number of tokens per word to get the output token count of a GenAI job.
+
+Usage:
+    session = WhatIfSession(system)
+    report = session.set("number of words generated per chat", 300)
+    print(report.recomputed_attributes)
+"""
+import math
+import operator
+import time
+from contextlib import contextmanager
+from copy import copy
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+import numpy as np
+
+from modeling_tools.footprints import footprint_attributes_by_object, footprint_in_kg
+from modeling_tools.lookup_cache import import_boavizta_modules
+
+REPLAYABLE_OPERATORS = {"+": operator.add, "-": operator.sub, "*": operator.mul, "/": operator.truediv}
+
+
+@dataclass
+class WhatIfReport:
+    """
+    Outcome of one update of a WhatIfSession.
+
+    Attributes:
+        changed_hypotheses: labels of the hypotheses given a new value.
+        updated_inputs: (modeling object name, attribute name) of the inputs replaced by the update.
+        recomputed_attributes: (modeling object name, attribute name) of the calculated attributes recomputed by
+            e-footprint, in computation order.
+        duration_in_s: duration of the update.
+        total_footprint_before: total footprint of the System before the update, in kg.
+        total_footprint_after: total footprint of the System after the update, in kg.
+    """
+    changed_hypotheses: List[str]
+    updated_inputs: List[Tuple[str, str]] = field(default_factory=list)
+    recomputed_attributes: List[Tuple[str, str]] = field(default_factory=list)
+    duration_in_s: float = 0
+    total_footprint_before: float = 0
+    total_footprint_after: float = 0
+
+
+def input_attributes(mod_obj):
+    from efootprint.abstract_modeling_classes.explainable_object_base_class import ExplainableObject
+
+    return {attr_name: attr_value for attr_name, attr_value in mod_obj.__dict__.items()
+            if isinstance(attr_value, ExplainableObject) and attr_name not in mod_obj.calculated_attributes
+            and not attr_name.startswith("previous") and not attr_name.startswith("initial")}
+
+
+def calculation_leaves(explainable_object):
+    leaves = {}
+    nodes_to_visit = [explainable_object]
+    while nodes_to_visit:
+        node = nodes_to_visit.pop()
+        if not node.has_parent:
+            leaves[id(node)] = node
+        nodes_to_visit += [parent for parent in (node.left_parent, node.right_parent) if parent is not None]
+
+    return list(leaves.values())
+
+
+def replay_calculation(explainable_object, new_leaves_by_old_leaf_id, replayed_nodes=None):
+    """
+    Recompute explainable_object from its calculation graph, with some of its leaves replaced by new values.
+
+    Args:
+        explainable_object: ExplainableObject whose calculation graph is replayed.
+        new_leaves_by_old_leaf_id: dict {id(old leaf): new leaf}.
+        replayed_nodes: dict {id(node): replayed node} shared between calls, so that common intermediate results are
+            only computed once.
+    Returns:
+        the replayed ExplainableObject, or explainable_object itself if none of its leaves is replaced.
+    """
+    replayed_nodes = {} if replayed_nodes is None else replayed_nodes
+    node_id = id(explainable_object)
+    if node_id in new_leaves_by_old_leaf_id:
+        return new_leaves_by_old_leaf_id[node_id]
+    if node_id in replayed_nodes:
+        return replayed_nodes[node_id]
+    if not explainable_object.has_parent:
+        return explainable_object
+
+    left_parent, right_parent = explainable_object.left_parent, explainable_object.right_parent
+    new_left_parent = replay_calculation(left_parent, new_leaves_by_old_leaf_id, replayed_nodes) \
+        if left_parent is not None else None
+    new_right_parent = replay_calculation(right_parent, new_leaves_by_old_leaf_id, replayed_nodes) \
+        if right_parent is not None else None
+
+    if new_left_parent is left_parent and new_right_parent is right_parent:
+        replayed_node = explainable_object
+    elif explainable_object.operator in REPLAYABLE_OPERATORS and right_parent is not None:
+        replayed_node = REPLAYABLE_OPERATORS[explainable_object.operator](new_left_parent, new_right_parent)
+    elif explainable_object.operator is None and right_parent is None:
+        replayed_node = explainable_object.__class__(new_left_parent.value, left_parent=new_left_parent)
+    else:
+        raise ValueError(
+            f"Can’t replay the calculation of {explainable_object.label}: operator {explainable_object.operator} "
+            f"isn’t supported, please rebuild the System instead")
+
+    if replayed_node is not explainable_object and explainable_object.label:
+        replayed_node.set_label(explainable_object.label)
+    replayed_nodes[node_id] = replayed_node
+
+    return replayed_node
+
+
+def shifted_sum(hourly_values, kernel, factor=1):
+    """
+    Sum the copies of an hourly pint-pandas DataFrame shifted by 0 to len(kernel) - 1 hours, each one weighted by its
+    kernel value, and multiply the sum by factor.
+
+    Returns:
+        a DataFrame covering the hours of hourly_values and the len(kernel) - 1 next ones, as pandas aligns shifted
+        copies, or None when the hours of hourly_values aren’t contiguous.
+    """
+    import pandas as pd
+    import pint_pandas
+
+    index = hourly_values.index
+    if not isinstance(index, pd.PeriodIndex) or len(index) == 0 or (index[-1] - index[0]).n != len(index) - 1:
+        return None
+    values = hourly_values["value"]
+    # Units are multiplied once, on a scalar, as pint is slow on arrays
+    unit_factor = 1 * values.pint.units * factor
+    summed_magnitudes = np.convolve(values.pint.magnitude.to_numpy(dtype=float), kernel) * unit_factor.magnitude
+
+    return pd.DataFrame(
+        {"value": pint_pandas.PintArray(summed_magnitudes, dtype=unit_factor.units)},
+        index=pd.period_range(start=index[0], periods=len(summed_magnitudes), freq="h"))
+
+
+def fast_nb_avg_hourly_occurrences(compute_nb_avg_hourly_occurrences):
+    """
+    Wrap e-footprint’s compute_nb_avg_hourly_occurrences, which sums the occurrence starts shifted by each full hour of
+    the event duration plus the ones shifted by its last partial hour, weighted by its length.
+    """
+    from efootprint.abstract_modeling_classes.explainable_objects import ExplainableHourlyQuantities
+    from efootprint.constants.units import u
+
+    def wrapper(hourly_occurrences_starts, event_duration):
+        if isinstance(hourly_occurrences_starts, ExplainableHourlyQuantities):
+            # Use copy not to convert event_duration in place, as e-footprint does
+            event_duration_in_nb_of_hours = copy(event_duration.value).to(u.hour).magnitude
+            nb_of_full_hours = math.floor(event_duration_in_nb_of_hours)
+            kernel = [1.0] * nb_of_full_hours
+            if event_duration_in_nb_of_hours > nb_of_full_hours:
+                kernel.append(event_duration_in_nb_of_hours - nb_of_full_hours)
+            nb_avg_hourly_occurrences = shifted_sum(hourly_occurrences_starts.value, kernel) if kernel else None
+            if nb_avg_hourly_occurrences is not None:
+                return ExplainableHourlyQuantities(
+                    nb_avg_hourly_occurrences, left_parent=hourly_occurrences_starts, right_parent=event_duration,
+                    operator="hourly occurrences average")
+
+        return compute_nb_avg_hourly_occurrences(hourly_occurrences_starts, event_duration)
+
+    wrapper.__wrapped__ = compute_nb_avg_hourly_occurrences
+
+    return wrapper
+
+
+def fast_hourly_data_exchange(compute_hourly_data_exchange):
+    """
+    Wrap the Job method summing the hourly occurrences of a job shifted by each full hour of its duration, times the
+    data it exchanges per hour.
+    """
+    from efootprint.abstract_modeling_classes.explainable_objects import ExplainableHourlyQuantities
+
+    def wrapper(job, usage_pattern, data_exchange_type):
+        hourly_occurrences = job.hourly_occurrences_per_usage_pattern[usage_pattern]
+        nb_of_full_hours = int(job.duration_in_full_hours.magnitude)
+        if isinstance(hourly_occurrences, ExplainableHourlyQuantities) and nb_of_full_hours > 0:
+            data_exchange_type_no_underscore = data_exchange_type.replace("_", " ")
+            data_exchange_per_hour = (getattr(job, data_exchange_type) / job.duration_in_full_hours).set_label(
+                f"{data_exchange_type_no_underscore} per hour for job {job.name} in {usage_pattern.name}")
+            hourly_data_exchange = shifted_sum(
+                hourly_occurrences.value, np.ones(nb_of_full_hours), data_exchange_per_hour.value)
+            if hourly_data_exchange is not None:
+                return ExplainableHourlyQuantities(
+                    hourly_data_exchange, left_parent=hourly_occurrences, right_parent=data_exchange_per_hour,
+                    operator="shifted by each hour of the job duration and multiplied by").set_label(
+                    f"Hourly {data_exchange_type_no_underscore} for {job.name} in {usage_pattern.name}")
+
+        return compute_hourly_data_exchange(job, usage_pattern, data_exchange_type)
+
+    wrapper.__wrapped__ = compute_hourly_data_exchange
+
+    return wrapper
+
+
+@contextmanager
+def fast_hourly_shifts():
+    """
+    Compute the sums of hourly quantities shifted by each hour of a duration with NumPy convolutions while the context
+    is active, in the e-footprint 9 versions that sum them with pandas.
+    """
+    import importlib
+
+    patched_attributes = [
+        ("efootprint.core.usage.job", "compute_nb_avg_hourly_occurrences", fast_nb_avg_hourly_occurrences),
+        ("efootprint.core.usage.usage_pattern", "compute_nb_avg_hourly_occurrences", fast_nb_avg_hourly_occurrences),
+        ("efootprint.core.usage.job", "JobBase.compute_hourly_data_exchange_for_usage_pattern",
+         fast_hourly_data_exchange)]
+    original_attributes = []
+    for module_name, attr_path, fast_version in patched_attributes:
+        owner = importlib.import_module(module_name)
+        *owner_path, attr_name = attr_path.split(".")
+        for owner_attr_name in owner_path:
+            owner = getattr(owner, owner_attr_name)
+        original = owner.__dict__.get(attr_name)
+        if original is None or hasattr(original, "__wrapped__"):
+            continue
+        original_attributes.append((owner, attr_name, original))
+        setattr(owner, attr_name, fast_version(original))
+    try:
+        yield
+    finally:
+        for owner, attr_name, original in original_attributes:
+            setattr(owner, attr_name, original)
+
+
+class WhatIfSession:
+    """
+    Change hypotheses of a built System and recompute only what depends on them.
+
+    The session keeps the initial value of every changed hypothesis, so that changes can be listed and reverted.
+    """
+    def __init__(self, system):
+        # ModelingUpdate imports e-footprint modules that call the Boavizta API when they are imported
+        import_boavizta_modules()
+        self.system = system
+        self.footprint_attributes = footprint_attributes_by_object(system)
+        self.footprints_in_kg = {key: footprint_in_kg(getattr(obj, attribute))
+                                 for key, (obj, attribute) in self.footprint_attributes.items()}
+        # [initial hypothesis, current hypothesis] of every changed hypothesis, and their index by current hypothesis id
+        self.changes = []
+        self.change_index_by_current_hypothesis_id = {}
+        self.reports = []
+
+    def input_attributes_by_mod_obj(self):
+        return {mod_obj: input_attributes(mod_obj) for mod_obj in self.system.all_linked_objects}
+
+    def hypotheses(self):
+        """
+        Returns:
+            dict {label: SourceValue} of all hypotheses the System is computed from. Labels shared by several
+            hypotheses, like those of objects with the same name, map to the list of these hypotheses.
+        """
+        hypotheses = {}
+        for attributes in self.input_attributes_by_mod_obj().values():
+            for attr_value in attributes.values():
+                for leaf in calculation_leaves(attr_value):
+                    hypotheses.setdefault(leaf.label, {})[id(leaf)] = leaf
+
+        return {label: list(leaves.values())[0] if len(leaves) == 1 else list(leaves.values())
+                for label, leaves in hypotheses.items()}
+
+    def find_hypothesis(self, hypothesis):
+        from efootprint.abstract_modeling_classes.explainable_object_base_class import ExplainableObject
+
+        if isinstance(hypothesis, ExplainableObject):
+            return hypothesis
+        hypotheses = self.hypotheses()
+        matching_labels = [label for label in hypotheses if label == hypothesis]
+        if not matching_labels:
+            # Labels of SourceValues end with their source name, which can be omitted
+            matching_labels = [label for label in hypotheses if label.startswith(f"{hypothesis} from ")]
+        if not matching_labels:
+            raise ValueError(f"No hypothesis labelled {hypothesis} in {self.system.name}")
+        if len(matching_labels) > 1 or isinstance(hypotheses[matching_labels[0]], list):
+            raise ValueError(
+                f"Several hypotheses match {hypothesis}: {matching_labels}, please pass the SourceValue itself")
+
+        return hypotheses[matching_labels[0]]
+
+    @staticmethod
+    def new_hypothesis_value(hypothesis, new_value):
+        from pint import Quantity
+        from efootprint.abstract_modeling_classes.explainable_object_base_class import ExplainableObject
+        from efootprint.abstract_modeling_classes.source_objects import SourceValue
+
+        if isinstance(new_value, ExplainableObject):
+            new_hypothesis = new_value
+        elif isinstance(new_value, Quantity):
+            new_hypothesis = SourceValue(new_value, source=hypothesis.source)
+        else:
+            new_hypothesis = SourceValue(new_value * hypothesis.value.units, source=hypothesis.source)
+
+        return new_hypothesis.set_label(hypothesis.label)
+
+    def set(self, hypothesis, new_value):
+        """
+        Give a new value to one hypothesis, see update.
+        """
+        return self.update([(hypothesis, new_value)])
+
+    def update(self, new_values):
+        """
+        Give new values to hypotheses and recompute the calculated attributes that depend on them in one ModelingUpdate.
+
+        Args:
+            new_values: dict {hypothesis label: new value} or list of (hypothesis, new value) tuples. Hypotheses are
+                SourceValues or their labels, with or without their source name. New values are pint Quantities,
+                ExplainableObjects or numbers in the unit of the hypothesis.
+        Returns:
+            a WhatIfReport.
+        """
+        from efootprint.abstract_modeling_classes.modeling_update import ModelingUpdate
+
+        start = time.perf_counter()
+        total_footprint_before = self.total_footprint()
+        if isinstance(new_values, dict):
+            new_values = list(new_values.items())
+        new_leaves = []
+        for hypothesis, new_value in new_values:
+            old_leaf = self.find_hypothesis(hypothesis)
+            new_leaves.append((old_leaf, self.new_hypothesis_value(old_leaf, new_value)))
+        new_leaves_by_old_leaf_id = {id(old_leaf): new_leaf for old_leaf, new_leaf in new_leaves}
+
+        changes_list = []
+        updated_inputs = []
+        replayed_nodes = {}
+        for mod_obj, attributes in self.input_attributes_by_mod_obj().items():
+            for attr_name, attr_value in attributes.items():
+                new_attr_value = replay_calculation(attr_value, new_leaves_by_old_leaf_id, replayed_nodes)
+                if new_attr_value is not attr_value:
+                    changes_list.append([attr_value, new_attr_value])
+                    updated_inputs.append((mod_obj.name, attr_name))
+
+        report = WhatIfReport(
+            changed_hypotheses=[new_leaf.label for new_leaf in new_leaves_by_old_leaf_id.values()],
+            updated_inputs=updated_inputs, total_footprint_before=total_footprint_before)
+        if changes_list:
+            try:
+                with fast_hourly_shifts():
+                    modeling_update = ModelingUpdate(changes_list)
+            except Exception:
+                self.roll_back(changes_list)
+                raise
+            report.recomputed_attributes = [
+                (recomputed_value.modeling_obj_container.name, recomputed_value.attr_name_in_mod_obj_container)
+                for recomputed_value in modeling_update.recomputed_values]
+            self.update_footprints(report.recomputed_attributes)
+        self.record_changes(new_leaves)
+        report.total_footprint_after = self.total_footprint()
+        report.duration_in_s = time.perf_counter() - start
+        self.reports.append(report)
+
+        return report
+
+    def changed_hypotheses(self):
+        """
+        Returns:
+            list of (label, initial value, current value) tuples of the hypotheses changed since the session started.
+        """
+        return [(current_hypothesis.label, initial_hypothesis.value, current_hypothesis.value)
+                for initial_hypothesis, current_hypothesis in self.changes
+                if current_hypothesis.value != initial_hypothesis.value]
+
+    def reset(self):
+        """
+        Set all changed hypotheses back to their initial values.
+        """
+        return self.update([(current_hypothesis, initial_hypothesis.value)
+                            for initial_hypothesis, current_hypothesis in self.changes
+                            if current_hypothesis.value != initial_hypothesis.value])
+
+    @staticmethod
+    def roll_back(changes_list):
+        """
+        Set back the inputs of a failed ModelingUpdate that it already replaced, and recompute the calculated attributes
+        that depend on them: e-footprint replaces all inputs before recomputing anything and doesn’t roll back when a
+        recomputation raises, like when a server has too little RAM for its jobs.
+        """
+        from efootprint.abstract_modeling_classes.modeling_update import ModelingUpdate
+
+        replaced_inputs = [[new_attr_value, attr_value] for attr_value, new_attr_value in changes_list
+                           if getattr(new_attr_value, "modeling_obj_container", None) is not None]
+        if replaced_inputs:
+            with fast_hourly_shifts():
+                ModelingUpdate(replaced_inputs)
+
+    def record_changes(self, new_leaves):
+        """
+        Record the (old hypothesis, new hypothesis) pairs of a successful update, keeping the initial hypothesis of the
+        ones changed before.
+        """
+        for old_leaf, new_leaf in new_leaves:
+            change_index = self.change_index_by_current_hypothesis_id.pop(id(old_leaf), None)
+            if change_index is None:
+                change_index = len(self.changes)
+                self.changes.append([old_leaf, new_leaf])
+            self.changes[change_index][1] = new_leaf
+            self.change_index_by_current_hypothesis_id[id(new_leaf)] = change_index
+
+    def update_footprints(self, recomputed_attributes):
+        """
+        Sum again the footprints among recomputed_attributes, (modeling object name, attribute name) tuples.
+
+        ModelingUpdate recomputes attributes on the modeling objects of the System, but hands back their values through
+        contextual wrappers, so they are matched on object name and attribute name, footprints of objects sharing a
+        name with a recomputed one being summed again too.
+        """
+        recomputed_attributes = set(recomputed_attributes)
+        for key, (obj, attribute) in self.footprint_attributes.items():
+            if (obj.name, attribute) in recomputed_attributes:
+                self.footprints_in_kg[key] = footprint_in_kg(getattr(obj, attribute))
+
+    def total_footprint(self):
+        return sum(self.footprints_in_kg.values())
+
+
+if __name__ == "__main__":
+    from modeling_tools.modelings import get_modeling
+    from modeling_tools.run_modeling import load_builder
+
+    ai_use_case = get_modeling("ai_use_case")
+    build_system = load_builder(ai_use_case, ai_use_case.path)
+
+    start = time.perf_counter()
+    system = build_system()
+    build_duration = time.perf_counter() - start
+    session = WhatIfSession(system)
+
+    for hypothesis_label, new_hypothesis_value, build_kwargs in [
+            ("number of words generated per chat", 300, {"word_per_chat": 300}),
+            ("monthly number of documents ingested for RAG", 2000, {"word_per_chat": 300, "nb_docs_ingested": 2000})]:
+        what_if_report = session.set(hypothesis_label, new_hypothesis_value)
+        print(f"{hypothesis_label} set to {new_hypothesis_value}: {len(what_if_report.updated_inputs)} inputs updated "
+              f"and {len(what_if_report.recomputed_attributes)} attributes recomputed in "
+              f"{what_if_report.duration_in_s * 1000:.0f} ms (full build: {build_duration * 1000:.0f} ms)")
+        for mod_obj_name, attr_name in what_if_report.recomputed_attributes:
+            print(f"    {mod_obj_name}.{attr_name}")
+        rebuilt_total = WhatIfSession(build_system(**build_kwargs)).total_footprint()
+        print(f"Total footprint {what_if_report.total_footprint_before:.1f} -> "
+              f"{what_if_report.total_footprint_after:.1f} kg, full rebuild: {rebuilt_total:.1f} kg")
+
+    reset_report = session.reset()
+    print(f"Reset to initial hypotheses: {reset_report.total_footprint_after:.1f} kg")
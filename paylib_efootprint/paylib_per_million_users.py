@@ -4,9 +4,15 @@ from websites import up_site_recup, up_site_vitrine
 
 from efootprint.core.system import System
 
-paylib = System(
-    "Paylib per million users",
-    [up_site_recup, up_site_vitrine, preprod_up, up_app_download_iphone, up_app_download_android,
-     up_app_usage_android, up_app_usage_iphone])
+# Usage patterns are built on demand by their builder functions, so that building one of them doesn't build the others
+USAGE_PATTERN_BUILDERS = [up_site_recup, up_site_vitrine, preprod_up, up_app_download_iphone, up_app_download_android,
+                          up_app_usage_android, up_app_usage_iphone]
+
+
+def build_system(usage_pattern_builders=USAGE_PATTERN_BUILDERS):
+    return System("Paylib per million users", [build_usage_pattern() for build_usage_pattern in usage_pattern_builders])
+
+
+paylib = build_system()
 
 paylib.object_relationship_graph_to_file()
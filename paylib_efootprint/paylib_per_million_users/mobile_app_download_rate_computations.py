@@ -1,3 +1,5 @@
+from functools import cache
+
 from efootprint.abstract_modeling_classes.explainable_object_base_class import Source
 from efootprint.abstract_modeling_classes.source_objects import SourceValue
 from efootprint.constants.sources import Sources
@@ -33,16 +35,25 @@ iphone_paylib_app_update_rate = SourceValue(
 download_rate_for_user_with_hibernating_app = SourceValue(
     1 * u.user_journey / (u.user * u.year), Sources.HYPOTHESIS, "Download rate for user with hibernating app")
 
-android_fraction_of_inactive_users = hundred_percent - android_fraction_of_users_active_over_3_months
-average_paylib_app_download_rate_android = (
-    (android_fraction_of_users_active_over_3_months
-     + (hundred_percent - percentage_hibernation_android) * android_fraction_of_inactive_users)
-    * android_paylib_app_update_rate +
-    android_fraction_of_inactive_users * percentage_hibernation_android * download_rate_for_user_with_hibernating_app)
-
-iphone_fraction_of_inactive_users = hundred_percent - iphone_fraction_of_users_active_over_3_months
-average_paylib_app_download_rate_iphone = (
-    (iphone_fraction_of_users_active_over_3_months
-     + (hundred_percent - percentage_hibernation_iphone) * iphone_fraction_of_inactive_users)
-    * iphone_paylib_app_update_rate +
-    iphone_fraction_of_inactive_users * percentage_hibernation_iphone * download_rate_for_user_with_hibernating_app)
\ No newline at end of file
+
+@cache
+def average_paylib_app_download_rate_android():
+    android_fraction_of_inactive_users = hundred_percent - android_fraction_of_users_active_over_3_months
+
+    return (
+        (android_fraction_of_users_active_over_3_months
+         + (hundred_percent - percentage_hibernation_android) * android_fraction_of_inactive_users)
+        * android_paylib_app_update_rate +
+        android_fraction_of_inactive_users * percentage_hibernation_android
+        * download_rate_for_user_with_hibernating_app)
+
+
+@cache
+def average_paylib_app_download_rate_iphone():
+    iphone_fraction_of_inactive_users = hundred_percent - iphone_fraction_of_users_active_over_3_months
+
+    return (
+        (iphone_fraction_of_users_active_over_3_months
+         + (hundred_percent - percentage_hibernation_iphone) * iphone_fraction_of_inactive_users)
+        * iphone_paylib_app_update_rate +
+        iphone_fraction_of_inactive_users * percentage_hibernation_iphone * download_rate_for_user_with_hibernating_app)
@@ -0,0 +1,26 @@
+import os
+
+import pytest
+
+from modeling_tools.lookup_cache import CACHE_DIR_ENV, OFFLINE_ENV, cached_boaviztapi_calls, import_boavizta_modules
+from modeling_tools.render_cache import rendering
+
+LOOKUPS_FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "lookups")
+
+
+@pytest.fixture(scope="session")
+def offline_build(tmp_path_factory):
+    """
+    Return a function calling a System build function from a temporary working directory, as modeling scripts write
+    files, with the Boavizta API lookups of tests/fixtures/lookups only.
+    """
+    def build(build_function, *args, **kwargs):
+        with pytest.MonkeyPatch.context() as monkeypatch:
+            monkeypatch.setenv(CACHE_DIR_ENV, LOOKUPS_FIXTURE_DIR)
+            monkeypatch.setenv(OFFLINE_ENV, "1")
+            monkeypatch.chdir(tmp_path_factory.mktemp("build"))
+            import_boavizta_modules()
+            with cached_boaviztapi_calls(), rendering(headless=True):
+                return build_function(*args, **kwargs)
+
+    return build
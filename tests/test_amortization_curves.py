@@ -0,0 +1,59 @@
+"""
+Amortization curves of the Bloom modeling, built with e-footprint 2.x or, through legacy_adapter.py, e-footprint 9.
+
+Usage, from the repository root:
+    python -m pytest tests/test_amortization_curves.py
+"""
+import numpy as np
+import pytest
+
+pytest.importorskip("efootprint")
+
+from modeling_tools.amortization_curves import AmortizationCurves, check_against_system
+from modeling_tools.footprints import efootprint_version
+from modeling_tools.modelings import get_modeling
+from modeling_tools.run_modeling import run_modeling_script
+
+EFOOTPRINT_MAJOR_VERSION = int(efootprint_version().split(".")[0])
+
+if EFOOTPRINT_MAJOR_VERSION != get_modeling("bloom").legacy_api and EFOOTPRINT_MAJOR_VERSION < 9:
+    pytest.skip(f"Bloom can’t be built with e-footprint {efootprint_version()}", allow_module_level=True)
+
+
+@pytest.fixture(scope="module")
+def curves(offline_build):
+    bloom = get_modeling("bloom")
+
+    return AmortizationCurves(offline_build(run_modeling_script, bloom, bloom.path))
+
+
+def test_components_match_system_total(curves):
+    components_footprint, system_footprint, totals_match = check_against_system(curves)
+
+    assert system_footprint > 0
+    assert totals_match, (components_footprint, system_footprint)
+
+
+def test_reference_point_amortizes_system_footprint(curves):
+    # Over the lifetime of one training, the requests of the modeling carry the whole yearly footprint of its System
+    lifetime_of_one_training = 1 / curves.nb_of_trainings_per_year
+    result = curves.evaluate([curves.reference_requests_per_hour], [lifetime_of_one_training],
+                             [curves.reference_nb_of_gpus])
+    nb_of_requests_per_training = curves.reference_requests_per_hour * curves.hours_per_year * lifetime_of_one_training
+
+    assert result.amortized_footprint_per_request.shape == (1, 1, 1)
+    assert result.amortized_footprint_per_request[0, 0, 0] * nb_of_requests_per_training == pytest.approx(
+        sum(curves.yearly_footprints.values()) * lifetime_of_one_training, rel=1e-9)
+
+
+def test_break_even_points_split_footprint_in_half(curves):
+    lifetimes_in_years = np.array([0.5, 1, 3])
+    nb_of_inference_gpus = np.array([8, 16, 32])
+    break_even_volumes = curves.evaluate([1], lifetimes_in_years, nb_of_inference_gpus).break_even_requests_per_hour
+
+    for lifetime_index, lifetime in enumerate(lifetimes_in_years):
+        for gpu_index, nb_of_gpus in enumerate(nb_of_inference_gpus):
+            result = curves.evaluate([break_even_volumes[lifetime_index, gpu_index]], [lifetime], [nb_of_gpus])
+            assert result.training_share[0, 0, 0] == pytest.approx(0.5, rel=1e-9)
+            assert result.break_even_lifetimes_in_years[0, 0] == pytest.approx(lifetime, rel=1e-9)
+
@@ -0,0 +1,95 @@
+"""
+Parity checks of the three modelings with the e-footprint version installed.
+
+The unitless replay of every modeling must reproduce the e-footprint footprints, with its leaves overridden the
+footprints e-footprint 9 recomputes after the same change, and keep at most as many nodes as constants as it did when
+written. With e-footprint 9 the legacy
+modelings built through legacy_adapter.py must reproduce the footprints written by their legacy e-footprint version in
+their legacy_footprints.json, except the ones whose e-footprint 9 model changed. Modelings that the installed
+e-footprint version can’t build are skipped.
+
+Modelings are built offline from the Boavizta API responses of tests/fixtures/lookups, recorded with
+    EFOOTPRINT_MODELINGS_CACHE_DIR=tests/fixtures/lookups python -m modeling_tools.lookup_cache prewarm
+
+Usage, from the repository root:
+    python -m pytest tests
+"""
+import pytest
+
+pytest.importorskip("efootprint")
+
+from modeling_tools.footprints import efootprint_version
+from modeling_tools.legacy_adapter import compare_with_legacy, read_legacy_footprints
+from modeling_tools.modelings import MODELINGS, get_modeling
+from modeling_tools.run_modeling import build_modeling_system
+from modeling_tools.unitless_replay import ROUNDING_DECIMALS, UnitlessReplay, check_against_pint
+from modeling_tools.what_if import WhatIfSession
+
+EFOOTPRINT_MAJOR_VERSION = int(efootprint_version().split(".")[0])
+LEGACY_MODELINGS = [modeling_name for modeling_name, modeling in MODELINGS.items() if modeling.legacy_api is not None]
+# Nodes the replay keeps as constants, by e-footprint major version, mostly the hour shifts within job durations
+MAX_FROZEN_NODES = {1: {"paylib": 7}, 2: {"bloom": 2}, 9: {"ai_use_case": 128, "bloom": 52, "paylib": 51}}
+
+
+@pytest.fixture(scope="module")
+def systems(offline_build):
+    """
+    Build the modelings on demand, once per test module.
+    """
+    built_systems = {}
+
+    def build(modeling_name):
+        modeling = get_modeling(modeling_name)
+        if modeling.legacy_api != EFOOTPRINT_MAJOR_VERSION and EFOOTPRINT_MAJOR_VERSION < 9:
+            pytest.skip(f"{modeling_name} can’t be built with e-footprint {efootprint_version()}")
+        if modeling_name not in built_systems:
+            built_systems[modeling_name] = offline_build(build_modeling_system, modeling, modeling.path, None)
+
+        return built_systems[modeling_name]
+
+    return build
+
+
+@pytest.mark.parametrize("modeling_name", list(MODELINGS.keys()))
+def test_unitless_replay_matches_pint(systems, modeling_name):
+    system = systems(modeling_name)
+    replay = UnitlessReplay(system)
+    atol = 10 ** -max(ROUNDING_DECIMALS) if EFOOTPRINT_MAJOR_VERSION >= 9 else 0
+
+    assert check_against_pint(replay, replay.evaluate(), rtol=1e-9, atol=atol) == []
+    assert len(replay.frozen) <= MAX_FROZEN_NODES[EFOOTPRINT_MAJOR_VERSION][modeling_name]
+
+
+@pytest.mark.parametrize("modeling_name, leaf_label", [
+    ("ai_use_case", "PUE of GPU server from hypothesis"),
+    ("ai_use_case", "Nb gpus of GPU server from hypothesis"),
+    ("bloom", "Lifespan of Inference GPU server from Estimating the Carbon Footprint of BLOOM"),
+    ("paylib", "User defined number of Prod compute instances from hypothesis")])
+def test_overridden_unitless_replay_matches_update(systems, modeling_name, leaf_label):
+    if EFOOTPRINT_MAJOR_VERSION < 9:
+        pytest.skip("WhatIfSession updates e-footprint 9 Systems")
+    system = systems(modeling_name)
+    replay = UnitlessReplay(system)
+    session = WhatIfSession(system)
+    new_magnitude = session.find_hypothesis(leaf_label).value.magnitude * 1.25
+    atol = 10 ** -max(ROUNDING_DECIMALS)
+
+    footprints = replay.evaluate({leaf_label: new_magnitude})
+    try:
+        session.set(leaf_label, new_magnitude)
+        assert check_against_pint(replay, replay.evaluate(), rtol=1e-9, atol=atol) != []
+        assert check_against_pint(replay, footprints, rtol=1e-9, atol=atol) == []
+    finally:
+        session.reset()
+
+
+@pytest.mark.parametrize("modeling_name", LEGACY_MODELINGS)
+def test_legacy_modeling_matches_legacy_footprints(systems, modeling_name):
+    if EFOOTPRINT_MAJOR_VERSION < 9:
+        pytest.skip("legacy_adapter.py translates legacy modelings to e-footprint 9")
+    modeling = get_modeling(modeling_name)
+
+    comparisons = compare_with_legacy(systems(modeling_name), read_legacy_footprints(modeling))
+
+    assert [comparison for comparison in comparisons[:-1]
+            if not comparison["match"] and comparison["model_change"] is None] == []
@@ -0,0 +1,71 @@
+"""
+Background renders of the AI use case, checked against renders of the System at the time of the call.
+
+Usage, from the repository root:
+    python -m pytest tests/test_render_cache.py
+"""
+import re
+import threading
+
+import pytest
+
+pytest.importorskip("efootprint")
+
+from modeling_tools.footprints import efootprint_version, footprints_by_object
+from modeling_tools.lookup_cache import LookupCache
+from modeling_tools.modelings import get_modeling
+from modeling_tools.render_cache import rendering, snapshot
+from modeling_tools.run_modeling import build_modeling_system
+from modeling_tools.what_if import WhatIfSession
+
+if int(efootprint_version().split(".")[0]) < 9:
+    pytest.skip("WhatIfSession updates e-footprint 9 Systems", allow_module_level=True)
+
+
+@pytest.fixture(scope="module")
+def session(offline_build):
+    ai_use_case = get_modeling("ai_use_case")
+
+    return WhatIfSession(offline_build(build_modeling_system, ai_use_case, ai_use_case.path, None))
+
+
+def total_footprint(system):
+    return sum(footprint["value"] for footprint in footprints_by_object(system))
+
+
+def plot_title(filename):
+    with open(filename) as file:
+        return re.search(r"Total CO2 emissions from [^\"]*", file.read()).group(0)
+
+
+def test_snapshot_keeps_footprints_at_copy_time(session):
+    total_footprint_before = total_footprint(session.system)
+    system_snapshot = snapshot(session.system)
+    try:
+        session.set("PUE of GPU server", 2)
+
+        assert total_footprint(session.system) != total_footprint_before
+        assert total_footprint(system_snapshot) == total_footprint_before
+    finally:
+        session.reset()
+
+
+def test_background_render_shows_system_at_call_time(session, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    system = session.system
+    try:
+        with rendering(headless=False, cache=LookupCache(str(tmp_path / "renders"), offline=False),
+                       background=True) as renderer:
+            # The background thread only renders once the System is updated
+            update_done = threading.Event()
+            renderer.executor.submit(update_done.wait)
+            assert system.plot_footprints_by_category_and_object("background.html") is None
+            session.set("Lifespan of GPU server", session.find_hypothesis("Lifespan of GPU server").value.magnitude / 4)
+            update_done.set()
+        updated_title = plot_title(system.plot_footprints_by_category_and_object("updated.html").filename)
+    finally:
+        session.reset()
+    initial_title = plot_title(system.plot_footprints_by_category_and_object("initial.html").filename)
+
+    assert renderer.stats["rendered"] == 1
+    assert plot_title("background.html") == initial_title != updated_title
@@ -0,0 +1,50 @@
+"""
+Sensitivities of the AI use case footprint to its inputs, evaluated with WhatIfSession updates.
+
+Usage, from the repository root:
+    python -m pytest tests/test_sensitivity.py
+"""
+import pytest
+
+pytest.importorskip("efootprint")
+
+from modeling_tools.footprints import efootprint_version
+from modeling_tools.modelings import get_modeling
+from modeling_tools.run_modeling import load_builder
+from modeling_tools.sensitivity import elasticity, perturb_inputs
+from modeling_tools.what_if import WhatIfSession
+
+if int(efootprint_version().split(".")[0]) < 9:
+    pytest.skip("Sensitivities are evaluated with WhatIfSession updates from e-footprint 9", allow_module_level=True)
+
+RELATIVE_STEP = 0.1
+
+
+@pytest.fixture
+def session(offline_build):
+    ai_use_case = get_modeling("ai_use_case")
+
+    return offline_build(lambda: WhatIfSession(load_builder(ai_use_case, ai_use_case.path)()))
+
+
+def test_server_power_has_nonzero_elasticity(session):
+    base_footprint = session.total_footprint()
+
+    [(_, footprint_up, footprint_down, error)] = perturb_inputs(
+        ["Power of server_web from hypothesis"], RELATIVE_STEP, session)
+
+    assert error is None
+    assert elasticity(footprint_up, footprint_down, base_footprint, RELATIVE_STEP) > 0
+    assert session.changed_hypotheses() == []
+    assert session.total_footprint() == base_footprint
+
+
+def test_failed_perturbation_leaves_system_unchanged(session):
+    labels = ["Power of server_web from hypothesis"]
+    expected_perturbations = perturb_inputs(labels, RELATIVE_STEP, session)
+
+    [(_, _, _, error)] = perturb_inputs(
+        ["User defined number of server_web instances from user data"], RELATIVE_STEP, session)
+
+    assert error is not None
+    assert perturb_inputs(labels, RELATIVE_STEP, session) == expected_perturbations
@@ -0,0 +1,49 @@
+"""
+Paylib variants built from templates, computed together or as separate usage patterns.
+
+Usage, from the repository root:
+    python -m pytest tests/test_templates.py
+"""
+import pytest
+
+pytest.importorskip("efootprint")
+
+from modeling_tools.footprints import efootprint_version, footprints_by_object
+from modeling_tools.modelings import get_modeling
+from modeling_tools.templates import build_paylib_variants, import_paylib_templates, market_countries
+
+EFOOTPRINT_MAJOR_VERSION = int(efootprint_version().split(".")[0])
+
+if EFOOTPRINT_MAJOR_VERSION != get_modeling("paylib").legacy_api and EFOOTPRINT_MAJOR_VERSION < 9:
+    pytest.skip(f"Paylib can’t be built with e-footprint {efootprint_version()}", allow_module_level=True)
+
+
+def build_variants(offline_build, nb_of_markets, together=True):
+    return offline_build(
+        lambda: build_paylib_variants(import_paylib_templates(), nb_of_markets, ["Android"], 1e4, together))
+
+
+def nb_of_usage_patterns(variants):
+    return len({id(usage_pattern) for variant in variants for usage_pattern in variant.usage_patterns})
+
+
+def test_usage_patterns_grow_with_distinct_values(offline_build):
+    nb_of_countries = len(market_countries(offline_build(import_paylib_templates)))
+    _, variants = build_variants(offline_build, 2 * nb_of_countries + 1)
+
+    # The first country has three markets and the other ones two
+    assert len(variants) == 2 * nb_of_countries + 1
+    assert nb_of_usage_patterns(variants) == 2 * nb_of_countries
+    assert sorted(variant.share for variant in variants) == pytest.approx(
+        [1 / 3] * 3 + [1 / 2] * (2 * nb_of_countries - 2))
+
+
+def test_variants_computed_together_match_separate_variants(offline_build):
+    nb_of_countries = len(market_countries(offline_build(import_paylib_templates)))
+    totals = []
+    for together in (True, False):
+        system, variants = build_variants(offline_build, 2 * nb_of_countries, together)
+        totals.append(sum(footprint["value"] for footprint in footprints_by_object(system)))
+
+    # Separate e-footprint 1.x usage patterns each round up their number of user journeys in parallel
+    assert totals[0] == pytest.approx(totals[1], rel=1e-5 if EFOOTPRINT_MAJOR_VERSION >= 9 else 1e-2)
@@ -0,0 +1,66 @@
+"""
+What-if updates of the AI use case, checked against full rebuilds with the same hypotheses.
+
+Usage, from the repository root:
+    python -m pytest tests/test_what_if.py
+"""
+import pytest
+
+pytest.importorskip("efootprint")
+
+from modeling_tools.footprints import efootprint_version
+from modeling_tools.modelings import get_modeling
+from modeling_tools.run_modeling import load_builder
+from modeling_tools.what_if import WhatIfSession
+
+if int(efootprint_version().split(".")[0]) < 9:
+    pytest.skip("WhatIfSession updates e-footprint 9 Systems", allow_module_level=True)
+
+
+@pytest.fixture(scope="module")
+def build_system():
+    ai_use_case = get_modeling("ai_use_case")
+
+    return load_builder(ai_use_case, ai_use_case.path)
+
+
+@pytest.fixture
+def session(offline_build, build_system):
+    return offline_build(lambda: WhatIfSession(build_system()))
+
+
+@pytest.mark.parametrize("hypothesis_label, new_value, build_kwargs", [
+    ("number of words generated per chat", 300, {"word_per_chat": 300}),
+    ("monthly number of documents ingested for RAG", 2000, {"nb_docs_ingested": 2000})])
+def test_update_matches_rebuild(offline_build, build_system, session, hypothesis_label, new_value, build_kwargs):
+    report = session.set(hypothesis_label, new_value)
+
+    assert report.total_footprint_after != report.total_footprint_before
+    assert report.total_footprint_after == offline_build(
+        lambda: WhatIfSession(build_system(**build_kwargs)).total_footprint())
+
+
+def test_reset_matches_initial_build(session):
+    total_footprint_before = session.total_footprint()
+    session.set("monthly number of documents ingested for RAG", 2000)
+
+    assert session.reset().total_footprint_after == total_footprint_before
+
+
+def test_failed_update_records_no_change(session):
+    from efootprint.constants.units import u
+
+    with pytest.raises(ValueError):
+        session.set("Lifespan of GPU server", 3 * u.kg)
+
+    assert session.changed_hypotheses() == []
+    assert session.changes == []
+
+
+def test_failed_recomputation_is_rolled_back(session):
+    server_ram = session.find_hypothesis("RAM of server_web").value
+
+    with pytest.raises(ValueError):
+        session.set("RAM of server_web", 0.0001)
+
+    assert session.find_hypothesis("RAM of server_web").value == server_ram